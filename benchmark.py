@@ -0,0 +1,131 @@
+"""
+DNS benchmark engine for DNS Manager Pro
+Ranks saved DNS configs by time-to-service: lookup time plus RTT to the answer
+"""
+
+import ipaddress
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Union
+
+import metrics
+from dns_query import DNSError, TYPE_A, resolve_with_config
+from service_probe import measure_connect
+
+DEFAULT_CONNECT_PORT = 443
+
+
+def _is_ip_literal(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return False
+
+
+def _as_target(target: Union[str, Dict]) -> Dict:
+    """Accept a bare host name or a catalog target entry"""
+    if isinstance(target, str):
+        return {'host': target, 'port': DEFAULT_CONNECT_PORT, 'weight': 1.0}
+    return {'host': target['host'],
+            'port': target.get('port') or DEFAULT_CONNECT_PORT,
+            'weight': target.get('weight', 1.0)}
+
+
+def _weighted_mean(pairs: List[tuple]) -> Optional[float]:
+    total_weight = sum(weight for _, weight in pairs)
+    if not pairs or total_weight <= 0:
+        return None
+    return sum(value * weight for value, weight in pairs) / total_weight
+
+
+def time_to_service(host: str, dns_config: Dict[str, str],
+                    connect: Callable[[str, int], Optional[float]] = measure_connect,
+                    dns_port: int = 53, timeout: float = 2.0,
+                    connect_port: int = DEFAULT_CONNECT_PORT) -> Dict:
+    """
+    Resolve a host through one DNS config and connect to the returned addresses
+    Returns: dict with lookup, connect and total time in ms (None when unreachable)
+    """
+    result = {'host': host, 'lookup': None, 'connect': None, 'total': None,
+              'address': None, 'addresses': [], 'error': None}
+
+    if _is_ip_literal(host):
+        result['lookup'] = 0.0
+        addresses = [host]
+    else:
+        try:
+            response = resolve_with_config(host, dns_config, qtype=TYPE_A,
+                                           port=dns_port, timeout=timeout)
+        except DNSError as e:
+            metrics.observe_probe('dns', dns_config.get('primary', ''), host, None)
+            result['error'] = str(e)
+            return result
+        metrics.observe_probe('dns', response['server'], host, response['latency'])
+        result['lookup'] = response['latency']
+        addresses = response['addresses']
+
+    result['addresses'] = addresses
+    if not addresses:
+        result['error'] = "No addresses returned"
+        return result
+
+    # Connect to every returned address; a client ends up on the best one
+    latencies = [(connect(address, connect_port), address) for address in addresses]
+    for latency, address in latencies:
+        metrics.observe_probe('connect', '', host, latency)
+    reachable = [(latency, address) for latency, address in latencies if latency is not None]
+    if not reachable:
+        result['error'] = "No returned address accepted a connection"
+        return result
+
+    result['connect'], result['address'] = min(reachable)
+    result['total'] = result['lookup'] + result['connect']
+    return result
+
+
+def run_time_to_service_benchmark(configs: Dict[str, Dict[str, str]],
+                                  targets: Dict[str, Union[str, Dict]],
+                                  connect: Callable[[str, int], Optional[float]] = measure_connect,
+                                  dns_port: int = 53, timeout: float = 2.0,
+                                  max_workers: int = 16) -> List[Dict]:
+    """
+    Measure time-to-service for every config/target pair
+    targets maps names to host names or catalog entries (host, port, weight);
+    averages are weighted by the target weight.
+    Returns: configs ranked by average total time, best first; configs with
+    no successful target are listed last
+    """
+    targets = {name: _as_target(target) for name, target in targets.items()}
+    jobs = [(config_name, target_name)
+            for config_name in configs for target_name in targets]
+
+    def run_job(job):
+        config_name, target_name = job
+        target = targets[target_name]
+        return time_to_service(target['host'], configs[config_name],
+                               connect=connect, dns_port=dns_port, timeout=timeout,
+                               connect_port=target['port'])
+
+    with metrics.BENCHMARK_DURATION.time('time_to_service'), \
+            ThreadPoolExecutor(max_workers=max_workers) as executor:
+        outcomes = list(executor.map(run_job, jobs))
+
+    per_config = {name: {} for name in configs}
+    for (config_name, target_name), outcome in zip(jobs, outcomes):
+        per_config[config_name][target_name] = outcome
+
+    ranking = []
+    for config_name, services in per_config.items():
+        valid = [(s, targets[name]['weight']) for name, s in services.items()
+                 if s['total'] is not None]
+        ranking.append({
+            'config': config_name,
+            'services': services,
+            'success': len(valid),
+            'avg_total': _weighted_mean([(s['total'], w) for s, w in valid]),
+            'avg_lookup': _weighted_mean([(s['lookup'], w) for s, w in valid]),
+            'avg_connect': _weighted_mean([(s['connect'], w) for s, w in valid]),
+        })
+
+    ranking.sort(key=lambda e: (e['avg_total'] is None, -e['success'], e['avg_total'] or 0))
+    return ranking
@@ -0,0 +1,322 @@
+"""
+Domain blocklists for the local DNS forwarder
+Hosts files, adblock-style lists (||ads.example^, @@||ok.example^) and plain
+domain lists are compiled once into index files of sorted 64-bit blake2b
+name hashes, which are memory-mapped and binary searched. Only lists that
+changed since their index was built are parsed again, so loading millions of
+entries usually just maps a few files.
+
+Usage:
+    python blocklist.py [--lists FILE ...] NAME ...
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import time
+from array import array
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+SETTINGS_FILE = 'blocklist.json'
+INDEX_DIR = 'blocklist_index'
+
+DEFAULT_SETTINGS = {
+    'lists': [],                # hosts / adblock / domain list files
+    'allow': [],                # never blocked, subdomains included
+    'response': 'nxdomain',     # or 'null': 0.0.0.0 / :: for A / AAAA
+}
+
+# Sections of an index file, in file order
+BLOCK, BLOCK_TREE, ALLOW, ALLOW_TREE = range(4)
+
+_MAGIC = b'DNSBLK1' + (b'<' if sys.byteorder == 'little' else b'>')
+_HEADER = struct.Struct('=8s4Q')
+
+# Names that hosts files map to themselves rather than block
+_HOSTS_SKIP = {'localhost', 'localhost.localdomain', 'local', 'broadcasthost', '0.0.0.0',
+               'ip6-localhost', 'ip6-loopback', 'ip6-localnet', 'ip6-mcastprefix',
+               'ip6-allnodes', 'ip6-allrouters', 'ip6-allhosts'}
+_HOSTS_ADDRESSES = {'0.0.0.0', '127.0.0.1', '::', '::0', '::1', '0:0:0:0:0:0:0:0'}
+_LABEL_CHARS = frozenset('abcdefghijklmnopqrstuvwxyz0123456789-_')
+# Adblock element hiding and scriptlet rules (example.org##.ad, #@#, #?#, #$#, #%#)
+_COSMETIC = re.compile(r'#[@?$%]?#')
+
+# Decisions remembered per Blocklist; DNS traffic repeats the same few names
+CACHE_SIZE = 4096
+
+
+def load_settings(path: str = SETTINGS_FILE) -> Dict:
+    """DEFAULT_SETTINGS overlaid with the settings file"""
+    settings = json.loads(json.dumps(DEFAULT_SETTINGS))
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            stored = json.load(f)
+    except OSError:
+        return settings
+    except ValueError as e:
+        print(f"Error reading {path}: {e}")
+        return settings
+    settings.update({key: value for key, value in stored.items() if key in DEFAULT_SETTINGS})
+    return settings
+
+
+def save_settings(settings: Dict, path: str = SETTINGS_FILE):
+    try:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(settings, f, indent=2)
+    except OSError as e:
+        print(f"Error saving blocklist settings: {e}")
+
+
+def name_hash(name: str) -> int:
+    """64-bit hash of a lowercase name without the trailing dot"""
+    return int.from_bytes(hashlib.blake2b(name.encode('utf-8', 'replace'), digest_size=8).digest(), 'little')
+
+
+def _valid_domain(name: str) -> bool:
+    if not name or len(name) > 253:
+        return False
+    return all(0 < len(label) <= 63 and _LABEL_CHARS.issuperset(label) for label in name.split('.'))
+
+
+def parse_line(line: str) -> List[Tuple[int, str]]:
+    """
+    (section, domain) entries on one list line; empty for comments and for
+    adblock rules that are not about a whole domain (paths, options, cosmetics)
+    """
+    line = line.strip()
+    if not line or line[0] in '#![':
+        return []
+
+    if line.startswith('||') or line.startswith('@@||'):
+        allow = line.startswith('@@')
+        rule = line[4:] if allow else line[2:]
+        domain, _, rest = rule.partition('^')
+        if rest and rest not in ('$important', '|'):
+            return []
+        domain = domain.lower().rstrip('.')
+        if not _valid_domain(domain):
+            return []
+        return [(ALLOW_TREE if allow else BLOCK_TREE, domain)]
+
+    if _COSMETIC.search(line):
+        return []
+    line = line.split('#', 1)[0]
+    parts = line.lower().split()
+    if not parts:
+        return []
+    if len(parts) > 1:
+        if parts[0] not in _HOSTS_ADDRESSES:
+            return []
+        return [(BLOCK, domain.rstrip('.')) for domain in parts[1:]
+                if domain not in _HOSTS_SKIP and _valid_domain(domain.rstrip('.'))]
+    domain = parts[0].rstrip('.')
+    if domain.startswith('*.'):
+        return [(BLOCK_TREE, domain[2:])] if _valid_domain(domain[2:]) else []
+    return [(BLOCK, domain)] if _valid_domain(domain) and domain not in _HOSTS_SKIP else []
+
+
+def index_path(source: str, index_dir: str = INDEX_DIR) -> str:
+    """Index file for a list in its current state; the name changes whenever the list does"""
+    stat = os.stat(source)
+    tag = hashlib.blake2b(os.path.abspath(source).encode(), digest_size=4).hexdigest()
+    return os.path.join(index_dir, f"{os.path.basename(source)}-{tag}-{stat.st_size}-{stat.st_mtime_ns}.idx")
+
+
+def build_index(source: str, path: str) -> List[int]:
+    """Compile a list file into an index file; returns the entry count per section"""
+    sections = [array('Q') for _ in range(4)]
+    with open(source, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            for section, domain in parse_line(line):
+                sections[section].append(name_hash(domain))
+
+    counts = []
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as out:
+        out.write(_HEADER.pack(_MAGIC, 0, 0, 0, 0))
+        for hashes in sections:
+            unique = array('Q')
+            previous = None
+            for value in sorted(hashes):
+                if value != previous:
+                    unique.append(value)
+                    previous = value
+            unique.tofile(out)
+            counts.append(len(unique))
+        out.seek(0)
+        out.write(_HEADER.pack(_MAGIC, *counts))
+    os.replace(temp_path, path)
+    return counts
+
+
+class DomainIndex:
+    """A memory-mapped index file: four sorted arrays of name hashes"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size or _HEADER.unpack(header)[0] != _MAGIC:
+                raise ValueError(f"{path} is not a blocklist index")
+            self.counts = list(_HEADER.unpack(header)[1:])
+            size = os.fstat(f.fileno()).st_size
+            if size != _HEADER.size + 8 * sum(self.counts):
+                raise ValueError(f"{path} is incomplete")
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size > _HEADER.size else None
+        self._view = memoryview(self._map)[_HEADER.size:].cast('Q') if self._map else memoryview(array('Q'))
+        self.sections = []
+        start = 0
+        for count in self.counts:
+            self.sections.append(self._view[start:start + count])
+            start += count
+
+    def contains(self, section: int, value: int) -> bool:
+        hashes = self.sections[section]
+        i = bisect_left(hashes, value)
+        return i < len(hashes) and hashes[i] == value
+
+    def close(self):
+        for view in self.sections:
+            view.release()
+        self.sections = []
+        self._view.release()
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+
+def open_index(source: str, index_dir: str = INDEX_DIR) -> Tuple[DomainIndex, bool]:
+    """
+    The index for a list file, compiled first if the list changed
+    Returns: (index, whether it was rebuilt)
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    path = index_path(source, index_dir)
+    rebuilt = False
+    try:
+        index = DomainIndex(path)
+    except (OSError, ValueError):
+        build_index(source, path)
+        index = DomainIndex(path)
+        rebuilt = True
+        # Indexes of earlier versions of this list; one still mapped elsewhere is left for next time
+        for stale in glob.glob(glob.escape(path.rsplit('-', 2)[0]) + '-*.idx'):
+            if os.path.abspath(stale) != os.path.abspath(path):
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+    return index, rebuilt
+
+
+class Blocklist:
+    """
+    Decides whether a name is blocked by any of its indexes
+
+    Exceptions (@@ rules) from any list and the `allow` domains win over
+    every block rule. Hosts and plain entries block exactly that name;
+    adblock ||domain^ and *.domain entries block the domain and all below it.
+    """
+
+    def __init__(self, indexes: List[DomainIndex], allow: Iterable[str] = ()):
+        self.indexes = indexes
+        self.allow = frozenset(name.lower().strip('.') for name in allow)
+        self.rebuilt = []           # list files compiled by load()
+        self._recent = {}
+
+    @classmethod
+    def load(cls, lists: Iterable[str], allow: Iterable[str] = (), index_dir: str = INDEX_DIR,
+             on_progress: Optional[Callable[[str, bool], None]] = None) -> 'Blocklist':
+        """
+        Map every list's index, compiling those that changed
+        Lists that cannot be read are reported and skipped.
+        """
+        indexes = []
+        rebuilt = []
+        for source in lists:
+            try:
+                index, was_rebuilt = open_index(source, index_dir)
+            except OSError as e:
+                print(f"Skipping blocklist {source}: {e}")
+                continue
+            indexes.append(index)
+            if was_rebuilt:
+                rebuilt.append(source)
+            if on_progress:
+                on_progress(source, was_rebuilt)
+        blocklist = cls(indexes, allow)
+        blocklist.rebuilt = rebuilt
+        return blocklist
+
+    def __len__(self) -> int:
+        """Block entries across all lists (a domain in two lists counts twice)"""
+        return sum(index.counts[BLOCK] + index.counts[BLOCK_TREE] for index in self.indexes)
+
+    def blocks(self, name: str) -> bool:
+        name = name.lower().rstrip('.')
+        decision = self._recent.get(name)
+        if decision is None:
+            decision = self._decide(name)
+            if len(self._recent) >= CACHE_SIZE:
+                self._recent.clear()
+            self._recent[name] = decision
+        return decision
+
+    def _decide(self, name: str) -> bool:
+        if not name:
+            return False
+        labels = name.split('.')
+        suffixes = ['.'.join(labels[i:]) for i in range(len(labels))]
+        if any(suffix in self.allow for suffix in suffixes):
+            return False
+        hashes = [name_hash(suffix) for suffix in suffixes]
+        blocked = False
+        for index in self.indexes:
+            if index.contains(ALLOW, hashes[0]) or any(index.contains(ALLOW_TREE, h) for h in hashes):
+                return False
+            if not blocked:
+                blocked = index.contains(BLOCK, hashes[0]) or any(index.contains(BLOCK_TREE, h) for h in hashes)
+        return blocked
+
+    def close(self):
+        for index in self.indexes:
+            index.close()
+        self.indexes = []
+        self._recent.clear()
+
+
+def load_from_settings(settings: Dict, index_dir: str = INDEX_DIR) -> Blocklist:
+    return Blocklist.load(settings['lists'], settings['allow'], index_dir)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Check names against the configured blocklists")
+    parser.add_argument('names', nargs='*', help="names to check")
+    parser.add_argument('--lists', nargs='+', help=f"list files (default: from {SETTINGS_FILE})")
+    args = parser.parse_args(argv)
+
+    settings = load_settings()
+    if args.lists:
+        settings['lists'] = args.lists
+    start = time.perf_counter()
+    blocklist = Blocklist.load(settings['lists'], settings['allow'],
+                               on_progress=lambda source, rebuilt: print(
+                                   f"{'Compiled' if rebuilt else 'Mapped'} {source}"))
+    print(f"{len(blocklist):,} entries from {len(blocklist.indexes)} lists "
+          f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+    for name in args.names:
+        print(f"{name}: {'blocked' if blocklist.blocks(name) else 'allowed'}")
+    blocklist.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,349 @@
+"""
+Bulk DNS queries for DNS Manager Pro
+Resolves many names through one resolver over a single UDP socket with many
+queries in flight, retrying over TCP when an answer comes back truncated
+
+Usage:
+    python bulk_query.py <names file> [--resolver NAME_OR_ADDRESS] [--type A|AAAA]
+                         [--compare NAME_OR_ADDRESS ...] [--json]
+
+NAME is a saved config or a catalog preset; names files hold one name per line
+(hosts-file lines work too: the last field is used; '#' starts a comment).
+"""
+
+import argparse
+import json
+import random
+import select
+import socket
+import struct
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from dns_query import (DNSError, RCODE_NAMES, TYPE_A, TYPE_AAAA, TYPE_NAMES,
+                       build_query, parse_response, resolve_tcp, split_server)
+
+WINDOW = 256            # queries in flight on the socket
+TIMEOUT = 2.0           # seconds per attempt
+RETRIES = 2             # extra attempts after a timeout
+TCP_WORKERS = 8
+
+CONFIG_FILE = 'dns_configs.json'
+
+
+def read_names(lines: Iterable[str]) -> List[str]:
+    """Names from a file's lines, without comments, blanks or duplicates"""
+    names = []
+    for line in lines:
+        fields = line.split('#', 1)[0].split()
+        if fields:
+            names.append(fields[-1].rstrip('.').lower())
+    return list(dict.fromkeys(names))
+
+
+def _result(name: str, qtype: int, server: str) -> Dict:
+    return {'name': name, 'type': TYPE_NAMES.get(qtype, str(qtype)), 'server': server,
+            'rcode': None, 'status': None, 'answers': [], 'addresses': [],
+            'latency': None, 'via': None, 'attempts': 0, 'error': None}
+
+
+def _fill(result: Dict, response: Dict, latency: float, via: str) -> Dict:
+    result.update(rcode=response['rcode'], answers=response['answers'], latency=latency, via=via,
+                  status=RCODE_NAMES.get(response['rcode'], str(response['rcode'])),
+                  addresses=[a['data'] for a in response['answers']
+                             if a['type'] in (TYPE_A, TYPE_AAAA)])
+    return result
+
+
+def resolve_many(names: Iterable[str], server: str, qtype: int = TYPE_A, port: int = 53,
+                 window: int = WINDOW, timeout: float = TIMEOUT, retries: int = RETRIES,
+                 tcp_fallback: bool = True, cancel: Optional[threading.Event] = None) -> Iterator[Dict]:
+    """
+    Resolve names through one resolver, keeping up to `window` queries in flight
+    Yields one result per name as answers arrive (not in input order):
+    {'name', 'type', 'server', 'rcode', 'status', 'answers' [{'name', 'type',
+    'ttl', 'data'}], 'addresses', 'latency' (ms), 'via' ('udp' or 'tcp'),
+    'attempts', 'error'}. Setting `cancel` stops early.
+    """
+    address, port = split_server(server, port)
+    family = socket.AF_INET6 if ':' in address else socket.AF_INET
+    window = max(1, min(window, 4096))
+    waiting = deque((name.rstrip('.').lower(), 1) for name in names)
+    in_flight = {}          # query id -> (name, attempt, sent_at, deadline)
+    tcp_futures = []
+    tcp_pool = None
+
+    sock = socket.socket(family, socket.SOCK_DGRAM)
+    try:
+        # Connected, so the kernel drops datagrams from anyone but the resolver
+        sock.connect((address, port))
+        sock.setblocking(False)
+
+        while waiting or in_flight or tcp_futures:
+            if cancel is not None and cancel.is_set():
+                return
+
+            while waiting and len(in_flight) < window:
+                name, attempt = waiting.popleft()
+                query_id = random.getrandbits(16)
+                while query_id in in_flight:
+                    query_id = random.getrandbits(16)
+                try:
+                    query = build_query(name, qtype, query_id)
+                except DNSError as e:
+                    failed = _result(name, qtype, server)
+                    failed['error'] = str(e)
+                    yield failed
+                    continue
+                try:
+                    sock.send(query)
+                except BlockingIOError:
+                    # Socket buffer full: wait for replies before sending more
+                    waiting.appendleft((name, attempt))
+                    break
+                except OSError:
+                    # e.g. an earlier ICMP unreachable surfacing; the query times out
+                    pass
+                sent_at = time.perf_counter()
+                in_flight[query_id] = (name, attempt, sent_at, sent_at + timeout)
+
+            now = time.perf_counter()
+            wait = min((entry[3] for entry in in_flight.values()), default=now + 0.05) - now
+            if tcp_futures:
+                wait = min(wait, 0.02)
+            readable, _, _ = select.select([sock], [], [], max(0.0, wait))
+
+            if readable:
+                while True:
+                    try:
+                        data = sock.recv(65535)
+                    except (BlockingIOError, InterruptedError):
+                        break
+                    except ConnectionRefusedError:
+                        # Nothing listens on that port; the queries will time out
+                        continue
+                    received_at = time.perf_counter()
+                    try:
+                        response = parse_response(data)
+                    except (DNSError, struct.error):
+                        continue
+                    entry = in_flight.get(response['id'])
+                    question = response['question'] or {}
+                    if entry is None or question.get('name', '').lower().rstrip('.') != entry[0]:
+                        continue
+                    del in_flight[response['id']]
+                    name, attempt, sent_at, _ = entry
+                    latency = (received_at - sent_at) * 1000
+                    result = _fill(_result(name, qtype, server), response, latency, 'udp')
+                    result['attempts'] = attempt
+                    if response['truncated'] and tcp_fallback:
+                        if tcp_pool is None:
+                            tcp_pool = ThreadPoolExecutor(max_workers=TCP_WORKERS)
+                        tcp_futures.append((tcp_pool.submit(resolve_tcp, name, server, qtype, port, timeout),
+                                            result))
+                        continue
+                    yield result
+
+            now = time.perf_counter()
+            for query_id in [i for i, entry in in_flight.items() if entry[3] <= now]:
+                name, attempt, _, _ = in_flight.pop(query_id)
+                if attempt <= retries:
+                    waiting.appendleft((name, attempt + 1))
+                else:
+                    failed = _result(name, qtype, server)
+                    failed.update(attempts=attempt, error=f"Timeout after {attempt} attempts")
+                    yield failed
+
+            for item in [item for item in tcp_futures if item[0].done()]:
+                tcp_futures.remove(item)
+                future, result = item
+                try:
+                    response = future.result()
+                except DNSError as e:
+                    result['error'] = f"Truncated over UDP; {e}"
+                    yield result
+                    continue
+                yield _fill(result, response, result['latency'] + response['latency'], 'tcp')
+    finally:
+        sock.close()
+        if tcp_pool is not None:
+            tcp_pool.shutdown(wait=False, cancel_futures=True)
+
+
+def resolve_many_with_config(names: Iterable[str], dns_config: Dict[str, str], qtype: int = TYPE_A,
+                             port: int = 53, **kwargs) -> Iterator[Dict]:
+    """
+    resolve_many through a saved config's primary; names that get no answer
+    are tried again on the secondary
+    """
+    primary, secondary = dns_config.get('primary'), dns_config.get('secondary')
+    if not primary:
+        raise DNSError("No DNS servers configured")
+    unanswered = []
+    for result in resolve_many(names, primary, qtype, port, **kwargs):
+        if result['rcode'] is None and secondary:
+            unanswered.append(result['name'])
+        else:
+            yield result
+    if unanswered:
+        yield from resolve_many(unanswered, secondary, qtype, port, **kwargs)
+
+
+def answer_key(result: Dict) -> tuple:
+    """What two resolvers must agree on: the status and the set of records"""
+    return result['status'], frozenset((a['type'], str(a['data'])) for a in result['answers'])
+
+
+def compare_resolvers(names: Iterable[str], resolvers: Dict[str, Dict[str, str]],
+                      qtype: int = TYPE_A, **kwargs) -> List[Dict]:
+    """
+    Resolve the same names through several configs at once
+    Returns: per name {'name', 'results': {resolver: result}, 'agree'}, in input order.
+    Answers from CDNs legitimately differ between resolvers; 'agree' only
+    says whether they were identical.
+    """
+    names = list(dict.fromkeys(name.rstrip('.').lower() for name in names))
+    per_resolver = {}
+
+    def run(label):
+        try:
+            per_resolver[label] = {r['name']: r for r in
+                                   resolve_many_with_config(names, resolvers[label], qtype, **kwargs)}
+        except (DNSError, OSError) as e:
+            # One unreachable or unresolvable resolver fails its own column only
+            per_resolver[label] = {}
+            for name in names:
+                per_resolver[label][name] = _result(name, qtype, '')
+                per_resolver[label][name]['error'] = str(e)
+
+    with ThreadPoolExecutor(max_workers=len(resolvers) or 1) as executor:
+        list(executor.map(run, resolvers))
+
+    rows = []
+    for name in names:
+        # Missing only when the run was cancelled
+        results = {label: per_resolver[label].get(name) or _result(name, qtype, '') for label in resolvers}
+        rows.append({'name': name, 'results': results,
+                     'agree': len({answer_key(r) for r in results.values()}) <= 1})
+    return rows
+
+
+def summarize(results: List[Dict], elapsed: Optional[float] = None) -> Dict:
+    """
+    Counts and latency percentiles for a finished run
+    Returns: {'total', 'answered', 'nxdomain', 'failed', 'tcp', 'p50', 'p95', 'max', 'qps'}
+    """
+    latencies = sorted(r['latency'] for r in results if r['rcode'] is not None)
+
+    def percentile(p):
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+
+    return {
+        'total': len(results),
+        'answered': sum(1 for r in results if r['rcode'] == 0),
+        'nxdomain': sum(1 for r in results if r['status'] == 'NXDOMAIN'),
+        'failed': sum(1 for r in results if r['rcode'] is None or r['rcode'] not in (0, 3)),
+        'tcp': sum(1 for r in results if r['via'] == 'tcp'),
+        'p50': percentile(0.5),
+        'p95': percentile(0.95),
+        'max': latencies[-1] if latencies else None,
+        'qps': len(results) / elapsed if elapsed else None,
+    }
+
+
+def format_result(result: Dict) -> str:
+    if result['error'] and result['rcode'] is None:
+        return f"{result['name']:<40} {result['type']:<5} ERROR     {result['error']}"
+    records = ', '.join(f"{a['data']} (ttl {a['ttl']})" for a in result['answers']) or '-'
+    via = ' tcp' if result['via'] == 'tcp' else ''
+    return (f"{result['name']:<40} {result['type']:<5} {result['status']:<9} "
+            f"{result['latency']:7.1f} ms{via}  {records}")
+
+
+def format_summary(summary: Dict) -> str:
+    text = (f"{summary['total']} names: {summary['answered']} answered, "
+            f"{summary['nxdomain']} NXDOMAIN, {summary['failed']} failed")
+    if summary['p50'] is not None:
+        text += f" | p50 {summary['p50']:.1f} ms, p95 {summary['p95']:.1f} ms"
+    if summary['qps']:
+        text += f" | {summary['qps']:.0f} queries/s"
+    return text
+
+
+def known_resolvers(config_file: str = CONFIG_FILE) -> Dict[str, Dict[str, str]]:
+    """Catalog presets and saved configs (saved configs win on a name clash)"""
+    from catalog import ServiceCatalog
+
+    resolvers = {name: {'primary': preset['primary'], 'secondary': preset['secondary']}
+                 for name, preset in ServiceCatalog().presets.items()}
+    try:
+        with open(config_file, 'r', encoding='utf-8') as f:
+            resolvers.update(json.load(f))
+    except (OSError, ValueError):
+        pass
+    return resolvers
+
+
+def lookup_resolver(label: str, resolvers: Dict[str, Dict[str, str]]) -> Dict[str, str]:
+    """A saved config or preset by name (case-insensitive), else an address"""
+    for name, config in resolvers.items():
+        if name.lower() == label.lower():
+            return config
+    return {'primary': label, 'secondary': ''}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Resolve many names through one resolver")
+    parser.add_argument('names', help="file with one name per line ('-' for stdin)")
+    parser.add_argument('--resolver', default='Cloudflare')
+    parser.add_argument('--type', default='A', choices=['A', 'AAAA'])
+    parser.add_argument('--compare', nargs='+', metavar='RESOLVER',
+                        help="resolve through these too and list names whose answers differ")
+    parser.add_argument('--window', type=int, default=WINDOW)
+    parser.add_argument('--timeout', type=float, default=TIMEOUT)
+    parser.add_argument('--json', action='store_true', help="one JSON object per line")
+    args = parser.parse_args(argv)
+
+    if args.names == '-':
+        names = read_names(sys.stdin)
+    else:
+        with open(args.names, 'r', encoding='utf-8') as f:
+            names = read_names(f)
+    qtype = TYPE_A if args.type == 'A' else TYPE_AAAA
+    resolvers = known_resolvers()
+    options = {'window': args.window, 'timeout': args.timeout}
+
+    if args.compare:
+        labels = [args.resolver] + args.compare
+        rows = compare_resolvers(names, {label: lookup_resolver(label, resolvers) for label in labels},
+                                 qtype, **options)
+        differing = [row for row in rows if not row['agree']]
+        for row in differing:
+            if args.json:
+                print(json.dumps(row, default=list))
+                continue
+            print(row['name'])
+            for label, result in row['results'].items():
+                records = ', '.join(str(a['data']) for a in result['answers']) or '-'
+                print(f"    {label:<24} {result['status'] or 'ERROR':<9} {records}")
+        print(f"{len(differing)} of {len(rows)} names answered differently", file=sys.stderr)
+        return 0
+
+    results = []
+    start = time.perf_counter()
+    for result in resolve_many_with_config(names, lookup_resolver(args.resolver, resolvers),
+                                           qtype, **options):
+        results.append(result)
+        print(json.dumps(result) if args.json else format_result(result), flush=True)
+    print(format_summary(summarize(results, time.perf_counter() - start)), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
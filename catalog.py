@@ -0,0 +1,183 @@
+"""
+Service catalog for DNS Manager Pro
+Ping/benchmark targets and DNS presets, loaded on first use from services.json
+plus an optional user catalog that adds, overrides or disables entries
+"""
+
+import json
+import sys
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BUNDLED_CATALOG = 'services.json'
+USER_CATALOG = 'service_catalog.json'
+
+PROBE_TYPES = ('icmp', 'tcp')
+
+TARGET_DEFAULTS = {
+    'groups': [],
+    'probe': 'icmp',
+    'port': 443,
+    'weight': 1.0,
+    'enabled': True,
+}
+
+PRESET_DEFAULTS = {
+    'secondary': '',
+    'groups': [],
+    'enabled': True,
+}
+
+
+def bundled_catalog_path() -> Path:
+    """Location of the catalog shipped with the app (PyInstaller extracts data to _MEIPASS)"""
+    base = getattr(sys, '_MEIPASS', None) or Path(__file__).parent
+    return Path(base) / BUNDLED_CATALOG
+
+
+class CatalogError(Exception):
+    """Raised when a catalog file has an invalid entry"""
+
+
+def _normalize_target(entry: Dict) -> Dict:
+    if not entry.get('name') or not entry.get('host'):
+        raise CatalogError(f"Target needs a name and a host: {entry!r}")
+    target = dict(TARGET_DEFAULTS, **entry)
+    if target['probe'] not in PROBE_TYPES:
+        raise CatalogError(f"Unknown probe type for {target['name']}: {target['probe']!r}")
+    target['port'] = int(target['port'])
+    target['weight'] = float(target['weight'])
+    target['groups'] = list(target['groups'])
+    return target
+
+
+def _normalize_preset(entry: Dict) -> Dict:
+    if not entry.get('name') or not entry.get('primary'):
+        raise CatalogError(f"Preset needs a name and a primary server: {entry!r}")
+    preset = dict(PRESET_DEFAULTS, **entry)
+    preset['groups'] = list(preset['groups'])
+    return preset
+
+
+class ServiceCatalog:
+    """
+    Targets and presets indexed by name and by group
+
+    Nothing is read from disk until the first lookup. Later files override
+    earlier ones entry by entry (matched on name); an override may contain
+    only the fields it changes, e.g. {"name": "YouTube", "enabled": false}.
+    """
+
+    def __init__(self, paths: Optional[List[Path]] = None):
+        if paths is None:
+            paths = [bundled_catalog_path(), Path(USER_CATALOG)]
+        self.paths = [Path(p) for p in paths]
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._groups: Dict[str, str] = {}
+        self._targets: Dict[str, Dict] = {}
+        self._presets: Dict[str, Dict] = {}
+        self._target_index: Dict[str, List[str]] = {}
+        self._preset_index: Dict[str, List[str]] = {}
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if not self._loaded:
+                self._load()
+                self._loaded = True
+
+    def reload(self):
+        """Drop loaded data; the next lookup reads the files again"""
+        with self._lock:
+            self._loaded = False
+
+    def _load(self):
+        groups: Dict[str, str] = {}
+        raw_targets: Dict[str, Dict] = {}
+        raw_presets: Dict[str, Dict] = {}
+
+        for path in self.paths:
+            if not path.exists():
+                continue
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Error loading service catalog {path}: {e}")
+                continue
+
+            groups.update(data.get('groups', {}))
+            for entry in data.get('targets', []):
+                raw_targets.setdefault(entry.get('name'), {}).update(entry)
+            for entry in data.get('presets', []):
+                raw_presets.setdefault(entry.get('name'), {}).update(entry)
+
+        targets = {}
+        for entry in raw_targets.values():
+            try:
+                target = _normalize_target(entry)
+            except (CatalogError, TypeError, ValueError) as e:
+                print(f"Skipping catalog target: {e}")
+                continue
+            if target['enabled']:
+                targets[target['name']] = target
+
+        presets = {}
+        for entry in raw_presets.values():
+            try:
+                preset = _normalize_preset(entry)
+            except (CatalogError, TypeError, ValueError) as e:
+                print(f"Skipping catalog preset: {e}")
+                continue
+            if preset['enabled']:
+                presets[preset['name']] = preset
+
+        self._groups = groups
+        self._targets = targets
+        self._presets = presets
+        self._target_index = self._index(targets)
+        self._preset_index = self._index(presets)
+
+    @staticmethod
+    def _index(entries: Dict[str, Dict]) -> Dict[str, List[str]]:
+        index: Dict[str, List[str]] = {}
+        for name, entry in entries.items():
+            for group in entry['groups']:
+                index.setdefault(group, []).append(name)
+        return index
+
+    @property
+    def groups(self) -> Dict[str, str]:
+        """Group id -> display name"""
+        self._ensure_loaded()
+        return self._groups
+
+    @property
+    def targets(self) -> Dict[str, Dict]:
+        """Enabled targets by name, in catalog order"""
+        self._ensure_loaded()
+        return self._targets
+
+    @property
+    def presets(self) -> Dict[str, Dict]:
+        """Enabled DNS presets by name, in catalog order"""
+        self._ensure_loaded()
+        return self._presets
+
+    def target_group(self, group: str) -> List[str]:
+        """Names of the enabled targets in a group"""
+        self._ensure_loaded()
+        return self._target_index.get(group, [])
+
+    def preset_group(self, group: str) -> List[str]:
+        """Names of the enabled presets in a group"""
+        self._ensure_loaded()
+        return self._preset_index.get(group, [])
+
+    def target_groups(self) -> Dict[str, str]:
+        """Groups that contain at least one enabled target (id -> display name)"""
+        self._ensure_loaded()
+        return {group: self._groups.get(group, group.title()) for group in self._target_index}
@@ -0,0 +1,423 @@
+"""
+Command execution layer for DNS Manager Pro
+Runs netsh/ipconfig/ping/git with enforced timeouts, records every call and
+can pipe read-only queries into one long-lived shell session
+"""
+
+import atexit
+import itertools
+import queue
+import re
+import shlex
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Sequence
+
+import metrics
+import tracing
+
+DEFAULT_TIMEOUT = 10.0
+HISTORY_SIZE = 200
+
+
+class CommandError(Exception):
+    """Raised by run(check=True) when a command fails, times out or cannot start"""
+
+    def __init__(self, result: 'CommandResult'):
+        self.result = result
+        if result.timed_out:
+            reason = f"timed out after {result.timeout:g}s"
+        elif result.error:
+            reason = result.error
+        else:
+            reason = f"exit code {result.returncode}"
+            if result.stderr.strip():
+                reason += f": {result.stderr.strip()}"
+        super().__init__(f"{result.command} failed ({reason})")
+
+
+class CommandResult:
+    """Outcome of one command; attribute names follow subprocess.CompletedProcess"""
+
+    def __init__(self, args: Sequence[str], returncode: Optional[int] = None,
+                 stdout: str = '', stderr: str = '', duration: float = 0.0,
+                 timed_out: bool = False, error: Optional[str] = None,
+                 via: str = 'process', timeout: Optional[float] = None):
+        self.args = list(args)
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.duration = duration        # ms
+        self.timed_out = timed_out
+        self.error = error              # set when the command could not be started
+        self.via = via                  # 'process', 'session' or 'fake'
+        self.timeout = timeout
+
+    @property
+    def command(self) -> str:
+        return subprocess.list2cmdline(self.args)
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0 and not self.timed_out
+
+    def check_returncode(self):
+        if not self.ok:
+            raise CommandError(self)
+
+    def __repr__(self):
+        return (f"CommandResult({self.command!r}, returncode={self.returncode}, "
+                f"duration={self.duration:.1f}ms, via={self.via!r})")
+
+
+class ShellSession:
+    """
+    One long-lived interpreter that commands are piped into
+
+    After each command a marker command is sent whose output contains a unique
+    token (and, when the shell can report it, the exit code). Output up to the
+    marker belongs to the command. stderr is merged into stdout. If a command
+    times out the interpreter is killed and started again on the next call.
+    """
+
+    def __init__(self, argv: List[str], marker: Callable[[str], str],
+                 programs: Sequence[str] = (), strip_program: bool = False,
+                 quote: Callable[[Sequence[str]], str] = subprocess.list2cmdline,
+                 prompt: str = ''):
+        self.argv = argv
+        self.marker = marker
+        self.programs = {p.lower() for p in programs}
+        self.strip_program = strip_program
+        self.quote = quote
+        self.prompt = prompt
+        self._process = None
+        self._lines = None
+        self._tokens = itertools.count(1)
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    def handles(self, args: Sequence[str]) -> bool:
+        """Whether a command can be run inside this session"""
+        return bool(args) and (not self.programs or args[0].lower() in self.programs)
+
+    def _start(self):
+        kwargs = {}
+        if sys.platform == 'win32':
+            kwargs['creationflags'] = subprocess.CREATE_NO_WINDOW
+        metrics.SUBPROCESS_SPAWNS.inc(_program(self.argv), 'session')
+        self._process = subprocess.Popen(
+            self.argv, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT, text=True, errors='replace', bufsize=1, **kwargs)
+        self._lines = queue.Queue()
+        threading.Thread(target=self._read, args=(self._process, self._lines),
+                         name='shell-session-reader', daemon=True).start()
+
+    @staticmethod
+    def _read(process, lines):
+        for line in process.stdout:
+            lines.put(line)
+        lines.put(None)
+
+    def execute(self, args: Sequence[str], timeout: float) -> tuple:
+        """
+        Run one command in the session
+        Returns: (returncode, output); raises subprocess.TimeoutExpired or OSError
+        """
+        with self._lock:
+            if self._process is None or self._process.poll() is not None:
+                self._start()
+
+            token = f"__dnsmanager_{next(self._tokens)}__"
+            words = list(args[1:]) if self.strip_program else list(args)
+            try:
+                self._process.stdin.write(f"{self.quote(words)}\n{self.marker(token)}\n")
+                self._process.stdin.flush()
+            except (OSError, ValueError) as e:
+                self._kill()
+                raise OSError(f"Shell session closed: {e}")
+
+            output = []
+            deadline = time.monotonic() + timeout
+            while True:
+                remaining = deadline - time.monotonic()
+                try:
+                    line = self._lines.get(timeout=max(0.0, remaining))
+                except queue.Empty:
+                    self._kill()
+                    raise subprocess.TimeoutExpired(list(args), timeout)
+                if line is None:
+                    self._kill()
+                    raise OSError("Shell session exited")
+                if self.prompt:
+                    while line.startswith(self.prompt):
+                        line = line[len(self.prompt):]
+                if token in line:
+                    match = re.search(re.escape(token) + r'\s+(-?\d+)', line)
+                    return (int(match.group(1)) if match else 0), ''.join(output)
+                output.append(line)
+
+    def _kill(self):
+        if self._process is not None:
+            try:
+                self._process.kill()
+                self._process.wait(timeout=1)
+            except (OSError, subprocess.TimeoutExpired):
+                pass
+            self._process = None
+
+    def close(self):
+        with self._lock:
+            if self._process is not None and self._process.poll() is None:
+                try:
+                    self._process.stdin.close()
+                except OSError:
+                    pass
+            self._kill()
+
+
+def netsh_session() -> ShellSession:
+    """
+    Interactive netsh: commands run in-process, no spawn per query.
+    The marker is an unknown command whose error message echoes the token;
+    netsh reports no exit code, so session results always have returncode 0.
+    """
+    return ShellSession(['netsh'], marker=lambda token: token,
+                        programs=('netsh',), strip_program=True, prompt='netsh>')
+
+
+def powershell_session() -> ShellSession:
+    """A PowerShell process that runs any command line and reports $LASTEXITCODE"""
+    def quote(words):
+        return '& ' + ' '.join("'" + w.replace("'", "''") + "'" for w in words)
+    return ShellSession(['powershell', '-NoLogo', '-NoProfile', '-NonInteractive', '-Command', '-'],
+                        marker=lambda token: f'Write-Output "{token} $LASTEXITCODE"',
+                        quote=quote)
+
+
+def posix_shell_session(shell: str = '/bin/sh') -> ShellSession:
+    """A POSIX shell session (used on non-Windows hosts and in tests)"""
+    return ShellSession([shell], marker=lambda token: f'echo "{token} $?"', quote=shlex.join)
+
+
+class CommandRunner:
+    """
+    Runs commands with a timeout and keeps the last few results in `history`
+
+    run() never raises for a failing command unless check=True; failures to
+    start (missing program) and timeouts are reported on the result instead.
+    Commands run with use_session=True go through the shell session when one
+    is configured and falls back to a new process if the session breaks.
+    """
+
+    via = 'process'
+
+    def __init__(self, default_timeout: float = DEFAULT_TIMEOUT,
+                 session: Optional[ShellSession] = None, history_size: int = HISTORY_SIZE):
+        self.default_timeout = default_timeout
+        self.session = session
+        self.history = deque(maxlen=history_size)
+
+    def run(self, args: Sequence[str], timeout: Optional[float] = None, check: bool = False,
+            cwd: Optional[str] = None, label: Optional[str] = None,
+            use_session: bool = False) -> CommandResult:
+        args = [str(a) for a in args]
+        timeout = self.default_timeout if timeout is None else timeout
+        session = self.session if use_session and cwd is None else None
+        if session is not None and not session.handles(args):
+            session = None
+
+        with tracing.span(label or args[0], 'subprocess', command=subprocess.list2cmdline(args)):
+            result = self._run_in_session(session, args, timeout) if session else None
+            if result is None:
+                result = self._run_process(args, timeout, cwd)
+
+        self.history.append(result)
+        if check:
+            result.check_returncode()
+        return result
+
+    def stream(self, args: Sequence[str], on_line: Callable[[str], None],
+               timeout: Optional[float] = None, check: bool = False,
+               label: Optional[str] = None) -> CommandResult:
+        """
+        Run a command in a new process, passing each stdout line to on_line as it arrives
+        The result still carries the complete stdout. on_line runs on the calling thread.
+        """
+        args = [str(a) for a in args]
+        timeout = self.default_timeout if timeout is None else timeout
+        with tracing.span(label or args[0], 'subprocess', command=subprocess.list2cmdline(args)):
+            result = self._run_process(args, timeout, None, on_line)
+
+        self.history.append(result)
+        if check:
+            result.check_returncode()
+        return result
+
+    def _run_in_session(self, session: ShellSession, args: List[str],
+                        timeout: float) -> Optional[CommandResult]:
+        start = time.perf_counter()
+        metrics.COMMANDS.inc(_program(args), 'session')
+        try:
+            returncode, output = session.execute(args, timeout)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            # Queries are read-only, so retrying them in a fresh process is safe
+            print(f"Shell session failed, running commands as processes: {e}")
+            session.close()
+            self.session = None
+            return None
+        return CommandResult(args, returncode, output, '', (time.perf_counter() - start) * 1000,
+                             via='session', timeout=timeout)
+
+    def _run_process(self, args: List[str], timeout: float, cwd: Optional[str],
+                     on_line: Optional[Callable[[str], None]] = None) -> CommandResult:
+        start = time.perf_counter()
+        program = _program(args)
+        metrics.SUBPROCESS_SPAWNS.inc(program, self.via)
+        metrics.COMMANDS.inc(program, self.via)
+        try:
+            if on_line is None:
+                returncode, stdout, stderr = self._execute(args, timeout, cwd)
+            else:
+                returncode, stdout, stderr = self._execute_streaming(args, timeout, on_line)
+        except subprocess.TimeoutExpired as e:
+            return CommandResult(args, None, _text(e.stdout), _text(e.stderr),
+                                 (time.perf_counter() - start) * 1000,
+                                 timed_out=True, via=self.via, timeout=timeout)
+        except OSError as e:
+            return CommandResult(args, None, '', '', (time.perf_counter() - start) * 1000,
+                                 error=str(e), via=self.via, timeout=timeout)
+        return CommandResult(args, returncode, stdout, stderr, (time.perf_counter() - start) * 1000,
+                             via=self.via, timeout=timeout)
+
+    def _execute(self, args: List[str], timeout: float, cwd: Optional[str]) -> tuple:
+        """Returns: (returncode, stdout, stderr)"""
+        kwargs = {}
+        if sys.platform == 'win32':
+            kwargs['creationflags'] = subprocess.CREATE_NO_WINDOW
+        completed = subprocess.run(args, capture_output=True, text=True, errors='replace',
+                                   timeout=timeout, cwd=cwd, **kwargs)
+        return completed.returncode, completed.stdout, completed.stderr
+
+    def _execute_streaming(self, args: List[str], timeout: float,
+                           on_line: Callable[[str], None]) -> tuple:
+        """Returns: (returncode, stdout, stderr); raises TimeoutExpired with the partial output"""
+        kwargs = {}
+        if sys.platform == 'win32':
+            kwargs['creationflags'] = subprocess.CREATE_NO_WINDOW
+        process = subprocess.Popen(args, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE, text=True, errors='replace',
+                                   bufsize=1, **kwargs)
+        # A watchdog kills the process at the deadline, which ends the read loop
+        expired = threading.Event()
+
+        def kill():
+            expired.set()
+            process.kill()
+
+        watchdog = threading.Timer(timeout, kill)
+        watchdog.daemon = True
+        stderr = []
+        reader = threading.Thread(target=lambda: stderr.append(process.stderr.read()), daemon=True)
+        watchdog.start()
+        reader.start()
+        lines = []
+        try:
+            for line in process.stdout:
+                lines.append(line)
+                on_line(line)
+        except BaseException:
+            # on_line raised; don't leave the process behind
+            process.kill()
+            raise
+        finally:
+            returncode = process.wait()
+            watchdog.cancel()
+            reader.join()
+            process.stdout.close()
+            process.stderr.close()
+
+        if expired.is_set():
+            raise subprocess.TimeoutExpired(args, timeout, output=''.join(lines),
+                                            stderr=''.join(stderr))
+        return returncode, ''.join(lines), ''.join(stderr)
+
+    def close(self):
+        if self.session is not None:
+            self.session.close()
+
+
+class FakeRunner(CommandRunner):
+    """
+    Runner that answers from canned responses instead of starting processes
+
+    Responses are keyed by an argument prefix; the longest matching prefix wins.
+    A response is stdout text, a (returncode, stdout, stderr) tuple, an
+    exception to raise (e.g. subprocess.TimeoutExpired or FileNotFoundError) or
+    a callable taking the argument list and returning one of those.
+    """
+
+    via = 'fake'
+
+    def __init__(self, responses: Optional[Dict[tuple, object]] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.responses = {}
+        self.calls = []
+        for prefix, response in (responses or {}).items():
+            self.add(prefix, response)
+
+    def add(self, prefix, response):
+        if isinstance(prefix, str):
+            prefix = tuple(prefix.split())
+        self.responses[tuple(prefix)] = response
+
+    def _execute(self, args: List[str], timeout: float, cwd: Optional[str]) -> tuple:
+        self.calls.append(list(args))
+        matches = [p for p in self.responses if tuple(args[:len(p)]) == p]
+        if not matches:
+            raise FileNotFoundError(f"No fake response for {subprocess.list2cmdline(args)}")
+        response = self.responses[max(matches, key=len)]
+        if callable(response) and not isinstance(response, type):
+            response = response(list(args))
+        if isinstance(response, BaseException):
+            raise response
+        if isinstance(response, str):
+            return 0, response, ''
+        return tuple(response)
+
+    def _execute_streaming(self, args: List[str], timeout: float,
+                           on_line: Callable[[str], None]) -> tuple:
+        returncode, stdout, stderr = self._execute(args, timeout, None)
+        for line in stdout.splitlines(keepends=True):
+            on_line(line)
+        return returncode, stdout, stderr
+
+
+def _program(args: Sequence[str]) -> str:
+    """'C:\\Windows\\System32\\netsh.exe' -> 'netsh'"""
+    name = re.split(r'[\\/]', args[0])[-1].lower() if args else ''
+    return name[:-4] if name.endswith('.exe') else name
+
+
+def _text(value) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, bytes):
+        return value.decode(errors='replace')
+    return value
+
+
+_default_runner = None
+_default_lock = threading.Lock()
+
+
+def default_runner() -> CommandRunner:
+    """Shared process-wide runner for modules without one of their own"""
+    global _default_runner
+    if _default_runner is None:
+        with _default_lock:
+            if _default_runner is None:
+                _default_runner = CommandRunner()
+    return _default_runner
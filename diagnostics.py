@@ -0,0 +1,292 @@
+"""
+Network diagnostics for DNS Manager Pro
+Runs adapter configuration, route table and resolver checks concurrently,
+streams their output line by line and parses it into plain dicts
+"""
+
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Sequence
+
+import metrics
+import tracing
+from command_runner import CommandError, CommandRunner, default_runner
+from dns_query import DNSError, RCODE_NAMES, resolve
+
+SECTION_TIMEOUT = 30.0
+
+# Name looked up when checking that a resolver answers
+PROBE_NAME = 'www.microsoft.com'
+RESOLVER_TIMEOUT = 2.0
+
+# Compared with the adapter's own resolvers when no others are given
+REFERENCE_RESOLVERS = ('1.1.1.1', '8.8.8.8')
+
+SECTION_TITLES = {
+    'adapters': 'Adapter configuration',
+    'routes': 'Route table',
+    'resolvers': 'Resolver reachability',
+}
+
+# "   IPv4 Address. . . . . . . . . . . : 192.168.1.23(Preferred)"
+_FIELD = re.compile(r'^\s{2,}(?P<key>\S.*?)[\s.]*:(?: (?P<value>.*))?$')
+_CONTINUATION = re.compile(r'^\s{20,}(?P<value>\S.*)$')
+_ADAPTER = re.compile(r'^(?P<type>\S.*?) adapter (?P<name>.+):$')
+_ROUTE = re.compile(r'^\s*(\d+\.\d+\.\d+\.\d+)\s+(\d+\.\d+\.\d+\.\d+)\s+(\S+)\s+'
+                    r'(\d+\.\d+\.\d+\.\d+)\s+(\d+)\s*$')
+_INTERFACE = re.compile(r'^\s*(\d+)\.{3}(?:([0-9a-f]{2}(?: [0-9a-f]{2}){5}) )?\.+(.*)$')
+
+# ipconfig field labels (English Windows) -> list-valued model keys
+_LIST_FIELDS = {
+    'IPv4 Address': 'ipv4', 'IPv6 Address': 'ipv6', 'Temporary IPv6 Address': 'ipv6',
+    'Link-local IPv6 Address': 'ipv6', 'Default Gateway': 'gateways', 'DNS Servers': 'dns_servers',
+}
+
+
+def _strip_suffix(value: str) -> str:
+    """'192.168.1.23(Preferred)' -> '192.168.1.23'"""
+    return value.split('(', 1)[0].strip()
+
+
+def parse_ipconfig_all(output: str) -> Dict:
+    """
+    Parse `ipconfig /all`
+    Returns: {'host': {label: value}, 'adapters': [{'name', 'type', 'description',
+    'mac', 'dhcp', 'connected', 'ipv4', 'ipv6', 'gateways', 'dns_servers', 'fields'}]}
+    """
+    host = {}
+    adapters = []
+    current = None
+    last_key = None
+
+    for raw_line in output.splitlines():
+        line = raw_line.rstrip()
+        if not line.strip():
+            continue
+        match = _ADAPTER.match(line)
+        if match:
+            current = {'name': match.group('name'), 'type': match.group('type'),
+                       'description': '', 'mac': '', 'dhcp': None, 'connected': True,
+                       'ipv4': [], 'ipv6': [], 'gateways': [], 'dns_servers': [], 'fields': {}}
+            adapters.append(current)
+            last_key = None
+            continue
+
+        # Extra values of a list field are indented to the value column
+        continuation = _CONTINUATION.match(line)
+        if continuation:
+            if current is not None and last_key in _LIST_FIELDS:
+                _apply_field(current, last_key, continuation.group('value'))
+            continue
+
+        field = _FIELD.match(line)
+        if field:
+            last_key = field.group('key').strip()
+            value = (field.group('value') or '').strip()
+            target = current['fields'] if current else host
+            target[last_key] = value
+            if current is not None:
+                _apply_field(current, last_key, value)
+
+    return {'host': host, 'adapters': adapters}
+
+
+def _apply_field(adapter: Dict, key: str, value: str):
+    if key in _LIST_FIELDS:
+        if value:
+            adapter[_LIST_FIELDS[key]].append(_strip_suffix(value))
+    elif key == 'Description':
+        adapter['description'] = value
+    elif key == 'Physical Address':
+        adapter['mac'] = value
+    elif key == 'DHCP Enabled':
+        adapter['dhcp'] = value.lower() == 'yes'
+    elif key == 'Media State':
+        adapter['connected'] = 'disconnected' not in value.lower()
+
+
+def parse_route_print(output: str) -> Dict:
+    """
+    Parse `route print` (IPv4 part)
+    Returns: {'interfaces': [{'index', 'mac', 'name'}], 'routes': [{'destination',
+    'netmask', 'gateway', 'interface', 'metric'}], 'default_gateways': [...]}
+    """
+    interfaces = []
+    routes = []
+    section = None
+    for line in output.splitlines():
+        stripped = line.strip()
+        if stripped == 'Interface List':
+            section = 'interfaces'
+            continue
+        if stripped.startswith('IPv4 Route Table'):
+            section = 'ipv4'
+            continue
+        if stripped.startswith(('IPv6 Route Table', 'Persistent Routes')):
+            section = None
+            continue
+
+        if section == 'interfaces':
+            match = _INTERFACE.match(line)
+            if match:
+                interfaces.append({'index': int(match.group(1)),
+                                   'mac': (match.group(2) or '').replace(' ', '-').upper(),
+                                   'name': match.group(3).strip()})
+        elif section == 'ipv4':
+            match = _ROUTE.match(line)
+            if match:
+                destination, netmask, gateway, interface, metric = match.groups()
+                routes.append({'destination': destination, 'netmask': netmask,
+                               'gateway': None if gateway == 'On-link' else gateway,
+                               'interface': interface, 'metric': int(metric)})
+
+    defaults = sorted((r for r in routes if r['destination'] == '0.0.0.0' and r['gateway']),
+                      key=lambda r: r['metric'])
+    return {'interfaces': interfaces, 'routes': routes,
+            'default_gateways': [r['gateway'] for r in defaults]}
+
+
+def check_resolver(server: str, name: str = PROBE_NAME, timeout: float = RESOLVER_TIMEOUT) -> Dict:
+    """
+    Ask one resolver for a name
+    Returns: {'server', 'ok', 'latency' (ms), 'rcode', 'addresses', 'error'}
+    """
+    result = {'server': server, 'ok': False, 'latency': None, 'rcode': None,
+              'addresses': [], 'error': None}
+    try:
+        response = resolve(name, server, timeout=timeout)
+    except (DNSError, OSError, ValueError) as e:
+        metrics.observe_probe('dns', server, name, None)
+        result['error'] = str(e)
+        return result
+    metrics.observe_probe('dns', server, name, response['latency'])
+    result.update(latency=response['latency'], addresses=response['addresses'],
+                  rcode=RCODE_NAMES.get(response['rcode'], str(response['rcode'])))
+    result['ok'] = response['rcode'] == 0
+    return result
+
+
+def format_resolver(check: Dict) -> str:
+    if check['error']:
+        return f"{check['server']:<40} unreachable ({check['error']})"
+    return f"{check['server']:<40} {check['rcode']:<9} {check['latency']:7.1f} ms"
+
+
+def _section(name: str) -> Dict:
+    return {'name': name, 'title': SECTION_TITLES.get(name, name), 'status': 'pending',
+            'duration': None, 'lines': 0, 'data': None, 'error': None}
+
+
+def _run_command_section(section: Dict, runner: CommandRunner, args: List[str],
+                         parse: Callable[[str], Dict], emit: Callable[[str], None], timeout: float):
+    try:
+        result = runner.stream(args, emit, timeout=timeout, check=True,
+                               label=f"diagnostics {section['name']}")
+    except CommandError as e:
+        section['status'] = 'timeout' if e.result.timed_out else 'error'
+        section['error'] = str(e)
+        # Whatever arrived before a timeout is still worth parsing
+        section['data'] = parse(e.result.stdout) if e.result.stdout else None
+        return
+    section['data'] = parse(result.stdout)
+    section['status'] = 'ok'
+
+
+def _run_resolver_section(section: Dict, servers: Sequence[str], emit: Callable[[str], None],
+                          name: str, timeout: float):
+    results = {}
+    if not servers:
+        section['status'] = 'error'
+        section['error'] = "No resolvers to check"
+        return
+    with ThreadPoolExecutor(max_workers=min(16, len(servers))) as executor:
+        futures = {executor.submit(check_resolver, server, name, timeout): server for server in servers}
+        for future in as_completed(futures):
+            server = futures[future]
+            results[server] = future.result()
+            emit(format_resolver(results[server]) + '\n')
+    section['data'] = {'name': name, 'resolvers': [results[server] for server in servers]}
+    section['status'] = 'ok' if any(r['ok'] for r in results.values()) else 'error'
+    if section['status'] == 'error':
+        section['error'] = "No resolver answered"
+
+
+def run_diagnostics(runner: Optional[CommandRunner] = None,
+                    resolvers: Optional[Sequence[str]] = None,
+                    on_line: Optional[Callable[[str, str], None]] = None,
+                    on_section: Optional[Callable[[Dict], None]] = None,
+                    sections: Sequence[str] = tuple(SECTION_TITLES),
+                    timeout: float = SECTION_TIMEOUT,
+                    probe_name: str = PROBE_NAME) -> Dict:
+    """
+    Run the diagnostics sections concurrently
+    on_line(section name, line) gets output as it is produced and
+    on_section(section) each section once it is done; both are called from
+    worker threads. resolvers defaults to REFERENCE_RESOLVERS.
+    Returns: {'sections': {name: {'name', 'title', 'status' ('ok', 'error',
+    'timeout'), 'duration' (ms), 'lines', 'data', 'error'}}, 'duration' (ms)}
+    """
+    runner = runner or default_runner()
+    resolvers = list(dict.fromkeys(resolvers or REFERENCE_RESOLVERS))
+    report = {'sections': {name: _section(name) for name in sections}, 'duration': None}
+    lock = threading.Lock()
+
+    def run_section(section):
+        def emit(line):
+            with lock:
+                section['lines'] += 1
+            if on_line:
+                on_line(section['name'], line)
+
+        start = time.perf_counter()
+        with tracing.span(f"diagnostics {section['name']}", 'diagnostics'):
+            try:
+                if section['name'] == 'adapters':
+                    _run_command_section(section, runner, ['ipconfig', '/all'],
+                                         parse_ipconfig_all, emit, timeout)
+                elif section['name'] == 'routes':
+                    _run_command_section(section, runner, ['route', 'print'],
+                                         parse_route_print, emit, timeout)
+                elif section['name'] == 'resolvers':
+                    _run_resolver_section(section, resolvers, emit, probe_name,
+                                          min(timeout, RESOLVER_TIMEOUT))
+                else:
+                    raise ValueError(f"Unknown diagnostics section {section['name']!r}")
+            except Exception as e:
+                section['status'] = 'error'
+                section['error'] = str(e)
+        section['duration'] = (time.perf_counter() - start) * 1000
+        if on_section:
+            on_section(section)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(report['sections']) or 1) as executor:
+        list(executor.map(run_section, report['sections'].values()))
+    report['duration'] = (time.perf_counter() - start) * 1000
+    return report
+
+
+def summarize(report: Dict) -> List[str]:
+    """Short human-readable lines: one per section plus the key findings"""
+    lines = []
+    for section in report['sections'].values():
+        timing = f"{section['duration']:.0f} ms" if section['duration'] is not None else '-'
+        lines.append(f"{section['title']:<24} {section['status']:<8} {timing:>8}")
+        if section['error']:
+            lines.append(f"    {section['error']}")
+        data = section['data'] or {}
+        if section['name'] == 'adapters' and data:
+            for adapter in data['adapters']:
+                if adapter['connected'] and (adapter['ipv4'] or adapter['ipv6']):
+                    dns = ', '.join(adapter['dns_servers']) or 'none'
+                    lines.append(f"    {adapter['name']}: {', '.join(adapter['ipv4'] or adapter['ipv6'])}"
+                                 f" (DNS {dns})")
+        elif section['name'] == 'routes' and data.get('default_gateways'):
+            lines.append(f"    Default gateway: {', '.join(data['default_gateways'])}")
+        elif section['name'] == 'resolvers' and data:
+            for check in data['resolvers']:
+                lines.append(f"    {format_resolver(check)}")
+    lines.append(f"Total {report['duration']:.0f} ms")
+    return lines
@@ -0,0 +1,487 @@
+"""
+Local split-DNS forwarder for DNS Manager Pro
+Listens on a loopback address and forwards each query to the saved config
+routed for its domain (e.g. everything under corp to the internal servers),
+or to the default config. Routes are matched by longest suffix in a label
+trie, so a lookup costs one dict step per label however many routes exist.
+With a blocklist attached, blocked names are answered locally first.
+
+A route may name a list of configs instead of one: the query goes to all of
+them at once and the first good answer wins.
+
+Usage (configs from dns_configs.json, routes from split_dns.json):
+    python dns_forwarder.py [--listen 127.0.0.1:53] [--default NAME] [--blocklist]
+"""
+
+import argparse
+import asyncio
+import json
+import socket
+import struct
+import sys
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+import metrics
+from dns_query import (DNSError, FLAG_QR, FLAG_RA, FLAG_RD, RCODE_NOERROR, RCODE_NXDOMAIN,
+                       RCODE_SERVFAIL, TYPE_A, TYPE_AAAA, decode_name, split_server)
+
+SETTINGS_FILE = 'split_dns.json'
+CONFIG_FILE = 'dns_configs.json'
+
+DEFAULT_SETTINGS = {
+    'listen': '127.0.0.1:53',
+    'default': None,            # saved config for unrouted names; the app falls back to the adapter's servers
+    'timeout': 2.0,             # per upstream server
+    'routes': {},               # suffix -> config name, or a list of names to race
+}
+
+RCODE_REFUSED = 5
+
+# Upstream answers with these codes are only used when nothing better arrives
+_RETRY_RCODES = (RCODE_SERVFAIL, RCODE_REFUSED)
+
+FORWARDED = metrics.counter(
+    'dnsmanager_forwarder_queries_total',
+    'Queries handled by the local forwarder, by target configs (result: answered, failed, blocked)',
+    ('upstream', 'result'))
+
+Target = Union[str, List[str]]
+
+
+def load_settings(path: str = SETTINGS_FILE) -> Dict:
+    """DEFAULT_SETTINGS overlaid with the settings file"""
+    settings = json.loads(json.dumps(DEFAULT_SETTINGS))
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            stored = json.load(f)
+    except OSError:
+        return settings
+    except ValueError as e:
+        print(f"Error reading {path}: {e}")
+        return settings
+    settings.update({key: value for key, value in stored.items() if key in DEFAULT_SETTINGS})
+    return settings
+
+
+def save_settings(settings: Dict, path: str = SETTINGS_FILE):
+    try:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(settings, f, indent=2)
+    except OSError as e:
+        print(f"Error saving split DNS settings: {e}")
+
+
+def normalize_suffix(suffix: str) -> str:
+    """'*.Corp.' / '.corp' / 'corp' -> 'corp'; '*' or '.' is the root"""
+    suffix = suffix.strip().lower()
+    if suffix.startswith('*'):
+        suffix = suffix[1:]
+    return suffix.strip('.')
+
+
+class SuffixTrie:
+    """
+    Maps domain suffixes to values; a suffix covers the name itself and
+    everything below it, and the longest matching suffix wins
+
+    Nodes are plain dicts keyed by label, walked from the rightmost label.
+    The value of a node sits under the '' key, which no label can take.
+    """
+
+    __slots__ = ('_root', '_size')
+
+    def __init__(self, items: Optional[Iterable[Tuple[str, object]]] = None):
+        self._root = {}
+        self._size = 0
+        for suffix, value in items or ():
+            self.add(suffix, value)
+
+    def add(self, suffix: str, value):
+        node = self._root
+        suffix = normalize_suffix(suffix)
+        for label in reversed(suffix.split('.')) if suffix else ():
+            node = node.setdefault(label, {})
+        if '' not in node:
+            self._size += 1
+        node[''] = value
+
+    def longest_match(self, name: str) -> Optional[Tuple[str, object]]:
+        """(matched suffix, value) for the most specific suffix covering name, or None"""
+        labels = name.lower().rstrip('.').split('.') if name.strip('.') else []
+        node = self._root
+        best = (0, node['']) if '' in node else None
+        depth = 0
+        for label in reversed(labels):
+            node = node.get(label)
+            if node is None:
+                break
+            depth += 1
+            if '' in node:
+                best = (depth, node[''])
+        if best is None:
+            return None
+        depth, value = best
+        return '.'.join(labels[len(labels) - depth:]), value
+
+    def get(self, name: str, default=None):
+        match = self.longest_match(name)
+        return match[1] if match else default
+
+    def __len__(self) -> int:
+        return self._size
+
+
+class SplitRouter:
+    """Picks the config(s) for a query name from suffix routes and a default"""
+
+    def __init__(self, routes: Dict[str, Target], default: Optional[Target] = None):
+        self.trie = SuffixTrie((suffix, self._names(target)) for suffix, target in routes.items())
+        self.default = self._names(default) if default else None
+
+    @staticmethod
+    def _names(target: Target) -> Tuple[str, ...]:
+        return (target,) if isinstance(target, str) else tuple(target)
+
+    def route(self, name: str) -> Tuple[str, Optional[Tuple[str, ...]]]:
+        """(route label for stats, config names) for a name; names None means no route"""
+        match = self.trie.longest_match(name)
+        if match is not None:
+            return match[0] or '.', match[1]
+        return 'default', self.default
+
+
+def error_response(query: bytes, rcode: int = RCODE_SERVFAIL) -> bytes:
+    """An answerless reply to query with the given rcode"""
+    query_id, flags = struct.unpack('!HH', query[:4])
+    _, offset = decode_name(query, 12)
+    header = struct.pack('!HHHHHH', query_id, FLAG_QR | FLAG_RA | (flags & FLAG_RD) | rcode, 1, 0, 0, 0)
+    return header + query[12:offset + 4]
+
+
+def blocked_response(query: bytes, qtype: int, mode: str = 'nxdomain', ttl: int = 300) -> bytes:
+    """
+    The local answer for a blocked name: NXDOMAIN, or with mode 'null'
+    0.0.0.0 / :: for A / AAAA (and no records for other types)
+    """
+    if mode != 'null':
+        return error_response(query, RCODE_NXDOMAIN)
+    response = error_response(query, RCODE_NOERROR)
+    rdata = {TYPE_A: bytes(4), TYPE_AAAA: bytes(16)}.get(qtype)
+    if rdata is None:
+        return response
+    # One answer; 0xC00C points back at the question name
+    record = struct.pack('!HHHIH', 0xC00C, qtype, 1, ttl, len(rdata)) + rdata
+    return response[:6] + struct.pack('!H', 1) + response[8:] + record
+
+
+def _rcode(response: bytes) -> int:
+    return struct.unpack('!H', response[2:4])[0] & 0x000F
+
+
+class _ForwarderProtocol(asyncio.DatagramProtocol):
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        asyncio.get_running_loop().create_task(self.server._answer_udp(self.transport, data, addr))
+
+
+class DNSForwarder:
+    """
+    UDP and TCP DNS forwarder on a loopback address
+
+    configs returns the saved configs ({'primary', 'secondary'}, servers may
+    carry a port) and is read per query, so edits apply at once. UDP queries
+    go upstream over UDP, and a truncated answer is passed back for the
+    client to retry over TCP, which is forwarded over TCP. Each server of a
+    config gets `timeout` seconds before the next one is tried; names nobody
+    answers get SERVFAIL, names without any route get REFUSED.
+
+    blocklist (see blocklist.Blocklist) may be set or swapped at any time;
+    names it blocks never leave the machine and get blocked_response().
+    """
+
+    def __init__(self, router: SplitRouter, configs: Callable[[], Dict[str, Dict[str, str]]],
+                 host: str = '127.0.0.1', port: int = 53, timeout: float = 2.0,
+                 blocklist=None, block_response: str = 'nxdomain'):
+        self.router = router
+        self.configs = configs
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.blocklist = blocklist
+        self.block_response = block_response
+        self.queries = 0
+        self.failed = 0
+        self.blocked = 0
+        self.routes = {}        # route label -> queries
+        self._loop = None
+        self._thread = None
+        self._transport = None
+        self._tcp_server = None
+        self._error = None
+        self._ready = threading.Event()
+
+    def set_router(self, router: SplitRouter):
+        """Swap routes while serving; queries in flight finish on the old ones"""
+        self.router = router
+
+    def set_blocklist(self, blocklist, block_response: Optional[str] = None):
+        """Swap the blocklist (None turns filtering off); the old one is closed on the serving thread"""
+        old, self.blocklist = self.blocklist, blocklist
+        if block_response:
+            self.block_response = block_response
+        if old is not None and old is not blocklist:
+            loop = self._loop
+            if loop is not None and loop.is_running():
+                loop.call_soon_threadsafe(old.close)
+            else:
+                old.close()
+
+    def start(self) -> 'DNSForwarder':
+        """Start serving on a background event loop thread; raises OSError if the port is taken"""
+        self._ready.clear()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name='dns forwarder', daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error:
+            raise self._error
+        return self
+
+    def stop(self):
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._loop = None
+
+    def running(self) -> bool:
+        return self._loop is not None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def address(self) -> str:
+        host = f"[{self.host}]" if ':' in self.host else self.host
+        return f"{host}:{self.port}"
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._bind())
+        except OSError as e:
+            self._error = e
+            self._loop.close()
+            self._loop = None
+            self._ready.set()
+            return
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._transport.close()
+            self._tcp_server.close()
+            pending = asyncio.all_tasks(self._loop)
+            for task in pending:
+                task.cancel()
+            self._loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            self._loop.close()
+
+    async def _bind(self):
+        family = socket.AF_INET6 if ':' in self.host else socket.AF_INET
+        attempts = 5 if self.port == 0 else 1
+        for attempt in range(attempts):
+            self._transport, _ = await self._loop.create_datagram_endpoint(
+                lambda: _ForwarderProtocol(self), local_addr=(self.host, self.port), family=family)
+            port = self._transport.get_extra_info('sockname')[1]
+            try:
+                self._tcp_server = await asyncio.start_server(self._serve_tcp, self.host, port, family=family)
+                break
+            except OSError:
+                self._transport.close()
+                if attempt == attempts - 1:
+                    raise
+        self.port = port
+
+    # Query path
+
+    async def handle(self, query: bytes, tcp: bool) -> Optional[bytes]:
+        """The reply for one client query, or None to drop it (unparseable)"""
+        try:
+            name, offset = decode_name(query, 12)
+            qtype = struct.unpack('!H', query[offset:offset + 2])[0]
+        except (DNSError, IndexError, struct.error):
+            return None
+        self.queries += 1
+
+        blocklist = self.blocklist
+        if blocklist is not None and blocklist.blocks(name):
+            self.blocked += 1
+            FORWARDED.inc('blocklist', 'blocked')
+            return blocked_response(query, qtype, self.block_response)
+
+        route, names = self.router.route(name)
+        self.routes[route] = self.routes.get(route, 0) + 1
+        upstream = '+'.join(names) if names else 'none'
+        configs = self.configs()
+        targets = [configs[n] for n in names or () if n in configs]
+        if not targets:
+            self.failed += 1
+            FORWARDED.inc(upstream, 'failed')
+            return error_response(query, RCODE_REFUSED)
+
+        if len(targets) == 1:
+            response = await self._ask_config(query, targets[0], tcp)
+        else:
+            response = await self._race(query, targets, tcp)
+        if response is None:
+            self.failed += 1
+            FORWARDED.inc(upstream, 'failed')
+            return error_response(query)
+        FORWARDED.inc(upstream, 'answered')
+        return response
+
+    async def _ask_config(self, query: bytes, config: Dict[str, str], tcp: bool) -> Optional[bytes]:
+        """Primary, then secondary; an error rcode is kept only if no server does better"""
+        fallback = None
+        for server in (config.get('primary'), config.get('secondary')):
+            if not server:
+                continue
+            try:
+                response = await (self._forward_tcp(query, server) if tcp else self._forward_udp(query, server))
+            except (OSError, asyncio.TimeoutError, DNSError):
+                continue
+            if _rcode(response) not in _RETRY_RCODES:
+                return response
+            fallback = fallback or response
+        return fallback
+
+    async def _race(self, query: bytes, configs: List[Dict[str, str]], tcp: bool) -> Optional[bytes]:
+        """First good answer from any of the configs"""
+        tasks = [asyncio.ensure_future(self._ask_config(query, config, tcp)) for config in configs]
+        fallback = None
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                response = await next_done
+                if response is not None and _rcode(response) not in _RETRY_RCODES:
+                    return response
+                fallback = fallback or response
+            return fallback
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _forward_udp(self, query: bytes, server: str) -> bytes:
+        host, port = split_server(server)
+        loop = asyncio.get_running_loop()
+        family = socket.AF_INET6 if ':' in host else socket.AF_INET
+        with socket.socket(family, socket.SOCK_DGRAM) as sock:
+            sock.setblocking(False)
+            sock.connect((host, port))
+            await loop.sock_sendall(sock, query)
+            deadline = loop.time() + self.timeout
+            while True:
+                data = await asyncio.wait_for(loop.sock_recv(sock, 65535), deadline - loop.time())
+                # Skip anything that isn't a reply to this query
+                if len(data) >= 12 and data[:2] == query[:2] and data[2] & 0x80:
+                    return data
+
+    async def _forward_tcp(self, query: bytes, server: str) -> bytes:
+        host, port = split_server(server)
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), self.timeout)
+        try:
+            writer.write(struct.pack('!H', len(query)) + query)
+            await writer.drain()
+            length = struct.unpack('!H', await asyncio.wait_for(reader.readexactly(2), self.timeout))[0]
+            data = await asyncio.wait_for(reader.readexactly(length), self.timeout)
+        except asyncio.IncompleteReadError:
+            raise DNSError(f"{server} closed the connection mid-answer")
+        finally:
+            writer.close()
+        if data[:2] != query[:2]:
+            raise DNSError(f"Mismatched reply from {server}")
+        return data
+
+    async def _answer_udp(self, transport, data: bytes, addr):
+        response = await self.handle(data, tcp=False)
+        if response is not None:
+            transport.sendto(response, addr)
+
+    async def _serve_tcp(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                length = struct.unpack('!H', await reader.readexactly(2))[0]
+                response = await self.handle(await reader.readexactly(length), tcp=True)
+                if response is None:
+                    break
+                writer.write(struct.pack('!H', len(response)) + response)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+def router_from_settings(settings: Dict, fallback: Optional[str] = None) -> SplitRouter:
+    """A router for split_dns.json settings; fallback is used when no default is set"""
+    return SplitRouter(settings.get('routes') or {}, settings.get('default') or fallback)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Forward DNS queries to saved configs by domain")
+    parser.add_argument('--settings', default=SETTINGS_FILE, help=f"routes file (default {SETTINGS_FILE})")
+    parser.add_argument('--configs', default=CONFIG_FILE, help=f"saved configs (default {CONFIG_FILE})")
+    parser.add_argument('--listen', help="address to serve on (default from the routes file)")
+    parser.add_argument('--default', help="saved config for names without a route")
+    parser.add_argument('--blocklist', action='store_true', help="filter through the lists in blocklist.json")
+    args = parser.parse_args(argv)
+
+    settings = load_settings(args.settings)
+    try:
+        with open(args.configs, 'r', encoding='utf-8') as f:
+            configs = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Could not read saved configs from {args.configs}: {e}")
+        return 1
+
+    router = router_from_settings(settings, args.default)
+    missing = set(router.default or ()) - set(configs)
+    for target in settings['routes'].values():
+        missing.update(set(SplitRouter._names(target)) - set(configs))
+    if missing:
+        print(f"Routes name configs that are not saved: {', '.join(sorted(missing))}")
+    host, port = split_server(args.listen or settings['listen'])
+    forwarder = DNSForwarder(router, lambda: configs, host, port, settings['timeout'])
+    if args.blocklist:
+        import blocklist
+        block_settings = blocklist.load_settings()
+        forwarder.blocklist = blocklist.load_from_settings(block_settings)
+        forwarder.block_response = block_settings['response']
+        print(f"Blocking {len(forwarder.blocklist):,} entries from {len(forwarder.blocklist.indexes)} lists")
+    try:
+        forwarder.start()
+    except OSError as e:
+        print(f"Could not listen on {host}:{port}: {e}")
+        return 1
+    print(f"Forwarding on {forwarder.address}: {len(router.trie)} routes, default "
+          f"{', '.join(router.default) if router.default else 'none (REFUSED)'}; press Ctrl+C to stop")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    forwarder.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
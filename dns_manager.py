@@ -1,30 +1,48 @@
+import time
+
+_IMPORT_START = time.perf_counter()
+
 import customtkinter as ctk
 from tkinter import messagebox, Menu
-import subprocess
 import json
 import os
 import socket
-import time
 import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional
 import ctypes
 import sys
 import webbrowser
-from PIL import Image, ImageDraw
-import darkdetect
 from version import __version__, APP_NAME, APP_URL
-from updater import UpdateManager, UpdateChecker
+from catalog import ServiceCatalog
+from command_runner import CommandError, CommandRunner, netsh_session
+import metrics
+import netsh_backend
+import tracing
+from ui_dispatcher import UIDispatcher
+from dns_query import split_server
+from ttl_cache import TTLCache
+
+_IMPORT_END = time.perf_counter()
+
+# Target for window creation up to the first paint
+STARTUP_BUDGET_MS = 300
+
 
 class DNSManager(ctk.CTk):
     def __init__(self):
         super().__init__()
 
+        # Startup happens in two stages: the window skeleton is built here and
+        # painted first; icon, adapter discovery, the lists and the update check
+        # are filled in by finish_startup once the window is on screen.
+        self.startup_metrics = {'imports_ms': (_IMPORT_END - _IMPORT_START) * 1000}
+        self._init_start = time.perf_counter()
+        self._startup_finished = False
+
         # Configure window
         self.title("DNS Manager Pro")
 
-        # Set icon
-        self.set_app_icon()
-
         # Center window on screen
         window_width = 1100
         window_height = 750
@@ -49,70 +67,127 @@ class DNSManager(ctk.CTk):
         self.admin_warning_shown = False
         self.benchmark_running = False
 
-        # Performance optimizations
-        self._dns_cache = {}
-        self._cache_time = {}
-        self._cache_duration = 5  # seconds
+        # Adapter DNS settings read through netsh, per adapter. Failed reads are
+        # remembered briefly so a broken netsh is not re-run on every redraw
+        self.dns_state = TTLCache(maxsize=16, ttl=5, negative_ttl=2,
+                                  on_lookup=metrics.DNS_SETTINGS_CACHE.inc)
 
-        # Update manager
-        self.update_manager = UpdateManager()
-        self.pending_update = None
+        # netsh/ipconfig runner; read-only netsh queries reuse one interactive netsh
+        self.runner = CommandRunner(session=netsh_session())
 
-        # Gaming servers for ping tests
-        self.gaming_servers = {
-            "Fortnite (NA-East)": "qosping-aws-us-east-1.ol.epicgames.com",
-            "Fortnite (EU)": "qosping-aws-eu-west-1.ol.epicgames.com",
-            "Epic Games": "epicgames.com",
-            "Call of Duty (Activision)": "activision.com",
-            "EA Servers": "ea.com",
-            "Battlefield": "battlefield.com",
-            "Steam": "store.steampowered.com",
-            "Riot Games": "riotgames.com",
-            "Valorant": "playvalorant.com",
-            "League of Legends": "leagueoflegends.com",
-            "Battle.net": "battle.net",
-            "Ubisoft": "ubisoft.com",
-            "Apex Legends": "playapex.com",
-            "ChatGPT": "chat.openai.com",
-            "Gemini": "gemini.google.com",
-            "Claude": "claude.ai",
-            "Perplexity": "perplexity.ai",
-            "YouTube": "youtube.com",
-            "Cloudflare": "1.1.1.1",
-            "Google DNS": "8.8.8.8"
-        }
+        # Worker threads change widgets only through self.ui (applied on the Tk thread)
+        self.ui = UIDispatcher(self)
+        self.ui.start()
 
-        # Popular DNS presets
-        self.dns_presets = {
-            "Cloudflare": {"primary": "1.1.1.1", "secondary": "1.0.0.1"},
-            "Cloudflare Family": {"primary": "1.1.1.3", "secondary": "1.0.0.3"},
-            "Google": {"primary": "8.8.8.8", "secondary": "8.8.4.4"},
-            "OpenDNS": {"primary": "208.67.222.222", "secondary": "208.67.220.220"},
-            "Quad9": {"primary": "9.9.9.9", "secondary": "149.112.112.112"},
-            "AdGuard": {"primary": "94.140.14.14", "secondary": "94.140.15.15"},
-            "Comodo Secure": {"primary": "8.26.56.26", "secondary": "8.20.247.20"},
-            "CleanBrowsing": {"primary": "185.228.168.9", "secondary": "185.228.169.9"},
-            "Alternate DNS": {"primary": "76.76.19.19", "secondary": "76.223.122.150"},
-        }
+        # Background health checks of the active DNS servers; monitor_settings.json
+        # is read (and the monitor started) after first paint
+        self.monitor_settings = None
+        self.health_monitor = None
+
+        # Rule-based config switching (dns_rules.json, read after first paint)
+        self.rules_settings = None
+        self.rules_engine = None
+
+        # Local forwarder for split DNS (split_dns.json) and blocklists (blocklist.json);
+        # the adapter points at it while it runs
+        self.forwarder = None
+        self.split_settings = None
+        self.split_routes_on = False
+        self.split_restore = None       # (adapter, its DNS settings before: {'source', 'servers'})
+
+        # Update manager (created on first use)
+        self._update_manager = None
+        self.pending_update = None
+
+        # Ping/benchmark targets and DNS presets (read from services.json on first use)
+        self.catalog = ServiceCatalog()
 
         # Load saved configurations
         self.load_configs()
 
-        # Get network adapters
-        self.refresh_adapters()
-
         # Create menu bar
         self.create_menu_bar()
 
         # Create UI
         self.create_widgets()
 
+        # Second stage runs once the window has been mapped
+        self.bind('<Map>', self._on_first_map, add='+')
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    def _on_first_map(self, event):
+        """Kick off the second startup stage after the window is first shown"""
+        if event.widget is not self or self._startup_finished:
+            return
+        self._startup_finished = True
+        self.after_idle(self.finish_startup)
+
+    @tracing.traced(category='startup')
+    def finish_startup(self):
+        """Second startup stage: everything not needed for the first paint"""
+        self.update_idletasks()
+        self.startup_metrics['first_paint_ms'] = (time.perf_counter() - self._init_start) * 1000
+        tracing.instant('first paint', 'startup')
+
+        # Set icon
+        self.set_app_icon()
+
+        # Fill the lists
+        self.populate_presets()
+        self.populate_ping_tests()
+        self.refresh_saved_configs_ui()
+
+        # Get network adapters (in background)
+        self.refresh_adapters()
+
+        self.startup_metrics['ready_ms'] = (time.perf_counter() - self._init_start) * 1000
+        self.report_startup_metrics()
+        tracing.save()
+
         # Check admin rights
         self.check_admin()
 
         # Check for updates on startup (in background)
         self.check_for_updates_background()
 
+        self.load_monitor_settings()
+        self.load_rules_settings()
+
+    def report_startup_metrics(self):
+        """Print startup timings when the first paint misses the budget"""
+        startup = self.startup_metrics
+        total = startup['imports_ms'] + startup['first_paint_ms']
+        if total > STARTUP_BUDGET_MS:
+            print(f"Startup over budget ({STARTUP_BUDGET_MS} ms): "
+                  f"imports {startup['imports_ms']:.0f} ms, "
+                  f"first paint {startup['first_paint_ms']:.0f} ms, "
+                  f"ready {startup['ready_ms']:.0f} ms")
+
+    @property
+    def update_manager(self):
+        """Update manager, imported and created on first use"""
+        if self._update_manager is None:
+            from updater import UpdateManager
+            self._update_manager = UpdateManager(self.runner)
+        return self._update_manager
+
+    @property
+    def gaming_servers(self) -> Dict[str, str]:
+        """Enabled catalog targets as name -> host"""
+        return {name: target['host'] for name, target in self.catalog.targets.items()}
+
+    @property
+    def dns_presets(self) -> Dict[str, Dict[str, str]]:
+        """Enabled catalog presets as name -> primary/secondary"""
+        return {name: {'primary': preset['primary'], 'secondary': preset['secondary']}
+                for name, preset in self.catalog.presets.items()}
+
+    def tcp_probe_ports(self, names) -> Dict[str, int]:
+        """host -> port for the given targets that are probed by TCP connect"""
+        targets = self.catalog.targets
+        return {targets[name]['host']: targets[name]['port']
+                for name in names if targets[name]['probe'] == 'tcp'}
+
     def check_admin(self):
         """Check if running with admin privileges"""
         try:
@@ -123,12 +198,15 @@ class DNSManager(ctk.CTk):
         except:
             pass
 
+    @tracing.traced(category='startup')
     def set_app_icon(self):
         """Set application icon"""
         try:
-            # Try to load SVG logo and convert to icon
-            if os.path.exists("logo.svg"):
-                # For now, we'll create a simple icon programmatically
+            icon_path = "logo.ico"
+            # logo.ico ships with the app; only draw one if it is missing
+            if not os.path.exists(icon_path) and os.path.exists("logo.svg"):
+                from PIL import Image, ImageDraw
+
                 icon_size = 64
                 image = Image.new('RGB', (icon_size, icon_size), color='#1e3a8a')
                 draw = ImageDraw.Draw(image)
@@ -138,8 +216,8 @@ class DNSManager(ctk.CTk):
                 draw.ellipse([24, 24, 40, 40], fill='#1e40af')
 
                 # Save as ICO
-                icon_path = "logo.ico"
                 image.save(icon_path, format='ICO')
+            if os.path.exists(icon_path):
                 self.iconbitmap(icon_path)
         except Exception as e:
             print(f"Could not set icon: {e}")
@@ -148,6 +226,7 @@ class DNSManager(ctk.CTk):
         """Apply system theme or user selected theme"""
         if self.current_theme_mode == "system":
             try:
+                import darkdetect
                 system_theme = darkdetect.theme()
                 if system_theme:
                     ctk.set_appearance_mode(system_theme.lower())
@@ -158,6 +237,7 @@ class DNSManager(ctk.CTk):
         else:
             ctk.set_appearance_mode(self.current_theme_mode)
 
+    @tracing.traced(category='startup')
     def create_menu_bar(self):
         """Create menu bar"""
         menubar = Menu(self, bg='#2b2b2b', fg='white', activebackground='#3b3b3b',
@@ -169,7 +249,7 @@ class DNSManager(ctk.CTk):
         file_menu.add_command(label="Import Configs", command=self.import_configs)
         file_menu.add_command(label="Export Configs", command=self.export_configs)
         file_menu.add_separator()
-        file_menu.add_command(label="Exit", command=self.quit)
+        file_menu.add_command(label="Exit", command=self.on_close)
         menubar.add_cascade(label="File", menu=file_menu)
 
         # Tools Menu
@@ -178,6 +258,27 @@ class DNSManager(ctk.CTk):
         tools_menu.add_command(label="Flush DNS Cache", command=self.flush_dns_cache)
         tools_menu.add_command(label="Network Diagnostics", command=self.show_network_diagnostics)
         tools_menu.add_command(label="Benchmark All DNS", command=self.show_benchmark_dialog)
+        tools_menu.add_command(label="DNS Query Tool", command=self.show_query_tool)
+        tools_menu.add_separator()
+        self.monitor_enabled_var = ctk.BooleanVar(value=False)
+        self.failover_var = ctk.BooleanVar(value=False)
+        tools_menu.add_checkbutton(label="Health Monitor", variable=self.monitor_enabled_var,
+                                   command=self.toggle_health_monitor)
+        tools_menu.add_checkbutton(label="Auto Failover", variable=self.failover_var,
+                                   command=self.toggle_failover)
+        self.rules_enabled_var = ctk.BooleanVar(value=False)
+        tools_menu.add_checkbutton(label="Rule-Based Switching", variable=self.rules_enabled_var,
+                                   command=self.toggle_rules_engine)
+        tools_menu.add_command(label="Edit Switching Rules", command=self.open_rules_file)
+        tools_menu.add_separator()
+        self.split_dns_var = ctk.BooleanVar(value=False)
+        tools_menu.add_checkbutton(label="Split DNS", variable=self.split_dns_var,
+                                   command=self.toggle_split_dns)
+        tools_menu.add_command(label="Edit Split DNS Routes", command=self.open_split_dns_file)
+        self.blocklist_var = ctk.BooleanVar(value=False)
+        tools_menu.add_checkbutton(label="Blocklist Filtering", variable=self.blocklist_var,
+                                   command=self.toggle_blocklist)
+        tools_menu.add_command(label="Edit Blocklists", command=self.open_blocklist_file)
         menubar.add_cascade(label="Tools", menu=tools_menu)
 
         # View Menu
@@ -249,34 +350,195 @@ class DNSManager(ctk.CTk):
     def flush_dns_cache(self):
         """Flush DNS cache"""
         try:
-            subprocess.run(['ipconfig', '/flushdns'],
-                         creationflags=subprocess.CREATE_NO_WINDOW,
-                         check=True)
+            netsh_backend.flush_dns(self.runner, check=True)
             self.show_success("DNS cache flushed successfully!")
         except Exception as e:
             self.show_error(f"Failed to flush DNS cache: {str(e)}")
 
     def show_network_diagnostics(self):
-        """Show network diagnostics window"""
+        """Show network diagnostics window; sections run concurrently and stream their output"""
+        import diagnostics
+
         diag_window = ctk.CTkToplevel(self)
         diag_window.title("Network Diagnostics")
-        diag_window.geometry("600x400")
-
-        text_box = ctk.CTkTextbox(diag_window, font=ctk.CTkFont(family="Consolas", size=11))
-        text_box.pack(fill="both", expand=True, padx=20, pady=20)
+        diag_window.geometry("760x520")
+
+        status_label = ctk.CTkLabel(diag_window, text="Running diagnostics...",
+                                    font=ctk.CTkFont(size=12), text_color="#f39c12")
+        status_label.pack(anchor="w", padx=20, pady=(15, 0))
+
+        tabs = ctk.CTkTabview(diag_window)
+        tabs.pack(fill="both", expand=True, padx=20, pady=(5, 20))
+        boxes = {}
+        for name in ('summary',) + tuple(diagnostics.SECTION_TITLES):
+            title = diagnostics.SECTION_TITLES.get(name, "Summary")
+            tabs.add(title)
+            boxes[name] = ctk.CTkTextbox(tabs.tab(title), font=ctk.CTkFont(family="Consolas", size=11))
+            boxes[name].pack(fill="both", expand=True)
+        tabs.set(diagnostics.SECTION_TITLES['adapters'])
+
+        # Lines are buffered here and appended once per UI tick, not once per line
+        pending = {name: [] for name in boxes}
+        pending_lock = threading.Lock()
+        done = []
+
+        def flush_output():
+            with pending_lock:
+                chunks = {name: ''.join(lines) for name, lines in pending.items() if lines}
+                for lines in pending.values():
+                    lines.clear()
+            for name, text in chunks.items():
+                boxes[name].insert("end", text)
+
+        def on_line(section, line):
+            with pending_lock:
+                pending[section].append(line)
+            self.ui.call(flush_output, key=('diagnostics output', id(diag_window)))
+
+        def on_section(section):
+            done.append(section['name'])
+            self.ui.configure(status_label, text=f"Running diagnostics... {len(done)}/{len(boxes) - 1} done "
+                                                 f"({section['title']}: {section['status']}, "
+                                                 f"{section['duration']:.0f} ms)")
+
+        current = self.dns_state.peek(self.current_adapter) or {}
+        resolvers = [current.get('primary'), current.get('secondary'), *diagnostics.REFERENCE_RESOLVERS]
 
         def run_diagnostics():
-            try:
-                result = subprocess.run(['ipconfig', '/all'],
-                                      capture_output=True,
-                                      text=True,
-                                      creationflags=subprocess.CREATE_NO_WINDOW)
-                text_box.insert("1.0", result.stdout)
-            except Exception as e:
-                text_box.insert("1.0", f"Error: {str(e)}")
+            report = diagnostics.run_diagnostics(self.runner, [r for r in resolvers if r],
+                                                 on_line=on_line, on_section=on_section)
+            summary = '\n'.join(diagnostics.summarize(report)) + '\n'
+            failed = [s['title'] for s in report['sections'].values() if s['status'] != 'ok']
+            self.ui.call(boxes['summary'].insert, "end", summary)
+            self.ui.configure(status_label,
+                              text=(f"Finished in {report['duration']:.0f} ms"
+                                    + (f" - problems: {', '.join(failed)}" if failed else "")),
+                              text_color="#e74c3c" if failed else "#2ecc71")
 
         threading.Thread(target=run_diagnostics, daemon=True).start()
 
+    def show_query_tool(self):
+        """Resolve a list of names through one resolver, many queries in flight at once"""
+        import bulk_query
+        from tkinter import filedialog
+
+        resolvers = dict(self.dns_presets)
+        resolvers.update(self.saved_configs)
+
+        query_window = ctk.CTkToplevel(self)
+        query_window.title("DNS Query Tool")
+        query_window.geometry("860x600")
+
+        controls = ctk.CTkFrame(query_window, fg_color="transparent")
+        controls.pack(fill="x", padx=20, pady=(15, 5))
+
+        ctk.CTkLabel(controls, text="Resolver:", font=ctk.CTkFont(size=12)).pack(side="left")
+        resolver_combo = ctk.CTkComboBox(controls, values=list(resolvers), width=220)
+        resolver_combo.set(next(iter(self.saved_configs), next(iter(resolvers), "1.1.1.1")))
+        resolver_combo.pack(side="left", padx=(5, 15))
+
+        type_selector = ctk.CTkSegmentedButton(controls, values=["A", "AAAA"])
+        type_selector.set("A")
+        type_selector.pack(side="left")
+
+        names_box = ctk.CTkTextbox(query_window, height=140, font=ctk.CTkFont(family="Consolas", size=11))
+        names_box.pack(fill="x", padx=20, pady=5)
+        names_box.insert("1.0", "\n".join(self.gaming_servers.values()))
+
+        buttons = ctk.CTkFrame(query_window, fg_color="transparent")
+        buttons.pack(fill="x", padx=20, pady=5)
+
+        status_label = ctk.CTkLabel(query_window, text="One name per line; hosts files work too",
+                                    font=ctk.CTkFont(size=12), text_color="gray")
+        status_label.pack(anchor="w", padx=20)
+
+        output_box = ctk.CTkTextbox(query_window, font=ctk.CTkFont(family="Consolas", size=11))
+        output_box.pack(fill="both", expand=True, padx=20, pady=(5, 20))
+
+        cancel = threading.Event()
+        pending = []
+        pending_lock = threading.Lock()
+
+        def load_file():
+            filename = filedialog.askopenfilename(
+                title="Load Names",
+                filetypes=[("Text files", "*.txt"), ("Hosts files", "hosts"), ("All files", "*.*")]
+            )
+            if filename:
+                try:
+                    with open(filename, 'r', encoding='utf-8', errors='replace') as f:
+                        names = bulk_query.read_names(f)
+                except OSError as e:
+                    self.show_error(f"Failed to load names: {str(e)}")
+                    return
+                names_box.delete("1.0", "end")
+                names_box.insert("1.0", "\n".join(names))
+                status_label.configure(text=f"Loaded {len(names)} names", text_color="gray")
+
+        def flush_output():
+            with pending_lock:
+                text = ''.join(pending)
+                pending.clear()
+            output_box.insert("end", text)
+            output_box.see("end")
+
+        def run_queries(names, dns_config, qtype):
+            from dns_query import DNSError
+            results = []
+            start = time.perf_counter()
+            try:
+                for result in bulk_query.resolve_many_with_config(names, dns_config, qtype, cancel=cancel):
+                    results.append(result)
+                    with pending_lock:
+                        pending.append(bulk_query.format_result(result) + "\n")
+                    self.ui.call(flush_output, key=('query output', id(query_window)))
+                    self.ui.configure(status_label, text=f"Resolving... {len(results)}/{len(names)}")
+
+                summary = bulk_query.format_summary(bulk_query.summarize(results, time.perf_counter() - start))
+                if cancel.is_set():
+                    summary = "Cancelled - " + summary
+                self.ui.configure(status_label, text=summary, text_color="#2ecc71" if not cancel.is_set() else "gray")
+            except (DNSError, OSError) as e:
+                self.ui.configure(status_label, text=f"Query failed: {e}", text_color="#e74c3c")
+            finally:
+                self.ui.configure(run_btn, state="normal")
+                self.ui.configure(cancel_btn, state="disabled")
+
+        def start_queries():
+            names = bulk_query.read_names(names_box.get("1.0", "end").splitlines())
+            if not names:
+                self.show_warning("Enter at least one name to resolve!")
+                return
+            dns_config = bulk_query.lookup_resolver(resolver_combo.get().strip(), resolvers)
+            try:
+                host, _ = split_server(dns_config.get('primary', ''))
+            except ValueError:
+                host = ''
+            if not self.is_valid_ip(host):
+                self.show_error("Choose a resolver or enter a valid IP address!")
+                return
+            qtype = bulk_query.TYPE_AAAA if type_selector.get() == "AAAA" else bulk_query.TYPE_A
+
+            cancel.clear()
+            output_box.delete("1.0", "end")
+            status_label.configure(text=f"Resolving {len(names)} names...", text_color="#f39c12")
+            run_btn.configure(state="disabled")
+            cancel_btn.configure(state="normal")
+            threading.Thread(target=run_queries, args=(names, dns_config, qtype), daemon=True).start()
+
+        def close():
+            cancel.set()
+            query_window.destroy()
+
+        ctk.CTkButton(buttons, text="Load File", width=100, command=load_file).pack(side="left")
+        run_btn = ctk.CTkButton(buttons, text="Run", width=100, fg_color="#2ecc71", hover_color="#27ae60",
+                                command=start_queries)
+        run_btn.pack(side="left", padx=10)
+        cancel_btn = ctk.CTkButton(buttons, text="Cancel", width=100, state="disabled",
+                                   fg_color="#e74c3c", hover_color="#c0392b", command=cancel.set)
+        cancel_btn.pack(side="left")
+        query_window.protocol("WM_DELETE_WINDOW", close)
+
     def show_about(self):
         """Show about dialog"""
         about_window = ctk.CTkToplevel(self)
@@ -345,10 +607,12 @@ class DNSManager(ctk.CTk):
 
     def check_for_updates_background(self):
         """Check for updates in background on startup"""
+        from updater import UpdateChecker
+
         def callback(update_info):
             if update_info:
                 self.pending_update = update_info
-                self.after(100, lambda: self.show_update_notification(update_info))
+                self.ui.call(self.show_update_notification, update_info)
 
         checker = UpdateChecker(callback)
         checker.start()
@@ -379,7 +643,7 @@ class DNSManager(ctk.CTk):
         progress.start()
 
         def check_updates():
-            update_info = self.update_manager.check_for_updates()
+            update_info = self.update_manager.check_for_updates(force=True)
 
             def show_result():
                 check_window.destroy()
@@ -388,7 +652,7 @@ class DNSManager(ctk.CTk):
                 else:
                     self.show_success(f"You're up to date!\n\nCurrent version: {__version__}")
 
-            self.after(100, show_result)
+            self.ui.call(show_result)
 
         threading.Thread(target=check_updates, daemon=True).start()
 
@@ -472,29 +736,45 @@ class DNSManager(ctk.CTk):
             progress_bar.set(0)
 
             def download_and_install():
-                # Update progress
+                # Update progress (called from this thread, at most 10 times a second)
                 def update_progress(percent, downloaded, total):
-                    progress = percent / 100
-                    progress_bar.set(progress)
-                    mb_downloaded = downloaded / (1024 * 1024)
-                    mb_total = total / (1024 * 1024)
-                    progress_label.configure(text=f"Downloading: {mb_downloaded:.1f} MB / {mb_total:.1f} MB ({percent:.0f}%)")
-
-                progress_label.configure(text="Downloading update...")
-
-                # Download
-                update_file = self.update_manager.download_update(
-                    update_info['download_url'],
-                    progress_callback=update_progress
-                )
-
-                if update_file:
+                    def show():
+                        progress_bar.set(percent / 100)
+                        mb_downloaded = downloaded / (1024 * 1024)
+                        mb_total = total / (1024 * 1024)
+                        progress_label.configure(text=f"Downloading: {mb_downloaded:.1f} MB / {mb_total:.1f} MB ({percent:.0f}%)")
+                    self.ui.call(show, key='update progress')
+
+                # Source installs with a release manifest only fetch the files that changed
+                if self.update_manager.can_delta_update(update_info):
+                    def delta_progress(percent, done, total):
+                        def show():
+                            progress_bar.set(percent / 100)
+                            progress_label.configure(text=f"Updating files: {done} / {total}")
+                        self.ui.call(show, key='update progress')
+
+                    self.ui.configure(progress_label, text="Checking changed files...")
+                    downloaded = self.update_manager.install_delta(update_info, progress_callback=delta_progress)
+                    install = lambda: True  # files were swapped in by install_delta
+                else:
+                    self.ui.configure(progress_label, text="Downloading update...")
+
+                    # Download (resumes a partial download, verified against the release checksums)
+                    update_file = self.update_manager.download_update(
+                        update_info['download_url'],
+                        progress_callback=update_progress,
+                        checksum_url=update_info.get('checksum_url')
+                    )
+                    downloaded = update_file is not None
+                    install = lambda: self.update_manager.install_update(update_file)
+
+                if downloaded:
                     def finish_install():
                         progress_label.configure(text="Installing update...")
                         progress_bar.set(1.0)
 
                         # Install
-                        success = self.update_manager.install_update(update_file)
+                        success = install()
 
                         if success:
                             result = messagebox.askyesno(
@@ -504,7 +784,7 @@ class DNSManager(ctk.CTk):
                             )
 
                             if result:
-                                self.update_manager.restart_app()
+                                self.restart_app()
                             else:
                                 update_window.destroy()
                         else:
@@ -512,14 +792,14 @@ class DNSManager(ctk.CTk):
                             messagebox.showerror("Update Failed", "Failed to install update. Please try again.")
                             update_window.destroy()
 
-                    self.after(100, finish_install)
+                    self.ui.call(finish_install)
                 else:
                     def show_error():
                         progress_label.configure(text="Download failed!")
                         messagebox.showerror("Download Failed", "Failed to download update. Please check your internet connection.")
                         update_window.destroy()
 
-                    self.after(100, show_error)
+                    self.ui.call(show_error)
 
             threading.Thread(target=download_and_install, daemon=True).start()
 
@@ -547,14 +827,14 @@ class DNSManager(ctk.CTk):
                                 icon='info'
                             )
                             if result:
-                                self.update_manager.restart_app()
+                                self.restart_app()
                             else:
                                 update_window.destroy()
                         else:
                             messagebox.showerror("Update Failed", f"Git update failed: {message}")
                             update_window.destroy()
 
-                    self.after(100, finish)
+                    self.ui.call(finish)
 
                 threading.Thread(target=do_git_update, daemon=True).start()
 
@@ -577,6 +857,7 @@ class DNSManager(ctk.CTk):
                      font=ctk.CTkFont(size=13),
                      fg_color="gray").pack(side="left", padx=5, fill="x", expand=True)
 
+    @tracing.traced(category='startup')
     def create_widgets(self):
         """Create all UI elements"""
         # Main container with padding
@@ -673,7 +954,16 @@ class DNSManager(ctk.CTk):
             font=ctk.CTkFont(size=12),
             justify="left"
         )
-        self.current_dns_label.pack(anchor="w", padx=10, pady=(0, 10))
+        self.current_dns_label.pack(anchor="w", padx=10, pady=(0, 2))
+
+        self.health_label = ctk.CTkLabel(
+            current_frame,
+            text="",
+            font=ctk.CTkFont(size=11),
+            text_color="gray",
+            justify="left"
+        )
+        self.health_label.pack(anchor="w", padx=10, pady=(0, 10))
 
         # DNS Input Section
         input_frame = ctk.CTkFrame(left_column)
@@ -751,20 +1041,9 @@ class DNSManager(ctk.CTk):
             font=ctk.CTkFont(size=16, weight="bold")
         ).pack(anchor="w", padx=10, pady=(10, 5))
 
-        # Scrollable frame for presets
-        presets_scroll = ctk.CTkScrollableFrame(presets_frame, height=200)
-        presets_scroll.pack(fill="both", expand=True, padx=10, pady=(0, 10))
-
-        for name, dns in self.dns_presets.items():
-            preset_btn = ctk.CTkButton(
-                presets_scroll,
-                text=f"{name} ({dns['primary']})",
-                command=lambda d=dns: self.load_preset(d),
-                font=ctk.CTkFont(size=12),
-                height=35,
-                anchor="w"
-            )
-            preset_btn.pack(fill="x", pady=2)
+        # Scrollable frame for presets (filled by populate_presets after first paint)
+        self.presets_scroll = ctk.CTkScrollableFrame(presets_frame, height=200)
+        self.presets_scroll.pack(fill="both", expand=True, padx=10, pady=(0, 10))
 
         # === RIGHT COLUMN ===
 
@@ -824,8 +1103,6 @@ class DNSManager(ctk.CTk):
         self.saved_scroll = ctk.CTkScrollableFrame(saved_frame, height=200)
         self.saved_scroll.pack(fill="both", expand=True, padx=10, pady=(0, 10))
 
-        self.refresh_saved_configs_ui()
-
         # Ping Tests
         ping_frame = ctk.CTkFrame(right_column)
         ping_frame.pack(fill="both", expand=True, padx=15, pady=(0, 15))
@@ -849,11 +1126,28 @@ class DNSManager(ctk.CTk):
         )
         test_all_btn.pack(side="right")
 
+        # Ping test rows are created by populate_ping_tests after first paint
         self.ping_scroll = ctk.CTkScrollableFrame(ping_frame, height=200)
         self.ping_scroll.pack(fill="both", expand=True, padx=10, pady=(0, 10))
-
-        # Create ping test buttons
         self.ping_labels = {}
+
+    @tracing.traced(category='ui')
+    def populate_presets(self):
+        """Create the DNS preset buttons"""
+        for name, dns in self.dns_presets.items():
+            preset_btn = ctk.CTkButton(
+                self.presets_scroll,
+                text=f"{name} ({dns['primary']})",
+                command=lambda d=dns: self.load_preset(d),
+                font=ctk.CTkFont(size=12),
+                height=35,
+                anchor="w"
+            )
+            preset_btn.pack(fill="x", pady=2)
+
+    @tracing.traced(category='ui')
+    def populate_ping_tests(self):
+        """Create the ping test buttons"""
         for name, server in self.gaming_servers.items():
             server_frame = ctk.CTkFrame(self.ping_scroll, fg_color="transparent")
             server_frame.pack(fill="x", pady=2)
@@ -873,7 +1167,7 @@ class DNSManager(ctk.CTk):
                 server_frame,
                 text="--",
                 font=ctk.CTkFont(size=11),
-                width=80
+                width=150
             )
             label.pack(side="right")
             self.ping_labels[name] = label
@@ -884,107 +1178,415 @@ class DNSManager(ctk.CTk):
         self.change_theme(theme_map[value])
 
     def refresh_adapters(self):
-        """Get list of network adapters"""
-        try:
-            result = subprocess.run(
-                ['netsh', 'interface', 'show', 'interface'],
-                capture_output=True,
-                text=True,
-                creationflags=subprocess.CREATE_NO_WINDOW
-            )
+        """Get list of network adapters (netsh runs in the background)"""
+        # An explicit refresh re-reads every adapter's DNS settings
+        self.dns_state.clear()
+        if self.rules_engine:
+            self.rules_engine.notify('network')
+
+        @tracing.traced('refresh_adapters', 'startup')
+        def load():
+            try:
+                adapters = netsh_backend.list_adapters(self.runner)
+            except CommandError as e:
+                error = str(e)
+                self.ui.call(self.show_error, f"Failed to get network adapters: {error}")
+                return
 
-            self.adapters = []
-            lines = result.stdout.split('\n')
-            for line in lines[3:]:  # Skip header lines
-                parts = line.split()
-                if len(parts) >= 4 and parts[0] in ['Enabled', 'Connected']:
-                    adapter_name = ' '.join(parts[3:])
-                    if adapter_name:
-                        self.adapters.append(adapter_name)
-
-            if hasattr(self, 'adapter_combo') and self.adapters:
-                self.adapter_combo.configure(values=self.adapters)
-                if self.adapters:
-                    # Try to find WiFi adapter as default
-                    default_adapter = self.adapters[0]
-                    wifi_keywords = ['wi-fi', 'wifi', 'wireless', 'wlan', '802.11']
-                    for adapter in self.adapters:
-                        adapter_lower = adapter.lower()
-                        if any(keyword in adapter_lower for keyword in wifi_keywords):
-                            default_adapter = adapter
-                            break
-
-                    self.adapter_combo.set(default_adapter)
-                    self.current_adapter = default_adapter
-                    self.show_current_dns()
-        except Exception as e:
-            self.show_error(f"Failed to get network adapters: {str(e)}")
+            self.ui.call(self.show_adapters, adapters)
+
+        threading.Thread(target=load, daemon=True).start()
+
+    @tracing.traced(category='ui')
+    def show_adapters(self, adapters: List[str]):
+        """Fill the adapter selector and pick a default adapter"""
+        self.adapters = adapters
+        self.dns_state.retain(adapters)
+        if self.adapters:
+            self.adapter_combo.configure(values=self.adapters)
+            # Try to find WiFi adapter as default
+            default_adapter = self.adapters[0]
+            wifi_keywords = ['wi-fi', 'wifi', 'wireless', 'wlan', '802.11']
+            for adapter in self.adapters:
+                adapter_lower = adapter.lower()
+                if any(keyword in adapter_lower for keyword in wifi_keywords):
+                    default_adapter = adapter
+                    break
+
+            self.adapter_combo.set(default_adapter)
+            self.current_adapter = default_adapter
+            self.show_current_dns()
 
     def on_adapter_change(self, choice):
         """Handle adapter selection change"""
         self.current_adapter = choice
         self.show_current_dns()
 
-    def get_current_dns_servers(self, use_cache=True):
-        """Get current DNS servers as a dictionary with caching"""
-        if not self.current_adapter:
+    def get_current_dns_servers(self, use_cache=True, raise_errors=False):
+        """
+        Current DNS servers as a dictionary (None for DHCP), cached per adapter
+        A failed netsh read returns None too, or raises CommandError with raise_errors=True
+        """
+        adapter = self.current_adapter
+        if not adapter:
             return None
 
-        # Check cache
-        if use_cache and self.current_adapter in self._dns_cache:
-            cache_age = time.time() - self._cache_time.get(self.current_adapter, 0)
-            if cache_age < self._cache_duration:
-                return self._dns_cache[self.current_adapter]
-
+        if not use_cache:
+            self.dns_state.invalidate(adapter)
         try:
-            result = subprocess.run(
-                ['netsh', 'interface', 'ip', 'show', 'dns', self.current_adapter],
-                capture_output=True,
-                text=True,
-                creationflags=subprocess.CREATE_NO_WINDOW,
-                timeout=3  # Add timeout for faster failure
-            )
-
-            dns_servers = []
-            lines = result.stdout.split('\n')
-            for line in lines:
-                if 'Statically Configured DNS Servers:' in line or 'DNS servers configured through DHCP:' in line:
-                    continue
-                if any(part.replace('.', '').isdigit() for part in line.split()):
-                    ip = line.strip().split()[-1]
-                    if self.is_valid_ip(ip):
-                        dns_servers.append(ip)
-
-            dns_info = None
-            if dns_servers:
-                dns_info = {
-                    'primary': dns_servers[0],
-                    'secondary': dns_servers[1] if len(dns_servers) > 1 else ''
-                }
-
-            # Update cache
-            self._dns_cache[self.current_adapter] = dns_info
-            self._cache_time[self.current_adapter] = time.time()
-
-            return dns_info
-        except:
+            return self.dns_state.get_or_load(
+                adapter, lambda: netsh_backend.get_dns_servers(self.runner, adapter, check=True))
+        except CommandError:
+            if raise_errors:
+                raise
             return None
 
     def show_current_dns(self):
-        """Display current DNS settings for selected adapter"""
-        current_dns = self.get_current_dns_servers()
+        """Display current DNS settings for selected adapter (netsh runs in the background)"""
+        adapter = self.current_adapter
+
+        def fetch():
+            try:
+                current_dns = self.get_current_dns_servers(raise_errors=True)
+            except CommandError as e:
+                self.ui.call(self.show_dns_info, adapter, None, str(e), key='dns info')
+                return
+            self.ui.call(self.show_dns_info, adapter, current_dns, key='dns info')
+
+        threading.Thread(target=fetch, daemon=True).start()
 
-        if current_dns:
+    def show_dns_info(self, adapter: str, current_dns: Optional[Dict[str, str]],
+                      error: Optional[str] = None):
+        """Show fetched DNS settings if the adapter is still selected"""
+        if adapter != self.current_adapter:
+            return
+
+        if error:
+            print(f"Could not read DNS servers for {adapter}: {error}")
+            self.current_dns_label.configure(text="DNS: could not be read")
+        elif current_dns:
             dns_text = f"Primary: {current_dns['primary']}"
             if current_dns['secondary']:
                 dns_text += f"\nSecondary: {current_dns['secondary']}"
+            if current_dns['primary'].startswith('127.'):
+                dns_text += "\n(local forwarder)" if self.forwarder else "\n(local forwarder not running!)"
             self.current_dns_label.configure(text=dns_text)
         else:
             self.current_dns_label.configure(text="DNS: DHCP (Automatic)")
 
         # Refresh saved configs UI to update highlighting
-        if hasattr(self, 'saved_scroll'):
-            self.refresh_saved_configs_ui()
+        self.refresh_saved_configs_ui()
+
+        if self.health_monitor and not error:
+            self.health_monitor.set_active(self.active_config_name(current_dns), current_dns)
+
+    def active_config_name(self, current_dns: Optional[Dict[str, str]]) -> Optional[str]:
+        """Name of the saved config matching the adapter's DNS, if any"""
+        if not current_dns:
+            return None
+        for name, dns in self.saved_configs.items():
+            if (current_dns['primary'] == dns['primary'] and
+                    current_dns.get('secondary', '') == dns.get('secondary', '')):
+                return name
+        return None
+
+    def load_monitor_settings(self):
+        """Read monitor_settings.json into the menu and start the monitor if it is on"""
+        import health_monitor
+        self.monitor_settings = health_monitor.load_settings()
+        self.monitor_enabled_var.set(self.monitor_settings['enabled'])
+        self.failover_var.set(self.monitor_settings['failover'])
+        if self.monitor_settings['enabled']:
+            self.start_health_monitor()
+
+    def start_health_monitor(self):
+        """Probe the active DNS servers in the background"""
+        import health_monitor
+        if self.health_monitor is None:
+            self.health_monitor = health_monitor.HealthMonitor(
+                self.monitor_settings,
+                candidates=lambda: dict(self.saved_configs),
+                on_sample=lambda stats: self.update_health_label(),
+                on_alert=self.on_health_alert,
+                on_failover=lambda name, dns: self.switch_to_config(name, dns, "Failover"))
+        current = self.dns_state.peek(self.current_adapter)
+        self.health_monitor.set_active(self.active_config_name(current), current)
+        self.health_monitor.start()
+
+    def toggle_health_monitor(self):
+        import health_monitor
+        self.monitor_settings['enabled'] = self.monitor_enabled_var.get()
+        health_monitor.save_settings(self.monitor_settings)
+        if self.monitor_settings['enabled']:
+            self.start_health_monitor()
+        elif self.health_monitor:
+            self.health_monitor.stop()
+            self.health_label.configure(text="")
+
+    def toggle_failover(self):
+        import health_monitor
+        self.monitor_settings['failover'] = self.failover_var.get()
+        health_monitor.save_settings(self.monitor_settings)
+        if self.health_monitor:
+            self.health_monitor.settings['failover'] = self.monitor_settings['failover']
+
+    def update_health_label(self):
+        """Called from the monitor thread after each probe round"""
+        import health_monitor
+        status = self.health_monitor.status()
+        breached = any(s['breached'] for s in status['servers'].values())
+        self.ui.configure(self.health_label,
+                          text=health_monitor.format_status(status['servers']) if status['servers'] else "",
+                          text_color="#e74c3c" if breached else "gray")
+
+    def on_health_alert(self, alert: Dict):
+        """Called from the monitor thread; failovers are announced, breaches shown in the label"""
+        self.update_health_label()
+        if alert['kind'] == 'failover':
+            self.ui.call(self.show_warning, f"DNS health: {alert['message']}")
+
+    def switch_to_config(self, name: str, dns: Dict[str, str], reason: str) -> bool:
+        """Apply a saved config for the health monitor or the rules engine; runs on their thread"""
+        if self.forwarder is not None:
+            # The adapter stays on the forwarder; the config takes over names without a route
+            self.split_settings['default'] = name
+            self.forwarder.set_router(self.forwarder_router())
+            print(f"{reason}: local forwarder default is now {name}")
+            return True
+        adapter = self.current_adapter
+        if not adapter:
+            return False
+        try:
+            netsh_backend.set_dns(self.runner, adapter, dns['primary'], dns.get('secondary', ''))
+            netsh_backend.flush_dns(self.runner)
+        except Exception as e:
+            print(f"{reason}: switching to {name} failed: {e}")
+            return False
+        finally:
+            self.dns_state.invalidate(adapter)
+        self.ui.call(self.show_current_dns)
+        return True
+
+    def forwarder_router(self) -> 'dns_forwarder.SplitRouter':
+        """Split DNS routes (when on) over the forwarder's default config"""
+        import dns_forwarder
+        routes = self.split_settings['routes'] if self.split_routes_on else {}
+        return dns_forwarder.SplitRouter(routes, self.split_settings['default'])
+
+    def toggle_split_dns(self):
+        self.split_routes_on = self.split_dns_var.get()
+        if self.split_routes_on and self.forwarder is None:
+            if not self.start_forwarder():
+                self.split_routes_on = False
+                self.split_dns_var.set(False)
+        elif self.forwarder is not None:
+            if self.split_routes_on:
+                import dns_forwarder
+                self.split_settings['routes'] = dns_forwarder.load_settings()['routes']
+            self.forwarder.set_router(self.forwarder_router())
+            self.stop_forwarder_if_unused()
+
+    def toggle_blocklist(self):
+        if not self.blocklist_var.get():
+            if self.forwarder is not None:
+                self.forwarder.set_blocklist(None)
+                self.stop_forwarder_if_unused()
+            return
+        if self.forwarder is None and not self.start_forwarder():
+            self.blocklist_var.set(False)
+            return
+
+        import blocklist
+        forwarder = self.forwarder
+        settings = blocklist.load_settings()
+        if not settings['lists']:
+            self.show_warning("No blocklists yet. Add hosts or adblock list files to \"lists\" "
+                              "in blocklist.json (Tools → Edit Blocklists).")
+
+        def load():
+            # Lists that changed since last time are compiled here, which can take a while
+            loaded = blocklist.load_from_settings(settings)
+            print(f"Blocklist: {len(loaded):,} entries from {len(loaded.indexes)} lists"
+                  + (f", compiled {', '.join(loaded.rebuilt)}" if loaded.rebuilt else ""))
+            self.ui.call(self.attach_blocklist, forwarder, loaded, settings['response'])
+
+        threading.Thread(target=load, daemon=True).start()
+
+    def attach_blocklist(self, forwarder, loaded, response: str):
+        if forwarder is self.forwarder and self.blocklist_var.get():
+            forwarder.set_blocklist(loaded, response)
+        else:
+            loaded.close()
+
+    def start_forwarder(self) -> bool:
+        """Start the local forwarder (split_dns.json) on loopback and point the adapter at it"""
+        import dns_forwarder
+        adapter = self.current_adapter
+        if not adapter:
+            self.show_error("Please select a network adapter first!")
+            return False
+        settings = dns_forwarder.load_settings()
+        host, port = split_server(settings['listen'])
+        if port != 53:
+            self.show_error(f"Windows only sends DNS queries to port 53; split_dns.json listens on {settings['listen']}")
+            return False
+
+        # Static servers are put back afterwards, a DHCP adapter is reset to DHCP
+        try:
+            before = netsh_backend.get_dns_settings(self.runner, adapter)
+        except CommandError as e:
+            self.show_error(f"Could not read the DNS servers of {adapter}: {str(e)}")
+            return False
+        if host in before['servers']:
+            # Left over from a session that did not shut down cleanly
+            before = {'source': 'dhcp', 'servers': []}
+        extra = {}
+        if not settings['default']:
+            if not before['servers']:
+                self.show_error("The local forwarder needs a config for names without a route.\n\n"
+                                "Set \"default\" in split_dns.json to a saved config, "
+                                "or apply static DNS servers first.")
+                return False
+            servers = before['servers']
+            extra['Adapter DNS'] = {'primary': servers[0], 'secondary': servers[1] if len(servers) > 1 else ''}
+            settings['default'] = 'Adapter DNS'
+
+        self.split_settings = settings
+        forwarder = dns_forwarder.DNSForwarder(self.forwarder_router(),
+                                               lambda: {**self.saved_configs, **extra},
+                                               host, port, settings['timeout'])
+        try:
+            forwarder.start()
+        except OSError as e:
+            self.show_error(f"Could not start the local DNS forwarder on {settings['listen']}: {e}")
+            return False
+        try:
+            try:
+                netsh_backend.set_dns(self.runner, adapter, host)
+            finally:
+                self.dns_state.invalidate(adapter)
+            netsh_backend.flush_dns(self.runner)
+        except CommandError as e:
+            forwarder.stop()
+            self.show_error(f"Failed to apply DNS. Make sure you're running as Administrator!\n\nError: {str(e)}")
+            return False
+
+        self.forwarder = forwarder
+        self.split_restore = (adapter, before)
+        self.show_current_dns()
+        return True
+
+    def stop_forwarder_if_unused(self):
+        if not self.split_routes_on and not self.blocklist_var.get():
+            self.stop_forwarder()
+
+    def stop_forwarder(self):
+        """Give the adapter its previous DNS servers back, then stop the forwarder"""
+        if self.forwarder is None:
+            return
+        adapter, before = self.split_restore
+        servers = before['servers']
+        try:
+            try:
+                if before['source'] == 'static' and servers:
+                    netsh_backend.set_dns(self.runner, adapter, servers[0], servers[1] if len(servers) > 1 else '')
+                else:
+                    netsh_backend.reset_dns(self.runner, adapter)
+            finally:
+                self.dns_state.invalidate(adapter)
+            netsh_backend.flush_dns(self.runner)
+        except CommandError as e:
+            self.show_error(f"Could not restore the DNS servers of {adapter}: {str(e)}")
+        self.forwarder.set_blocklist(None)
+        self.forwarder.stop()
+        self.forwarder = None
+        self.split_restore = None
+        self.show_current_dns()
+
+    def shutdown(self):
+        """Undo split DNS and filtering before exiting, so the adapter isn't left pointing at nothing"""
+        self.stop_forwarder()
+        if self.rules_engine:
+            self.rules_engine.stop()
+        if self.health_monitor:
+            self.health_monitor.stop()
+
+    def on_close(self):
+        """Window close button and File → Exit"""
+        self.shutdown()
+        self.destroy()
+
+    def restart_app(self):
+        """Restart after an update, through the same teardown as closing the window"""
+        self.shutdown()
+        self.update_manager.restart_app()
+
+    def load_rules_settings(self):
+        """Read dns_rules.json into the menu and start switching if it is on"""
+        import rules_engine
+        self.rules_settings = rules_engine.load_rules()
+        self.rules_enabled_var.set(self.rules_settings['enabled'])
+        if self.rules_settings['enabled']:
+            self.start_rules_engine()
+
+    def start_rules_engine(self):
+        """(Re)load dns_rules.json and switch configs as its triggers fire"""
+        import rules_engine
+        if self.rules_engine is not None:
+            self.rules_engine.stop()
+        self.rules_settings = rules_engine.load_rules()
+        self.rules_engine = rules_engine.RulesEngine(
+            self.rules_settings,
+            configs=lambda: dict(self.saved_configs),
+            apply=lambda name, dns: self.switch_to_config(name, dns, "Rule"),
+            runner=self.runner,
+            on_decision=self.on_rule_decision)
+        self.rules_engine.start()
+
+    def toggle_rules_engine(self):
+        import rules_engine
+        enabled = self.rules_enabled_var.get()
+        rules_engine.set_enabled(enabled)
+        if enabled:
+            self.start_rules_engine()
+        elif self.rules_engine:
+            self.rules_engine.stop()
+            self.rules_engine = None
+
+    def open_rules_file(self):
+        """Open dns_rules.json in the default editor; rules are reloaded when switching is turned on"""
+        import rules_engine
+        path = os.path.abspath(rules_engine.RULES_FILE)
+        if not os.path.exists(path):
+            rules_engine.save_rules(rules_engine.load_rules(path), path)
+        self.open_in_editor(path)
+
+    def open_split_dns_file(self):
+        """Open split_dns.json in the default editor; routes are reloaded when Split DNS is turned on"""
+        import dns_forwarder
+        path = os.path.abspath(dns_forwarder.SETTINGS_FILE)
+        if not os.path.exists(path):
+            dns_forwarder.save_settings(dns_forwarder.load_settings(path), path)
+        self.open_in_editor(path)
+
+    def open_blocklist_file(self):
+        """Open blocklist.json in the default editor; lists are reloaded when filtering is turned on"""
+        import blocklist
+        path = os.path.abspath(blocklist.SETTINGS_FILE)
+        if not os.path.exists(path):
+            blocklist.save_settings(blocklist.load_settings(path), path)
+        self.open_in_editor(path)
+
+    def open_in_editor(self, path: str):
+        try:
+            os.startfile(path)
+        except (AttributeError, OSError):
+            webbrowser.open(path)
+
+    def on_rule_decision(self, decision: Dict):
+        """Called from the rules engine thread"""
+        if not decision['applied']:
+            self.ui.call(self.show_warning, f"Rule {decision['rule']} could not switch to {decision['config']}")
 
     def is_valid_ip(self, ip: str) -> bool:
         """Validate IP address format"""
@@ -1016,31 +1618,18 @@ class DNSManager(ctk.CTk):
             return
 
         try:
-            # Set primary DNS
-            subprocess.run(
-                ['netsh', 'interface', 'ip', 'set', 'dns', self.current_adapter, 'static', primary],
-                check=True,
-                creationflags=subprocess.CREATE_NO_WINDOW
-            )
-
-            # Set secondary DNS if provided
-            if secondary:
-                subprocess.run(
-                    ['netsh', 'interface', 'ip', 'add', 'dns', self.current_adapter, secondary, 'index=2'],
-                    check=True,
-                    creationflags=subprocess.CREATE_NO_WINDOW
-                )
-
-            # Invalidate DNS cache
-            if self.current_adapter in self._dns_cache:
-                del self._dns_cache[self.current_adapter]
+            try:
+                netsh_backend.set_dns(self.runner, self.current_adapter, primary, secondary)
+            finally:
+                # Even a failed change may have set the primary server
+                self.dns_state.invalidate(self.current_adapter)
 
             self.show_success(f"DNS applied successfully!\n\nPrimary: {primary}" + (f"\nSecondary: {secondary}" if secondary else ""))
             self.show_current_dns()
 
             # Flush DNS cache
-            subprocess.run(['ipconfig', '/flushdns'], creationflags=subprocess.CREATE_NO_WINDOW)
-        except subprocess.CalledProcessError as e:
+            netsh_backend.flush_dns(self.runner)
+        except CommandError as e:
             self.show_error(f"Failed to apply DNS. Make sure you're running as Administrator!\n\nError: {str(e)}")
         except Exception as e:
             self.show_error(f"Error: {str(e)}")
@@ -1052,19 +1641,14 @@ class DNSManager(ctk.CTk):
             return
 
         try:
-            subprocess.run(
-                ['netsh', 'interface', 'ip', 'set', 'dns', self.current_adapter, 'dhcp'],
-                check=True,
-                creationflags=subprocess.CREATE_NO_WINDOW
-            )
-
-            # Invalidate DNS cache
-            if self.current_adapter in self._dns_cache:
-                del self._dns_cache[self.current_adapter]
+            try:
+                netsh_backend.reset_dns(self.runner, self.current_adapter)
+            finally:
+                self.dns_state.invalidate(self.current_adapter)
 
             self.show_success("DNS reset to DHCP (automatic) successfully!")
             self.show_current_dns()
-            subprocess.run(['ipconfig', '/flushdns'], creationflags=subprocess.CREATE_NO_WINDOW)
+            netsh_backend.flush_dns(self.runner)
         except Exception as e:
             self.show_error(f"Failed to reset DNS: {str(e)}")
 
@@ -1107,6 +1691,7 @@ class DNSManager(ctk.CTk):
         self.refresh_saved_configs_ui()
         self.show_success(f"Configuration '{name}' saved successfully!")
 
+    @tracing.traced(category='startup')
     def load_configs(self):
         """Load saved configurations from file"""
         try:
@@ -1125,6 +1710,7 @@ class DNSManager(ctk.CTk):
         except Exception as e:
             self.show_error(f"Error saving configs: {e}")
 
+    @tracing.traced(category='ui')
     def refresh_saved_configs_ui(self):
         """Refresh the saved configurations display"""
         # Clear existing widgets
@@ -1242,57 +1828,41 @@ class DNSManager(ctk.CTk):
             self.show_success(f"Configuration '{name}' deleted!")
 
     def ping_server(self, server: str, name: str):
-        """Ping a gaming server"""
-        def do_ping():
-            label = self.ping_labels[name]
-            label.configure(text="Testing...")
+        """Ping every address of a gaming server and show best/worst per family"""
+        from service_probe import probe_service
+
+        self.ping_labels[name].configure(text="Testing...")
 
+        def do_ping():
             try:
-                # Try to resolve hostname first
-                try:
-                    ip = socket.gethostbyname(server)
-                except:
-                    ip = server
-
-                # Perform ping
-                start_time = time.time()
-                result = subprocess.run(
-                    ['ping', '-n', '4', ip],
-                    capture_output=True,
-                    text=True,
-                    timeout=10,
-                    creationflags=subprocess.CREATE_NO_WINDOW
-                )
-
-                # Parse average latency
-                output = result.stdout
-                if 'Average' in output:
-                    avg_line = [line for line in output.split('\n') if 'Average' in line][0]
-                    latency = avg_line.split('=')[-1].strip().replace('ms', '').strip()
-
-                    # Color code based on latency
-                    try:
-                        lat_val = int(latency)
-                        if lat_val < 50:
-                            color = "#2ecc71"  # Green
-                        elif lat_val < 100:
-                            color = "#f39c12"  # Orange
-                        else:
-                            color = "#e74c3c"  # Red
-                        label.configure(text=f"{latency}ms", text_color=color)
-                    except:
-                        label.configure(text=f"{latency}ms")
-                elif 'unreachable' in output.lower() or 'timed out' in output.lower():
-                    label.configure(text="Timeout", text_color="#e74c3c")
-                else:
-                    label.configure(text="Failed", text_color="#e74c3c")
-            except subprocess.TimeoutExpired:
-                label.configure(text="Timeout", text_color="#e74c3c")
+                self.show_ping_result(name, probe_service(server, tcp_ports=self.tcp_probe_ports([name])))
             except Exception as e:
-                label.configure(text="Error", text_color="#e74c3c")
+                self.ui.configure(self.ping_labels[name], text="Error", text_color="#e74c3c")
 
         threading.Thread(target=do_ping, daemon=True).start()
 
+    def show_ping_result(self, name: str, result: Dict):
+        """Show a service probe result in its ping label (from any thread)"""
+        from service_probe import format_summary
+
+        label = self.ping_labels[name]
+        best = result['best']
+
+        if best:
+            # Color code based on the best reachable address
+            lat_val = best['latency']
+            if lat_val < 50:
+                color = "#2ecc71"  # Green
+            elif lat_val < 100:
+                color = "#f39c12"  # Orange
+            else:
+                color = "#e74c3c"  # Red
+            self.ui.configure(label, text=format_summary(result), text_color=color)
+        elif result['addresses']:
+            self.ui.configure(label, text="Timeout", text_color="#e74c3c")
+        else:
+            self.ui.configure(label, text="Failed", text_color="#e74c3c")
+
     def show_benchmark_dialog(self):
         """Show DNS benchmark dialog"""
         if self.benchmark_running:
@@ -1350,25 +1920,18 @@ class DNSManager(ctk.CTk):
             for var in selected_services.values():
                 var.set(False)
 
-        def select_gaming():
-            gaming_keywords = ['Fortnite', 'Call of Duty', 'EA', 'Battlefield', 'Steam',
-                             'Riot', 'Valorant', 'League', 'Battle.net', 'Ubisoft', 'Apex']
-            for name, var in selected_services.items():
-                var.set(any(keyword in name for keyword in gaming_keywords))
-
-        def select_ai():
-            ai_keywords = ['ChatGPT', 'Gemini', 'Claude', 'Perplexity']
+        def select_group(group):
+            members = set(self.catalog.target_group(group))
             for name, var in selected_services.items():
-                var.set(any(keyword in name for keyword in ai_keywords))
+                var.set(name in members)
 
         ctk.CTkButton(quick_btn_frame, text="Select All", command=select_all,
                      width=100, height=30).pack(side="left", padx=3)
         ctk.CTkButton(quick_btn_frame, text="Clear All", command=select_none,
                      width=100, height=30).pack(side="left", padx=3)
-        ctk.CTkButton(quick_btn_frame, text="Gaming", command=select_gaming,
-                     width=100, height=30).pack(side="left", padx=3)
-        ctk.CTkButton(quick_btn_frame, text="AI Platforms", command=select_ai,
-                     width=100, height=30).pack(side="left", padx=3)
+        for group, label in self.catalog.target_groups().items():
+            ctk.CTkButton(quick_btn_frame, text=label, command=lambda g=group: select_group(g),
+                         width=100, height=30).pack(side="left", padx=3)
 
         # Results area
         results_frame = ctk.CTkFrame(main_frame)
@@ -1384,6 +1947,21 @@ class DNSManager(ctk.CTk):
                                    font=ctk.CTkFont(size=11), text_color="gray")
         status_label.pack(pady=(0, 10))
 
+        # Benchmark mode
+        mode_frame = ctk.CTkFrame(main_frame, fg_color="transparent")
+        mode_frame.pack(fill="x", pady=(10, 0))
+
+        ctk.CTkLabel(mode_frame, text="Mode:", font=ctk.CTkFont(size=12)).pack(side="left", padx=(0, 5))
+
+        mode_selector = ctk.CTkSegmentedButton(mode_frame,
+                                               values=["Lookup Time", "Time to Service", "Integrity"],
+                                               font=ctk.CTkFont(size=11))
+        mode_selector.pack(side="left")
+        mode_selector.set("Lookup Time")
+
+        ctk.CTkLabel(mode_frame, text="Time to Service = lookup through each config + connect to its answer",
+                    font=ctk.CTkFont(size=10), text_color="gray").pack(side="left", padx=10)
+
         # Start benchmark button
         def start_benchmark():
             selected = [name for name, var in selected_services.items() if var.get()]
@@ -1398,39 +1976,151 @@ class DNSManager(ctk.CTk):
             self.benchmark_running = True
             status_label.configure(text="Benchmark running...", text_color="#f39c12")
 
-            def run_benchmark():
-                results = {}
+            hosts = [self.gaming_servers[name] for name in selected]
+
+            def run_guarded(work):
+                """Worker thread body: however work() ends, the benchmark can be started again"""
+                error = None
+                try:
+                    work()
+                except Exception as e:
+                    print(f"Benchmark failed: {e}")
+                    error = e
+                finally:
+                    self.ui.call(finish_benchmark, error)
+
+            def finish_benchmark(error):
+                self.benchmark_running = False
+                if error is not None and status_label.winfo_exists():
+                    status_label.configure(text=f"Benchmark failed: {error}", text_color="#e74c3c")
+
+            def run_service_benchmark():
+                from benchmark import run_time_to_service_benchmark
+                from integrity import attach_integrity, check_integrity
+
+                targets = {name: self.catalog.targets[name] for name in selected}
+                with ThreadPoolExecutor(max_workers=1) as executor:
+                    integrity = executor.submit(check_integrity, self.saved_configs, hosts)
+                    ranking = run_time_to_service_benchmark(self.saved_configs, targets)
+                attach_integrity(ranking, integrity.result())
+                self.ui.call(show_service_ranking, ranking, targets)
+
+            def run_integrity_check():
+                from integrity import check_integrity
+
+                report = check_integrity(self.saved_configs, hosts)
+                self.ui.call(show_integrity_report, report)
+
+            def show_integrity_report(report):
+                from integrity import findings, format_integrity
 
-                # Clear results area
                 for widget in results_scroll.winfo_children():
                     widget.destroy()
 
-                # Test each DNS config
-                for config_name, dns_config in self.saved_configs.items():
-                    results[config_name] = {}
-
-                    # Apply this DNS temporarily (or test without applying)
-                    # For now, we'll just measure DNS resolution time
-                    for service_name in selected:
-                        server = self.gaming_servers[service_name]
-                        try:
-                            start = time.time()
-                            socket.gethostbyname(server)
-                            latency = (time.time() - start) * 1000  # Convert to ms
-                            results[config_name][service_name] = latency
-                        except:
-                            results[config_name][service_name] = None
+                summaries = sorted(report['resolvers'].values(),
+                                   key=lambda s: (s['integrity'] is None, -(s['integrity'] or 0)))
+                for summary in summaries:
+                    result_frame = ctk.CTkFrame(results_scroll)
+                    result_frame.pack(fill="x", pady=3)
+
+                    color = ("#2ecc71" if summary['verdict'] == 'consistent'
+                             else "#e74c3c" if summary['verdict'] in ('NXDOMAIN hijacking', 'unreachable')
+                             else "#f39c12")
+                    ctk.CTkLabel(result_frame, text=summary['config'], font=ctk.CTkFont(size=13, weight="bold"),
+                               anchor="w").pack(anchor="w", padx=10)
+                    detail_text = (f"{format_integrity(summary)} | {summary['hijacked']} hijacked, "
+                                   f"{summary['filtered']} filtered, {summary['divergent']} divergent, "
+                                   f"{summary['failed']} no answer")
+                    ctk.CTkLabel(result_frame, text=detail_text, font=ctk.CTkFont(size=10),
+                               text_color=color, anchor="w").pack(anchor="w", padx=10)
+
+                for line in findings(report)[:50]:
+                    ctk.CTkLabel(results_scroll, text=line, font=ctk.CTkFont(size=10),
+                               text_color="gray", anchor="w").pack(anchor="w", padx=10)
+
+                self.benchmark_running = False
+                status_label.configure(text=f"Integrity check complete! Compared {len(report['resolvers'])} configs "
+                                            f"on {len(report['names'])} names",
+                                     text_color="#2ecc71")
+
+            def show_service_ranking(ranking, targets):
+                for widget in results_scroll.winfo_children():
+                    widget.destroy()
+
+                for rank, entry in enumerate(ranking, 1):
+                    result_frame = ctk.CTkFrame(results_scroll)
+                    result_frame.pack(fill="x", pady=3)
+
+                    rank_color = "#2ecc71" if rank == 1 else "#f39c12" if rank == 2 else "#e74c3c" if rank == 3 else "gray"
+                    ctk.CTkLabel(result_frame, text=f"#{rank}", font=ctk.CTkFont(size=14, weight="bold"),
+                               text_color=rank_color, width=40).pack(side="left", padx=5)
+
+                    info_frame = ctk.CTkFrame(result_frame, fg_color="transparent")
+                    info_frame.pack(side="left", fill="x", expand=True, padx=5)
+
+                    ctk.CTkLabel(info_frame, text=entry['config'], font=ctk.CTkFont(size=13, weight="bold"),
+                               anchor="w").pack(anchor="w")
+
+                    if entry['avg_total'] is not None:
+                        detail_text = (f"Total: {entry['avg_total']:.1f}ms "
+                                       f"(lookup {entry['avg_lookup']:.1f} + connect {entry['avg_connect']:.1f}) | "
+                                       f"{entry['success']}/{len(targets)} services")
+                    else:
+                        detail_text = f"Unreachable | 0/{len(targets)} services"
+                    if entry['integrity'] is not None:
+                        detail_text += f" | Integrity: {entry['integrity']:.0f}% ({entry['integrity_verdict']})"
+                    ctk.CTkLabel(info_frame, text=detail_text, font=ctk.CTkFont(size=10),
+                               text_color="gray", anchor="w").pack(anchor="w")
+
+                self.benchmark_running = False
+                status_label.configure(text=f"Benchmark complete! Ranked {len(ranking)} configs by time to service "
+                                            f"across {len(selected)} services",
+                                     text_color="#2ecc71")
+
+            def run_benchmark():
+                from integrity import check_integrity
+
+                results = {}
+                with metrics.BENCHMARK_DURATION.time('lookup'), ThreadPoolExecutor(max_workers=1) as executor:
+                    integrity = executor.submit(check_integrity, self.saved_configs, hosts)
+
+                    # Test each DNS config
+                    for config_name, dns_config in self.saved_configs.items():
+                        results[config_name] = {}
+
+                        # Apply this DNS temporarily (or test without applying)
+                        # For now, we'll just measure DNS resolution time
+                        for service_name in selected:
+                            server = self.gaming_servers[service_name]
+                            try:
+                                start = time.time()
+                                socket.gethostbyname(server)
+                                latency = (time.time() - start) * 1000  # Convert to ms
+                                results[config_name][service_name] = latency
+                            except:
+                                results[config_name][service_name] = None
 
                 # Calculate averages and display results
                 config_averages = []
+                targets = self.catalog.targets
                 for config_name, service_results in results.items():
-                    valid_results = [v for v in service_results.values() if v is not None]
-                    if valid_results:
-                        avg = sum(valid_results) / len(valid_results)
+                    valid_results = [(v, targets[name]['weight'])
+                                     for name, v in service_results.items() if v is not None]
+                    total_weight = sum(weight for _, weight in valid_results)
+                    if valid_results and total_weight > 0:
+                        avg = sum(v * weight for v, weight in valid_results) / total_weight
                         config_averages.append((config_name, avg, service_results))
 
                 # Sort by average (best first)
                 config_averages.sort(key=lambda x: x[1])
+                self.ui.call(show_lookup_ranking, config_averages, integrity.result())
+
+            def show_lookup_ranking(config_averages, report):
+                from integrity import format_integrity
+
+                # Clear results area
+                for widget in results_scroll.winfo_children():
+                    widget.destroy()
 
                 # Display results
                 for rank, (config_name, avg, service_results) in enumerate(config_averages, 1):
@@ -1451,7 +2141,8 @@ class DNSManager(ctk.CTk):
                                anchor="w").pack(anchor="w")
 
                     success_count = len([v for v in service_results.values() if v is not None])
-                    detail_text = f"Avg: {avg:.1f}ms | {success_count}/{len(service_results)} services"
+                    detail_text = (f"Avg: {avg:.1f}ms | {success_count}/{len(service_results)} services | "
+                                   f"{format_integrity(report['resolvers'].get(config_name))}")
                     ctk.CTkLabel(info_frame, text=detail_text, font=ctk.CTkFont(size=10),
                                text_color="gray", anchor="w").pack(anchor="w")
 
@@ -1459,7 +2150,12 @@ class DNSManager(ctk.CTk):
                 status_label.configure(text=f"Benchmark complete! Tested {len(config_averages)} configs against {len(selected)} services",
                                      text_color="#2ecc71")
 
-            threading.Thread(target=run_benchmark, daemon=True).start()
+            if mode_selector.get() == "Time to Service":
+                threading.Thread(target=run_guarded, args=(run_service_benchmark,), daemon=True).start()
+            elif mode_selector.get() == "Integrity":
+                threading.Thread(target=run_guarded, args=(run_integrity_check,), daemon=True).start()
+            else:
+                threading.Thread(target=run_guarded, args=(run_benchmark,), daemon=True).start()
 
         start_btn = ctk.CTkButton(main_frame, text="Start Benchmark", command=start_benchmark,
                                  font=ctk.CTkFont(size=14, weight="bold"), height=40,
@@ -1467,10 +2163,26 @@ class DNSManager(ctk.CTk):
         start_btn.pack(pady=(10, 0))
 
     def test_all_servers(self):
-        """Test all gaming servers"""
-        for name, server in self.gaming_servers.items():
-            self.ping_server(server, name)
-            time.sleep(0.1)  # Small delay to stagger requests
+        """Test all gaming servers with one batched ICMP probe"""
+        from service_probe import probe_services
+
+        servers = dict(self.gaming_servers)
+        for name in servers:
+            self.ping_labels[name].configure(text="Testing...")
+
+        tcp_ports = self.tcp_probe_ports(servers)
+
+        def do_ping_all():
+            try:
+                results = probe_services(servers.values(), tcp_ports=tcp_ports)
+            except Exception as e:
+                for name in servers:
+                    self.ui.configure(self.ping_labels[name], text="Error", text_color="#e74c3c")
+                return
+            for name, server in servers.items():
+                self.show_ping_result(name, results[server])
+
+        threading.Thread(target=do_ping_all, daemon=True).start()
 
     def show_error(self, message: str):
         """Show error message"""
@@ -1491,7 +2203,25 @@ def main():
         print("This application only works on Windows!")
         sys.exit(1)
 
-    app = DNSManager()
+    # Tracing: DNSMANAGER_TRACE=<file> or --trace [<file>]
+    if '--trace' in sys.argv:
+        index = sys.argv.index('--trace')
+        path = sys.argv[index + 1] if index + 1 < len(sys.argv) and not sys.argv[index + 1].startswith('-') else None
+        tracing.enable(path)
+    else:
+        tracing.enable_from_environment()
+    tracing.complete('imports', 'startup', _IMPORT_START, _IMPORT_END)
+
+    # Metrics endpoint: DNSMANAGER_METRICS=<port> or --metrics [<port>]
+    if '--metrics' in sys.argv:
+        index = sys.argv.index('--metrics')
+        port = sys.argv[index + 1] if index + 1 < len(sys.argv) and sys.argv[index + 1].isdigit() else None
+        metrics.enable(int(port) if port else metrics.DEFAULT_PORT)
+    else:
+        metrics.enable_from_environment()
+
+    with tracing.span('DNSManager.__init__', 'startup'):
+        app = DNSManager()
     app.mainloop()
 
 if __name__ == "__main__":
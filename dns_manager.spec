@@ -21,6 +21,7 @@ a = Analysis(
     binaries=[],
     datas=[
         ('logo.svg', '.'),
+        ('services.json', '.'),
         ('version.py', '.'),
         ('updater.py', '.'),
     ],
@@ -0,0 +1,269 @@
+"""
+Minimal DNS client for DNS Manager Pro
+Sends queries straight to a chosen resolver instead of the system resolver
+"""
+
+import random
+import socket
+import struct
+import time
+from typing import Dict, List, Optional, Tuple
+
+# Record types
+TYPE_A = 1
+TYPE_NS = 2
+TYPE_CNAME = 5
+TYPE_SOA = 6
+TYPE_PTR = 12
+TYPE_MX = 15
+TYPE_TXT = 16
+TYPE_AAAA = 28
+
+TYPE_NAMES = {
+    TYPE_A: 'A', TYPE_NS: 'NS', TYPE_CNAME: 'CNAME', TYPE_SOA: 'SOA',
+    TYPE_PTR: 'PTR', TYPE_MX: 'MX', TYPE_TXT: 'TXT', TYPE_AAAA: 'AAAA',
+}
+
+# Response codes
+RCODE_NOERROR = 0
+RCODE_SERVFAIL = 2
+RCODE_NXDOMAIN = 3
+
+RCODE_NAMES = {0: 'NOERROR', 1: 'FORMERR', 2: 'SERVFAIL', 3: 'NXDOMAIN', 4: 'NOTIMP', 5: 'REFUSED'}
+
+FLAG_QR = 0x8000
+FLAG_TC = 0x0200
+FLAG_RD = 0x0100
+FLAG_RA = 0x0080
+
+
+class DNSError(Exception):
+    """Raised when a DNS message cannot be parsed or a query fails"""
+
+
+def encode_name(name: str) -> bytes:
+    """Encode a domain name in DNS wire format"""
+    labels = name.rstrip('.').split('.') if name.strip('.') else []
+    out = bytearray()
+    for label in labels:
+        raw = label.encode('idna')
+        if not raw or len(raw) > 63:
+            raise DNSError(f"Invalid label in name: {name!r}")
+        out.append(len(raw))
+        out += raw
+    out.append(0)
+    return bytes(out)
+
+
+def decode_name(data: bytes, offset: int) -> Tuple[str, int]:
+    """
+    Decode a (possibly compressed) domain name
+    Returns: (name, offset just past the name in the original position)
+    """
+    labels = []
+    end = None
+    jumps = 0
+    while True:
+        if offset >= len(data):
+            raise DNSError("Name runs past end of message")
+        length = data[offset]
+        if length & 0xC0 == 0xC0:
+            if offset + 1 >= len(data):
+                raise DNSError("Truncated compression pointer")
+            if end is None:
+                end = offset + 2
+            offset = ((length & 0x3F) << 8) | data[offset + 1]
+            jumps += 1
+            if jumps > 64:
+                raise DNSError("Compression loop")
+            continue
+        offset += 1
+        if length == 0:
+            break
+        labels.append(data[offset:offset + length].decode('ascii', errors='replace'))
+        offset += length
+    return '.'.join(labels), (end if end is not None else offset)
+
+
+def build_query(name: str, qtype: int = TYPE_A, query_id: Optional[int] = None) -> bytes:
+    """Build a recursive query message"""
+    if query_id is None:
+        query_id = random.getrandbits(16)
+    header = struct.pack('!HHHHHH', query_id, FLAG_RD, 1, 0, 0, 0)
+    return header + encode_name(name) + struct.pack('!HH', qtype, 1)
+
+
+def _decode_rdata(data: bytes, rtype: int, offset: int, rdlength: int):
+    rdata = data[offset:offset + rdlength]
+    if rtype == TYPE_A and rdlength == 4:
+        return socket.inet_ntop(socket.AF_INET, rdata)
+    if rtype == TYPE_AAAA and rdlength == 16:
+        return socket.inet_ntop(socket.AF_INET6, rdata)
+    if rtype in (TYPE_CNAME, TYPE_NS, TYPE_PTR):
+        return decode_name(data, offset)[0]
+    if rtype == TYPE_MX:
+        return f"{struct.unpack('!H', rdata[:2])[0]} {decode_name(data, offset + 2)[0]}"
+    return rdata.hex()
+
+
+def parse_response(data: bytes) -> Dict:
+    """
+    Parse a DNS response message
+    Returns: dict with id, rcode, truncated flag, question and answer records
+    """
+    if len(data) < 12:
+        raise DNSError("Message shorter than header")
+    query_id, flags, qdcount, ancount, _, _ = struct.unpack('!HHHHHH', data[:12])
+
+    offset = 12
+    question = None
+    for _ in range(qdcount):
+        qname, offset = decode_name(data, offset)
+        qtype, _ = struct.unpack('!HH', data[offset:offset + 4])
+        offset += 4
+        if question is None:
+            question = {'name': qname, 'type': qtype}
+
+    answers = []
+    for _ in range(ancount):
+        rname, offset = decode_name(data, offset)
+        if offset + 10 > len(data):
+            raise DNSError("Truncated resource record")
+        rtype, _, ttl, rdlength = struct.unpack('!HHIH', data[offset:offset + 10])
+        offset += 10
+        if offset + rdlength > len(data):
+            raise DNSError("Truncated record data")
+        answers.append({
+            'name': rname,
+            'type': rtype,
+            'ttl': ttl,
+            'data': _decode_rdata(data, rtype, offset, rdlength),
+        })
+        offset += rdlength
+
+    return {
+        'id': query_id,
+        'rcode': flags & 0x000F,
+        'truncated': bool(flags & FLAG_TC),
+        'question': question,
+        'answers': answers,
+    }
+
+
+def split_server(server: str, port: int = 53) -> Tuple[str, int]:
+    """'1.1.1.1', '::1', '127.0.0.1:5353' or '[::1]:5353' -> (address, port)"""
+    if server.startswith('['):
+        address, _, rest = server[1:].partition(']')
+        return address, int(rest[1:]) if rest.startswith(':') else port
+    if server.count(':') == 1:
+        address, _, server_port = server.partition(':')
+        return address, int(server_port)
+    return server, port
+
+
+def _finish(response: Dict, latency: float, via: str) -> Dict:
+    response['latency'] = latency
+    response['via'] = via
+    response['addresses'] = [a['data'] for a in response['answers']
+                             if a['type'] in (TYPE_A, TYPE_AAAA)]
+    return response
+
+
+def _recv_exact(sock: socket.socket, count: int) -> bytes:
+    data = b''
+    while len(data) < count:
+        chunk = sock.recv(count - len(data))
+        if not chunk:
+            raise DNSError("Connection closed mid-message")
+        data += chunk
+    return data
+
+
+def resolve_tcp(name: str, server: str, qtype: int = TYPE_A, port: int = 53,
+                timeout: float = 2.0) -> Dict:
+    """
+    Resolve a name over TCP (used when a UDP answer comes back truncated)
+    Returns / Raises: as resolve()
+    """
+    server, port = split_server(server, port)
+    query_id = random.getrandbits(16)
+    query = build_query(name, qtype, query_id)
+
+    start = time.perf_counter()
+    try:
+        with socket.create_connection((server, port), timeout=timeout) as sock:
+            sock.sendall(struct.pack('!H', len(query)) + query)
+            length = struct.unpack('!H', _recv_exact(sock, 2))[0]
+            data = _recv_exact(sock, length)
+    except socket.timeout:
+        raise DNSError(f"Timeout querying {server} for {name} over TCP")
+    except OSError as e:
+        raise DNSError(f"Error querying {server} for {name} over TCP: {e}")
+    latency = (time.perf_counter() - start) * 1000
+
+    response = parse_response(data)
+    if response['id'] != query_id:
+        raise DNSError(f"Mismatched reply from {server} for {name}")
+    return _finish(response, latency, 'tcp')
+
+
+def resolve(name: str, server: str, qtype: int = TYPE_A, port: int = 53,
+            timeout: float = 2.0, tcp_fallback: bool = True) -> Dict:
+    """
+    Resolve a name through a specific resolver over UDP
+    server may carry its own port ('127.0.0.1:5353'), which overrides `port`.
+    A truncated answer is fetched again over TCP unless tcp_fallback is off.
+    Returns: parsed response plus 'addresses' (A/AAAA answers), 'latency' in ms
+    (both attempts when retried) and 'via' ('udp' or 'tcp')
+    Raises: DNSError on timeout or malformed reply
+    """
+    server, port = split_server(server, port)
+    query_id = random.getrandbits(16)
+    query = build_query(name, qtype, query_id)
+    family = socket.AF_INET6 if ':' in server else socket.AF_INET
+
+    with socket.socket(family, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(timeout)
+        start = time.perf_counter()
+        sock.sendto(query, (server, port))
+        deadline = start + timeout
+        while True:
+            try:
+                data, _ = sock.recvfrom(4096)
+            except socket.timeout:
+                raise DNSError(f"Timeout querying {server} for {name}")
+            except OSError as e:
+                raise DNSError(f"Error querying {server} for {name}: {e}")
+            latency = (time.perf_counter() - start) * 1000
+            if len(data) >= 2 and struct.unpack('!H', data[:2])[0] == query_id:
+                break
+            # Stray reply for another query; keep waiting for ours
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                raise DNSError(f"Timeout querying {server} for {name}")
+            sock.settimeout(remaining)
+
+    response = parse_response(data)
+    if response['truncated'] and tcp_fallback:
+        response = resolve_tcp(name, server, qtype=qtype, port=port, timeout=timeout)
+        response['latency'] += latency
+        return response
+    return _finish(response, latency, 'udp')
+
+
+def resolve_with_config(name: str, dns_config: Dict[str, str], qtype: int = TYPE_A,
+                        port: int = 53, timeout: float = 2.0) -> Dict:
+    """
+    Resolve through a saved config, falling back to the secondary server on failure
+    Returns: response from the first server that answered (with 'server' set)
+    """
+    servers: List[str] = [s for s in (dns_config.get('primary'), dns_config.get('secondary')) if s]
+    last_error = None
+    for server in servers:
+        try:
+            response = resolve(name, server, qtype=qtype, port=port, timeout=timeout)
+            response['server'] = server
+            return response
+        except DNSError as e:
+            last_error = e
+    raise last_error or DNSError("No DNS servers configured")
@@ -0,0 +1,416 @@
+"""
+Local DNS stub server for DNS Manager Pro tests and benchmark demos
+Answers A/AAAA queries from a fixed table on a loopback address, with
+scriptable latency, loss, error responses and truncation per zone
+
+Usage (demo: stand-ins for the catalog presets):
+    python dns_stub.py [profiles.json] [--benchmark]
+"""
+
+import asyncio
+import ipaddress
+import json
+import math
+import random
+import socket
+import struct
+import sys
+import threading
+from typing import Callable, Dict, List, Optional, Union
+
+from dns_query import (decode_name, TYPE_A, TYPE_AAAA, RCODE_NAMES,
+                       RCODE_NOERROR, RCODE_NXDOMAIN, FLAG_QR, FLAG_RA, FLAG_RD, FLAG_TC)
+
+# Largest UDP reply without EDNS; bigger answers are truncated
+MAX_UDP_SIZE = 512
+
+RCODES = {name: code for code, name in RCODE_NAMES.items()}
+
+# Behaviour keys a zone may set (see DNSStubServer)
+ZONE_KEYS = ('latency', 'loss', 'rcode', 'rcode_rate', 'ttl', 'truncate', 'addresses')
+
+
+def build_response(query: bytes, rcode: int, answers: List[bytes],
+                   truncated: bool = False) -> bytes:
+    """Build a response echoing the query's ID and question section"""
+    query_id, flags = struct.unpack('!HH', query[:4])
+    _, offset = decode_name(query, 12)
+    question = query[12:offset + 4]
+    flags = FLAG_QR | FLAG_RA | (flags & FLAG_RD) | (FLAG_TC if truncated else 0) | rcode
+    header = struct.pack('!HHHHHH', query_id, flags, 1, len(answers), 0, 0)
+    return header + question + b''.join(answers)
+
+
+def build_record(rtype: int, address: str, ttl: int) -> bytes:
+    """Build an answer record pointing back at the question name"""
+    rdata = ipaddress.ip_address(address).packed
+    # 0xC00C is a compression pointer to the question name at offset 12
+    return struct.pack('!HHHIH', 0xC00C, rtype, 1, ttl, len(rdata)) + rdata
+
+
+def sample_latency(spec, rng: random.Random, name: str = '') -> float:
+    """
+    Draw one delay in seconds from a latency spec
+    A spec is a number, a callable taking the query name, or a dict:
+        {'dist': 'fixed', 'value': s}
+        {'dist': 'uniform', 'low': s, 'high': s}
+        {'dist': 'normal', 'mean': s, 'stdev': s}
+        {'dist': 'lognormal', 'median': s, 'sigma': x}
+        {'dist': 'exponential', 'mean': s}
+    plus optional 'spike_rate' and 'spike' (extra seconds) for a slow tail.
+    """
+    if not spec:
+        return 0.0
+    if callable(spec):
+        return spec(name)
+    if isinstance(spec, (int, float)):
+        return float(spec)
+
+    dist = spec.get('dist', 'fixed')
+    if dist == 'fixed':
+        value = spec.get('value', 0.0)
+    elif dist == 'uniform':
+        value = rng.uniform(spec['low'], spec['high'])
+    elif dist == 'normal':
+        value = rng.gauss(spec['mean'], spec.get('stdev', 0.0))
+    elif dist == 'lognormal':
+        value = rng.lognormvariate(math.log(spec['median']), spec.get('sigma', 0.5))
+    elif dist == 'exponential':
+        value = rng.expovariate(1 / spec['mean'])
+    else:
+        raise ValueError(f"Unknown latency distribution {dist!r}")
+
+    if spec.get('spike_rate') and rng.random() < spec['spike_rate']:
+        value += spec.get('spike', 0.0)
+    return max(0.0, value)
+
+
+def _rcode(value) -> int:
+    return RCODES[value.upper()] if isinstance(value, str) else int(value)
+
+
+class _StubProtocol(asyncio.DatagramProtocol):
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        asyncio.get_running_loop().create_task(self.server._answer_udp(self.transport, data, addr))
+
+
+class DNSStubServer:
+    """
+    UDP and TCP DNS server on a loopback address that answers from a record table
+
+    records maps lowercase names to lists of IPv4/IPv6 addresses; names that
+    are not in the table get NXDOMAIN. Every reply is held back by `delay`
+    seconds to simulate resolver latency; `delay` may also be a callable
+    taking the query name or a distribution (see sample_latency). A fraction
+    `loss` of UDP queries is dropped unanswered (seed the generator for
+    repeatable runs).
+
+    zones overrides that behaviour below a name: the most specific matching
+    zone wins ('.' matches everything), and a zone may set
+        latency, loss, ttl     as above
+        rcode, rcode_rate      answer e.g. 'SERVFAIL' to that fraction of queries
+        truncate               reply over UDP with TC set and no answers
+        addresses              answer any name in the zone that has no record
+    UDP replies over 512 bytes are truncated too; TCP always gets the full
+    answer, on the same port.
+    """
+
+    def __init__(self, records: Optional[Dict[str, List[str]]] = None,
+                 delay: Union[float, Callable[[str], float], Dict] = 0.0,
+                 host: str = '127.0.0.1', port: int = 0, ttl: int = 300,
+                 loss: float = 0.0, seed: Optional[int] = None,
+                 zones: Optional[Dict[str, Dict]] = None, tcp: bool = True):
+        self.records = {name.lower().rstrip('.'): list(addresses)
+                        for name, addresses in (records or {}).items()}
+        self.delay = delay
+        self.host = host
+        self.port = port
+        self.ttl = ttl
+        self.loss = loss
+        self.zones = {}
+        for zone, behaviour in (zones or {}).items():
+            unknown = set(behaviour) - set(ZONE_KEYS)
+            if unknown:
+                raise ValueError(f"Unknown zone settings for {zone!r}: {sorted(unknown)}")
+            self.zones[zone.lower().strip('.')] = dict(behaviour)
+        self.tcp = tcp
+        self.queries = 0
+        self.tcp_queries = 0
+        self.dropped = 0
+        self.truncated = 0
+        self._random = random.Random(seed)
+        self._loop = None
+        self._thread = None
+        self._transport = None
+        self._tcp_server = None
+        self._error = None
+        self._ready = threading.Event()
+
+    def start(self) -> 'DNSStubServer':
+        """Start serving on a background event loop thread"""
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error:
+            raise self._error
+        return self
+
+    def stop(self):
+        """Stop the server and its event loop"""
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._loop = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def address(self) -> str:
+        """host:port, as accepted by dns_query.resolve"""
+        host = f"[{self.host}]" if ':' in self.host else self.host
+        return f"{host}:{self.port}"
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._bind())
+        except OSError as e:
+            self._error = e
+            self._loop.close()
+            self._loop = None
+            self._ready.set()
+            return
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._transport.close()
+            if self._tcp_server:
+                self._tcp_server.close()
+            # Let delayed replies and open TCP connections finish cancelling
+            pending = asyncio.all_tasks(self._loop)
+            for task in pending:
+                task.cancel()
+            self._loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            self._loop.close()
+
+    async def _bind(self):
+        family = socket.AF_INET6 if ':' in self.host else socket.AF_INET
+        # With an ephemeral port the TCP side may find it taken; pick another
+        attempts = 5 if self.port == 0 else 1
+        for attempt in range(attempts):
+            self._transport, _ = await self._loop.create_datagram_endpoint(
+                lambda: _StubProtocol(self), local_addr=(self.host, self.port), family=family)
+            port = self._transport.get_extra_info('sockname')[1]
+            if not self.tcp:
+                break
+            try:
+                self._tcp_server = await asyncio.start_server(self._serve_tcp, self.host, port,
+                                                              family=family)
+                break
+            except OSError:
+                self._transport.close()
+                if attempt == attempts - 1:
+                    raise
+        self.port = port
+
+    def zone_settings(self, name: str) -> Dict:
+        """Effective behaviour for a name: server defaults, then zones from '.' down"""
+        settings = {'latency': self.delay, 'loss': self.loss, 'ttl': self.ttl,
+                    'rcode': None, 'rcode_rate': 1.0, 'truncate': False, 'addresses': None}
+        if self.zones:
+            labels = name.split('.') if name else []
+            for i in range(len(labels), -1, -1):
+                zone = self.zones.get('.'.join(labels[i:]))
+                if zone:
+                    settings.update(zone)
+        return settings
+
+    def _respond(self, data: bytes, udp: bool) -> Optional[tuple]:
+        """
+        Work out the reply to one query
+        Returns: (response bytes, delay) or None to drop the query
+        """
+        try:
+            qname, offset = decode_name(data, 12)
+            qtype = struct.unpack('!H', data[offset:offset + 2])[0]
+        except Exception:
+            return None
+
+        name = qname.lower().rstrip('.')
+        settings = self.zone_settings(name)
+        if udp and settings['loss'] and self._random.random() < settings['loss']:
+            self.dropped += 1
+            return None
+
+        delay = sample_latency(settings['latency'], self._random, name)
+        if settings['rcode'] is not None and (settings['rcode_rate'] >= 1
+                                              or self._random.random() < settings['rcode_rate']):
+            return build_response(data, _rcode(settings['rcode']), []), delay
+
+        addresses = self.records.get(name, settings['addresses'])
+        if addresses is None:
+            return build_response(data, RCODE_NXDOMAIN, []), delay
+
+        wanted = 4 if qtype == TYPE_A else 6 if qtype == TYPE_AAAA else None
+        answers = [build_record(qtype, address, settings['ttl'])
+                   for address in addresses
+                   if ipaddress.ip_address(address).version == wanted]
+        response = build_response(data, RCODE_NOERROR, answers)
+        if udp and (settings['truncate'] or len(response) > MAX_UDP_SIZE):
+            self.truncated += 1
+            response = build_response(data, RCODE_NOERROR, [], truncated=True)
+        return response, delay
+
+    async def _answer_udp(self, transport, data: bytes, addr):
+        self.queries += 1
+        reply = self._respond(data, udp=True)
+        if reply is None:
+            return
+        response, delay = reply
+        if delay:
+            await asyncio.sleep(delay)
+        transport.sendto(response, addr)
+
+    async def _serve_tcp(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                length = struct.unpack('!H', await reader.readexactly(2))[0]
+                data = await reader.readexactly(length)
+                self.queries += 1
+                self.tcp_queries += 1
+                reply = self._respond(data, udp=False)
+                if reply is None:
+                    break
+                response, delay = reply
+                if delay:
+                    await asyncio.sleep(delay)
+                writer.write(struct.pack('!H', len(response)) + response)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+class StubFleet:
+    """
+    One stub server per resolver address of a set of DNS presets
+
+    Each primary and secondary gets its own server on its own loopback port,
+    so the fleet's `configs` can be benchmarked in place of the real presets.
+    profiles maps preset names to behaviour: the zone keys of DNSStubServer
+    (applied to every name) plus an optional 'zones' dict. Names without a
+    record resolve to 127.0.0.1 unless the profile sets 'addresses'.
+    """
+
+    def __init__(self, presets: Dict[str, Dict[str, str]],
+                 profiles: Optional[Dict[str, Dict]] = None,
+                 records: Optional[Dict[str, List[str]]] = None,
+                 host: str = '127.0.0.1', seed: Optional[int] = None):
+        self.presets = presets
+        self.profiles = profiles or {}
+        self.records = records
+        self.host = host
+        self.seed = seed
+        self.servers = {}       # (preset name, 'primary' | 'secondary') -> DNSStubServer
+        self.configs = {}       # preset name -> {'primary', 'secondary'} as host:port
+
+    def start(self) -> 'StubFleet':
+        try:
+            for index, (name, preset) in enumerate(self.presets.items()):
+                profile = dict(self.profiles.get(name, {}))
+                zones = {'.': {'addresses': ['127.0.0.1']}}
+                zones['.'].update({key: profile.pop(key) for key in list(profile)
+                                   if key in ZONE_KEYS})
+                for zone, behaviour in profile.pop('zones', {}).items():
+                    zones.setdefault(zone, {}).update(behaviour)
+                if profile:
+                    raise ValueError(f"Unknown profile settings for {name!r}: {sorted(profile)}")
+
+                config = {'primary': '', 'secondary': ''}
+                for offset, role in enumerate(('primary', 'secondary')):
+                    if not preset.get(role):
+                        continue
+                    seed = None if self.seed is None else self.seed + 2 * index + offset
+                    server = DNSStubServer(self.records, host=self.host, seed=seed,
+                                           zones=zones).start()
+                    self.servers[(name, role)] = server
+                    config[role] = server.address
+                self.configs[name] = config
+        except BaseException:
+            self.stop()
+            raise
+        return self
+
+    def stop(self):
+        for server in self.servers.values():
+            server.stop()
+        self.servers.clear()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main(argv: List[str]) -> int:
+    from catalog import ServiceCatalog
+
+    profiles = {}
+    paths = [arg for arg in argv if not arg.startswith('--')]
+    if paths:
+        with open(paths[0], 'r', encoding='utf-8') as f:
+            profiles = json.load(f)
+
+    presets = {name: {'primary': preset['primary'], 'secondary': preset['secondary']}
+               for name, preset in ServiceCatalog().presets.items()}
+    records = None
+    if '--benchmark' in argv:
+        # Only the targets exist, so the integrity canaries get NXDOMAIN
+        targets = {f"Service {i}": f"service{i}.test" for i in range(10)}
+        records = {host: [f'10.0.{i}.1'] for i, host in enumerate(targets.values())}
+        profiles = {name: {'addresses': None, **profiles.get(name, {})} for name in presets}
+    with StubFleet(presets, profiles, records, seed=1) as fleet:
+        print(f"{'Preset':24} {'Primary':22} Secondary")
+        for name, config in fleet.configs.items():
+            print(f"{name:24} {config['primary']:22} {config['secondary']}")
+
+        if '--benchmark' in argv:
+            from benchmark import run_time_to_service_benchmark
+            ranking = run_time_to_service_benchmark(fleet.configs, targets,
+                                                    connect=lambda address, port: 0.0,
+                                                    timeout=1.0)
+            from integrity import attach_integrity, check_integrity
+            attach_integrity(ranking, check_integrity(fleet.configs, targets.values(), timeout=1.0))
+            print(f"\n{'Preset':24} {'Lookup ms':>10} {'Answered':>9}  Integrity")
+            for entry in ranking:
+                lookup = f"{entry['avg_lookup']:.1f}" if entry['avg_lookup'] is not None else '-'
+                integrity = (f"{entry['integrity']:.0f}% {entry['integrity_verdict']}"
+                             if entry['integrity'] is not None else '-')
+                print(f"{entry['config']:24} {lookup:>10} {entry['success']:>6}/{len(targets)}  {integrity}")
+            return 0
+
+        print("\nServing; press Ctrl+C to stop")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,376 @@
+"""
+Resolver health monitor for DNS Manager Pro
+Probes the active DNS servers in the background, keeps rolling latency and
+loss windows, raises alerts when an SLO is breached and can fail over to the
+healthiest saved config
+"""
+
+import json
+import math
+import os
+import random
+import threading
+import time
+from array import array
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+import metrics
+from dns_query import DNSError, RCODE_NOERROR, RCODE_NXDOMAIN, resolve
+
+SETTINGS_FILE = 'monitor_settings.json'
+ALERT_LOG = 'dns_health.log'
+
+DEFAULT_SETTINGS = {
+    'enabled': False,
+    'interval': 30.0,           # seconds between probe rounds
+    'jitter': 0.2,              # +/- fraction of the interval
+    'window': 60,               # probes kept per server
+    'min_samples': 10,          # no verdict on fewer probes
+    'p95_ms': 250.0,            # latency SLO
+    'loss': 0.10,               # loss SLO (fraction of probes)
+    'failover': False,
+    'failover_cooldown': 600.0,  # seconds before failing over again
+    'probe_name': 'www.microsoft.com',
+    'timeout': 2.0,
+}
+
+MAX_ALERTS = 200
+
+# The alert log is moved to dns_health.log.1 (replacing the previous one)
+# once it grows past this size
+MAX_LOG_BYTES = 256 * 1024
+
+# A breached SLO recovers only below this fraction of its limit, so a value
+# hovering at the limit does not alert on every probe
+RECOVERY_RATIO = 0.8
+
+
+def load_settings(path: str = SETTINGS_FILE) -> Dict:
+    """DEFAULT_SETTINGS overlaid with whatever the settings file sets"""
+    settings = dict(DEFAULT_SETTINGS)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            stored = json.load(f)
+    except (OSError, ValueError):
+        return settings
+    settings.update({key: value for key, value in stored.items() if key in DEFAULT_SETTINGS})
+    return settings
+
+
+def save_settings(settings: Dict, path: str = SETTINGS_FILE):
+    try:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(settings, f, indent=2)
+    except OSError as e:
+        print(f"Error saving monitor settings: {e}")
+
+
+class RingBuffer:
+    """Fixed number of floats; the oldest value is overwritten when full"""
+
+    __slots__ = ('_values', '_next', '_count')
+
+    def __init__(self, size: int):
+        if size < 1:
+            raise ValueError("Ring buffer size must be at least 1")
+        self._values = array('d', bytes(8 * size))
+        self._next = 0
+        self._count = 0
+
+    def append(self, value: float):
+        self._values[self._next] = value
+        self._next = (self._next + 1) % len(self._values)
+        self._count = min(self._count + 1, len(self._values))
+
+    def values(self) -> List[float]:
+        """Oldest first"""
+        if self._count < len(self._values):
+            return list(self._values[:self._count])
+        return list(self._values[self._next:]) + list(self._values[:self._next])
+
+    def clear(self):
+        self._next = self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def size(self) -> int:
+        return len(self._values)
+
+
+def _percentile(sorted_values: List[float], p: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(p * len(sorted_values)))]
+
+
+class ResolverHealth:
+    """Rolling window of probe outcomes for one server; NaN marks a lost probe"""
+
+    def __init__(self, server: str, window: int):
+        self.server = server
+        self.samples = RingBuffer(window)
+        self.probes = 0
+        self.lost = 0
+        self.breached = set()     # SLO names currently breached
+        self.last_error = None
+
+    def record(self, latency: Optional[float], error: Optional[str] = None):
+        self.probes += 1
+        if latency is None:
+            self.lost += 1
+            self.last_error = error
+            self.samples.append(math.nan)
+        else:
+            self.samples.append(latency)
+
+    def stats(self) -> Dict:
+        """Returns: {'server', 'samples', 'loss', 'p50', 'p95', 'last', 'probes', 'lost', 'last_error'}"""
+        values = self.samples.values()
+        answered = sorted(v for v in values if not math.isnan(v))
+        return {
+            'server': self.server,
+            'samples': len(values),
+            'loss': (len(values) - len(answered)) / len(values) if values else None,
+            'p50': _percentile(answered, 0.5),
+            'p95': _percentile(answered, 0.95),
+            'last': None if not values or math.isnan(values[-1]) else values[-1],
+            'probes': self.probes,
+            'lost': self.lost,
+            'last_error': self.last_error,
+        }
+
+
+def probe_dns(server: str, name: str, timeout: float) -> Optional[float]:
+    """One lookup; latency in ms, or None when the server gave no usable answer"""
+    try:
+        response = resolve(name, server, timeout=timeout)
+    except (DNSError, OSError, ValueError):
+        response = None
+    latency = response['latency'] if response and response['rcode'] in (RCODE_NOERROR, RCODE_NXDOMAIN) else None
+    metrics.observe_probe('dns', server, name, latency)
+    return latency
+
+
+class HealthMonitor:
+    """
+    Probes the active config's servers every `interval` seconds (+/- jitter)
+
+    The app tells the monitor what is active with set_active(); candidates()
+    returns the saved configs to fail over to. Callbacks run on the monitor
+    thread: on_sample(stats by role), on_alert(alert) and on_failover(name,
+    config), which should apply the config and return True on success.
+    """
+
+    def __init__(self, settings: Optional[Dict] = None,
+                 candidates: Optional[Callable[[], Dict[str, Dict[str, str]]]] = None,
+                 on_sample: Optional[Callable[[Dict[str, Dict]], None]] = None,
+                 on_alert: Optional[Callable[[Dict], None]] = None,
+                 on_failover: Optional[Callable[[str, Dict[str, str]], bool]] = None,
+                 probe: Optional[Callable[[str], Optional[float]]] = None,
+                 log_file: Optional[str] = ALERT_LOG,
+                 clock: Callable[[], float] = time.time,
+                 rng: Optional[random.Random] = None):
+        self.settings = dict(DEFAULT_SETTINGS, **(settings or {}))
+        self.candidates = candidates or (lambda: {})
+        self.on_sample = on_sample
+        self.on_alert = on_alert
+        self.on_failover = on_failover
+        self.probe = probe or (lambda server: probe_dns(server, self.settings['probe_name'],
+                                                        self.settings['timeout']))
+        self.log_file = log_file
+        self.clock = clock
+        self.rng = rng or random.Random()
+        self.alerts = deque(maxlen=MAX_ALERTS)
+        self.active_name = None
+        self.active = None            # {'primary', 'secondary'}
+        self.health = {}              # role -> ResolverHealth
+        self.last_failover = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # Active config
+
+    def set_active(self, name: Optional[str], config: Optional[Dict[str, str]]):
+        """Watch these servers; windows restart only when the servers change"""
+        with self._lock:
+            self.active_name = name
+            servers = {role: (config or {}).get(role) for role in ('primary', 'secondary')}
+            if servers == {role: (self.active or {}).get(role) for role in servers}:
+                return
+            self.active = dict(config) if config else None
+            self.health = {role: ResolverHealth(server, self.settings['window'])
+                           for role, server in servers.items() if server}
+
+    # Scheduling
+
+    def next_delay(self) -> float:
+        jitter = self.settings['jitter']
+        return self.settings['interval'] * (1 + self.rng.uniform(-jitter, jitter))
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='health monitor', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.settings['timeout'] * 2 + 1)
+            self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def _run(self):
+        # First round soon after start, at a random point so several
+        # instances never probe in lockstep
+        delay = self.rng.uniform(0, min(5.0, self.settings['interval']))
+        while not self._stop.wait(delay):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Health monitor error: {e}")
+            delay = self.next_delay()
+
+    # One round
+
+    def run_once(self) -> Dict[str, Dict]:
+        """Probe every active server once, check the SLOs, maybe fail over"""
+        with self._lock:
+            health = dict(self.health)
+            name = self.active_name
+        if not health:
+            return {}
+
+        for role, resolver in health.items():
+            latency = self.probe(resolver.server)
+            resolver.record(latency, None if latency is not None else "No answer")
+
+        stats = {role: resolver.stats() for role, resolver in health.items()}
+        if self.on_sample:
+            self.on_sample(stats)
+
+        for role, resolver in health.items():
+            self._evaluate(name, role, resolver, stats[role])
+
+        if self.settings['failover'] and all(r.breached for r in health.values()):
+            self.fail_over()
+        return stats
+
+    def _evaluate(self, name: Optional[str], role: str, resolver: ResolverHealth, stats: Dict):
+        if stats['samples'] < self.settings['min_samples']:
+            return
+        checks = {'loss': (stats['loss'], self.settings['loss']),
+                  'latency': (stats['p95'], self.settings['p95_ms'])}
+        for slo, (value, threshold) in checks.items():
+            if slo not in resolver.breached:
+                if value is not None and value > threshold:
+                    resolver.breached.add(slo)
+                    self._alert('breach', slo, name, role, resolver.server, value, threshold)
+            elif value is not None and value <= threshold * RECOVERY_RATIO:
+                resolver.breached.discard(slo)
+                self._alert('recovered', slo, name, role, resolver.server, value, threshold)
+
+    def _alert(self, kind: str, slo: str, name: Optional[str], role: str, server: str,
+               value: Optional[float], threshold: float):
+        if slo == 'loss':
+            measured, limit = f"{value * 100:.0f}% loss", f"{threshold * 100:.0f}%"
+        else:
+            measured = f"p95 {value:.0f} ms" if value is not None else "no answers"
+            limit = f"{threshold:.0f} ms"
+        label = f"{name or 'Current DNS'} {role} ({server})"
+        if kind == 'breach':
+            message = f"{label}: {measured} is over the {limit} limit"
+        else:
+            message = f"{label}: back within the {limit} limit ({measured})"
+        self._emit({'time': self.clock(), 'kind': kind, 'slo': slo, 'config': name, 'role': role,
+                    'server': server, 'value': value, 'threshold': threshold, 'message': message})
+
+    def _emit(self, alert: Dict):
+        self.alerts.append(alert)
+        stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(alert['time']))
+        line = f"{stamp} {alert['kind'].upper():<10} {alert['message']}"
+        print(f"DNS health: {line}")
+        if self.log_file:
+            try:
+                if os.path.getsize(self.log_file) > MAX_LOG_BYTES:
+                    os.replace(self.log_file, self.log_file + '.1')
+            except OSError:
+                pass
+            try:
+                with open(self.log_file, 'a', encoding='utf-8') as f:
+                    f.write(line + '\n')
+            except OSError:
+                pass
+        if self.on_alert:
+            self.on_alert(alert)
+
+    # Failover
+
+    def rank_candidates(self, probes: int = 3) -> List[Dict]:
+        """
+        Probe every other saved config's primary a few times
+        Returns: [{'config', 'servers', 'latency' (median ms), 'answered'}],
+        healthiest first; configs that never answered are left out
+        """
+        current = {role: (self.active or {}).get(role) for role in ('primary', 'secondary')}
+        ranked = []
+        for name, config in self.candidates().items():
+            if not config.get('primary') or \
+                    {role: config.get(role) for role in current} == current:
+                continue
+            latencies = sorted(v for v in (self.probe(config['primary']) for _ in range(probes))
+                               if v is not None)
+            if latencies:
+                ranked.append({'config': name, 'servers': config, 'answered': len(latencies),
+                               'latency': latencies[len(latencies) // 2]})
+        ranked.sort(key=lambda c: (-c['answered'], c['latency']))
+        return [c for c in ranked if c['latency'] <= self.settings['p95_ms']]
+
+    def fail_over(self) -> Optional[str]:
+        """Switch to the healthiest other saved config; returns its name"""
+        now = self.clock()
+        if self.last_failover is not None and now - self.last_failover < self.settings['failover_cooldown']:
+            return None
+        self.last_failover = now
+        previous = self.active_name or 'Current DNS'
+        for candidate in self.rank_candidates():
+            if self.on_failover and not self.on_failover(candidate['config'], candidate['servers']):
+                continue
+            self.set_active(candidate['config'], candidate['servers'])
+            self._emit({'time': now, 'kind': 'failover', 'slo': None, 'config': candidate['config'],
+                        'role': None, 'server': candidate['servers']['primary'], 'value': candidate['latency'],
+                        'threshold': None,
+                        'message': f"Switched from {previous} to {candidate['config']} "
+                                   f"({candidate['latency']:.0f} ms)"})
+            return candidate['config']
+        self._emit({'time': now, 'kind': 'failover', 'slo': None, 'config': None, 'role': None,
+                    'server': None, 'value': None, 'threshold': None,
+                    'message': f"{previous} is unhealthy and no healthy saved config was found"})
+        return None
+
+    def status(self) -> Dict:
+        """Snapshot for display: {'config', 'servers': {role: stats + 'breached'}}"""
+        with self._lock:
+            health = dict(self.health)
+            name = self.active_name
+        return {'config': name,
+                'servers': {role: dict(r.stats(), breached=sorted(r.breached)) for role, r in health.items()}}
+
+
+def format_status(stats: Dict[str, Dict]) -> str:
+    """'Primary 23 ms p95, 0% loss | Secondary ...' for the main window"""
+    parts = []
+    for role, s in stats.items():
+        if not s['samples']:
+            continue
+        p95 = f"{s['p95']:.0f} ms p95" if s['p95'] is not None else "no answers"
+        parts.append(f"{role.capitalize()} {p95}, {s['loss'] * 100:.0f}% loss")
+    return ' | '.join(parts) or "Health: waiting for probes"
@@ -0,0 +1,285 @@
+"""
+In-process ICMP echo prober for DNS Manager Pro
+Pings many hosts from one thread over a single socket per address family,
+falling back to the system ping command when ICMP sockets are unavailable
+"""
+
+import random
+import select
+import socket
+import struct
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+from command_runner import CommandRunner, default_runner
+from ping_parser import parse_ping_output
+
+IPPROTO_ICMPV6 = getattr(socket, 'IPPROTO_ICMPV6', 58)
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+ICMPV6_ECHO_REQUEST = 128
+ICMPV6_ECHO_REPLY = 129
+
+PAYLOAD = b'DNSManagerPro'.ljust(32, b'\x00')
+RECEIVE_BUFFER = 1024 * 1024
+
+
+def checksum(data: bytes) -> int:
+    """Internet checksum (RFC 1071)"""
+    if len(data) % 2:
+        data += b'\x00'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def address_family(address: str) -> int:
+    return socket.AF_INET6 if ':' in address else socket.AF_INET
+
+
+def summarize(replies: List[float], sent: int) -> Dict:
+    """Build a result dict in the same shape as ping_parser.parse_ping_output"""
+    received = len(replies)
+    return {
+        'replies': replies,
+        'sent': sent,
+        'received': received,
+        'loss': round((sent - received) / sent * 100, 1) if sent else None,
+        'min': min(replies) if replies else None,
+        'avg': sum(replies) / received if replies else None,
+        'max': max(replies) if replies else None,
+    }
+
+
+def ping_subprocess(address: str, count: int = 4, timeout: float = 10,
+                    runner: Optional[CommandRunner] = None) -> Dict:
+    """
+    Ping an address with the system ping command
+    Returns: parsed ping statistics (see ping_parser.parse_ping_output)
+    """
+    flag = '-6' if address_family(address) == socket.AF_INET6 else '-4'
+    if sys.platform == 'win32':
+        command = ['ping', '-n', str(count), flag, address]
+    else:
+        command = ['ping', '-c', str(count), flag, address]
+
+    result = (runner or default_runner()).run(command, timeout=timeout, label='ping')
+    if result.error or result.timed_out:
+        return summarize([], count)
+
+    stats = parse_ping_output(result.stdout)
+    if stats['sent'] is None:
+        stats.update(summarize(stats['replies'], count))
+    return stats
+
+
+class ICMPProber:
+    """
+    Sends ICMP echo requests to many targets over one socket per family
+
+    Socket choice per family, first that works:
+      1. unprivileged datagram ICMP socket (Linux with ping_group_range, macOS)
+      2. raw ICMP socket (root / Administrator)
+      3. the system ping command, run in a small thread pool
+
+    Replies are matched to targets by sequence number, so hundreds of hosts
+    can share one socket and one thread.
+    """
+
+    def __init__(self, timeout: float = 1.0, interval: float = 0.2):
+        self.timeout = timeout
+        self.interval = interval
+        self._ident = random.getrandbits(16)
+        self._seq = random.getrandbits(16)
+        self._sockets = {}
+        self.modes = {}
+
+    def close(self):
+        """Close any open ICMP sockets"""
+        for sock in self._sockets.values():
+            if sock:
+                sock.close()
+        self._sockets.clear()
+        self.modes.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _socket(self, family: int) -> Optional[socket.socket]:
+        if family in self._sockets:
+            return self._sockets[family]
+
+        proto = socket.IPPROTO_ICMP if family == socket.AF_INET else IPPROTO_ICMPV6
+        sock, mode = None, 'subprocess'
+        kinds = [(socket.SOCK_RAW, 'raw')]
+        if sys.platform != 'win32':
+            kinds.insert(0, (socket.SOCK_DGRAM, 'dgram'))
+        for kind, name in kinds:
+            try:
+                sock = socket.socket(family, kind, proto)
+            except (OSError, AttributeError):
+                continue
+            try:
+                if sys.platform == 'win32':
+                    # Windows raw sockets must be bound before they can receive
+                    sock.bind(('0.0.0.0', 0) if family == socket.AF_INET else ('::', 0))
+                sock.setblocking(False)
+            except OSError:
+                sock.close()
+                sock = None
+                continue
+            try:
+                # Room for a burst of replies from hundreds of targets
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER)
+            except OSError:
+                pass
+            mode = name
+            break
+
+        self._sockets[family] = sock
+        self.modes[family] = mode
+        return sock
+
+    def _next_seq(self) -> int:
+        self._seq = (self._seq + 1) & 0xFFFF
+        return self._seq
+
+    def _packet(self, family: int, seq: int) -> bytes:
+        if family == socket.AF_INET:
+            header = struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, 0, self._ident, seq)
+            csum = checksum(header + PAYLOAD)
+            return struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, csum, self._ident, seq) + PAYLOAD
+        # The kernel fills in the ICMPv6 checksum (it needs the IPv6 pseudo-header)
+        return struct.pack('!BBHHH', ICMPV6_ECHO_REQUEST, 0, 0, self._ident, seq) + PAYLOAD
+
+    def _parse_reply(self, family: int, data: bytes):
+        """Returns: (ident, seq) for an echo reply, else None"""
+        if family == socket.AF_INET:
+            if data and data[0] >> 4 == 4:
+                # Raw sockets (and macOS datagram sockets) include the IP header
+                data = data[(data[0] & 0x0F) * 4:]
+            reply_type = ICMP_ECHO_REPLY
+        else:
+            reply_type = ICMPV6_ECHO_REPLY
+        if len(data) < 8:
+            return None
+        icmp_type, _, _, ident, seq = struct.unpack('!BBHHH', data[:8])
+        if icmp_type != reply_type:
+            return None
+        return ident, seq
+
+    def ping_many(self, addresses: Iterable[str], count: int = 4) -> Dict[str, Dict]:
+        """
+        Ping every address `count` times
+        Returns: dict of address -> ping statistics
+        """
+        addresses = list(dict.fromkeys(addresses))
+        replies = {address: [] for address in addresses}
+        sent = {address: 0 for address in addresses}
+
+        socket_targets = []
+        fallback_targets = []
+        for address in addresses:
+            if self._socket(address_family(address)):
+                socket_targets.append(address)
+            else:
+                fallback_targets.append(address)
+
+        results = {}
+        executor = None
+        fallback_futures = {}
+        if fallback_targets:
+            executor = ThreadPoolExecutor(max_workers=min(16, len(fallback_targets)))
+            fallback_futures = {address: executor.submit(ping_subprocess, address, count,
+                                                         count * (self.timeout + self.interval) + 5)
+                                for address in fallback_targets}
+
+        try:
+            if socket_targets:
+                self._run_socket_pings(socket_targets, count, replies, sent)
+            for address in socket_targets:
+                results[address] = summarize(replies[address], sent[address])
+            for address, future in fallback_futures.items():
+                results[address] = future.result()
+        finally:
+            if executor:
+                executor.shutdown(wait=False)
+
+        return {address: results[address] for address in addresses}
+
+    def _run_socket_pings(self, targets: List[str], count: int,
+                          replies: Dict[str, List[float]], sent: Dict[str, int]):
+        pending = {}        # (family, seq) -> (address, sent_at)
+        expiry = deque()    # (sent_at, key) in send order
+        sockets = {family: self._sockets[family]
+                   for family in {address_family(a) for a in targets}}
+        family_of = {sock: family for family, sock in sockets.items()}
+
+        rounds = 0
+        next_round = time.perf_counter()
+        while True:
+            now = time.perf_counter()
+            if rounds < count and now >= next_round:
+                for address in targets:
+                    family = address_family(address)
+                    seq = self._next_seq()
+                    sent[address] += 1
+                    try:
+                        sockets[family].sendto(self._packet(family, seq), (address, 0))
+                    except OSError:
+                        continue
+                    sent_at = time.perf_counter()
+                    pending[(family, seq)] = (address, sent_at)
+                    expiry.append((sent_at, (family, seq)))
+                rounds += 1
+                next_round = now + self.interval
+
+            while expiry and now - expiry[0][0] > self.timeout:
+                pending.pop(expiry.popleft()[1], None)
+
+            if rounds >= count and not pending:
+                return
+
+            deadlines = []
+            if rounds < count:
+                deadlines.append(next_round)
+            if expiry:
+                deadlines.append(expiry[0][0] + self.timeout)
+            wait = max(0.0, min(deadlines) - now) if deadlines else 0.0
+
+            readable, _, _ = select.select(list(sockets.values()), [], [], wait)
+            for sock in readable:
+                family = family_of[sock]
+                while True:
+                    try:
+                        data, _ = sock.recvfrom(2048)
+                    except (BlockingIOError, InterruptedError):
+                        break
+                    except OSError:
+                        break
+                    received_at = time.perf_counter()
+                    parsed = self._parse_reply(family, data)
+                    if not parsed:
+                        continue
+                    ident, seq = parsed
+                    if self.modes[family] == 'raw' and ident != self._ident:
+                        # Raw sockets see every echo reply on the host
+                        continue
+                    entry = pending.pop((family, seq), None)
+                    if entry:
+                        address, sent_at = entry
+                        replies[address].append((received_at - sent_at) * 1000)
+
+
+def ping_many(addresses: Iterable[str], count: int = 4, timeout: float = 1.0) -> Dict[str, Dict]:
+    """Ping many addresses from the calling thread with a temporary prober"""
+    with ICMPProber(timeout=timeout) as prober:
+        return prober.ping_many(addresses, count=count)
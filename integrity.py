@@ -0,0 +1,177 @@
+"""
+Resolver integrity checks for DNS Manager Pro
+Resolves the same names through every saved config and compares the answers
+to spot NXDOMAIN hijacking, filtering and answers nobody else gives
+"""
+
+import ipaddress
+import random
+import string
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+import metrics
+from bulk_query import compare_resolvers
+from dns_query import TYPE_A
+
+# Names that cannot exist; a resolver that answers them rewrites NXDOMAIN
+CANARY_COUNT = 3
+CANARY_SUFFIXES = ('com', 'net', 'org')
+
+# Addresses filtering resolvers hand out instead of the real answer
+SINKHOLE_NETWORKS = [ipaddress.ip_network(n) for n in
+                     ('0.0.0.0/8', '127.0.0.0/8', '::/128', '::1/128')]
+
+# Answers for CDN-hosted names differ between resolvers; answers in the same
+# network block are counted as agreeing
+PREFIX_V4 = 24
+PREFIX_V6 = 48
+
+VERDICTS = ('agree', 'divergent', 'filtered', 'hijacked', 'failed')
+
+
+def canary_names(count: int = CANARY_COUNT, rng: Optional[random.Random] = None) -> List[str]:
+    """Random names under real TLDs that should come back NXDOMAIN"""
+    rng = rng or random.SystemRandom()
+    labels = (''.join(rng.choice(string.ascii_lowercase + string.digits) for _ in range(20))
+              for _ in range(count))
+    return [f"nx-{label}.{CANARY_SUFFIXES[i % len(CANARY_SUFFIXES)]}" for i, label in enumerate(labels)]
+
+
+def _is_ip_literal(name: str) -> bool:
+    try:
+        ipaddress.ip_address(name)
+        return True
+    except ValueError:
+        return False
+
+
+def _is_sinkhole(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in SINKHOLE_NETWORKS)
+
+
+def _blocks(addresses: Iterable[str]) -> set:
+    blocks = set()
+    for address in addresses:
+        try:
+            ip = ipaddress.ip_address(address)
+        except ValueError:
+            continue
+        prefix = PREFIX_V4 if ip.version == 4 else PREFIX_V6
+        blocks.add(ipaddress.ip_network(f"{ip}/{prefix}", strict=False))
+    return blocks
+
+
+def classify(results: Dict[str, Dict], canary: bool = False) -> Dict[str, str]:
+    """
+    Verdict per resolver for one name, given each resolver's bulk_query result
+    'agree', 'divergent' (answers share no network with anyone else's),
+    'filtered' (sinkhole address, or no answer where most resolvers have one),
+    'hijacked' (a canary got an answer) or 'failed' (no response)
+    """
+    verdicts = {}
+    answered = {label: r['addresses'] for label, r in results.items()
+                if r['rcode'] == 0 and r['addresses'] and not all(_is_sinkhole(a) for a in r['addresses'])}
+    responded = [label for label, r in results.items() if r['rcode'] is not None]
+    majority_answers = len(answered) * 2 > len(responded)
+
+    for label, result in results.items():
+        if result['rcode'] is None:
+            verdicts[label] = 'failed'
+        elif canary:
+            verdicts[label] = 'hijacked' if result['rcode'] == 0 and result['addresses'] else 'agree'
+        elif result['addresses'] and all(_is_sinkhole(a) for a in result['addresses']):
+            verdicts[label] = 'filtered'
+        elif label not in answered:
+            verdicts[label] = 'filtered' if majority_answers else 'agree'
+        elif not majority_answers and len(responded) > 1:
+            # Answers a name most resolvers say does not exist
+            verdicts[label] = 'divergent'
+        else:
+            others = set().union(*(_blocks(a) for other, a in answered.items() if other != label))
+            verdicts[label] = 'agree' if not others or _blocks(answered[label]) & others else 'divergent'
+    return verdicts
+
+
+def _summary(label: str, counts: Counter) -> Dict:
+    checked = sum(counts.values())
+    responded = checked - counts['failed']
+    if responded == 0:
+        verdict = 'unreachable'
+    elif counts['hijacked']:
+        verdict = 'NXDOMAIN hijacking'
+    elif counts['filtered']:
+        verdict = 'filtering'
+    elif counts['divergent']:
+        verdict = 'divergent answers'
+    else:
+        verdict = 'consistent'
+    return {'config': label, 'checked': checked, **{v: counts[v] for v in VERDICTS},
+            'integrity': counts['agree'] * 100 / responded if responded else None,
+            'verdict': verdict}
+
+
+def check_integrity(resolvers: Dict[str, Dict[str, str]], names: Iterable[str],
+                    canaries: int = CANARY_COUNT, qtype: int = TYPE_A,
+                    rng: Optional[random.Random] = None, **kwargs) -> Dict:
+    """
+    Resolve names (plus NXDOMAIN canaries) through every config and compare
+    All resolvers are queried at once, each with many queries in flight;
+    kwargs go to bulk_query.resolve_many (window, timeout, retries).
+    Returns: {'resolvers': {config: {'config', 'checked', 'agree', 'divergent',
+    'filtered', 'hijacked', 'failed', 'integrity' (% of answered names that
+    agree), 'verdict'}}, 'names': [{'name', 'canary', 'verdicts': {config: verdict},
+    'results': {config: result}}]}
+    """
+    names = [name for name in dict.fromkeys(n.rstrip('.').lower() for n in names)
+             if not _is_ip_literal(name)]
+    canary_list = canary_names(canaries, rng)
+    report = {'resolvers': {}, 'names': []}
+    if not resolvers:
+        return report
+
+    with metrics.BENCHMARK_DURATION.time('integrity'):
+        rows = compare_resolvers(names + canary_list, resolvers, qtype, **kwargs)
+    counts = {label: Counter() for label in resolvers}
+    for row in rows:
+        canary = row['name'] in canary_list
+        verdicts = classify(row['results'], canary)
+        for label, verdict in verdicts.items():
+            counts[label][verdict] += 1
+        report['names'].append({'name': row['name'], 'canary': canary,
+                                'verdicts': verdicts, 'results': row['results']})
+
+    report['resolvers'] = {label: _summary(label, counts[label]) for label in resolvers}
+    return report
+
+
+def attach_integrity(ranking: List[Dict], report: Dict) -> List[Dict]:
+    """Add 'integrity' and 'integrity_verdict' to benchmark ranking entries"""
+    for entry in ranking:
+        summary = report['resolvers'].get(entry['config'])
+        entry['integrity'] = summary['integrity'] if summary else None
+        entry['integrity_verdict'] = summary['verdict'] if summary else None
+    return ranking
+
+
+def format_integrity(summary: Optional[Dict]) -> str:
+    if not summary or summary['integrity'] is None:
+        return "Integrity: -"
+    return f"Integrity: {summary['integrity']:.0f}% ({summary['verdict']})"
+
+
+def findings(report: Dict) -> List[str]:
+    """One line per name a resolver answered differently, worst first"""
+    order = {'hijacked': 0, 'filtered': 1, 'divergent': 2}
+    lines = []
+    for entry in report['names']:
+        for label, verdict in entry['verdicts'].items():
+            if verdict in order:
+                result = entry['results'][label]
+                answer = ', '.join(result['addresses']) or result['status']
+                lines.append((order[verdict], f"{label}: {verdict} {entry['name']} -> {answer}"))
+    return [line for _, line in sorted(lines)]
@@ -0,0 +1,352 @@
+"""
+Prometheus metrics for DNS Manager Pro
+Counters and histograms for probes, benchmarks, DNS changes, the DNS settings
+cache and subprocesses, served as Prometheus text on a localhost HTTP endpoint
+
+Metrics are off unless the DNSMANAGER_METRICS environment variable or the
+--metrics command line flag gives a port. When off, labels() returns a shared
+no-op series, so instrumented code pays one global lookup per call, and the
+HTTP server machinery is only imported once an endpoint is started.
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+from typing import TYPE_CHECKING, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+ENV_VAR = 'DNSMANAGER_METRICS'
+DEFAULT_PORT = 9853
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+_NULL_TIMER = nullcontext()
+
+_enabled = False
+_server = None
+
+
+class _NullSeries:
+    """Stands in for every series while metrics are off"""
+
+    __slots__ = ()
+
+    def inc(self, amount: float = 1.0):
+        pass
+
+    def observe(self, value: float):
+        pass
+
+
+_NULL_SERIES = _NullSeries()
+
+
+class _CounterSeries:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self, lock: threading.Lock):
+        self.value = 0.0
+        self._lock = lock
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+
+class _HistogramSeries:
+    __slots__ = ('buckets', 'counts', 'sum', 'count', '_lock')
+
+    def __init__(self, buckets: Tuple[float, ...], lock: threading.Lock):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)     # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = lock
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+
+class Metric:
+    """A named family of series, one per combination of label values"""
+
+    type = 'untyped'
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self.series = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """The series for these label values (positional, in declaration order)"""
+        if not _enabled:
+            return _NULL_SERIES
+        series = self.series.get(values)
+        if series is None:
+            if len(values) != len(self.label_names):
+                raise ValueError(f"{self.name} takes labels {self.label_names}, got {values}")
+            with self._lock:
+                series = self.series.setdefault(values, self._new_series())
+        return series
+
+    def _new_series(self):
+        raise NotImplementedError
+
+    def clear(self):
+        with self._lock:
+            self.series.clear()
+
+    def _sorted_series(self) -> List[Tuple[Tuple[str, ...], object]]:
+        return sorted(((tuple(str(v) for v in values), series)
+                       for values, series in list(self.series.items())), key=lambda item: item[0])
+
+    def _label_text(self, values: Tuple[str, ...], extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, values)]
+        if extra:
+            pairs.append(f'{extra[0]}="{extra[1]}"')
+        return '{' + ','.join(pairs) + '}' if pairs else ''
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self._render_series())
+        return lines
+
+    def _render_series(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def _new_series(self):
+        return _CounterSeries(self._lock)
+
+    def inc(self, *values, amount: float = 1.0):
+        self.labels(*values).inc(amount)
+
+    def _render_series(self) -> List[str]:
+        return [f"{self.name}{self._label_text(values)} {_number(series.value)}"
+                for values, series in self._sorted_series()]
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_series(self):
+        return _HistogramSeries(self.buckets, self._lock)
+
+    def observe(self, value: float, *values):
+        self.labels(*values).observe(value)
+
+    def time(self, *values, failures: Optional[Counter] = None):
+        """Context manager observing the block's duration in seconds"""
+        if not _enabled:
+            return _NULL_TIMER
+        return _Timer(self.labels(*values), failures.labels(*values) if failures else None)
+
+    def _render_series(self) -> List[str]:
+        lines = []
+        for values, series in self._sorted_series():
+            with self._lock:
+                counts, total, count = list(series.counts), series.sum, series.count
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else _number(bound)
+                lines.append(f"{self.name}_bucket{self._label_text(values, ('le', le))} {cumulative}")
+            lines.append(f"{self.name}_sum{self._label_text(values)} {_number(total)}")
+            lines.append(f"{self.name}_count{self._label_text(values)} {count}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ('series', 'failures', 'start')
+
+    def __init__(self, series, failures):
+        self.series = series
+        self.failures = failures
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.series.observe(time.perf_counter() - self.start)
+        if exc_type is not None and self.failures is not None:
+            self.failures.inc()
+        return False
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        for metric in self.metrics.values():
+            metric.clear()
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, help_text: str, labels: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, help_text, labels))
+
+
+def histogram(name: str, help_text: str, labels: Sequence[str] = (),
+              buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, help_text, labels, buckets))
+
+
+# What the app records
+
+PROBE_LATENCY = histogram(
+    'dnsmanager_probe_latency_seconds',
+    'Latency of successful probes (kind: dns, icmp, tcp, connect)', ('kind', 'resolver', 'target'))
+PROBE_FAILURES = counter(
+    'dnsmanager_probe_failures_total',
+    'Probes that got no answer', ('kind', 'resolver', 'target'))
+BENCHMARK_DURATION = histogram(
+    'dnsmanager_benchmark_duration_seconds',
+    'Wall time of a benchmark run', ('mode',), DURATION_BUCKETS)
+DNS_CHANGE_DURATION = histogram(
+    'dnsmanager_dns_change_duration_seconds',
+    'Time to apply or reset adapter DNS settings', ('action',), DURATION_BUCKETS)
+DNS_CHANGE_FAILURES = counter(
+    'dnsmanager_dns_change_failures_total',
+    'Failed attempts to apply or reset adapter DNS settings', ('action',))
+DNS_SETTINGS_CACHE = counter(
+    'dnsmanager_dns_settings_cache_total',
+    'Lookups of the adapter DNS settings cache (result: hit, miss)', ('result',))
+SUBPROCESS_SPAWNS = counter(
+    'dnsmanager_subprocess_spawns_total',
+    'Processes started (via: process, session)', ('program', 'via'))
+COMMANDS = counter(
+    'dnsmanager_commands_total',
+    'Commands run, including those sent to a running shell session', ('program', 'via'))
+
+
+def observe_probe(kind: str, resolver: str, target: str, latency_ms: Optional[float]):
+    """Record one probe result; latency None counts as a failure"""
+    if not _enabled:
+        return
+    if latency_ms is None:
+        PROBE_FAILURES.labels(kind, resolver, target).inc()
+    else:
+        PROBE_LATENCY.labels(kind, resolver, target).observe(latency_ms / 1000)
+
+
+# Endpoint
+
+def _serve(host: str, port: int) -> 'ThreadingHTTPServer':
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        registry = REGISTRY
+
+        def do_GET(self):
+            if self.path.split('?', 1)[0] not in ('/metrics', '/'):
+                self.send_error(404)
+                return
+            body = self.registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics endpoint', daemon=True).start()
+    return server
+
+
+def enable(port: Optional[int] = None, host: str = '127.0.0.1') -> Optional['ThreadingHTTPServer']:
+    """
+    Start recording, and serve /metrics on host:port when a port is given
+    (0 picks a free port; see server.server_address)
+    """
+    global _enabled, _server
+    _enabled = True
+    if port is None or _server is not None:
+        return _server
+    try:
+        _server = _serve(host, port)
+    except OSError as e:
+        print(f"Could not start metrics endpoint on {host}:{port}: {e}")
+        return None
+    return _server
+
+
+def enable_from_environment() -> Optional['ThreadingHTTPServer']:
+    """Enable metrics if DNSMANAGER_METRICS is set to a port"""
+    value = os.environ.get(ENV_VAR)
+    if not value:
+        return None
+    try:
+        return enable(int(value))
+    except ValueError:
+        print(f"{ENV_VAR} must be a port number, got {value!r}")
+        return None
+
+
+def disable():
+    """Stop recording and serving; recorded values are kept until clear()"""
+    global _enabled, _server
+    _enabled = False
+    if _server is not None:
+        _server.shutdown()
+        _server.server_close()
+        _server = None
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def clear():
+    REGISTRY.clear()
+
+
+def render() -> str:
+    return REGISTRY.render()
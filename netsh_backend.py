@@ -0,0 +1,215 @@
+"""
+Windows network configuration through netsh and ipconfig
+All commands go through a CommandRunner, so they can be timed, traced and faked in tests
+"""
+
+import csv
+from typing import Dict, List, Optional
+
+import metrics
+from command_runner import CommandRunner
+
+QUERY_TIMEOUT = 3.0
+CHANGE_TIMEOUT = 15.0
+
+
+def _is_ipv4(ip: str) -> bool:
+    try:
+        parts = ip.split('.')
+        return len(parts) == 4 and all(0 <= int(part) <= 255 for part in parts)
+    except ValueError:
+        return False
+
+
+def parse_interfaces(output: str) -> List[str]:
+    """Adapter names from `netsh interface show interface` (enabled or connected only)"""
+    adapters = []
+    for line in output.split('\n')[3:]:  # Skip header lines
+        parts = line.split()
+        if len(parts) >= 4 and parts[0] in ['Enabled', 'Connected']:
+            adapter_name = ' '.join(parts[3:])
+            if adapter_name:
+                adapters.append(adapter_name)
+    return adapters
+
+
+def parse_connected_interfaces(output: str) -> List[str]:
+    """Adapter names from `netsh interface show interface` whose State is Connected"""
+    adapters = []
+    for line in output.split('\n')[3:]:
+        parts = line.split()
+        if len(parts) >= 4 and parts[1] == 'Connected':
+            adapters.append(' '.join(parts[3:]))
+    return adapters
+
+
+def parse_wlan_ssids(output: str) -> List[str]:
+    """SSIDs of connected wireless interfaces from `netsh wlan show interfaces`"""
+    ssids = []
+    state = None
+    for line in output.split('\n'):
+        key, sep, value = line.partition(':')
+        if not sep:
+            continue
+        key, value = key.strip(), value.strip()
+        if key == 'State':
+            state = value.lower()
+        elif key == 'SSID' and state == 'connected' and value:
+            ssids.append(value)
+    return ssids
+
+
+def parse_tasklist(output: str) -> Dict[str, int]:
+    """Running image names (lowercased) and how many of each, from `tasklist /fo csv /nh`"""
+    counts = {}
+    for row in csv.reader(output.splitlines()):
+        if len(row) >= 2 and row[1].isdigit():
+            name = row[0].lower()
+            counts[name] = counts.get(name, 0) + 1
+    return counts
+
+
+def parse_dns_settings(output: str) -> Dict:
+    """
+    Where an adapter's DNS servers come from, from `netsh interface ip show dns <adapter>`
+    Returns: {'source': 'static' or 'dhcp', 'servers': [IPv4 addresses]}
+    """
+    settings = {'source': 'dhcp', 'servers': []}
+    block = None
+    english = False
+    for line in output.split('\n'):
+        label, sep, value = line.partition(':')
+        if sep and ' ' in label.strip():
+            # A new "Label:  value" entry; the first server is printed on the header line itself
+            if 'Statically Configured DNS Servers' in label:
+                block = settings['source'] = 'static'
+                english = True
+            elif 'DNS servers configured through DHCP' in label:
+                block = settings['source'] = 'dhcp'
+                english = True
+            elif english:
+                block = None
+            else:
+                # Localized netsh: the labels can't be told apart, so every server
+                # listed counts as static, as before sources were distinguished
+                block = settings['source'] = 'static'
+            line = value
+        if block and any(part.replace('.', '').isdigit() for part in line.split()):
+            ip = line.strip().split()[-1]
+            if _is_ipv4(ip):
+                settings['servers'].append(ip)
+    return settings
+
+
+def parse_dns_servers(output: str) -> Optional[Dict[str, str]]:
+    """
+    Static DNS servers from `netsh interface ip show dns <adapter>`
+    Returns: {'primary', 'secondary'} or None when the servers come from DHCP
+    (the adapter is automatic) or none are listed
+    """
+    settings = parse_dns_settings(output)
+    dns_servers = settings['servers']
+    if settings['source'] != 'static' or not dns_servers:
+        return None
+    return {
+        'primary': dns_servers[0],
+        'secondary': dns_servers[1] if len(dns_servers) > 1 else ''
+    }
+
+
+def list_adapters(runner: CommandRunner) -> List[str]:
+    """Raises CommandError if netsh fails"""
+    result = runner.run(['netsh', 'interface', 'show', 'interface'], timeout=QUERY_TIMEOUT,
+                        check=True, label='netsh show interface', use_session=True)
+    return parse_interfaces(result.stdout)
+
+
+def connected_adapters(runner: CommandRunner) -> List[str]:
+    """Raises CommandError if netsh fails"""
+    result = runner.run(['netsh', 'interface', 'show', 'interface'], timeout=QUERY_TIMEOUT,
+                        check=True, label='netsh show interface', use_session=True)
+    return parse_connected_interfaces(result.stdout)
+
+
+def wifi_ssids(runner: CommandRunner) -> List[str]:
+    """SSIDs the machine is connected to; empty without Wi-Fi (or when the WLAN service is off)"""
+    result = runner.run(['netsh', 'wlan', 'show', 'interfaces'], timeout=QUERY_TIMEOUT,
+                        label='netsh wlan show interfaces', use_session=True)
+    return parse_wlan_ssids(result.stdout) if result.ok else []
+
+
+def running_processes(runner: CommandRunner) -> Dict[str, int]:
+    """Raises CommandError if tasklist fails"""
+    result = runner.run(['tasklist', '/fo', 'csv', '/nh'], timeout=CHANGE_TIMEOUT, check=True,
+                        label='tasklist')
+    return parse_tasklist(result.stdout)
+
+
+def _is_show_dns_answer(output: str) -> bool:
+    """
+    Whether output has the shape of a show dns answer in any language
+    An answer lists indented 'Label:  value' lines under its header; netsh
+    errors are unindented sentences.
+    """
+    return any(line[:1] in (' ', '\t') and ':' in line for line in output.splitlines())
+
+
+def _show_dns(runner: CommandRunner, adapter: str, check: bool):
+    args = ['netsh', 'interface', 'ip', 'show', 'dns', adapter]
+    result = runner.run(args, timeout=QUERY_TIMEOUT, label='netsh show dns', use_session=True)
+    if result.via == 'session' and not _is_show_dns_answer(result.stdout):
+        # Session results have no exit code, so an error message would read as DHCP;
+        # anything but a show dns answer is asked again in a process that reports one
+        result = runner.run(args, timeout=QUERY_TIMEOUT, label='netsh show dns')
+    if check:
+        result.check_returncode()
+    return result
+
+
+def get_dns_servers(runner: CommandRunner, adapter: str, check: bool = False) -> Optional[Dict[str, str]]:
+    """
+    Current DNS servers of an adapter; None for DHCP
+    When netsh fails this returns None as well, or raises CommandError with check=True
+    """
+    result = _show_dns(runner, adapter, check)
+    if not result.ok:
+        print(f"Could not read DNS servers for {adapter}: {result!r}")
+        return None
+    return parse_dns_servers(result.stdout)
+
+
+def get_dns_settings(runner: CommandRunner, adapter: str) -> Dict:
+    """
+    Source and servers of an adapter's DNS, DHCP-assigned servers included (see parse_dns_settings)
+    Raises CommandError if netsh fails
+    """
+    return parse_dns_settings(_show_dns(runner, adapter, check=True).stdout)
+
+
+def set_dns(runner: CommandRunner, adapter: str, primary: str, secondary: str = ''):
+    """Set static DNS servers; raises CommandError (usually missing admin rights)"""
+    with metrics.DNS_CHANGE_DURATION.time('apply', failures=metrics.DNS_CHANGE_FAILURES):
+        runner.run(['netsh', 'interface', 'ip', 'set', 'dns', adapter, 'static', primary],
+                   timeout=CHANGE_TIMEOUT, check=True, label='netsh set dns static')
+        if secondary:
+            runner.run(['netsh', 'interface', 'ip', 'add', 'dns', adapter, secondary, 'index=2'],
+                       timeout=CHANGE_TIMEOUT, check=True, label='netsh add dns')
+
+
+def reset_dns(runner: CommandRunner, adapter: str):
+    """Switch an adapter back to DHCP-provided DNS; raises CommandError"""
+    with metrics.DNS_CHANGE_DURATION.time('reset', failures=metrics.DNS_CHANGE_FAILURES):
+        runner.run(['netsh', 'interface', 'ip', 'set', 'dns', adapter, 'dhcp'],
+                   timeout=CHANGE_TIMEOUT, check=True, label='netsh set dns dhcp')
+
+
+def flush_dns(runner: CommandRunner, check: bool = False):
+    runner.run(['ipconfig', '/flushdns'], timeout=QUERY_TIMEOUT, check=check,
+               label='ipconfig /flushdns')
+
+
+def ipconfig_all(runner: CommandRunner) -> str:
+    """Raises CommandError if ipconfig fails"""
+    result = runner.run(['ipconfig', '/all'], timeout=CHANGE_TIMEOUT, check=True,
+                        label='ipconfig /all')
+    return result.stdout
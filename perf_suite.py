@@ -0,0 +1,393 @@
+"""
+Performance suite for DNS Manager Pro
+Times the app's own hot paths and compares the results with a stored baseline
+
+Usage:
+    python perf_suite.py                   run, compare with perf_baseline.json
+    python perf_suite.py --save-baseline   run and store the results as the baseline
+    python perf_suite.py --quick --only parse
+
+Exits with status 1 when a case is slower than the baseline by more than the
+tolerance. Baselines are machine-specific: record one on the machine that runs
+the comparison.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional
+
+ROOT = Path(__file__).parent
+FIXTURES = ROOT / 'tests' / 'fixtures'
+BASELINE_FILE = 'perf_baseline.json'
+RESULTS_FILE = 'perf_results.json'
+DEFAULT_TOLERANCE = 0.25
+
+_cases = []
+
+
+class Skip(Exception):
+    """Raised by a case that cannot run here (e.g. no display for Tk)"""
+
+
+def case(name: str, unit: str = 'ms'):
+    """Register a benchmark function; it takes `quick` and returns the measured value"""
+    def decorator(func):
+        _cases.append((name, unit, func))
+        return func
+    return decorator
+
+
+def measure(func: Callable[[], object], number: int = 1, repeat: int = 5) -> float:
+    """Best time in ms for one call, over `repeat` runs of `number` calls (after a warm-up)"""
+    func()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) * 1000 / number)
+    return min(timings)
+
+
+def random_ips(count: int, seed: int = 1) -> List[str]:
+    rng = random.Random(seed)
+    ips = [f"{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}"
+           for _ in range(count * 3 // 4)]
+    ips += [rng.choice(["256.1.1.1", "1.1.1", "dns.google", "", "1.1.1.1.1"])
+            for _ in range(count - len(ips))]
+    rng.shuffle(ips)
+    return ips
+
+
+def random_configs(count: int, seed: int = 2) -> Dict[str, Dict[str, str]]:
+    ips = random_ips(count * 2, seed)
+    return {f"Config {i:05d}": {'primary': ips[2 * i], 'secondary': ips[2 * i + 1]}
+            for i in range(count)}
+
+
+def _fixture(*parts) -> str:
+    with open(FIXTURES.joinpath(*parts), 'r', encoding='utf-8', newline='') as f:
+        return f.read()
+
+
+# --- Cases -----------------------------------------------------------------
+
+@case('is_valid_ip', unit='ops/s')
+def bench_is_valid_ip(quick: bool):
+    from netsh_backend import _is_ipv4
+    try:
+        from dns_manager import DNSManager
+        is_valid_ip = lambda ip: DNSManager.is_valid_ip(None, ip)
+    except ImportError:
+        is_valid_ip = _is_ipv4
+    ips = random_ips(10_000)
+
+    def run():
+        for ip in ips:
+            is_valid_ip(ip)
+    return len(ips) / (measure(run, repeat=3 if quick else 7) / 1000)
+
+
+@case('parse_interfaces', unit='ops/s')
+def bench_parse_interfaces(quick: bool):
+    from netsh_backend import parse_interfaces
+    output = _fixture('netsh', 'interface_show.txt')
+    return 1000 / measure(lambda: parse_interfaces(output), number=200 if quick else 2000)
+
+
+@case('parse_dns_servers', unit='ops/s')
+def bench_parse_dns_servers(quick: bool):
+    from netsh_backend import parse_dns_servers
+    outputs = [_fixture('netsh', name) for name in
+               ('ip_show_dns_static.txt', 'ip_show_dns_dhcp.txt', 'ip_show_dns_none.txt')]
+
+    def run():
+        for output in outputs:
+            parse_dns_servers(output)
+    return 3000 / measure(run, number=200 if quick else 2000)
+
+
+@case('parse_ping_output', unit='ops/s')
+def bench_parse_ping_output(quick: bool):
+    from ping_parser import parse_ping_output
+    outputs = [path.read_text(encoding='utf-8') for path in sorted((FIXTURES / 'ping').glob('*.txt'))]
+
+    def run():
+        for output in outputs:
+            parse_ping_output(output)
+    return len(outputs) * 1000 / measure(run, number=50 if quick else 500)
+
+
+def _config_io(count: int, quick: bool, load: bool) -> float:
+    try:
+        from dns_manager import DNSManager
+    except ImportError as e:
+        raise Skip(f"dns_manager not importable: {e}")
+    errors = []
+    with tempfile.TemporaryDirectory() as directory:
+        app = SimpleNamespace(config_file=os.path.join(directory, 'dns_configs.json'),
+                              saved_configs=random_configs(count), show_error=errors.append)
+        DNSManager.save_configs_to_file(app)
+        action = DNSManager.load_configs if load else DNSManager.save_configs_to_file
+        elapsed = measure(lambda: action(app), repeat=3 if quick else 7)
+    if errors or len(app.saved_configs) != count:
+        raise RuntimeError(f"config round trip failed: {errors}")
+    return elapsed
+
+
+for _count in (100, 1000, 10000):
+    case(f'configs_save[{_count}]')(lambda quick, n=_count: _config_io(n, quick, load=False))
+    case(f'configs_load[{_count}]')(lambda quick, n=_count: _config_io(n, quick, load=True))
+
+
+_STARTUP_SCRIPT = """
+import sys, time
+import customtkinter
+start = time.perf_counter()
+import dns_manager
+print((time.perf_counter() - start) * 1000)
+"""
+
+
+@case('startup_imports')
+def bench_startup_imports(quick: bool):
+    """Importing the app in a fresh interpreter (customtkinter excluded)"""
+    timings = []
+    for _ in range(2 if quick else 5):
+        result = subprocess.run([sys.executable, '-c', _STARTUP_SCRIPT], cwd=ROOT,
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            raise Skip(f"dns_manager not importable: {result.stderr.strip().splitlines()[-1:]}")
+        timings.append(float(result.stdout))
+    return min(timings)
+
+
+_display = None
+
+
+def _virtual_display():
+    """Use the current display, or start Xvfb for the run (Windows always has one)"""
+    global _display
+    if sys.platform == 'win32' or os.environ.get('DISPLAY') or _display:
+        return
+    xvfb = shutil.which('Xvfb')
+    if not xvfb:
+        raise Skip("no display and Xvfb is not installed")
+    number = 90 + os.getpid() % 100
+    _display = subprocess.Popen([xvfb, f':{number}', '-screen', '0', '1280x1024x24'],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    os.environ['DISPLAY'] = f':{number}'
+    time.sleep(0.5)
+
+
+_app = None
+
+
+def _ui_app():
+    global _app
+    if _app is None:
+        _virtual_display()
+        try:
+            from dns_manager import DNSManager
+            _app = DNSManager()
+        except Exception as e:
+            raise Skip(f"cannot create the main window: {e}")
+        _app.config_file = os.path.join(tempfile.mkdtemp(), 'dns_configs.json')
+    return _app
+
+
+def _render_configs(count: int, quick: bool) -> float:
+    app = _ui_app()
+    app.saved_configs = random_configs(count)
+
+    def run():
+        app.refresh_saved_configs_ui()
+        app.update_idletasks()
+    return measure(run, repeat=2 if quick or count >= 1000 else 5)
+
+
+for _count in (10, 100, 1000):
+    case(f'saved_configs_ui[{_count}]')(lambda quick, n=_count: _render_configs(n, quick))
+
+
+@case('time_to_service_benchmark', unit='ops/s')
+def bench_time_to_service(quick: bool):
+    from benchmark import run_time_to_service_benchmark
+    from dns_stub import DNSStubServer
+
+    targets = {f"Service {i}": f"service{i}.test" for i in range(20)}
+    records = {host: ["127.0.0.1"] for host in targets.values()}
+    with DNSStubServer(records) as stub:
+        configs = {f"Resolver {i}": {'primary': '127.0.0.1', 'secondary': ''} for i in range(5)}
+        run = lambda: run_time_to_service_benchmark(configs, targets, connect=lambda a, port: 1.0,
+                                                    dns_port=stub.port)
+        elapsed = measure(run, repeat=2 if quick else 5)
+    return len(configs) * len(targets) / (elapsed / 1000)
+
+
+for _state in ('off', 'on'):
+    @case(f'observe_probe[{_state}]', unit='ops/s')
+    def bench_observe_probe(quick: bool, state=_state):
+        import metrics
+        was_enabled = metrics.is_enabled()
+        if state == 'on':
+            metrics.enable()
+        else:
+            metrics.disable()
+        targets = [f"service{i}.test" for i in range(50)]
+
+        def run():
+            for target in targets:
+                metrics.observe_probe('dns', '1.1.1.1', target, 12.5)
+        try:
+            return len(targets) * 1000 / measure(run, number=200 if quick else 2000)
+        finally:
+            if not was_enabled:
+                metrics.disable()
+                metrics.clear()
+
+
+@case('split_dns_route[50k]', unit='ops/s')
+def bench_split_dns_route(quick: bool):
+    from dns_forwarder import SplitRouter
+
+    router = SplitRouter({f"host{i}.team{i % 100}.example.com": 'Corp' for i in range(50_000)}, 'Default')
+    names = [f"www.host{i}.team{i % 100}.example.com" for i in range(0, 50_000, 500)] + \
+            [f"cdn{i}.unrouted.net" for i in range(100)]
+
+    def run():
+        for name in names:
+            router.route(name)
+    return len(names) * 1000 / measure(run, number=20 if quick else 200)
+
+
+@case('blocklist_lookup[200k]', unit='ops/s')
+def bench_blocklist_lookup(quick: bool):
+    from blocklist import Blocklist
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'hosts')
+        with open(source, 'w') as f:
+            for i in range(200_000):
+                f.write(f"0.0.0.0 ad{i}.tracker{i % 97}.test\n")
+        bl = Blocklist.load([source], index_dir=os.path.join(tmp, 'index'))
+        names = [f"ad{i}.tracker{i % 97}.test" for i in range(0, 200_000, 2_000)] + \
+                [f"www.site{i}.example.com" for i in range(100)]
+
+        def run():
+            # Uncached decisions: the recent-decision cache would hide the index
+            bl._recent.clear()
+            for name in names:
+                bl.blocks(name)
+        try:
+            return len(names) * 1000 / measure(run, number=20 if quick else 200)
+        finally:
+            bl.close()
+
+
+# --- Runner ----------------------------------------------------------------
+
+def run_cases(only: Optional[str] = None, quick: bool = False) -> Dict[str, Dict]:
+    results = {}
+    for name, unit, func in _cases:
+        if only and only not in name:
+            continue
+        try:
+            value = func(quick)
+        except Skip as e:
+            print(f"  {name:32} skipped ({e})")
+            continue
+        results[name] = {'value': value, 'unit': unit}
+        print(f"  {name:32} {format_value(value, unit)}")
+    return results
+
+
+def format_value(value: float, unit: str) -> str:
+    if unit == 'ops/s':
+        return f"{value:>14,.0f} ops/s"
+    return f"{value:>14.3f} ms"
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict],
+            tolerance: float = DEFAULT_TOLERANCE) -> List[Dict]:
+    """
+    Cases that got slower than the baseline by more than `tolerance` (0.25 = 25%)
+    Returns: list of {'name', 'baseline', 'current', 'slowdown'}
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base or base['unit'] != result['unit'] or not base['value'] or not result['value']:
+            continue
+        if result['unit'] == 'ops/s':
+            slowdown = base['value'] / result['value'] - 1
+        else:
+            slowdown = result['value'] / base['value'] - 1
+        if slowdown > tolerance:
+            regressions.append({'name': name, 'baseline': base['value'],
+                                'current': result['value'], 'slowdown': slowdown})
+    return regressions
+
+
+def _environment() -> Dict[str, str]:
+    return {'python': platform.python_version(), 'platform': platform.platform(),
+            'machine': platform.machine(), 'recorded': time.strftime('%Y-%m-%d %H:%M:%S')}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="DNS Manager Pro performance suite")
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--output', default=RESULTS_FILE)
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument('--only', help="run cases whose name contains this text")
+    parser.add_argument('--quick', action='store_true', help="fewer repetitions")
+    args = parser.parse_args(argv)
+
+    print("Running performance suite...")
+    try:
+        results = run_cases(args.only, args.quick)
+    finally:
+        if _app is not None:
+            _app.destroy()
+        if _display:
+            _display.terminate()
+
+    report = {'environment': _environment(), 'results': results}
+    target = args.baseline if args.save_baseline else args.output
+    with open(target, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {target}")
+    if args.save_baseline:
+        return 0
+
+    try:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    except (OSError, ValueError):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to record one")
+        return 0
+
+    regressions = compare(results, baseline['results'], args.tolerance)
+    for regression in regressions:
+        unit = results[regression['name']]['unit']
+        print(f"REGRESSION {regression['name']}: {format_value(regression['baseline'], unit).strip()}"
+              f" -> {format_value(regression['current'], unit).strip()}"
+              f" ({regression['slowdown']:+.0%})")
+    if not regressions:
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""
+Ping output parser for DNS Manager Pro
+Extracts per-reply RTTs, loss and min/avg/max from Windows (any language),
+iputils and busybox ping output
+"""
+
+import re
+import statistics
+from typing import Dict, Iterable, List, Optional
+
+# "time=12ms", "Zeit=12ms", "temps=15 ms", "время=9мс", "time<1ms", "time=11.8 ms"
+_RTT_RE = re.compile(r'([=<])\s*(\d+(?:[.,]\d+)?)\s*(?:ms|мс)(?!\w)', re.IGNORECASE)
+
+# iputils "rtt min/avg/max/mdev = a/b/c/d ms", busybox/macOS "round-trip min/avg/max = a/b/c ms"
+_UNIX_SUMMARY_RE = re.compile(r'=\s*(\d+(?:\.\d+)?)/(\d+(?:\.\d+)?)/(\d+(?:\.\d+)?)')
+
+# iputils "4 packets transmitted, 3 received", busybox "4 packets transmitted, 3 packets received"
+_UNIX_COUNTS_RE = re.compile(r'(\d+) packets transmitted, (\d+) (?:packets )?received')
+
+# Windows "Sent = 4, Received = 4, Lost = 0" in any language
+_WIN_COUNTS_RE = re.compile(r'=\s*(\d+)\s*[,，、]\s*[^=\n]*=\s*(\d+)\s*[,，、]\s*[^=\n]*=\s*(\d+)')
+
+_LOSS_RE = re.compile(r'(\d+(?:[.,]\d+)?)\s*%')
+
+
+def _number(text: str) -> float:
+    return float(text.replace(',', '.'))
+
+
+def _rtt(match) -> float:
+    operator, value = match
+    if operator == '<':
+        # "time<1ms": take the midpoint of the interval
+        return _number(value) / 2
+    return _number(value)
+
+
+def parse_ping_output(output: str) -> Dict:
+    """
+    Parse the output of one ping run
+    Returns: dict with per-reply 'replies' (ms), 'sent', 'received', 'loss' (%),
+    and 'min'/'avg'/'max' (ms, None when nothing came back).
+    Windows "time<1ms" replies are recorded as 0.5 ms.
+    """
+    replies: List[float] = []
+    summary = None
+
+    for line in output.splitlines():
+        if '=' not in line and '<' not in line:
+            continue
+        values = _RTT_RE.findall(line)
+        if len(values) == 1:
+            replies.append(_rtt(values[0]))
+        elif len(values) == 3:
+            # Windows summary is always Minimum, Maximum, Average
+            low, high, avg = (_rtt(v) for v in values)
+            summary = (low, avg, high)
+
+    sent = None
+    counts = _UNIX_COUNTS_RE.search(output)
+    if counts:
+        sent = int(counts.group(1))
+        if summary is None:
+            match = _UNIX_SUMMARY_RE.search(output, counts.end())
+            if match:
+                summary = tuple(float(v) for v in match.groups())
+    else:
+        counts = _WIN_COUNTS_RE.search(output)
+        if counts:
+            sent = int(counts.group(1))
+
+    received = len(replies)
+    if sent:
+        # Windows counts "Destination host unreachable" as received, so trust the replies
+        loss = round((sent - received) / sent * 100, 1)
+    else:
+        match = _LOSS_RE.search(output)
+        loss = _number(match.group(1)) if match else None
+
+    if replies:
+        low, avg, high = min(replies), sum(replies) / len(replies), max(replies)
+    elif summary:
+        low, avg, high = summary
+    else:
+        low = avg = high = None
+
+    return {
+        'replies': replies,
+        'sent': sent,
+        'received': received,
+        'loss': loss,
+        'min': low,
+        'avg': avg,
+        'max': high,
+    }
+
+
+def parse_ping_outputs(outputs: Iterable[str]) -> List[Dict]:
+    """Parse a batch of ping outputs"""
+    return [parse_ping_output(output) for output in outputs]
+
+
+def aggregate_samples(results: Iterable[Dict]) -> Dict:
+    """
+    Pool the per-reply samples of many parsed ping runs
+    Returns: dict with sample count, loss and min/avg/median/p95/max over all replies
+    """
+    samples: List[float] = []
+    sent = 0
+    for result in results:
+        samples.extend(result['replies'])
+        sent += result['sent'] or len(result['replies'])
+
+    aggregate: Dict[str, Optional[float]] = {
+        'samples': len(samples),
+        'sent': sent,
+        'loss': round((sent - len(samples)) / sent * 100, 1) if sent else None,
+        'min': None, 'avg': None, 'median': None, 'p95': None, 'max': None,
+    }
+    if samples:
+        samples.sort()
+        aggregate.update({
+            'min': samples[0],
+            'avg': sum(samples) / len(samples),
+            'median': statistics.median(samples),
+            'p95': samples[min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))],
+            'max': samples[-1],
+        })
+    return aggregate
@@ -78,11 +78,13 @@ copy BUILD.md "%RELEASE_DIR%\"
 copy DISTRIBUTION.md "%RELEASE_DIR%\"
 
 echo.
-echo [5/5] Creating checksums...
+echo [5/5] Creating checksums and update manifest...
+python update_install.py manifest . %VERSION% "%RELEASE_DIR%\manifest.json"
 cd "%RELEASE_DIR%"
-certutil -hashfile "DNSManagerPro-v%VERSION%-Portable.exe" SHA256 > checksums.txt
-if exist "DNSManagerPro-Setup-v%VERSION%.exe" (
-    certutil -hashfile "DNSManagerPro-Setup-v%VERSION%.exe" SHA256 >> checksums.txt
+REM Every published asset is listed: the updater refuses to install anything without a checksum
+type nul > checksums.txt
+for %%f in (*) do (
+    if /i not "%%f"=="checksums.txt" certutil -hashfile "%%f" SHA256 >> checksums.txt
 )
 cd ..\..
 
@@ -0,0 +1,585 @@
+"""
+Rule-based DNS profile switching for DNS Manager Pro
+Rules in dns_rules.json pick a saved config from the time of day, the
+connected adapters, the Wi-Fi network, a VPN and running programs. The first
+enabled rule whose conditions all hold wins.
+
+Evaluation is event-driven: Windows address-change notifications
+(NotifyAddrChange), WMI process start/stop traces and a timer set to the next
+time-window edge wake the engine, which then decides from facts it already
+holds. A config is applied only when the winning rule changes, so a manual
+change sticks until the next trigger flips the decision.
+"""
+
+import argparse
+import datetime
+import json
+import queue
+import re
+import subprocess
+import sys
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import metrics
+import netsh_backend
+from command_runner import CommandError, CommandRunner
+
+RULES_FILE = 'dns_rules.json'
+
+DEFAULT_RULES = {
+    'enabled': False,
+    'rules': [],
+}
+
+CONDITIONS = ('time', 'days', 'adapter', 'ssid', 'vpn', 'process')
+DAYS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+
+# Connected adapters whose name matches count as a VPN
+VPN_PATTERN = re.compile(r'vpn|wireguard|openvpn|anyconnect|nordlynx|forti|globalprotect|zerotier|'
+                         r'tailscale|\btap\b|\btun\b', re.IGNORECASE)
+
+# Longest sleep between decisions when no event arrives; catches clock changes and resume
+MAX_WAIT = 3600.0
+
+# Fallback for when WMI process traces are unavailable (they need admin rights):
+# every poll starts a tasklist process, so it runs far less often than traces report
+PROCESS_POLL_INTERVAL = 15.0
+
+PROCESS_TRACE_SCRIPT = (
+    "Register-CimIndicationEvent -ClassName Win32_ProcessStartTrace -SourceIdentifier start | Out-Null; "
+    "Register-CimIndicationEvent -ClassName Win32_ProcessStopTrace -SourceIdentifier stop | Out-Null; "
+    "[Console]::Out.WriteLine('ready'); [Console]::Out.Flush(); "
+    "while ($true) { $e = Wait-Event; "
+    "[Console]::Out.WriteLine($e.SourceIdentifier + ' ' + $e.SourceEventArgs.NewEvent.ProcessName); "
+    "[Console]::Out.Flush(); Remove-Event -EventIdentifier $e.EventIdentifier }"
+)
+
+
+def load_rules(path: str = RULES_FILE) -> Dict:
+    """DEFAULT_RULES overlaid with the rules file"""
+    settings = json.loads(json.dumps(DEFAULT_RULES))
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            stored = json.load(f)
+    except OSError:
+        return settings
+    except ValueError as e:
+        print(f"Error reading {path}: {e}")
+        return settings
+    settings.update({key: value for key, value in stored.items() if key in DEFAULT_RULES})
+    return settings
+
+
+def save_rules(settings: Dict, path: str = RULES_FILE):
+    try:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(settings, f, indent=2)
+    except OSError as e:
+        print(f"Error saving rules: {e}")
+
+
+def set_enabled(enabled: bool, path: str = RULES_FILE) -> bool:
+    """Turn switching on or off in the rules file, leaving hand-edited rules alone"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            settings = json.load(f)
+    except OSError:
+        settings = json.loads(json.dumps(DEFAULT_RULES))
+    except ValueError as e:
+        print(f"Not changing {path}, it is not valid JSON: {e}")
+        return False
+    settings['enabled'] = enabled
+    save_rules(settings, path)
+    return True
+
+
+# Rules
+
+def parse_time_window(text: str) -> Tuple[int, int]:
+    """'22:00-06:00' -> (1320, 360) in minutes after midnight; raises ValueError"""
+    try:
+        start, end = (part.strip() for part in text.split('-'))
+        minutes = []
+        for part in (start, end):
+            hours, mins = part.split(':')
+            hours, mins = int(hours), int(mins)
+            if not (0 <= hours <= 24 and 0 <= mins < 60) or hours * 60 + mins > 1440:
+                raise ValueError
+            minutes.append(hours * 60 + mins)
+    except ValueError:
+        raise ValueError(f"Time window must look like 22:00-06:00, got {text!r}") from None
+    return minutes[0], minutes[1]
+
+
+def in_window(now: datetime.datetime, window: Tuple[int, int], days: Optional[frozenset] = None) -> bool:
+    """
+    Whether now falls in [start, end); a window past midnight (22:00-06:00)
+    belongs to the day it starts on, and start == end means all day
+    """
+    start, end = window
+    minute = now.hour * 60 + now.minute
+    weekday = now.weekday()
+    if start == end:
+        inside = True
+    elif start < end:
+        inside = start <= minute < end
+    else:
+        inside = minute >= start or minute < end
+        if minute < end:
+            weekday = (weekday - 1) % 7
+    return inside and (days is None or weekday in days)
+
+
+def _names(value) -> List[str]:
+    return [value] if isinstance(value, str) else list(value)
+
+
+def _image(name: str) -> str:
+    """Process names compare without case or a trailing .exe"""
+    name = name.strip().lower()
+    return name[:-4] if name.endswith('.exe') else name
+
+
+def compile_rule(rule: Dict) -> Dict:
+    """
+    Validated copy of a rule with its conditions normalized
+    Raises ValueError for a rule that could never work as written
+    """
+    if not isinstance(rule, dict) or not rule.get('config'):
+        raise ValueError("A rule needs a 'config' to apply")
+    when = rule.get('when') or {}
+    unknown = set(when) - set(CONDITIONS)
+    if unknown:
+        raise ValueError(f"Unknown conditions: {', '.join(sorted(unknown))}")
+
+    compiled = {'name': rule.get('name') or rule['config'], 'config': rule['config'],
+                'enabled': rule.get('enabled', True), 'window': None, 'days': None,
+                'adapters': None, 'ssids': None, 'vpn': None, 'processes': None}
+    if 'time' in when:
+        compiled['window'] = parse_time_window(when['time'])
+    if 'days' in when:
+        try:
+            compiled['days'] = frozenset(DAYS.index(day[:3].lower()) for day in _names(when['days']))
+        except ValueError:
+            raise ValueError(f"Days must be among {', '.join(DAYS)}, got {when['days']!r}") from None
+        if compiled['window'] is None:
+            compiled['window'] = (0, 0)
+    if 'adapter' in when:
+        compiled['adapters'] = frozenset(name.lower() for name in _names(when['adapter']))
+    if 'ssid' in when:
+        compiled['ssids'] = frozenset(_names(when['ssid']))
+    if 'vpn' in when:
+        compiled['vpn'] = bool(when['vpn'])
+    if 'process' in when:
+        compiled['processes'] = frozenset(_image(name) for name in _names(when['process']))
+    return compiled
+
+
+def compile_rules(rules: Iterable[Dict]) -> List[Dict]:
+    """Compiled rules in order; invalid ones are reported and left out"""
+    compiled = []
+    for index, rule in enumerate(rules, 1):
+        try:
+            compiled.append(compile_rule(rule))
+        except ValueError as e:
+            name = rule.get('name', f"#{index}") if isinstance(rule, dict) else f"#{index}"
+            print(f"Ignoring rule {name}: {e}")
+    return compiled
+
+
+def empty_facts() -> Dict:
+    return {'adapters': [], 'ssids': [], 'processes': {}}
+
+
+def has_vpn(adapters: Iterable[str]) -> bool:
+    return any(VPN_PATTERN.search(name) for name in adapters)
+
+
+def matches(rule: Dict, facts: Dict, now: datetime.datetime) -> bool:
+    """Whether every condition of a compiled rule holds"""
+    if not rule['enabled']:
+        return False
+    if rule['window'] is not None and not in_window(now, rule['window'], rule['days']):
+        return False
+    if rule['adapters'] is not None and not any(a.lower() in rule['adapters'] for a in facts['adapters']):
+        return False
+    if rule['ssids'] is not None and not any(ssid in rule['ssids'] for ssid in facts['ssids']):
+        return False
+    if rule['vpn'] is not None and has_vpn(facts['adapters']) != rule['vpn']:
+        return False
+    if rule['processes'] is not None and not any(facts['processes'].get(name) for name in rule['processes']):
+        return False
+    return True
+
+
+def choose(rules: List[Dict], facts: Dict, now: datetime.datetime) -> Optional[Dict]:
+    """The first compiled rule that matches, or None"""
+    for rule in rules:
+        if matches(rule, facts, now):
+            return rule
+    return None
+
+
+def seconds_until_change(rules: List[Dict], now: datetime.datetime) -> Optional[float]:
+    """Seconds until the next time-window edge (or midnight for day rules); None without time rules"""
+    edges = set()
+    for rule in rules:
+        if rule['enabled'] and rule['window'] is not None:
+            edges.update(rule['window'])
+            if rule['days'] is not None:
+                edges.add(0)
+    if not edges:
+        return None
+    seconds_now = now.hour * 3600 + now.minute * 60 + now.second + now.microsecond / 1e6
+    waits = [(edge * 60 - seconds_now) % 86400 or 86400 for edge in edges]
+    return min(waits)
+
+
+# Event sources
+
+# NotifyAddrChange blocks until the next change and cannot be interrupted, so
+# one watcher thread serves every subscriber for the life of the process
+_address_listeners = []
+_address_lock = threading.Lock()
+_address_thread = None
+
+
+def _address_change_waiter() -> Optional[Callable[[], int]]:
+    """A call that blocks until the IPv4 address table changes; None off Windows"""
+    if sys.platform != 'win32':
+        return None
+    import ctypes
+    try:
+        notify = ctypes.windll.iphlpapi.NotifyAddrChange
+    except (AttributeError, OSError):
+        return None
+    return lambda: notify(None, None)
+
+
+def _dispatch_address_changes(wait: Callable[[], int]):
+    global _address_thread
+    while wait() == 0:
+        with _address_lock:
+            listeners = list(_address_listeners)
+        for on_change in listeners:
+            on_change()
+    print("Address change notifications stopped")
+    with _address_lock:
+        _address_thread = None
+
+
+def watch_address_changes(on_change: Callable[[], None]) -> Optional[Callable[[], None]]:
+    """
+    Call on_change whenever an IPv4 address is added or removed (adapter
+    connects or drops, VPN comes up, new DHCP lease); Windows only
+    Returns a function that stops the calls, or None when notifications are unavailable.
+    """
+    global _address_thread
+    with _address_lock:
+        if _address_thread is None:
+            wait = _address_change_waiter()
+            if wait is None:
+                return None
+            _address_thread = threading.Thread(target=_dispatch_address_changes, args=(wait,),
+                                               name='address changes', daemon=True)
+            _address_thread.start()
+        _address_listeners.append(on_change)
+
+    def unsubscribe():
+        with _address_lock:
+            if on_change in _address_listeners:
+                _address_listeners.remove(on_change)
+
+    return unsubscribe
+
+
+class ProcessWatcher:
+    """
+    Reports process starts and exits as on_event('start' | 'stop', image name)
+    Streams WMI process traces from PowerShell. Only when WMI is unavailable
+    does it fall back to diffing tasklist every PROCESS_POLL_INTERVAL seconds,
+    which starts a process per poll.
+    """
+
+    def __init__(self, on_event: Callable[[str, str], None], runner: Optional[CommandRunner] = None,
+                 argv: Optional[List[str]] = None, poll_interval: float = PROCESS_POLL_INTERVAL):
+        self.on_event = on_event
+        self.runner = runner or CommandRunner()
+        self.argv = argv or ['powershell', '-NoProfile', '-NonInteractive', '-Command', PROCESS_TRACE_SCRIPT]
+        self.poll_interval = poll_interval
+        self.mode = None
+        self._process = None
+        self._stop = threading.Event()
+
+    def start(self):
+        self._stop.clear()
+        threading.Thread(target=self._run, name='process watcher', daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+        process = self._process
+        if process is not None and process.poll() is None:
+            process.kill()
+
+    def _run(self):
+        self._stream()
+        if not self._stop.is_set():
+            self._poll()
+
+    def _stream(self):
+        """Forward trace events until stopped or the trace ends"""
+        kwargs = {}
+        if sys.platform == 'win32':
+            kwargs['creationflags'] = subprocess.CREATE_NO_WINDOW
+        try:
+            self._process = subprocess.Popen(self.argv, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                             stderr=subprocess.DEVNULL, text=True, errors='replace',
+                                             bufsize=1, **kwargs)
+        except OSError as e:
+            print(f"Process trace unavailable: {e}; polling tasklist instead")
+            return
+        metrics.SUBPROCESS_SPAWNS.inc(self.argv[0].lower(), 'process')
+
+        ready = False
+        with self._process.stdout:
+            for line in self._process.stdout:
+                kind, _, name = line.strip().partition(' ')
+                if kind == 'ready':
+                    ready = True
+                    self.mode = 'trace'
+                elif ready and kind in ('start', 'stop') and name:
+                    self.on_event(kind, name)
+        self._process.wait()
+        if not self._stop.is_set():
+            reason = "ended" if ready else "unavailable (needs admin rights)"
+            print(f"Process trace {reason}; polling tasklist instead")
+
+    def _poll(self):
+        self.mode = 'poll'
+        previous = None
+        while not self._stop.is_set():
+            try:
+                current = netsh_backend.running_processes(self.runner)
+            except CommandError as e:
+                print(f"Could not list processes: {e}")
+                current = previous
+            if previous is not None and current is not None:
+                for name in current.keys() - previous.keys():
+                    self.on_event('start', name)
+                for name in previous.keys() - current.keys():
+                    self.on_event('stop', name)
+            previous = current
+            self._stop.wait(self.poll_interval)
+
+
+# Engine
+
+def read_network_facts(runner: CommandRunner) -> Dict:
+    """Returns: {'adapters': connected adapter names, 'ssids': connected Wi-Fi networks}"""
+    try:
+        adapters = netsh_backend.connected_adapters(runner)
+    except CommandError as e:
+        print(f"Could not list connected adapters: {e}")
+        adapters = []
+    return {'adapters': adapters, 'ssids': netsh_backend.wifi_ssids(runner)}
+
+
+class RulesEngine:
+    """
+    Applies the config of the first matching rule whenever a trigger changes the decision
+
+    apply(config name, config) runs on the engine thread and returns whether
+    the change went through. on_decision gets a dict for every applied or
+    failed switch: {'rule', 'config', 'trigger', 'applied', 'decision_ms'},
+    where decision_ms runs from the trigger to the start of apply.
+    """
+
+    def __init__(self, settings: Dict, configs: Callable[[], Dict[str, Dict]],
+                 apply: Callable[[str, Dict], bool], runner: Optional[CommandRunner] = None,
+                 on_decision: Optional[Callable[[Dict], None]] = None,
+                 read_network: Optional[Callable[[], Dict]] = None,
+                 read_processes: Optional[Callable[[], Dict[str, int]]] = None,
+                 clock: Callable[[], datetime.datetime] = datetime.datetime.now,
+                 watch_events: bool = True):
+        self.runner = runner or CommandRunner()
+        self.configs = configs
+        self.apply = apply
+        self.on_decision = on_decision
+        self.read_network = read_network or (lambda: read_network_facts(self.runner))
+        self.read_processes = read_processes or (lambda: netsh_backend.running_processes(self.runner))
+        self.clock = clock
+        self.watch_events = watch_events
+        self.rules = compile_rules(settings.get('rules', []))
+        self.facts = empty_facts()
+        self.current_rule = None
+        self.last_decision = None
+        self._events = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = None
+        self._process_watcher = None
+        self._unwatch_addresses = None
+
+    def uses(self, condition: str) -> bool:
+        key = {'adapter': 'adapters', 'ssid': 'ssids', 'process': 'processes', 'time': 'window'}.get(condition, condition)
+        return any(rule['enabled'] and rule[key] is not None for rule in self.rules)
+
+    def set_rules(self, rules: Iterable[Dict]):
+        """Swap in edited rules and decide again"""
+        self.rules = compile_rules(rules)
+        self.current_rule = None
+        self.notify('rules')
+
+    def notify(self, trigger: str, detail=None):
+        """Queue a trigger ('network', 'process', 'rules', ...); safe from any thread"""
+        self._events.put((trigger, detail, time.perf_counter()))
+
+    def start(self):
+        if self.running():
+            return
+        self._stop.clear()
+        self.current_rule = None
+        self.notify('start')
+        self._thread = threading.Thread(target=self._run, name='rules engine', daemon=True)
+        self._thread.start()
+        if self.watch_events:
+            if self.uses('adapter') or self.uses('ssid') or self.uses('vpn'):
+                self._unwatch_addresses = watch_address_changes(lambda: self.notify('network'))
+                if self._unwatch_addresses is None:
+                    print("Address change notifications unavailable; network rules are checked on Refresh")
+            if self.uses('process'):
+                self._process_watcher = ProcessWatcher(lambda kind, name: self.notify('process', (kind, name)),
+                                                       self.runner)
+                self._process_watcher.start()
+
+    def stop(self):
+        self._stop.set()
+        self._events.put(None)
+        if self._unwatch_addresses is not None:
+            self._unwatch_addresses()
+            self._unwatch_addresses = None
+        if self._process_watcher is not None:
+            self._process_watcher.stop()
+            self._process_watcher = None
+
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive() and not self._stop.is_set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            wait = seconds_until_change(self.rules, self.clock())
+            try:
+                event = self._events.get(timeout=min(wait, MAX_WAIT) if wait is not None else MAX_WAIT)
+            except queue.Empty:
+                event = ('time', None, time.perf_counter())
+            if event is None:
+                break
+            events = [event]
+            # Triggers often come in bursts (several address changes per reconnect)
+            while True:
+                try:
+                    event = self._events.get_nowait()
+                except queue.Empty:
+                    break
+                if event is None:
+                    return
+                events.append(event)
+            try:
+                self.handle(events)
+            except Exception as e:
+                print(f"Rules engine error: {e}")
+
+    def handle(self, events: List[Tuple[str, object, float]]) -> Optional[Dict]:
+        """Update facts for a batch of (trigger, detail, perf_counter time) events, then decide"""
+        triggers = {trigger for trigger, _, _ in events}
+        relevant = bool(triggers - {'process'})
+        if triggers & {'start', 'rules', 'network'}:
+            self.facts.update(self.read_network())
+        if 'start' in triggers or 'rules' in triggers:
+            self.facts['processes'] = self._read_processes() if self.uses('process') else {}
+        for trigger, detail, _ in events:
+            if trigger == 'process':
+                relevant |= self._count_process(*detail)
+        if not relevant:
+            return None
+        first_trigger, _, started = events[0]
+        return self.decide(first_trigger, started)
+
+    def _read_processes(self) -> Dict[str, int]:
+        try:
+            return {_image(name): count for name, count in self.read_processes().items()}
+        except CommandError as e:
+            print(f"Could not list processes: {e}")
+            return {}
+
+    def _count_process(self, kind: str, name: str) -> bool:
+        """Track a start/stop; True if a rule watches this program"""
+        name = _image(name)
+        processes = self.facts['processes']
+        if kind == 'start':
+            processes[name] = processes.get(name, 0) + 1
+        elif processes.get(name, 0) > 1:
+            processes[name] -= 1
+        else:
+            processes.pop(name, None)
+        return any(rule['processes'] and name in rule['processes'] for rule in self.rules)
+
+    def decide(self, trigger: str = 'manual', started: Optional[float] = None) -> Optional[Dict]:
+        """Apply the winning rule's config if the winner changed; returns the decision"""
+        started = time.perf_counter() if started is None else started
+        rule = choose(self.rules, self.facts, self.clock())
+        name = rule['name'] if rule else None
+        if name == self.current_rule:
+            return None
+        self.current_rule = name
+        if rule is None:
+            return None
+
+        config = self.configs().get(rule['config'])
+        decision = {'rule': rule['name'], 'config': rule['config'], 'trigger': trigger,
+                    'applied': False, 'decision_ms': (time.perf_counter() - started) * 1000}
+        if config is None:
+            print(f"Rule {rule['name']}: no saved config named {rule['config']}")
+        else:
+            decision['applied'] = bool(self.apply(rule['config'], config))
+            print(f"Rule {rule['name']} ({trigger}): "
+                  f"{'switched to' if decision['applied'] else 'could not switch to'} {rule['config']}")
+        if not decision['applied']:
+            # Try again on the next trigger
+            self.current_rule = None
+        self.last_decision = decision
+        if self.on_decision:
+            self.on_decision(decision)
+        return decision
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Show which rule would apply right now, without changing anything"""
+    parser = argparse.ArgumentParser(description="Check DNS switching rules against this machine")
+    parser.add_argument('--rules', default=RULES_FILE, help=f"rules file (default {RULES_FILE})")
+    args = parser.parse_args(argv)
+
+    settings = load_rules(args.rules)
+    rules = compile_rules(settings['rules'])
+    runner = CommandRunner()
+    facts = read_network_facts(runner)
+    facts['processes'] = {}
+    if any(rule['processes'] for rule in rules):
+        try:
+            facts['processes'] = {_image(n): c for n, c in netsh_backend.running_processes(runner).items()}
+        except CommandError as e:
+            print(f"Could not list processes: {e}")
+
+    print(f"Connected adapters: {', '.join(facts['adapters']) or 'none'}"
+          f"{' (VPN)' if has_vpn(facts['adapters']) else ''}")
+    print(f"Wi-Fi: {', '.join(facts['ssids']) or 'not connected'}")
+    rule = choose(rules, facts, datetime.datetime.now())
+    print(f"Matching rule: {rule['name']} -> {rule['config']}" if rule else "No rule matches")
+    if not settings['enabled']:
+        print("Rule-based switching is turned off")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,162 @@
+"""
+Service latency probing for DNS Manager Pro
+Resolves every A/AAAA address of a service and probes them concurrently
+"""
+
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import metrics
+from icmp_probe import ping_many
+
+FAMILY_NAMES = {
+    socket.AF_INET: 'IPv4',
+    socket.AF_INET6: 'IPv6',
+}
+
+
+def resolve_addresses(host: str) -> List[Tuple[int, str]]:
+    """
+    Resolve all A and AAAA records for a host
+    Returns: list of (family, address) in resolver order, without duplicates
+    """
+    addresses = []
+    seen = set()
+    for family, _, _, _, sockaddr in socket.getaddrinfo(host, None, socket.AF_UNSPEC,
+                                                        socket.SOCK_STREAM):
+        if family not in FAMILY_NAMES:
+            continue
+        address = sockaddr[0]
+        if address not in seen:
+            seen.add(address)
+            addresses.append((family, address))
+    return addresses
+
+
+def measure_connect(address: str, port: int = 443, timeout: float = 2.0) -> Optional[float]:
+    """
+    Measure TCP connect latency to an address
+    Returns: latency in ms or None if the connection failed
+    """
+    family = socket.AF_INET6 if ':' in address else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        start = time.perf_counter()
+        sock.connect((address, port))
+        return (time.perf_counter() - start) * 1000
+    except OSError:
+        return None
+    finally:
+        sock.close()
+
+
+def _summarize_service(host: str, addresses: List[Tuple[int, str]],
+                       latencies: List[Optional[float]]) -> Dict:
+    results = [
+        {'address': address, 'family': FAMILY_NAMES[family], 'latency': latency}
+        for (family, address), latency in zip(addresses, latencies)
+    ]
+
+    families = {}
+    for family_name in FAMILY_NAMES.values():
+        members = [r for r in results if r['family'] == family_name]
+        if not members:
+            continue
+        reachable = sorted((r for r in members if r['latency'] is not None),
+                           key=lambda r: r['latency'])
+        families[family_name] = {
+            'count': len(members),
+            'reachable': len(reachable),
+            'best': reachable[0] if reachable else None,
+            'worst': reachable[-1] if reachable else None,
+        }
+
+    reachable = [f['best'] for f in families.values() if f['best']]
+    best = min(reachable, key=lambda r: r['latency']) if reachable else None
+
+    return {'host': host, 'addresses': results, 'families': families, 'best': best}
+
+
+def _resolve_or_empty(host: str) -> List[Tuple[int, str]]:
+    try:
+        return resolve_addresses(host)
+    except (socket.gaierror, UnicodeError):
+        return []
+
+
+def probe_services(hosts: Iterable[str], count: int = 4, timeout: float = 1.0,
+                   tcp_ports: Optional[Dict[str, int]] = None) -> Dict[str, Dict]:
+    """
+    Resolve many services concurrently, then ping every address from one ICMP prober
+    Hosts listed in tcp_ports are measured by TCP connect time to that port instead.
+    Returns: dict of host -> probe result (see probe_service)
+    """
+    hosts = list(dict.fromkeys(hosts))
+    tcp_ports = tcp_ports or {}
+    if not hosts:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(16, len(hosts))) as executor:
+        resolved = dict(zip(hosts, executor.map(_resolve_or_empty, hosts)))
+
+        tcp_jobs = {(address, tcp_ports[host]): executor.submit(measure_connect, address,
+                                                                tcp_ports[host], timeout)
+                    for host, addresses in resolved.items() if host in tcp_ports
+                    for _, address in addresses}
+
+        icmp_addresses = [address for host, addresses in resolved.items() if host not in tcp_ports
+                          for _, address in addresses]
+        stats = ping_many(icmp_addresses, count=count, timeout=timeout) if icmp_addresses else {}
+        tcp_latency = {key: job.result() for key, job in tcp_jobs.items()}
+
+    results = {}
+    for host, addresses in resolved.items():
+        if host in tcp_ports:
+            latencies = [tcp_latency[(address, tcp_ports[host])] for _, address in addresses]
+        else:
+            latencies = [stats[address]['avg'] for _, address in addresses]
+        for latency in latencies:
+            metrics.observe_probe('tcp' if host in tcp_ports else 'icmp', '', host, latency)
+        results[host] = _summarize_service(host, addresses, latencies)
+    return results
+
+
+def probe_service(host: str,
+                  probe: Optional[Callable[[str, int], Optional[float]]] = None,
+                  max_workers: int = 8, tcp_ports: Optional[Dict[str, int]] = None) -> Dict:
+    """
+    Resolve a service and probe every address concurrently
+    By default all addresses are pinged together by the in-process ICMP prober;
+    a custom per-address `probe(address, family)` runs in a thread pool instead.
+    Returns: dict with per-address latencies and best/worst address per family
+    """
+    if probe is None:
+        return probe_services([host], tcp_ports=tcp_ports)[host]
+
+    addresses = _resolve_or_empty(host)
+    if not addresses:
+        return _summarize_service(host, [], [])
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(addresses))) as executor:
+        latencies = list(executor.map(lambda item: probe(item[1], item[0]), addresses))
+
+    return _summarize_service(host, addresses, latencies)
+
+
+def format_summary(result: Dict) -> str:
+    """Format a probe result as a short per-family summary, e.g. 'v4 23/80ms  v6 41ms'"""
+    parts = []
+    for family_name, family in result['families'].items():
+        tag = 'v4' if family_name == 'IPv4' else 'v6'
+        if not family['best']:
+            parts.append(f"{tag} timeout")
+            continue
+        best = family['best']['latency']
+        worst = family['worst']['latency']
+        if family['reachable'] > 1 and round(worst) != round(best):
+            parts.append(f"{tag} {best:.0f}/{worst:.0f}ms")
+        else:
+            parts.append(f"{tag} {best:.0f}ms")
+    return '  '.join(parts)
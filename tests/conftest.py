@@ -0,0 +1,9 @@
+"""
+Shared pytest setup for DNS Manager Pro tests
+"""
+
+import sys
+from pathlib import Path
+
+# Application modules live in the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,219 @@
+"""
+Fake netsh, ipconfig, route and ping for running DNS Manager Pro tests on Linux
+
+The wrapper scripts next to this file (netsh, ipconfig, route, ping) run
+`fake_tools.py <tool> <args>`. Put this directory first on PATH and point
+DNSMANAGER_FAKE_STATE at a JSON state file:
+
+    {
+      "adapters": [{"name": "Wi-Fi", "admin": "Enabled", "state": "Connected"}],
+      "dns": {"Wi-Fi": {"source": "static", "servers": ["1.1.1.1"]}},
+      "dhcp_dns": {"Wi-Fi": ["192.168.1.1"]},
+      "ping": {"1.1.1.1": 12.5, "10.9.9.9": null},
+      "delay": {"netsh": 0.0},
+      "line_delay": {"ipconfig": 0.01},
+      "admin": true
+    }
+
+delay holds a tool back before it answers; line_delay pauses after every
+output line, like a slow ipconfig on a machine with many adapters.
+netsh changes are written back to the state file. Every invocation is
+appended to <state file>.log, one JSON argument list per line. netsh
+without arguments reads commands from stdin like the interactive shell.
+"""
+
+import json
+import os
+import sys
+import time
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'fixtures')
+ELEVATION_ERROR = "The requested operation requires elevation (Run as administrator).\n"
+
+
+def state_path():
+    return os.environ['DNSMANAGER_FAKE_STATE']
+
+
+def load_state():
+    with open(state_path(), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_state(state):
+    temp_path = state_path() + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(temp_path, state_path())
+
+
+def log_call(tool, args):
+    with open(state_path() + '.log', 'a', encoding='utf-8') as f:
+        f.write(json.dumps([tool] + list(args)) + '\n')
+
+
+def simulate_delay(state, tool):
+    delay = state.get('delay', {}).get(tool, 0)
+    if delay:
+        time.sleep(delay)
+
+
+# --- netsh -----------------------------------------------------------------
+
+def netsh_show_interface(state):
+    lines = ["", "Admin State    State          Type             Interface Name",
+             "-" * 73]
+    for adapter in state['adapters']:
+        lines.append(f"{adapter.get('admin', 'Enabled'):<15}{adapter.get('state', 'Connected'):<15}"
+                     f"{'Dedicated':<17}{adapter['name']}")
+    return 0, '\n'.join(lines) + '\n\n'
+
+
+def netsh_show_dns(state, name):
+    if name not in {a['name'] for a in state['adapters']}:
+        return 1, "The filename, directory name, or volume label syntax is incorrect.\n\n"
+    config = state.get('dns', {}).get(name, {'source': 'dhcp', 'servers': []})
+    if config['source'] == 'static':
+        label = "    Statically Configured DNS Servers:    "
+    else:
+        label = "    DNS servers configured through DHCP:  "
+    servers = config['servers'] or ['None']
+    lines = ["", f'Configuration for interface "{name}"', label + servers[0]]
+    lines += [" " * len(label) + server for server in servers[1:]]
+    lines += ["    Register with which suffix:           Primary only", ""]
+    return 0, '\n'.join(lines) + '\n'
+
+
+def netsh(state, args):
+    words = list(args)
+    lowered = [a.lower() for a in words]
+    if lowered[:3] == ['interface', 'show', 'interface']:
+        return netsh_show_interface(state)
+    if lowered[:4] == ['interface', 'ip', 'show', 'dns'] and len(words) > 4:
+        return netsh_show_dns(state, words[4])
+
+    if lowered[:4] in (['interface', 'ip', 'set', 'dns'], ['interface', 'ip', 'add', 'dns']):
+        if not state.get('admin', True):
+            return 1, ELEVATION_ERROR
+        if len(words) < 6:
+            return 1, "The syntax supplied for this command is not valid.\n"
+        name = words[4]
+        if name not in {a['name'] for a in state['adapters']}:
+            return 1, "The filename, directory name, or volume label syntax is incorrect.\n\n"
+        dns = state.setdefault('dns', {})
+        if lowered[2] == 'set' and lowered[5] == 'static' and len(words) > 6:
+            dns[name] = {'source': 'static', 'servers': [words[6]]}
+        elif lowered[2] == 'set' and lowered[5] == 'dhcp':
+            dns[name] = {'source': 'dhcp', 'servers': list(state.get('dhcp_dns', {}).get(name, []))}
+        elif lowered[2] == 'add':
+            config = dns.setdefault(name, {'source': 'static', 'servers': []})
+            config['servers'].append(words[5])
+        else:
+            return 1, "The syntax supplied for this command is not valid.\n"
+        save_state(state)
+        return 0, "\n"
+
+    return 1, f"The following command was not found: {' '.join(words)}.\n"
+
+
+def netsh_interactive():
+    import shlex
+    while True:
+        sys.stdout.write("netsh>")
+        sys.stdout.flush()
+        line = sys.stdin.readline()
+        if not line or line.strip().lower() in ('exit', 'quit', 'bye'):
+            return 0
+        words = shlex.split(line, posix=True)
+        if not words:
+            continue
+        state = load_state()
+        log_call('netsh', words)
+        simulate_delay(state, 'netsh')
+        _, output = netsh(state, words)
+        sys.stdout.write(output)
+        sys.stdout.flush()
+
+
+# --- ipconfig --------------------------------------------------------------
+
+def ipconfig(state, args):
+    option = args[0].lower() if args else ''
+    if option == '/flushdns':
+        return 0, "\nWindows IP Configuration\n\nSuccessfully flushed the DNS Resolver Cache.\n"
+    if option == '/all':
+        with open(os.path.join(FIXTURES, 'netsh', 'ipconfig_all.txt'), encoding='utf-8') as f:
+            return 0, f.read()
+    return 1, "Error: unrecognized or incomplete command line.\n"
+
+
+# --- route -----------------------------------------------------------------
+
+def route(state, args):
+    if args and args[0].lower() == 'print':
+        with open(os.path.join(FIXTURES, 'netsh', 'route_print.txt'), encoding='utf-8') as f:
+            return 0, f.read()
+    return 1, "The syntax of this command is incorrect.\n"
+
+
+# --- ping ------------------------------------------------------------------
+
+def ping(state, args):
+    count = 4
+    address = None
+    i = 0
+    while i < len(args):
+        if args[i] in ('-c', '-n'):
+            count = int(args[i + 1])
+            i += 2
+            continue
+        if not args[i].startswith('-'):
+            address = args[i]
+        i += 1
+    if address is None:
+        return 2, "ping: usage error: Destination address required\n"
+
+    rtt = state.get('ping', {}).get(address)
+    lines = [f"PING {address} ({address}) 56(84) bytes of data."]
+    received = 0
+    if rtt is not None:
+        for seq in range(1, count + 1):
+            lines.append(f"64 bytes from {address}: icmp_seq={seq} ttl=57 time={rtt:.1f} ms")
+            received += 1
+    lines += ["", f"--- {address} ping statistics ---",
+              f"{count} packets transmitted, {received} received, "
+              f"{(count - received) * 100 // count}% packet loss, time {count * 1000}ms"]
+    if received:
+        lines.append(f"rtt min/avg/max/mdev = {rtt:.3f}/{rtt:.3f}/{rtt:.3f}/0.000 ms")
+    return (0 if received else 1), '\n'.join(lines) + '\n'
+
+
+TOOLS = {'netsh': netsh, 'ipconfig': ipconfig, 'route': route, 'ping': ping}
+
+
+def write_output(stream, output, line_delay):
+    if not line_delay:
+        stream.write(output)
+        return
+    for line in output.splitlines(keepends=True):
+        stream.write(line)
+        stream.flush()
+        time.sleep(line_delay)
+
+
+def main(argv):
+    tool, args = argv[0], argv[1:]
+    if tool == 'netsh' and not args:
+        return netsh_interactive()
+    state = load_state()
+    log_call(tool, args)
+    simulate_delay(state, tool)
+    code, output = TOOLS[tool](state, args)
+    # Like the real tools, only usage errors go to stderr
+    write_output(sys.stderr if code == 2 else sys.stdout, output,
+                 state.get('line_delay', {}).get(tool, 0))
+    return code
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,115 @@
+"""
+Tests for the time-to-service benchmark, run against loopback DNS stubs
+"""
+
+import socket
+import time
+
+import pytest
+
+from benchmark import run_time_to_service_benchmark, time_to_service
+from dns_query import DNSError, resolve
+from dns_stub import DNSStubServer
+from service_probe import measure_connect
+
+
+@pytest.fixture
+def tcp_listener():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(64)
+    yield sock.getsockname()[1]
+    sock.close()
+
+
+def start_stub_pair(near_delay, far_delay):
+    """
+    Two resolvers on the same port but different loopback addresses:
+    127.0.0.1 answers quickly with a far edge, 127.0.0.2 answers slowly
+    with the near edge
+    """
+    fast = DNSStubServer({"game.test": ["127.0.0.3"]}, delay=far_delay, host="127.0.0.1").start()
+    slow = DNSStubServer({"game.test": ["127.0.0.4"]}, delay=near_delay,
+                         host="127.0.0.2", port=fast.port).start()
+    return fast, slow
+
+
+def test_resolve_through_stub():
+    with DNSStubServer({"game.test": ["127.0.0.9", "::1"]}) as stub:
+        response = resolve("game.test", "127.0.0.1", port=stub.port)
+        assert response["addresses"] == ["127.0.0.9"]
+        assert response["answers"][0]["ttl"] == 300
+
+        missing = resolve("missing.test", "127.0.0.1", port=stub.port)
+        assert missing["rcode"] == 3
+        assert missing["addresses"] == []
+
+
+def test_resolve_times_out_without_server():
+    with pytest.raises(DNSError):
+        resolve("game.test", "127.0.0.1", port=9, timeout=0.2)
+
+
+def test_measure_connect(tcp_listener):
+    assert measure_connect("127.0.0.1", port=tcp_listener) is not None
+
+
+def test_time_to_service_uses_returned_address(tcp_listener):
+    with DNSStubServer({"game.test": ["127.0.0.1"]}, delay=0.05) as stub:
+        result = time_to_service("game.test", {"primary": "127.0.0.1", "secondary": ""},
+                                 connect=lambda a, port: measure_connect(a, port=tcp_listener),
+                                 dns_port=stub.port)
+    assert result["address"] == "127.0.0.1"
+    assert result["lookup"] >= 50
+    assert result["total"] == pytest.approx(result["lookup"] + result["connect"])
+
+
+def test_ranking_prefers_near_answer_over_fast_lookup():
+    fast, slow = start_stub_pair(near_delay=0.03, far_delay=0.0)
+    edge_rtt = {"127.0.0.3": 0.15, "127.0.0.4": 0.01}
+
+    def fake_connect(address, port):
+        time.sleep(edge_rtt[address])
+        return edge_rtt[address] * 1000
+
+    try:
+        configs = {
+            "Fast lookup, far edge": {"primary": "127.0.0.1", "secondary": ""},
+            "Slow lookup, near edge": {"primary": "127.0.0.2", "secondary": ""},
+            "Dead": {"primary": "127.0.0.5", "secondary": ""},
+        }
+        ranking = run_time_to_service_benchmark(configs, {"Game": "game.test"},
+                                                connect=fake_connect, dns_port=fast.port,
+                                                timeout=0.3)
+    finally:
+        fast.stop()
+        slow.stop()
+
+    assert [entry["config"] for entry in ranking] == [
+        "Slow lookup, near edge", "Fast lookup, far edge", "Dead"]
+    best = ranking[0]
+    assert best["avg_lookup"] >= 30
+    assert best["services"]["Game"]["address"] == "127.0.0.4"
+    assert ranking[1]["avg_lookup"] < best["avg_lookup"]
+    assert ranking[2]["avg_total"] is None
+
+
+def test_ip_literal_targets_skip_lookup(tcp_listener):
+    result = time_to_service("127.0.0.1", {"primary": "127.0.0.5", "secondary": ""},
+                             connect=lambda a, port: measure_connect(a, port=tcp_listener))
+    assert result["lookup"] == 0.0
+    assert result["total"] is not None
+
+
+def test_weights_shift_the_average():
+    stub = DNSStubServer({"a.test": ["127.0.0.1"], "b.test": ["127.0.0.2"]}).start()
+    rtt = {"127.0.0.1": 10.0, "127.0.0.2": 100.0}
+    try:
+        ranking = run_time_to_service_benchmark(
+            {"Only": {"primary": "127.0.0.1", "secondary": ""}},
+            {"A": {"host": "a.test", "port": 443, "weight": 3.0},
+             "B": {"host": "b.test", "port": 8443, "weight": 1.0}},
+            connect=lambda address, port: rtt[address], dns_port=stub.port)
+    finally:
+        stub.stop()
+    assert ranking[0]["avg_connect"] == pytest.approx((3 * 10.0 + 100.0) / 4)
@@ -0,0 +1,145 @@
+"""
+Tests for blocklist parsing, the compiled domain index and filtering in the forwarder
+"""
+
+import os
+import time
+
+import blocklist
+from blocklist import ALLOW, ALLOW_TREE, BLOCK, BLOCK_TREE, Blocklist, parse_line
+from dns_forwarder import DNSForwarder, SplitRouter
+from dns_query import RCODE_NOERROR, RCODE_NXDOMAIN, TYPE_AAAA, resolve
+from dns_stub import DNSStubServer
+
+HOSTS = """\
+# Ad servers
+0.0.0.0 ads.example.com tracker.example.net  # inline comment
+127.0.0.1 localhost
+::1 ip6-localhost
+"""
+
+ADBLOCK = """\
+[Adblock Plus 2.0]
+! Title: test list
+||doubleclick.test^
+||metrics.shop.test^$important
+@@||cdn.doubleclick.test^
+||ads.test/banner.png
+example.org##.ad-banner
+*.telemetry.test
+plain.test
+"""
+
+
+def write(path, text):
+    path.write_text(text)
+    return str(path)
+
+
+def test_list_formats():
+    assert parse_line('0.0.0.0 a.test B.test. # x') == [(BLOCK, 'a.test'), (BLOCK, 'b.test')]
+    assert parse_line('127.0.0.1 localhost') == []
+    assert parse_line('192.168.1.5 printer.lan') == []
+    assert parse_line('||Ads.Test^') == [(BLOCK_TREE, 'ads.test')]
+    assert parse_line('@@||ok.test^') == [(ALLOW_TREE, 'ok.test')]
+    assert parse_line('||ads.test^$third-party') == []
+    assert parse_line('||ads.test/path') == []
+    assert parse_line('*.ads.test') == [(BLOCK_TREE, 'ads.test')]
+    assert parse_line('ads.test') == [(BLOCK, 'ads.test')]
+    for ignored in ('', '# comment', '! comment', '[Adblock]', 'bad name!.test', 'example.org##.ad'):
+        assert parse_line(ignored) == []
+    assert ALLOW not in [section for section, _ in parse_line('@@||ok.test^')]
+
+
+def test_exact_subtree_and_allow_rules(tmp_path):
+    lists = [write(tmp_path / 'hosts', HOSTS), write(tmp_path / 'adblock.txt', ADBLOCK)]
+    bl = Blocklist.load(lists, allow=['keep.telemetry.test'], index_dir=str(tmp_path / 'index'))
+    try:
+        assert len(bl) == 6
+        assert bl.blocks('ads.example.com') and bl.blocks('ADS.example.com.')
+        assert not bl.blocks('www.ads.example.com')        # hosts entries are exact
+        assert bl.blocks('doubleclick.test') and bl.blocks('x.y.doubleclick.test')
+        assert not bl.blocks('cdn.doubleclick.test') and not bl.blocks('a.cdn.doubleclick.test')
+        assert bl.blocks('metrics.shop.test') and not bl.blocks('shop.test')
+        assert bl.blocks('telemetry.test') and bl.blocks('eu.telemetry.test')
+        assert not bl.blocks('keep.telemetry.test')
+        assert bl.blocks('plain.test') and not bl.blocks('sub.plain.test')
+        assert not bl.blocks('ads.test') and not bl.blocks('localhost') and not bl.blocks('')
+    finally:
+        bl.close()
+    assert bl.indexes == []
+
+
+def test_only_changed_lists_are_compiled_again(tmp_path):
+    index_dir = str(tmp_path / 'index')
+    hosts = write(tmp_path / 'hosts', HOSTS)
+    adblock = write(tmp_path / 'adblock.txt', ADBLOCK)
+
+    first = Blocklist.load([hosts, adblock], index_dir=index_dir)
+    assert first.rebuilt == [hosts, adblock]
+    first.close()
+
+    again = Blocklist.load([hosts, adblock], index_dir=index_dir)
+    assert again.rebuilt == []
+    again.close()
+
+    write(tmp_path / 'hosts', HOSTS + '0.0.0.0 new.example.com\n')
+    updated = Blocklist.load([hosts, adblock, str(tmp_path / 'missing.txt')], index_dir=index_dir)
+    try:
+        assert updated.rebuilt == [hosts] and len(updated.indexes) == 2
+        assert updated.blocks('new.example.com')
+    finally:
+        updated.close()
+    assert len(os.listdir(index_dir)) == 2        # the old hosts index was removed
+
+
+def test_lookups_stay_fast_with_many_entries(tmp_path):
+    source = tmp_path / 'big.txt'
+    with open(source, 'w') as f:
+        for i in range(200_000):
+            f.write(f"0.0.0.0 ad{i}.tracker{i % 97}.test\n")
+    bl = Blocklist.load([str(source)], index_dir=str(tmp_path / 'index'))
+    try:
+        assert len(bl) == 200_000
+        names = [f"ad{i}.tracker{i % 97}.test" for i in range(0, 200_000, 100)]
+        names += [f"www.site{i}.test" for i in range(2_000)]
+        start = time.perf_counter()
+        results = [bl.blocks(name) for name in names]
+        per_lookup = (time.perf_counter() - start) / len(names)
+        assert results.count(True) == 2_000
+        assert per_lookup < 100e-6
+    finally:
+        bl.close()
+
+
+def test_forwarder_answers_blocked_names_locally(tmp_path):
+    lists = [write(tmp_path / 'adblock.txt', ADBLOCK)]
+    bl = Blocklist.load(lists, index_dir=str(tmp_path / 'index'))
+    zones = {'doubleclick.test': ['10.9.9.9'], 'example.com': ['93.184.216.34']}
+    with DNSStubServer(zones) as upstream:
+        configs = {'Up': {'primary': upstream.address}}
+        with DNSForwarder(SplitRouter({}, 'Up'), lambda: configs, port=0, blocklist=bl) as forwarder:
+            blocked = resolve('doubleclick.test', forwarder.address)
+            assert blocked['rcode'] == RCODE_NXDOMAIN and blocked['addresses'] == []
+            assert resolve('example.com', forwarder.address)['addresses'] == ['93.184.216.34']
+
+            forwarder.set_blocklist(bl, 'null')
+            assert resolve('ad.doubleclick.test', forwarder.address)['addresses'] == ['0.0.0.0']
+            null6 = resolve('ad.doubleclick.test', forwarder.address, qtype=TYPE_AAAA)
+            assert null6['rcode'] == RCODE_NOERROR and null6['addresses'] == ['::']
+
+            forwarder.set_blocklist(None)
+            assert resolve('doubleclick.test', forwarder.address)['addresses'] == ['10.9.9.9']
+    assert forwarder.blocked == 3
+    assert upstream.queries == 2
+    assert bl.indexes == []          # closed when it was detached
+
+
+def test_settings_defaults(tmp_path, capsys):
+    path = tmp_path / 'blocklist.json'
+    assert blocklist.load_settings(str(path)) == {'lists': [], 'allow': [], 'response': 'nxdomain'}
+    path.write_text('{"lists": ["a.txt"], "unknown": 1}')
+    assert blocklist.load_settings(str(path))['lists'] == ['a.txt']
+    path.write_text('{"lists": [')
+    assert blocklist.load_settings(str(path))['lists'] == []
+    assert "Error reading" in capsys.readouterr().out
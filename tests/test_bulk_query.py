@@ -0,0 +1,114 @@
+"""
+Tests for bulk DNS queries, run against the local DNS stub server
+"""
+
+import threading
+import time
+
+from bulk_query import (compare_resolvers, format_summary, lookup_resolver, read_names,
+                        resolve_many, resolve_many_with_config, summarize)
+from dns_query import TYPE_AAAA
+from dns_stub import DNSStubServer
+
+
+def host(i):
+    return f"host{i}.test"
+
+
+RECORDS = {host(i): [f"10.1.{i // 250}.{i % 250 + 1}"] for i in range(500)}
+
+
+def test_read_names():
+    lines = ["# blocklist\n", "\n", "0.0.0.0 Ads.Example.com  # tracker\n",
+             "example.org.\n", "ads.example.com\n"]
+    assert read_names(lines) == ["ads.example.com", "example.org"]
+
+
+def test_many_names_are_pipelined():
+    names = list(RECORDS) + ["missing.test"]
+    with DNSStubServer(RECORDS, delay=0.05) as stub:
+        start = time.perf_counter()
+        results = list(resolve_many(names, stub.address, window=256))
+        elapsed = time.perf_counter() - start
+
+    by_name = {r["name"]: r for r in results}
+    assert len(results) == len(names)
+    assert all(by_name[name]["addresses"] == RECORDS[name] for name in RECORDS)
+    assert by_name["missing.test"]["status"] == "NXDOMAIN"
+    # 501 queries at 50 ms each, one at a time, would take 25 s
+    assert elapsed < 5
+
+    summary = summarize(results, elapsed)
+    assert (summary["answered"], summary["nxdomain"], summary["failed"]) == (500, 1, 0)
+    assert summary["p50"] >= 50
+    assert "500 answered" in format_summary(summary)
+
+
+def test_truncated_answers_are_retried_over_tcp():
+    many = [f"10.0.0.{i}" for i in range(1, 61)]
+    with DNSStubServer({"big.test": many, "small.test": ["127.0.0.1"]}) as stub:
+        results = {r["name"]: r for r in resolve_many(["big.test", "small.test"], stub.address)}
+    assert results["big.test"]["via"] == "tcp" and len(results["big.test"]["addresses"]) == 60
+    assert results["small.test"]["via"] == "udp"
+    assert stub.tcp_queries == 1
+
+
+def test_lost_queries_are_retried():
+    with DNSStubServer(RECORDS, loss=0.2, seed=7) as stub:
+        results = list(resolve_many(list(RECORDS)[:100], stub.address, timeout=0.2, retries=6))
+    assert all(r["rcode"] == 0 for r in results)
+    assert any(r["attempts"] > 1 for r in results)
+    assert stub.dropped > 0
+
+
+def test_unreachable_resolver_reports_errors():
+    results = list(resolve_many(["a.test", "b.test"], "127.0.0.1:9", timeout=0.2, retries=1))
+    assert [r["error"] for r in results] == ["Timeout after 2 attempts"] * 2
+    assert summarize(results)["failed"] == 2
+
+
+def test_secondary_answers_what_the_primary_dropped():
+    with DNSStubServer(RECORDS, zones={"host1.test": {"loss": 1.0}}) as primary, \
+            DNSStubServer(RECORDS) as secondary:
+        config = {"primary": primary.address, "secondary": secondary.address}
+        results = {r["name"]: r for r in resolve_many_with_config(
+            [host(0), host(1)], config, timeout=0.2, retries=0)}
+    assert results[host(0)]["server"] == primary.address
+    assert results[host(1)]["server"] == secondary.address
+    assert results[host(1)]["addresses"] == RECORDS[host(1)]
+
+
+def test_compare_resolvers_flags_differences():
+    with DNSStubServer({"same.test": ["1.2.3.4"], "cdn.test": ["5.5.5.5"]}) as one, \
+            DNSStubServer({"same.test": ["1.2.3.4"], "cdn.test": ["6.6.6.6"]}) as two:
+        rows = compare_resolvers(["same.test", "cdn.test", "same.test"],
+                                 {"One": {"primary": one.address}, "Two": {"primary": two.address}})
+    assert [(row["name"], row["agree"]) for row in rows] == [("same.test", True), ("cdn.test", False)]
+    assert rows[1]["results"]["Two"]["addresses"] == ["6.6.6.6"]
+
+
+def test_compare_resolvers_reports_a_broken_resolver_as_failed():
+    with DNSStubServer({"same.test": ["1.2.3.4"]}) as stub:
+        rows = compare_resolvers(["same.test"], {"Good": {"primary": stub.address},
+                                                 "Bad": {"primary": "no-such-resolver.invalid"}},
+                                 timeout=0.2, retries=0)
+    assert rows[0]["results"]["Good"]["addresses"] == ["1.2.3.4"]
+    assert rows[0]["results"]["Bad"]["rcode"] is None
+    assert rows[0]["results"]["Bad"]["error"]
+
+
+def test_cancel_stops_the_run():
+    cancel = threading.Event()
+    with DNSStubServer(RECORDS, delay=0.05) as stub:
+        results = []
+        for result in resolve_many(list(RECORDS), stub.address, window=10, qtype=TYPE_AAAA,
+                                   cancel=cancel):
+            results.append(result)
+            cancel.set()
+    assert len(results) < 20
+
+
+def test_lookup_resolver():
+    resolvers = {"Cloudflare": {"primary": "1.1.1.1", "secondary": "1.0.0.1"}}
+    assert lookup_resolver("cloudflare", resolvers)["secondary"] == "1.0.0.1"
+    assert lookup_resolver("127.0.0.1:5353", resolvers) == {"primary": "127.0.0.1:5353", "secondary": ""}
@@ -0,0 +1,88 @@
+"""
+Tests for the service catalog
+"""
+
+import json
+
+from catalog import ServiceCatalog, bundled_catalog_path
+
+
+def write(path, data):
+    path.write_text(json.dumps(data), encoding="utf-8")
+    return path
+
+
+def test_bundled_catalog():
+    catalog = ServiceCatalog([bundled_catalog_path()])
+    assert len(catalog.targets) == 20
+    assert catalog.presets["Cloudflare"]["primary"] == "1.1.1.1"
+    assert "Valorant" in catalog.target_group("gaming")
+    assert catalog.target_group("ai") == ["ChatGPT", "Gemini", "Claude", "Perplexity"]
+    assert catalog.target_groups()["ai"] == "AI Platforms"
+    assert "AdGuard" in catalog.preset_group("filtering")
+
+
+def test_nothing_is_read_until_first_use(tmp_path):
+    path = write(tmp_path / "services.json", {"targets": [{"name": "A", "host": "a.test"}]})
+    catalog = ServiceCatalog([path])
+    path.unlink()
+    # Loaded lazily, so the deleted file simply yields an empty catalog
+    assert catalog.targets == {}
+
+
+def test_user_catalog_adds_overrides_and_disables(tmp_path):
+    bundled = write(tmp_path / "services.json", {
+        "groups": {"gaming": "Gaming"},
+        "targets": [
+            {"name": "Game", "host": "game.test", "groups": ["gaming"]},
+            {"name": "Video", "host": "video.test"},
+        ],
+        "presets": [{"name": "Resolver", "primary": "192.0.2.53"}],
+    })
+    user = write(tmp_path / "service_catalog.json", {
+        "groups": {"internal": "Internal"},
+        "targets": [
+            {"name": "Video", "enabled": False},
+            {"name": "Game", "weight": 2},
+            {"name": "Intranet", "host": "intranet.corp", "groups": ["internal"],
+             "probe": "tcp", "port": 8443},
+        ],
+    })
+
+    catalog = ServiceCatalog([bundled, user])
+
+    assert list(catalog.targets) == ["Game", "Intranet"]
+    assert catalog.targets["Game"]["weight"] == 2.0
+    assert catalog.targets["Game"]["host"] == "game.test"
+    assert catalog.targets["Intranet"]["probe"] == "tcp"
+    assert catalog.target_group("internal") == ["Intranet"]
+    assert catalog.target_groups() == {"gaming": "Gaming", "internal": "Internal"}
+    assert catalog.presets["Resolver"]["secondary"] == ""
+
+
+def test_invalid_entries_are_skipped(tmp_path):
+    path = write(tmp_path / "services.json", {"targets": [
+        {"name": "No host"},
+        {"name": "Bad probe", "host": "x.test", "probe": "carrier-pigeon"},
+        {"name": "Good", "host": "good.test"},
+    ]})
+    assert list(ServiceCatalog([path]).targets) == ["Good"]
+
+
+def test_malformed_presets_are_skipped(tmp_path, capsys):
+    path = write(tmp_path / "services.json", {"presets": [
+        {"name": "Bad groups", "primary": "1.1.1.1", "groups": 5},
+        {"name": "No primary"},
+        {"name": "Good", "primary": "9.9.9.9"},
+    ]})
+    assert list(ServiceCatalog([path]).presets) == ["Good"]
+    assert capsys.readouterr().out.count("Skipping catalog preset") == 2
+
+
+def test_reload_picks_up_changes(tmp_path):
+    path = write(tmp_path / "services.json", {"targets": [{"name": "A", "host": "a.test"}]})
+    catalog = ServiceCatalog([path])
+    assert list(catalog.targets) == ["A"]
+    write(path, {"targets": [{"name": "B", "host": "b.test"}]})
+    catalog.reload()
+    assert list(catalog.targets) == ["B"]
@@ -0,0 +1,205 @@
+"""
+Tests for the command runner, its shell session and the netsh backend
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+import netsh_backend
+from command_runner import (CommandError, CommandRunner, FakeRunner,
+                            posix_shell_session)
+
+PYTHON = sys.executable
+
+SHOW_INTERFACE = """
+Admin State    State          Type             Interface Name
+-------------------------------------------------------------------------
+Enabled        Connected      Dedicated        Ethernet 2
+Enabled        Disconnected   Dedicated        Wi-Fi
+Disabled       Disconnected   Dedicated        Old VPN
+"""
+
+SHOW_DNS_STATIC = """
+Configuration for interface "Wi-Fi"
+    Statically Configured DNS Servers:    1.1.1.1
+                                          1.0.0.1
+    Register with which suffix:           Primary only
+"""
+
+SHOW_DNS_DHCP = """
+Configuration for interface "Wi-Fi"
+    DNS servers configured through DHCP:  None
+    Register with which suffix:           Primary only
+"""
+
+
+def test_run_records_output_and_duration():
+    runner = CommandRunner()
+    result = runner.run([PYTHON, "-c", "import sys; print('out'); print('err', file=sys.stderr)"])
+    assert result.ok
+    assert result.stdout.strip() == "out"
+    assert result.stderr.strip() == "err"
+    assert result.duration > 0
+    assert list(runner.history) == [result]
+
+
+def test_failures_are_reported_not_raised():
+    runner = CommandRunner(history_size=2)
+    failed = runner.run([PYTHON, "-c", "import sys; sys.exit(3)"])
+    missing = runner.run(["definitely-not-a-program-xyz"])
+    slow = runner.run([PYTHON, "-c", "import time; time.sleep(5)"], timeout=0.2)
+
+    assert failed.returncode == 3 and not failed.ok
+    assert missing.returncode is None and missing.error
+    assert slow.timed_out and slow.duration < 2000
+    assert list(runner.history) == [missing, slow]
+
+    with pytest.raises(CommandError, match="exit code 3"):
+        failed.check_returncode()
+    with pytest.raises(CommandError, match="timed out"):
+        runner.run([PYTHON, "-c", "import time; time.sleep(5)"], timeout=0.2, check=True)
+
+
+def test_fake_runner_matches_longest_prefix():
+    runner = FakeRunner({
+        "netsh interface": "generic",
+        "netsh interface show interface": SHOW_INTERFACE,
+        "ipconfig /flushdns": (1, "", "access denied"),
+        "ping": subprocess.TimeoutExpired(["ping"], 1),
+    })
+    assert runner.run(["netsh", "interface", "show", "interface"]).stdout == SHOW_INTERFACE
+    assert runner.run(["netsh", "interface", "ip", "show", "dns"]).stdout == "generic"
+    assert runner.run(["ipconfig", "/flushdns"]).stderr == "access denied"
+    assert runner.run(["ping", "1.1.1.1"]).timed_out
+    assert runner.run(["git", "pull"]).error
+    assert runner.calls[0] == ["netsh", "interface", "show", "interface"]
+    assert {r.via for r in runner.history} == {"fake"}
+
+
+def test_stream_passes_lines_as_they_arrive():
+    script = ("import sys, time\n"
+              "for i in range(3):\n"
+              "    print(f'line {i}', flush=True); time.sleep(0.2)\n"
+              "print('err', file=sys.stderr)")
+    runner = CommandRunner()
+    arrivals = []
+    start = time.perf_counter()
+    result = runner.stream([PYTHON, "-c", script], lambda line: arrivals.append(
+        (line, time.perf_counter() - start)))
+
+    assert result.ok and result.stdout == "line 0\nline 1\nline 2\n"
+    assert result.stderr.strip() == "err"
+    assert [line for line, _ in arrivals] == ["line 0\n", "line 1\n", "line 2\n"]
+    # The first line is delivered long before the command finishes
+    assert arrivals[0][1] < result.duration / 1000 - 0.3
+    assert list(runner.history) == [result]
+
+
+def test_stream_timeout_keeps_partial_output():
+    runner = CommandRunner()
+    lines = []
+    result = runner.stream([PYTHON, "-c", "import time; print('partial', flush=True); time.sleep(5)"],
+                           lines.append, timeout=0.5)
+    assert result.timed_out and result.stdout == "partial\n"
+    assert lines == ["partial\n"] and result.duration < 3000
+
+    fake = FakeRunner({"ipconfig /all": "a\nb\n"})
+    assert fake.stream(["ipconfig", "/all"], lines.append).via == "fake"
+    assert lines[1:] == ["a\n", "b\n"]
+
+
+@pytest.mark.skipif(not os.path.exists("/bin/sh"), reason="needs a POSIX shell")
+def test_shell_session_reuses_one_process():
+    runner = CommandRunner(session=posix_shell_session())
+    try:
+        first = runner.run(["echo", "hello world"], use_session=True)
+        failing = runner.run(["sh", "-c", "echo oops; exit 4"], use_session=True)
+        pid = runner.run(["sh", "-c", "echo $PPID"], use_session=True)
+        pid_again = runner.run(["sh", "-c", "echo $PPID"], use_session=True)
+        direct = runner.run(["echo", "direct"])
+    finally:
+        runner.close()
+
+    assert first.via == "session" and first.stdout == "hello world\n"
+    assert failing.returncode == 4 and failing.stdout == "oops\n"
+    assert pid.stdout == pid_again.stdout
+    assert direct.via == "process"
+
+
+@pytest.mark.skipif(not os.path.exists("/bin/sh"), reason="needs a POSIX shell")
+def test_hung_session_falls_back_to_processes():
+    runner = CommandRunner(session=posix_shell_session())
+    result = runner.run([PYTHON, "-c", "import time; time.sleep(0.5); print('done')"],
+                        timeout=0.2, use_session=True)
+    assert result.via == "process" and result.timed_out
+    assert runner.session is None
+
+
+@pytest.mark.parametrize("fixture, expected, settings", [
+    ("ip_show_dns_static.txt", {"primary": "1.1.1.1", "secondary": "1.0.0.1"},
+     {"source": "static", "servers": ["1.1.1.1", "1.0.0.1"]}),
+    # Servers handed out by DHCP: the adapter is automatic
+    ("ip_show_dns_dhcp.txt", None, {"source": "dhcp", "servers": ["192.168.1.1"]}),
+    ("ip_show_dns_none.txt", None, {"source": "dhcp", "servers": []}),
+    ("ip_show_dns_static_de.txt", {"primary": "9.9.9.9", "secondary": "149.112.112.112"},
+     {"source": "static", "servers": ["9.9.9.9", "149.112.112.112"]}),
+])
+def test_show_dns_fixtures(fixture, expected, settings):
+    path = os.path.join(os.path.dirname(__file__), "fixtures", "netsh", fixture)
+    with open(path, encoding="utf-8", newline="") as f:
+        output = f.read()
+    assert netsh_backend.parse_dns_servers(output) == expected
+    assert netsh_backend.parse_dns_settings(output) == settings
+
+
+class CannedSession:
+    """Shell session stand-in that answers every command with the same text and no exit code"""
+
+    def __init__(self, output):
+        self.output = output
+
+    def handles(self, args):
+        return True
+
+    def execute(self, args, timeout):
+        return 0, self.output
+
+    def close(self):
+        pass
+
+
+@pytest.mark.parametrize("output, rerun", [
+    (SHOW_DNS_STATIC, False),
+    ('\nKonfiguration f\u00fcr die Schnittstelle "WLAN"\n'
+     '    \u00dcber DHCP konfigurierte DNS-Server:  Keine\n', False),
+    ("The filename, directory name, or volume label syntax is incorrect.\n\n", True),
+    ("Das Element wurde nicht gefunden.\n", True),
+])
+def test_only_session_errors_are_asked_again(output, rerun):
+    runner = FakeRunner({"netsh interface ip show dns": (1, "Element not found.\n", "")},
+                        session=CannedSession(output))
+    netsh_backend.get_dns_servers(runner, "WLAN")
+    assert [entry.via for entry in runner.history] == (["session", "fake"] if rerun else ["session"])
+
+
+def test_netsh_backend_parses_and_issues_commands():
+    runner = FakeRunner({
+        "netsh interface show interface": SHOW_INTERFACE,
+        ("netsh", "interface", "ip", "show", "dns", "Wi-Fi"): SHOW_DNS_STATIC,
+        ("netsh", "interface", "ip", "show", "dns", "Ethernet 2"): SHOW_DNS_DHCP,
+        "netsh interface ip set dns": "",
+        "netsh interface ip add dns": (1, "", "The requested operation requires elevation"),
+    })
+    assert netsh_backend.list_adapters(runner) == ["Ethernet 2", "Wi-Fi"]
+    assert netsh_backend.get_dns_servers(runner, "Wi-Fi") == {"primary": "1.1.1.1", "secondary": "1.0.0.1"}
+    assert netsh_backend.get_dns_servers(runner, "Ethernet 2") is None
+    assert netsh_backend.get_dns_servers(runner, "Missing") is None
+
+    netsh_backend.set_dns(runner, "Wi-Fi", "9.9.9.9")
+    assert runner.calls[-1] == ["netsh", "interface", "ip", "set", "dns", "Wi-Fi", "static", "9.9.9.9"]
+    with pytest.raises(CommandError, match="elevation"):
+        netsh_backend.set_dns(runner, "Wi-Fi", "9.9.9.9", "149.112.112.112")
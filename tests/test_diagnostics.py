@@ -0,0 +1,78 @@
+"""
+Tests for the concurrent, streaming network diagnostics
+"""
+
+import subprocess
+from pathlib import Path
+
+import diagnostics
+from command_runner import FakeRunner
+from dns_stub import DNSStubServer
+
+FIXTURES = Path(__file__).parent / "fixtures" / "netsh"
+IPCONFIG_ALL = (FIXTURES / "ipconfig_all.txt").read_text()
+ROUTE_PRINT = (FIXTURES / "route_print.txt").read_text()
+
+
+def test_parse_ipconfig_all():
+    model = diagnostics.parse_ipconfig_all(IPCONFIG_ALL)
+    assert model["host"]["Host Name"] == "GAMING-PC"
+    wifi, ethernet, tunnel = model["adapters"]
+    assert (wifi["name"], wifi["type"]) == ("Wi-Fi", "Wireless LAN")
+    assert wifi["ipv4"] == ["192.168.1.23"] and wifi["gateways"] == ["192.168.1.1"]
+    assert wifi["dns_servers"] == ["1.1.1.1", "1.0.0.1"] and wifi["dhcp"]
+    assert not ethernet["connected"]
+    assert tunnel["dns_servers"] == ["10.66.0.1", "fd00:66::1"]
+    assert tunnel["ipv6"] == ["fe80::9c1f:2a3b:4c5d:6e7f%25"] and tunnel["gateways"] == []
+
+
+def test_parse_route_print():
+    model = diagnostics.parse_route_print(ROUTE_PRINT)
+    assert model["default_gateways"] == ["192.168.1.1"]
+    assert model["interfaces"][2] == {"index": 25, "mac": "00-FF-1A-2B-3C-4D", "name": "WireGuard Tunnel"}
+    vpn = [r for r in model["routes"] if r["destination"] == "10.66.0.0"][0]
+    assert vpn == {"destination": "10.66.0.0", "netmask": "255.255.0.0", "gateway": None,
+                   "interface": "10.66.0.2", "metric": 5}
+    assert len(model["routes"]) == 9
+
+
+def test_report_model_and_streamed_lines():
+    runner = FakeRunner({"ipconfig /all": IPCONFIG_ALL, "route print": ROUTE_PRINT})
+    streamed = {}
+    finished = []
+    with DNSStubServer({"probe.test": ["127.0.0.1"]}) as good, \
+            DNSStubServer(zones={".": {"rcode": "SERVFAIL"}}) as broken:
+        report = diagnostics.run_diagnostics(
+            runner, [good.address, broken.address, "127.0.0.1:9"],
+            on_line=lambda section, line: streamed.setdefault(section, []).append(line),
+            on_section=lambda section: finished.append(section["name"]),
+            probe_name="probe.test")
+
+    sections = report["sections"]
+    assert sorted(finished) == ["adapters", "resolvers", "routes"]
+    assert all(section["status"] == "ok" for section in sections.values())
+    assert all(section["duration"] is not None for section in sections.values())
+    assert "".join(streamed["adapters"]) == IPCONFIG_ALL
+    assert sections["routes"]["lines"] == len(ROUTE_PRINT.splitlines())
+    assert sections["routes"]["data"]["default_gateways"] == ["192.168.1.1"]
+
+    checks = {c["server"]: c for c in sections["resolvers"]["data"]["resolvers"]}
+    assert checks[good.address]["ok"] and checks[good.address]["addresses"] == ["127.0.0.1"]
+    assert checks[broken.address]["rcode"] == "SERVFAIL" and not checks[broken.address]["ok"]
+    assert checks["127.0.0.1:9"]["error"]
+    assert len(streamed["resolvers"]) == 3
+
+    summary = "\n".join(diagnostics.summarize(report))
+    assert "Wi-Fi: 192.168.1.23 (DNS 1.1.1.1, 1.0.0.1)" in summary
+    assert "Default gateway: 192.168.1.1" in summary
+
+
+def test_failed_sections_do_not_stop_the_others():
+    runner = FakeRunner({"ipconfig /all": subprocess.TimeoutExpired(["ipconfig"], 1, output="Windows IP"),
+                         "route print": (1, "", "access denied")})
+    report = diagnostics.run_diagnostics(runner, sections=("adapters", "routes"))
+    assert report["sections"]["adapters"]["status"] == "timeout"
+    assert report["sections"]["adapters"]["data"] == {"host": {}, "adapters": []}
+    assert report["sections"]["routes"]["status"] == "error"
+    assert "access denied" in report["sections"]["routes"]["error"]
+    assert "resolvers" not in report["sections"]
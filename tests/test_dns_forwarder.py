@@ -0,0 +1,106 @@
+"""
+Tests for the split-DNS forwarder, against loopback stub upstreams
+"""
+
+import time
+
+import pytest
+
+from dns_forwarder import RCODE_REFUSED, DNSForwarder, SplitRouter, SuffixTrie
+from dns_query import RCODE_SERVFAIL, resolve
+from dns_stub import DNSStubServer
+
+
+def test_longest_suffix_wins():
+    trie = SuffixTrie([('*.corp', 'internal'), ('lab.corp', 'lab'), ('.riotgames.com.', 'games')])
+    assert trie.longest_match('intranet.corp') == ('corp', 'internal')
+    assert trie.longest_match('corp') == ('corp', 'internal')
+    assert trie.longest_match('Build.LAB.corp.') == ('lab.corp', 'lab')
+    assert trie.get('eu.riotgames.com') == 'games'
+    assert trie.get('riotgames.co') is None and trie.get('notcorp') is None
+    assert len(trie) == 3
+
+    trie.add('*', 'everything')
+    trie.add('corp', 'internal 2')
+    assert trie.longest_match('example.com') == ('', 'everything')
+    assert trie.get('x.corp') == 'internal 2' and len(trie) == 4
+
+
+def test_lookups_stay_fast_with_many_routes():
+    trie = SuffixTrie((f"host{i}.team{i % 100}.example{i % 7}.com", i) for i in range(50_000))
+    assert len(trie) == 50_000
+    names = [f"a.b.host{i}.team{i % 100}.example{i % 7}.com" for i in range(0, 50_000, 50)]
+    start = time.perf_counter()
+    for _ in range(10):
+        for name in names:
+            trie.longest_match(name)
+    per_lookup = (time.perf_counter() - start) / (10 * len(names))
+    assert trie.get(names[3]) == 150
+    assert per_lookup < 20e-6
+
+
+@pytest.fixture
+def upstreams():
+    corp = DNSStubServer({'intranet.corp': ['10.0.0.10']}).start()
+    public = DNSStubServer({'example.com': ['93.184.216.34'], 'intranet.corp': ['203.0.113.1']}).start()
+    yield corp, public
+    corp.stop()
+    public.stop()
+
+
+def test_queries_follow_their_routes(upstreams):
+    corp, public = upstreams
+    configs = {'Corp': {'primary': corp.address, 'secondary': ''},
+               'Public': {'primary': public.address, 'secondary': ''}}
+    with DNSForwarder(SplitRouter({'*.corp': 'Corp'}, 'Public'), lambda: configs, port=0) as forwarder:
+        assert resolve('intranet.corp', forwarder.address)['addresses'] == ['10.0.0.10']
+        assert resolve('example.com', forwarder.address)['addresses'] == ['93.184.216.34']
+        assert resolve('missing.corp', forwarder.address)['rcode'] == 3
+
+        # Routes can change while serving
+        forwarder.set_router(SplitRouter({}, 'Public'))
+        assert resolve('intranet.corp', forwarder.address)['addresses'] == ['203.0.113.1']
+
+    assert (corp.queries, public.queries) == (2, 2)
+    assert forwarder.routes == {'corp': 2, 'default': 2}
+
+
+def test_secondary_takes_over_from_a_dead_primary(upstreams):
+    corp, _ = upstreams
+    configs = {'Corp': {'primary': '127.0.0.1:9', 'secondary': corp.address}}
+    with DNSForwarder(SplitRouter({'corp': 'Corp'}), lambda: configs, port=0, timeout=0.3) as forwarder:
+        assert resolve('intranet.corp', forwarder.address)['addresses'] == ['10.0.0.10']
+
+
+def test_a_list_of_configs_races_for_the_first_answer():
+    with DNSStubServer({'game.test': ['10.1.1.1']}, delay=0.5) as slow, \
+            DNSStubServer({'game.test': ['10.2.2.2']}) as fast, \
+            DNSStubServer(zones={'.': {'rcode': 'SERVFAIL'}}) as broken:
+        configs = {'Slow': {'primary': slow.address}, 'Fast': {'primary': fast.address},
+                   'Broken': {'primary': broken.address}}
+        router = SplitRouter({'game.test': ['Broken', 'Slow', 'Fast']})
+        with DNSForwarder(router, lambda: configs, port=0) as forwarder:
+            start = time.perf_counter()
+            response = resolve('game.test', forwarder.address, timeout=2.0)
+            assert response['addresses'] == ['10.2.2.2']
+            assert time.perf_counter() - start < 0.4
+
+
+def test_truncated_answers_are_retried_over_tcp():
+    addresses = [f"10.0.{i // 250}.{i % 250}" for i in range(60)]
+    with DNSStubServer({'big.test': addresses}) as upstream:
+        configs = {'Up': {'primary': upstream.address}}
+        with DNSForwarder(SplitRouter({}, 'Up'), lambda: configs, port=0) as forwarder:
+            response = resolve('big.test', forwarder.address)
+    assert response['via'] == 'tcp' and len(response['addresses']) == 60
+    assert upstream.tcp_queries == 1
+
+
+def test_unrouted_and_unanswered_names():
+    configs = {'Dead': {'primary': '127.0.0.1:9'}}
+    router = SplitRouter({'dead.test': 'Dead', 'ghost.test': 'Not saved'})
+    with DNSForwarder(router, lambda: configs, port=0, timeout=0.2) as forwarder:
+        assert resolve('example.com', forwarder.address)['rcode'] == RCODE_REFUSED
+        assert resolve('x.ghost.test', forwarder.address)['rcode'] == RCODE_REFUSED
+        assert resolve('x.dead.test', forwarder.address, timeout=2.0)['rcode'] == RCODE_SERVFAIL
+    assert forwarder.queries == 3 and forwarder.failed == 3
@@ -0,0 +1,130 @@
+"""
+Tests for the scriptable DNS stub server and the preset stand-in fleet
+"""
+
+import random
+import socket
+import struct
+
+import pytest
+
+from benchmark import run_time_to_service_benchmark
+from dns_query import DNSError, build_query, parse_response, resolve, split_server
+from dns_stub import DNSStubServer, StubFleet, sample_latency
+
+
+def resolve_tcp(name, stub):
+    query = build_query(name)
+    with socket.create_connection((stub.host, stub.port), timeout=2) as sock:
+        sock.sendall(struct.pack('!H', len(query)) + query)
+        length = struct.unpack('!H', sock.recv(2))[0]
+        data = b''
+        while len(data) < length:
+            data += sock.recv(length - len(data))
+    return parse_response(data)
+
+
+def test_split_server():
+    assert split_server('1.1.1.1') == ('1.1.1.1', 53)
+    assert split_server('127.0.0.1:5353') == ('127.0.0.1', 5353)
+    assert split_server('2606:4700::1111') == ('2606:4700::1111', 53)
+    assert split_server('[::1]:5353', 53) == ('::1', 5353)
+
+
+def test_zones_inject_errors_and_ttls():
+    zones = {
+        'broken.test': {'rcode': 'SERVFAIL'},
+        'ok.broken.test': {'rcode': None, 'ttl': 5},
+        'wild.test': {'addresses': ['127.0.0.7']},
+    }
+    with DNSStubServer({'ok.broken.test': ['127.0.0.2'], 'a.broken.test': ['127.0.0.3']},
+                       zones=zones) as stub:
+        assert resolve('a.broken.test', stub.address)['rcode'] == 2
+        ok = resolve('ok.broken.test', stub.address)
+        assert ok['addresses'] == ['127.0.0.2'] and ok['answers'][0]['ttl'] == 5
+        assert resolve('anything.wild.test', stub.address)['addresses'] == ['127.0.0.7']
+        assert resolve('missing.test', stub.address)['rcode'] == 3
+
+
+def test_partial_error_rate_is_seeded():
+    def run():
+        with DNSStubServer({'x.test': ['127.0.0.1']}, seed=3,
+                           zones={'.': {'rcode': 'NXDOMAIN', 'rcode_rate': 0.3}}) as stub:
+            return [resolve('x.test', stub.address)['rcode'] for _ in range(40)]
+
+    first = run()
+    assert first == run()
+    assert 0 < first.count(3) < 40
+
+
+def test_truncated_udp_answer_is_complete_over_tcp():
+    many = [f'10.0.{i // 250}.{i % 250 + 1}' for i in range(60)]
+    with DNSStubServer({'big.test': many, 'small.test': ['127.0.0.1']},
+                       zones={'small.test': {'truncate': True}}) as stub:
+        big = resolve('big.test', stub.address, tcp_fallback=False)
+        assert big['truncated'] and big['answers'] == []
+        assert resolve('small.test', stub.address, tcp_fallback=False)['truncated']
+
+        assert len(resolve_tcp('big.test', stub)['answers']) == 60
+        assert not resolve_tcp('small.test', stub)['truncated']
+
+        retried = resolve('big.test', stub.address)
+        assert retried['via'] == 'tcp' and len(retried['addresses']) == 60
+    assert stub.truncated == 3 and stub.tcp_queries == 3
+
+
+def test_loss_applies_per_zone_and_not_to_tcp():
+    with DNSStubServer({'a.test': ['127.0.0.1'], 'b.test': ['127.0.0.1']},
+                       zones={'a.test': {'loss': 1.0}}) as stub:
+        with pytest.raises(DNSError):
+            resolve('a.test', stub.address, timeout=0.2)
+        assert resolve('b.test', stub.address)['addresses'] == ['127.0.0.1']
+        assert resolve_tcp('a.test', stub)['rcode'] == 0
+    assert stub.dropped == 1
+
+
+def test_latency_distributions():
+    rng = random.Random(5)
+    assert sample_latency(0.01, rng) == 0.01
+    assert sample_latency(lambda name: len(name) / 1000, rng, 'abcd') == 0.004
+    uniform = [sample_latency({'dist': 'uniform', 'low': 0.01, 'high': 0.02}, rng) for _ in range(200)]
+    assert all(0.01 <= value <= 0.02 for value in uniform)
+    normal = [sample_latency({'dist': 'normal', 'mean': 0.001, 'stdev': 0.01}, rng) for _ in range(200)]
+    assert min(normal) == 0.0
+    spiky = [sample_latency({'dist': 'lognormal', 'median': 0.01, 'sigma': 0.2,
+                             'spike_rate': 0.1, 'spike': 1.0}, rng) for _ in range(500)]
+    assert 20 < sum(value > 0.5 for value in spiky) < 90
+    with pytest.raises(ValueError):
+        sample_latency({'dist': 'pareto'}, rng)
+
+
+def test_unknown_zone_setting_is_rejected():
+    with pytest.raises(ValueError):
+        DNSStubServer(zones={'a.test': {'latecny': 0.1}})
+
+
+def test_fleet_stands_in_for_presets():
+    presets = {
+        'Quick': {'primary': '1.1.1.1', 'secondary': '1.0.0.1'},
+        'Sluggish': {'primary': '8.8.8.8', 'secondary': ''},
+        'Flaky': {'primary': '9.9.9.9', 'secondary': '149.112.112.112'},
+    }
+    profiles = {
+        'Sluggish': {'latency': {'dist': 'normal', 'mean': 0.06, 'stdev': 0.005}},
+        'Flaky': {'zones': {'down.test': {'rcode': 'SERVFAIL'}}},
+    }
+    with StubFleet(presets, profiles, seed=1) as fleet:
+        assert fleet.configs['Sluggish']['secondary'] == ''
+        ports = {split_server(server)[1] for config in fleet.configs.values()
+                 for server in config.values() if server}
+        assert len(ports) == 5
+
+        targets = {'Web': 'www.example.com', 'Down': 'down.test'}
+        ranking = run_time_to_service_benchmark(fleet.configs, targets,
+                                                connect=lambda address, port: 1.0, timeout=0.5)
+
+    by_name = {entry['config']: entry for entry in ranking}
+    assert by_name['Quick']['success'] == 2
+    assert by_name['Flaky']['success'] == 1
+    assert by_name['Flaky']['services']['Down']['addresses'] == []
+    assert by_name['Sluggish']['avg_lookup'] > by_name['Quick']['avg_lookup'] + 30
@@ -0,0 +1,225 @@
+"""
+End-to-end tests on Linux: real subprocesses against the fake netsh, ipconfig
+and ping in tests/fakes, and real DNS queries against the loopback stub
+"""
+
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+import diagnostics
+import icmp_probe
+import netsh_backend
+from benchmark import run_time_to_service_benchmark
+from command_runner import CommandError, CommandRunner, netsh_session
+from dns_stub import DNSStubServer
+from ttl_cache import TTLCache
+
+FAKES = Path(__file__).parent / 'fakes'
+
+pytestmark = pytest.mark.skipif(sys.platform == 'win32',
+                                reason="the fakes are POSIX wrapper scripts")
+
+
+class FakeSystem:
+    def __init__(self, path):
+        self.path = path
+
+    @property
+    def state(self):
+        return json.loads(self.path.read_text())
+
+    def update(self, **changes):
+        state = self.state
+        state.update(changes)
+        self.path.write_text(json.dumps(state))
+
+    @property
+    def calls(self):
+        log = Path(str(self.path) + '.log')
+        if not log.exists():
+            return []
+        return [json.loads(line) for line in log.read_text().splitlines()]
+
+
+@pytest.fixture
+def system(tmp_path, monkeypatch):
+    path = tmp_path / 'state.json'
+    path.write_text(json.dumps({
+        'adapters': [{'name': 'Ethernet', 'state': 'Disconnected'},
+                     {'name': 'Wi-Fi'},
+                     {'name': 'Old VPN', 'admin': 'Disabled', 'state': 'Disconnected'}],
+        'dns': {'Wi-Fi': {'source': 'static', 'servers': ['1.1.1.1', '1.0.0.1']}},
+        'dhcp_dns': {'Wi-Fi': ['192.168.1.1']},
+        'ping': {'1.1.1.1': 12.5, '8.8.8.8': 21.0},
+        'admin': True,
+    }))
+    monkeypatch.setenv('PATH', f"{FAKES}{os.pathsep}{os.environ.get('PATH', '')}")
+    monkeypatch.setenv('DNSMANAGER_FAKE_STATE', str(path))
+    monkeypatch.setenv('DNSMANAGER_FAKE_PYTHON', sys.executable)
+    return FakeSystem(path)
+
+
+def test_adapters_and_dns_through_processes(system):
+    runner = CommandRunner()
+    assert netsh_backend.list_adapters(runner) == ['Ethernet', 'Wi-Fi']
+    assert netsh_backend.get_dns_servers(runner, 'Wi-Fi') == {'primary': '1.1.1.1',
+                                                             'secondary': '1.0.0.1'}
+    assert netsh_backend.get_dns_servers(runner, 'Ethernet') is None
+    assert 'Physical Address' in netsh_backend.ipconfig_all(runner)
+    assert all(entry.via == 'process' for entry in runner.history)
+
+
+def test_apply_flush_and_reset(system):
+    runner = CommandRunner()
+    netsh_backend.set_dns(runner, 'Wi-Fi', '9.9.9.9', '149.112.112.112')
+    assert system.state['dns']['Wi-Fi'] == {'source': 'static',
+                                            'servers': ['9.9.9.9', '149.112.112.112']}
+    assert netsh_backend.get_dns_servers(runner, 'Wi-Fi')['secondary'] == '149.112.112.112'
+
+    netsh_backend.flush_dns(runner, check=True)
+    netsh_backend.reset_dns(runner, 'Wi-Fi')
+    assert system.state['dns']['Wi-Fi'] == {'source': 'dhcp', 'servers': ['192.168.1.1']}
+
+    assert system.calls[0] == ['netsh', 'interface', 'ip', 'set', 'dns', 'Wi-Fi', 'static', '9.9.9.9']
+    assert ['ipconfig', '/flushdns'] in system.calls
+    assert system.calls[-1] == ['netsh', 'interface', 'ip', 'set', 'dns', 'Wi-Fi', 'dhcp']
+
+
+def test_changes_without_elevation_raise(system):
+    system.update(admin=False)
+    with pytest.raises(CommandError) as excinfo:
+        netsh_backend.set_dns(CommandRunner(), 'Wi-Fi', '9.9.9.9')
+    assert 'elevation' in excinfo.value.result.stdout
+    assert system.state['dns']['Wi-Fi']['servers'] == ['1.1.1.1', '1.0.0.1']
+
+
+def test_session_matches_processes_and_is_faster(system):
+    process_runner = CommandRunner()
+    session_runner = CommandRunner(session=netsh_session())
+    try:
+        netsh_backend.list_adapters(session_runner)     # start the shell outside the timing
+
+        start = time.perf_counter()
+        via_process = [netsh_backend.get_dns_servers(process_runner, 'Wi-Fi') for _ in range(5)]
+        process_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        via_session = [netsh_backend.get_dns_servers(session_runner, 'Wi-Fi') for _ in range(5)]
+        session_time = time.perf_counter() - start
+
+        # Changes made by a separate process are seen by the running shell
+        netsh_backend.set_dns(process_runner, 'Wi-Fi', '9.9.9.9')
+        assert netsh_backend.get_dns_servers(session_runner, 'Wi-Fi')['primary'] == '9.9.9.9'
+    finally:
+        session_runner.close()
+
+    assert via_session == via_process
+    assert {entry.via for entry in session_runner.history} == {'session'}
+    assert session_time < process_time
+
+
+def test_session_errors_are_not_cached_as_dhcp(system):
+    session_runner = CommandRunner(session=netsh_session())
+    cache = TTLCache(negative_ttl=2)
+
+    def load(adapter):
+        return cache.get_or_load(adapter, lambda: netsh_backend.get_dns_servers(session_runner, adapter,
+                                                                                check=True))
+    try:
+        assert load('Wi-Fi')['primary'] == '1.1.1.1'
+        with pytest.raises(CommandError) as excinfo:
+            load('Missing')
+        assert 'syntax is incorrect' in excinfo.value.result.stdout
+        with pytest.raises(CommandError):
+            load('Missing')           # the failure is remembered for negative_ttl, not read as DHCP
+    finally:
+        session_runner.close()
+
+    assert [entry.via for entry in session_runner.history] == ['session', 'session', 'process']
+
+
+def test_hung_command_times_out(system):
+    system.update(delay={'netsh': 5})
+    runner = CommandRunner()
+    start = time.perf_counter()
+    result = runner.run(['netsh', 'interface', 'show', 'interface'], timeout=0.5)
+    assert result.timed_out and not result.ok
+    assert time.perf_counter() - start < 3
+
+
+def test_diagnostics_stream_and_run_concurrently(system):
+    # ~40 lines of ipconfig and ~35 of route print, 10 ms apart
+    system.update(line_delay={'ipconfig': 0.01, 'route': 0.01})
+    arrivals = {}
+    start = time.perf_counter()
+
+    def on_line(section, line):
+        arrivals.setdefault(section, []).append(time.perf_counter() - start)
+
+    report = diagnostics.run_diagnostics(CommandRunner(), sections=('adapters', 'routes'),
+                                         on_line=on_line)
+    sections = report['sections']
+    assert [a['name'] for a in sections['adapters']['data']['adapters']] == [
+        'Wi-Fi', 'Ethernet', 'WireGuard Tunnel']
+    assert sections['routes']['data']['default_gateways'] == ['192.168.1.1']
+
+    # Output arrives while the commands are still running...
+    assert arrivals['adapters'][0] < sections['adapters']['duration'] / 1000 / 2
+    # ...and the sections overlap instead of running one after the other
+    sequential = sections['adapters']['duration'] + sections['routes']['duration']
+    assert report['duration'] < sequential * 0.8
+
+
+def test_ping_parses_fake_output(system):
+    stats = icmp_probe.ping_subprocess('1.1.1.1', count=3, runner=CommandRunner())
+    assert stats['received'] == 3 and stats['loss'] == 0
+    assert stats['avg'] == pytest.approx(12.5)
+    assert icmp_probe.ping_subprocess('10.9.9.9', count=2, runner=CommandRunner())['loss'] == 100
+    assert ['ping', '-c', '3', '-4', '1.1.1.1'] in system.calls
+
+
+def test_ping_falls_back_to_command_without_raw_sockets(system, monkeypatch):
+    monkeypatch.setattr(icmp_probe.ICMPProber, '_socket', lambda self, family: None)
+    results = icmp_probe.ping_many(['1.1.1.1', '8.8.8.8'], count=2)
+    assert results['1.1.1.1']['avg'] == pytest.approx(12.5)
+    assert results['8.8.8.8']['avg'] == pytest.approx(21.0)
+
+
+def test_benchmark_ranks_slow_and_lossy_resolvers():
+    records = {f'service{i}.test': ['127.0.0.1'] for i in range(4)}
+    targets = {f'Service {i}': f'service{i}.test' for i in range(4)}
+    with DNSStubServer(records) as fast, \
+            DNSStubServer(records, delay=0.08) as slow, \
+            DNSStubServer(records, loss=1.0) as lossy:
+        configs = {name: {'primary': stub.address, 'secondary': ''}
+                   for name, stub in (('Fast', fast), ('Slow', slow), ('Lossy', lossy))}
+        start = time.perf_counter()
+        ranking = run_time_to_service_benchmark(configs, targets,
+                                                connect=lambda address, port: 1.0, timeout=0.3)
+        elapsed = time.perf_counter() - start
+
+    assert [entry['config'] for entry in ranking] == ['Fast', 'Slow', 'Lossy']
+    assert ranking[0]['avg_lookup'] < 50
+    assert ranking[1]['avg_lookup'] >= 80
+    assert ranking[2]['success'] == 0 and lossy.dropped >= len(targets)
+    # Parallel lookups: the lossy resolver costs one timeout, not one per target
+    assert elapsed < 1.0
+
+
+def test_partial_loss_is_repeatable():
+    records = {'example.test': ['127.0.0.1']}
+    outcomes = []
+    for _ in range(2):
+        with DNSStubServer(records, loss=0.5, seed=7) as stub:
+            run_time_to_service_benchmark(
+                {'Stub': {'primary': '127.0.0.1', 'secondary': ''}},
+                {f'Try {i}': 'example.test' for i in range(10)},
+                connect=lambda address, port: 1.0, dns_port=stub.port, timeout=0.2, max_workers=1)
+            outcomes.append(stub.dropped)
+    assert outcomes[0] == outcomes[1]
+    assert 0 < outcomes[0] < 10
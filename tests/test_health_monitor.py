@@ -0,0 +1,211 @@
+"""
+Tests for the background resolver health monitor
+"""
+
+import random
+import tracemalloc
+
+import health_monitor
+
+import pytest
+
+from dns_stub import DNSStubServer
+from health_monitor import (HealthMonitor, RingBuffer, format_status, load_settings,
+                            probe_dns, save_settings)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+class ScriptedProbe:
+    """Latency per server; None means the probe was lost"""
+
+    def __init__(self, latencies):
+        self.latencies = dict(latencies)
+
+    def __call__(self, server):
+        return self.latencies.get(server)
+
+
+def make_monitor(latencies, **settings):
+    probe = ScriptedProbe(latencies)
+    alerts = []
+    monitor = HealthMonitor(dict({'window': 20, 'min_samples': 5, 'p95_ms': 100.0, 'loss': 0.2}, **settings),
+                            probe=probe, on_alert=alerts.append, log_file=None,
+                            clock=FakeClock(), rng=random.Random(1))
+    return monitor, probe, alerts
+
+
+def test_ring_buffer_keeps_the_newest_values():
+    ring = RingBuffer(3)
+    assert ring.values() == [] and len(ring) == 0
+    for value in range(1, 6):
+        ring.append(value)
+    assert ring.values() == [3.0, 4.0, 5.0] and len(ring) == 3
+    with pytest.raises(ValueError):
+        RingBuffer(0)
+
+
+def test_breach_and_recovery_alert_once_each():
+    monitor, probe, alerts = make_monitor({'1.1.1.1': 20.0, '1.0.0.1': 25.0})
+    monitor.set_active('Cloudflare', {'primary': '1.1.1.1', 'secondary': '1.0.0.1'})
+    for _ in range(10):
+        monitor.run_once()
+    assert alerts == []
+
+    probe.latencies['1.1.1.1'] = None
+    for _ in range(10):
+        monitor.run_once()
+    assert [(a['kind'], a['slo'], a['role']) for a in alerts] == [('breach', 'loss', 'primary')]
+    assert "Cloudflare primary (1.1.1.1)" in alerts[0]['message']
+
+    probe.latencies['1.1.1.1'] = 30.0
+    for _ in range(20):
+        monitor.run_once()
+    assert [a['kind'] for a in alerts] == ['breach', 'recovered']
+
+    stats = monitor.status()['servers']['primary']
+    assert stats['probes'] == 40 and stats['lost'] == 10 and stats['samples'] == 20
+    assert stats['loss'] == 0 and stats['p95'] == 30.0
+
+
+def test_latency_slo_uses_p95():
+    monitor, probe, alerts = make_monitor({'9.9.9.9': 50.0})
+    monitor.set_active('Quad9', {'primary': '9.9.9.9', 'secondary': ''})
+    for i in range(20):
+        probe.latencies['9.9.9.9'] = 500.0 if i % 10 == 0 else 50.0
+        monitor.run_once()
+    # 2 slow probes in 20 put p95 over the limit
+    assert [(a['kind'], a['slo']) for a in alerts] == [('breach', 'latency')]
+    assert "p95 500 ms" in alerts[0]['message']
+
+
+def test_failover_to_the_healthiest_saved_config():
+    configs = {'Broken': {'primary': '10.0.0.1', 'secondary': '10.0.0.2'},
+               'Slow': {'primary': '8.8.8.8', 'secondary': ''},
+               'Fast': {'primary': '1.1.1.1', 'secondary': ''},
+               'Too slow': {'primary': '4.2.2.2', 'secondary': ''}}
+    monitor, probe, alerts = make_monitor({'8.8.8.8': 60.0, '1.1.1.1': 15.0, '4.2.2.2': 400.0},
+                                          failover=True)
+    applied = []
+    monitor.candidates = lambda: configs
+    monitor.on_failover = lambda name, config: applied.append(name) or True
+    monitor.set_active('Broken', configs['Broken'])
+
+    for _ in range(5):
+        monitor.run_once()
+    assert applied == ['Fast']
+    assert monitor.active_name == 'Fast' and monitor.status()['servers']['primary']['samples'] == 0
+    assert alerts[-1]['kind'] == 'failover' and "from Broken to Fast" in alerts[-1]['message']
+
+    # Within the cooldown nothing switches again
+    probe.latencies['1.1.1.1'] = None
+    for _ in range(5):
+        monitor.run_once()
+    assert applied == ['Fast']
+    monitor.clock.now += monitor.settings['failover_cooldown']
+    monitor.run_once()
+    assert applied == ['Fast', 'Slow']
+
+
+def test_failover_skips_configs_that_fail_to_apply():
+    configs = {'A': {'primary': '1.1.1.1'}, 'B': {'primary': '8.8.8.8'}}
+    monitor, _, alerts = make_monitor({'1.1.1.1': 10.0, '8.8.8.8': 20.0}, failover=True, min_samples=1)
+    monitor.candidates = lambda: configs
+    monitor.on_failover = lambda name, config: name == 'B'
+    monitor.set_active(None, {'primary': '10.9.9.9'})
+    monitor.run_once()
+    assert monitor.active_name == 'B'
+    assert "from Current DNS to B" in alerts[-1]['message']
+
+
+def test_same_servers_keep_their_window():
+    monitor, _, _ = make_monitor({'1.1.1.1': 10.0})
+    monitor.set_active('Cloudflare', {'primary': '1.1.1.1', 'secondary': ''})
+    monitor.run_once()
+    monitor.set_active('My Cloudflare', {'primary': '1.1.1.1', 'secondary': ''})
+    assert monitor.status()['servers']['primary']['samples'] == 1
+    assert monitor.status()['config'] == 'My Cloudflare'
+    monitor.set_active(None, None)
+    assert monitor.run_once() == {}
+
+
+def test_jitter_stays_within_bounds():
+    monitor, _, _ = make_monitor({}, interval=30.0, jitter=0.2)
+    delays = [monitor.next_delay() for _ in range(1000)]
+    assert 24.0 <= min(delays) and max(delays) <= 36.0
+    assert max(delays) - min(delays) > 10
+
+
+def test_memory_stays_flat_over_many_rounds(tmp_path):
+    monitor, probe, _ = make_monitor({'1.1.1.1': 10.0, '1.0.0.1': None})
+    monitor.log_file = str(tmp_path / "health.log")
+    monitor.on_alert = None
+    monitor.set_active('Cloudflare', {'primary': '1.1.1.1', 'secondary': '1.0.0.1'})
+
+    def run(rounds):
+        # Flaps between breached and healthy, so alerts keep coming
+        for i in range(rounds):
+            probe.latencies['1.1.1.1'] = None if i % 50 < 25 else 10.0
+            monitor.run_once()
+
+    tracemalloc.start()
+    # Long enough to fill the alert history
+    run(6000)
+    before = tracemalloc.take_snapshot()
+    run(20000)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    growth = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    assert growth < 100_000
+    assert len(monitor.alerts) == monitor.alerts.maxlen
+
+
+def test_recovery_needs_a_margin_below_the_limit():
+    monitor, probe, alerts = make_monitor({'1.1.1.1': 10.0}, min_samples=10, window=10)
+    monitor.set_active('Cloudflare', {'primary': '1.1.1.1', 'secondary': ''})
+    for i in range(100):
+        # Loss hovers around the 20% limit without settling below it
+        probe.latencies['1.1.1.1'] = (None if i % 10 in (0, 1, 5) else 10.0) if i < 50 else (None if i % 10 in (0, 5) else 10.0)
+        monitor.run_once()
+    assert [a['kind'] for a in alerts] == ['breach']
+
+
+def test_alert_log_is_rotated(tmp_path, monkeypatch):
+    monkeypatch.setattr(health_monitor, 'MAX_LOG_BYTES', 1000)
+    monitor, probe, _ = make_monitor({'1.1.1.1': 10.0})
+    log = tmp_path / "health.log"
+    monitor.log_file = str(log)
+    monitor.set_active('Cloudflare', {'primary': '1.1.1.1', 'secondary': ''})
+    for i in range(2000):
+        probe.latencies['1.1.1.1'] = None if i % 50 < 25 else 10.0
+        monitor.run_once()
+    assert len(monitor.alerts) > 50
+    assert log.stat().st_size <= 1100
+    assert (tmp_path / "health.log.1").stat().st_size <= 1100
+    assert not (tmp_path / "health.log.2").exists()
+
+
+def test_settings_round_trip(tmp_path):
+    path = tmp_path / "monitor_settings.json"
+    assert load_settings(str(path))['failover'] is False
+    assert load_settings(str(path))['enabled'] is False
+    save_settings({'failover': True, 'interval': 10, 'unknown': 1}, str(path))
+    settings = load_settings(str(path))
+    assert settings['failover'] is True and settings['interval'] == 10 and 'unknown' not in settings
+
+
+def test_probe_dns_against_stub():
+    with DNSStubServer({'probe.test': ['127.0.0.1']}, zones={'bad.test': {'rcode': 'SERVFAIL'}}) as stub:
+        assert probe_dns(stub.address, 'probe.test', 1.0) is not None
+        assert probe_dns(stub.address, 'missing.test', 1.0) is not None
+        assert probe_dns(stub.address, 'x.bad.test', 1.0) is None
+    assert probe_dns('127.0.0.1:9', 'probe.test', 0.2) is None
+
+    assert format_status({'primary': {'samples': 3, 'p95': 12.4, 'loss': 0.0}}) == "Primary 12 ms p95, 0% loss"
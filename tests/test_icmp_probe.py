@@ -0,0 +1,54 @@
+"""
+Tests for the in-process ICMP prober
+"""
+
+import socket
+
+import pytest
+
+import icmp_probe
+from icmp_probe import ICMPProber, checksum
+
+
+def icmp_available():
+    with ICMPProber() as prober:
+        return prober._socket(socket.AF_INET) is not None
+
+
+needs_icmp = pytest.mark.skipif(not icmp_available(),
+                                reason="no datagram or raw ICMP socket permission")
+
+
+def test_checksum_known_value():
+    # Echo request, id=1, seq=1, no payload
+    assert checksum(b"\x08\x00\x00\x00\x00\x01\x00\x01") == 0xF7FD
+
+
+@needs_icmp
+def test_ping_loopback():
+    with ICMPProber(timeout=0.5, interval=0.05) as prober:
+        result = prober.ping_many(["127.0.0.1"], count=3)["127.0.0.1"]
+    assert result["sent"] == 3
+    assert result["received"] == 3
+    assert result["loss"] == 0.0
+    assert result["min"] <= result["avg"] <= result["max"]
+
+
+@needs_icmp
+def test_many_targets_share_one_socket():
+    targets = [f"127.0.0.{i}" for i in range(1, 201)]
+    with ICMPProber(timeout=0.5, interval=0.05) as prober:
+        results = prober.ping_many(targets, count=2)
+        assert len(prober._sockets) == 1
+    assert list(results) == targets
+    assert all(r["received"] == 2 for r in results.values())
+
+
+def test_subprocess_fallback(monkeypatch):
+    monkeypatch.setattr(ICMPProber, "_socket", lambda self, family: None)
+    monkeypatch.setattr(icmp_probe, "ping_subprocess",
+                        lambda address, count, timeout: icmp_probe.summarize([7.0] * count, count))
+
+    results = icmp_probe.ping_many(["192.0.2.1", "2001:db8::1"], count=2)
+    assert results["192.0.2.1"]["avg"] == 7.0
+    assert results["2001:db8::1"]["received"] == 2
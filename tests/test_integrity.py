@@ -0,0 +1,85 @@
+"""
+Tests for resolver integrity checks against honest and misbehaving DNS stubs
+"""
+
+import random
+import time
+
+from integrity import attach_integrity, canary_names, check_integrity, classify, findings
+from dns_stub import DNSStubServer
+
+RECORDS = {
+    "www.example.test": ["93.184.216.34"],
+    "cdn.example.test": ["151.101.1.10"],
+    "ads.example.test": ["198.51.100.7"],
+}
+NAMES = list(RECORDS) + ["gone.example.test"]
+
+
+def result(rcode, addresses=()):
+    return {"rcode": rcode, "addresses": list(addresses), "status": None}
+
+
+def test_canaries_are_random_and_valid_looking():
+    names = canary_names(3, random.Random(1))
+    assert names == canary_names(3, random.Random(1)) and len(set(names)) == 3
+    assert [name.rsplit(".", 1)[1] for name in names] == ["com", "net", "org"]
+
+
+def test_classify():
+    verdicts = classify({"a": result(0, ["151.101.1.10"]), "b": result(0, ["151.101.1.77"]),
+                         "c": result(0, ["0.0.0.0"]), "d": result(3), "e": result(None),
+                         "f": result(0, ["203.0.113.9"])})
+    assert verdicts == {"a": "agree", "b": "agree", "c": "filtered", "d": "filtered",
+                        "e": "failed", "f": "divergent"}
+    # A name most resolvers call nonexistent
+    assert classify({"a": result(3), "b": result(3), "c": result(0, ["10.0.0.1"])}) == \
+        {"a": "agree", "b": "agree", "c": "divergent"}
+    assert classify({"a": result(3), "b": result(0, ["10.0.0.1"])}, canary=True) == \
+        {"a": "agree", "b": "hijacked"}
+
+
+def test_check_integrity_flags_misbehaving_resolvers():
+    shifted = dict(RECORDS, **{"cdn.example.test": ["203.0.113.50"]})
+    with DNSStubServer(RECORDS) as honest, DNSStubServer(RECORDS) as honest_too, \
+            DNSStubServer(RECORDS, zones={".": {"addresses": ["198.18.0.1"]}}) as hijacker, \
+            DNSStubServer(RECORDS, zones={"ads.example.test": {"rcode": "NXDOMAIN"}}) as filtering, \
+            DNSStubServer(shifted) as divergent:
+        configs = {name: {"primary": stub.address, "secondary": ""} for name, stub in
+                   [("Honest", honest), ("Honest 2", honest_too), ("Hijacker", hijacker),
+                    ("Filter", filtering), ("Divergent", divergent)]}
+        configs["Down"] = {"primary": "127.0.0.1:9", "secondary": ""}
+        report = check_integrity(configs, NAMES + ["WWW.Example.Test.", "10.0.0.1"],
+                                 rng=random.Random(2), timeout=0.3, retries=0)
+
+    summaries = report["resolvers"]
+    assert summaries["Honest"]["integrity"] == 100 and summaries["Honest"]["verdict"] == "consistent"
+    assert summaries["Hijacker"]["verdict"] == "NXDOMAIN hijacking"
+    # Three canaries plus gone.example.test
+    assert summaries["Hijacker"]["hijacked"] == 3 and summaries["Hijacker"]["divergent"] == 1
+    assert summaries["Filter"]["verdict"] == "filtering" and summaries["Filter"]["filtered"] == 1
+    assert summaries["Divergent"]["verdict"] == "divergent answers"
+    assert summaries["Down"]["verdict"] == "unreachable" and summaries["Down"]["integrity"] is None
+    assert len(report["names"]) == len(NAMES) + 3
+
+    lines = findings(report)
+    assert lines[0].startswith("Hijacker: hijacked nx-")
+    assert "Filter: filtered ads.example.test -> NXDOMAIN" in lines
+
+    ranking = attach_integrity([{"config": "Filter"}, {"config": "Unknown"}], report)
+    assert ranking[0]["integrity_verdict"] == "filtering" and ranking[1]["integrity"] is None
+
+
+def test_hundreds_of_names_across_many_resolvers_is_quick():
+    records = {f"host{i}.test": [f"10.2.{i // 250}.{i % 250 + 1}"] for i in range(300)}
+    stubs = [DNSStubServer(records, delay=0.01).start() for _ in range(20)]
+    try:
+        configs = {f"Resolver {i}": {"primary": stub.address} for i, stub in enumerate(stubs)}
+        start = time.perf_counter()
+        report = check_integrity(configs, records)
+        elapsed = time.perf_counter() - start
+    finally:
+        for stub in stubs:
+            stub.stop()
+    assert all(s["integrity"] == 100 for s in report["resolvers"].values())
+    assert elapsed < 10
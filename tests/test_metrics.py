@@ -0,0 +1,133 @@
+"""
+Tests for the Prometheus metrics registry, its endpoint and the instrumented code paths
+"""
+
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+import metrics
+import netsh_backend
+from benchmark import run_time_to_service_benchmark
+from command_runner import CommandError, CommandRunner, FakeRunner
+from dns_stub import DNSStubServer
+
+
+@pytest.fixture
+def recording():
+    metrics.clear()
+    metrics.enable()
+    yield metrics
+    metrics.disable()
+    metrics.clear()
+
+
+def series(metric, *labels):
+    return metric.series.get(labels)
+
+
+def test_nothing_is_recorded_while_off():
+    metrics.clear()
+    metrics.observe_probe('dns', '1.1.1.1', 'example.com', 12.0)
+    metrics.COMMANDS.inc('netsh', 'process')
+    with metrics.DNS_CHANGE_DURATION.time('apply'):
+        pass
+    assert all(not metric.series for metric in metrics.REGISTRY.metrics.values())
+    assert "# TYPE dnsmanager_probe_latency_seconds histogram" in metrics.render()
+
+
+def test_http_server_is_imported_only_for_an_endpoint():
+    script = ("import sys, metrics; metrics.enable(); print('http.server' in sys.modules); "
+              "metrics.enable(0); print('http.server' in sys.modules); metrics.disable()")
+    result = subprocess.run([sys.executable, '-c', script], cwd=os.path.dirname(os.path.dirname(__file__)),
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.split() == ['False', 'True']
+
+
+def test_exposition_format(recording):
+    registry = metrics.Registry()
+    hits = registry.register(metrics.Counter('test_hits_total', 'Hits', ('path',)))
+    latency = registry.register(metrics.Histogram('test_latency_seconds', 'Latency', ('server',),
+                                                  buckets=(0.01, 0.1)))
+    hits.inc('/a "quoted"\\path')
+    hits.inc('/a "quoted"\\path', amount=2)
+    for value in (0.005, 0.01, 0.05, 3.0):
+        latency.observe(value, '1.1.1.1')
+
+    assert registry.render().splitlines() == [
+        '# HELP test_hits_total Hits',
+        '# TYPE test_hits_total counter',
+        'test_hits_total{path="/a \\"quoted\\"\\\\path"} 3',
+        '# HELP test_latency_seconds Latency',
+        '# TYPE test_latency_seconds histogram',
+        'test_latency_seconds_bucket{server="1.1.1.1",le="0.01"} 2',
+        'test_latency_seconds_bucket{server="1.1.1.1",le="0.1"} 3',
+        'test_latency_seconds_bucket{server="1.1.1.1",le="+Inf"} 4',
+        'test_latency_seconds_sum{server="1.1.1.1"} 3.065',
+        'test_latency_seconds_count{server="1.1.1.1"} 4',
+    ]
+    with pytest.raises(ValueError):
+        hits.inc()
+    with pytest.raises(ValueError):
+        registry.register(metrics.Counter('test_hits_total', 'Again'))
+
+
+def test_endpoint_serves_prometheus_text(recording):
+    server = metrics.enable(port=0)
+    host, port = server.server_address
+    assert host == '127.0.0.1'
+    metrics.observe_probe('dns', '9.9.9.9', 'example.com', None)
+
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=2) as response:
+        assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+        body = response.read().decode()
+    assert 'dnsmanager_probe_failures_total{kind="dns",resolver="9.9.9.9",target="example.com"} 1' in body
+
+    with pytest.raises(urllib.error.HTTPError):
+        urllib.request.urlopen(f"http://127.0.0.1:{port}/other", timeout=2)
+
+
+def test_dns_changes_and_subprocesses_are_counted(recording):
+    runner = FakeRunner({'netsh interface ip set dns Wi-Fi static': '',
+                         'netsh interface ip add dns Wi-Fi': '',
+                         'netsh interface ip set dns Wi-Fi dhcp': (1, '', 'The requested operation requires elevation')})
+    netsh_backend.set_dns(runner, 'Wi-Fi', '1.1.1.1', '1.0.0.1')
+    with pytest.raises(CommandError):
+        netsh_backend.reset_dns(runner, 'Wi-Fi')
+
+    assert series(metrics.DNS_CHANGE_DURATION, 'apply').count == 1
+    assert series(metrics.DNS_CHANGE_DURATION, 'reset').count == 1
+    assert series(metrics.DNS_CHANGE_FAILURES, 'reset').value == 1
+    assert series(metrics.DNS_CHANGE_FAILURES, 'apply').value == 0
+    assert series(metrics.COMMANDS, 'netsh', 'fake').value == 3
+
+    CommandRunner().run([sys.executable, '-c', 'pass'])
+    spawned = [labels for labels in metrics.SUBPROCESS_SPAWNS.series if labels[1] == 'process']
+    assert len(spawned) == 1 and spawned[0][0].startswith('python')
+
+
+def test_benchmark_records_probes_and_duration(recording):
+    with DNSStubServer({'game.test': ['127.0.0.5']}) as stub:
+        run_time_to_service_benchmark({'Stub': {'primary': stub.address}},
+                                      {'Game': 'game.test', 'Gone': 'gone.test'},
+                                      connect=lambda address, port: 4.0)
+
+    assert series(metrics.PROBE_LATENCY, 'dns', stub.address, 'game.test').count == 1
+    assert series(metrics.PROBE_LATENCY, 'connect', '', 'game.test').sum == pytest.approx(0.004)
+    assert series(metrics.BENCHMARK_DURATION, 'time_to_service').count == 1
+
+
+def test_disabled_probe_hot_path_costs_next_to_nothing():
+    metrics.disable()
+    calls = 200_000
+    start = time.perf_counter()
+    for _ in range(calls):
+        metrics.observe_probe('dns', '1.1.1.1', 'example.com', 12.0)
+    per_call = (time.perf_counter() - start) / calls
+    # A DNS probe takes milliseconds; this is well under a microsecond
+    assert per_call < 2e-6
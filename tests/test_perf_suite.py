@@ -0,0 +1,37 @@
+"""
+Tests for the performance suite's runner and baseline comparison
+"""
+
+import json
+
+import perf_suite
+
+
+def test_compare_flags_only_slowdowns_beyond_tolerance():
+    baseline = {"parse": {"value": 1000.0, "unit": "ops/s"},
+                "render": {"value": 10.0, "unit": "ms"},
+                "load": {"value": 10.0, "unit": "ms"}}
+    results = {"parse": {"value": 700.0, "unit": "ops/s"},    # 43% slower
+               "render": {"value": 11.0, "unit": "ms"},       # within 25%
+               "load": {"value": 5.0, "unit": "ms"},          # faster
+               "new": {"value": 1.0, "unit": "ms"}}           # no baseline yet
+    regressions = perf_suite.compare(results, baseline, tolerance=0.25)
+    assert [r["name"] for r in regressions] == ["parse"]
+    assert regressions[0]["slowdown"] > 0.4
+
+
+def test_suite_saves_baseline_and_detects_regression(tmp_path, monkeypatch):
+    baseline = tmp_path / "baseline.json"
+    output = tmp_path / "results.json"
+    args = ["--quick", "--only", "parse_interfaces", "--baseline", str(baseline), "--output", str(output)]
+
+    assert perf_suite.main(args + ["--save-baseline"]) == 0
+    recorded = json.loads(baseline.read_text())
+    assert recorded["results"]["parse_interfaces"]["unit"] == "ops/s"
+    assert perf_suite.main(args + ["--tolerance", "10"]) == 0
+
+    # Pretend the baseline machine was much faster
+    recorded["results"]["parse_interfaces"]["value"] *= 100
+    baseline.write_text(json.dumps(recorded))
+    assert perf_suite.main(args) == 1
+    assert "parse_interfaces" in json.loads(output.read_text())["results"]
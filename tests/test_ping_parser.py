@@ -0,0 +1,65 @@
+"""
+Tests for the ping output parser against the recorded fixture corpus
+"""
+
+import json
+from pathlib import Path
+
+import pytest
+
+from ping_parser import aggregate_samples, parse_ping_output, parse_ping_outputs
+
+FIXTURES = Path(__file__).parent / "fixtures" / "ping"
+EXPECTED = json.loads((FIXTURES / "expected.json").read_text(encoding="utf-8"))
+
+
+def load(name):
+    return (FIXTURES / name).read_text(encoding="utf-8")
+
+
+@pytest.mark.parametrize("name", sorted(EXPECTED))
+def test_fixture_corpus(name):
+    result = parse_ping_output(load(name))
+    expected = EXPECTED[name]
+    assert result["replies"] == expected["replies"]
+    for key in ("sent", "received", "loss"):
+        assert result[key] == expected[key], key
+    for key in ("min", "avg", "max"):
+        if expected[key] is None:
+            assert result[key] is None
+        else:
+            assert result[key] == pytest.approx(expected[key], abs=1e-3)
+
+
+def test_every_fixture_has_expectations():
+    assert sorted(p.name for p in FIXTURES.glob("*.txt")) == sorted(EXPECTED)
+
+
+def test_quiet_output_falls_back_to_summary():
+    output = ("--- 1.1.1.1 ping statistics ---\n"
+              "5 packets transmitted, 5 received, 0% packet loss, time 4006ms\n"
+              "rtt min/avg/max/mdev = 10.100/11.200/12.300/0.700 ms\n")
+    result = parse_ping_output(output)
+    assert result["replies"] == []
+    assert (result["min"], result["avg"], result["max"]) == (10.1, 11.2, 12.3)
+
+
+def test_batch_parse_and_aggregate():
+    names = ["windows_en.txt", "windows_en_partial_loss.txt", "iputils.txt", "iputils_timeout.txt"]
+    results = parse_ping_outputs(load(name) for name in names * 50)
+    assert len(results) == 200
+
+    aggregate = aggregate_samples(results)
+    assert aggregate["samples"] == 50 * (4 + 2 + 4)
+    assert aggregate["sent"] == 50 * 16
+    assert aggregate["loss"] == pytest.approx(37.5)
+    assert aggregate["min"] == 11.0
+    assert aggregate["max"] == 52.0
+    assert aggregate["min"] <= aggregate["median"] <= aggregate["p95"] <= aggregate["max"]
+
+
+def test_aggregate_without_samples():
+    aggregate = aggregate_samples([parse_ping_output(load("windows_en_timeout.txt"))])
+    assert aggregate["samples"] == 0
+    assert aggregate["loss"] == 100.0
+    assert aggregate["avg"] is None
@@ -0,0 +1,261 @@
+"""
+Tests for rule-based DNS config switching
+"""
+
+import datetime
+import json
+import queue
+import sys
+import threading
+import time
+
+import pytest
+
+import netsh_backend
+import rules_engine
+from command_runner import FakeRunner
+from rules_engine import (ProcessWatcher, RulesEngine, choose, compile_rules, empty_facts, in_window,
+                          parse_time_window, seconds_until_change)
+
+CONFIGS = {'Corp': {'primary': '10.1.1.1', 'secondary': ''},
+           'Gaming': {'primary': '1.1.1.1', 'secondary': '1.0.0.1'},
+           'Family': {'primary': '1.1.1.3', 'secondary': '1.0.0.3'},
+           'Night': {'primary': '9.9.9.9', 'secondary': ''}}
+
+RULES = [
+    {'name': 'On VPN', 'config': 'Corp', 'when': {'vpn': True}},
+    {'name': 'Playing', 'config': 'Gaming', 'when': {'process': ['Valorant.exe', 'cs2']}},
+    {'name': 'Kids at home', 'config': 'Family',
+     'when': {'time': '07:00-21:00', 'days': ['mon', 'tue', 'wed', 'thu', 'fri'], 'ssid': 'HomeNet'}},
+    {'name': 'Late', 'config': 'Night', 'when': {'time': '22:00-06:00'}},
+]
+
+# A Wednesday
+NOON = datetime.datetime(2026, 10, 14, 12, 0)
+
+
+def test_time_windows_wrap_past_midnight():
+    assert parse_time_window('22:00-06:00') == (1320, 360)
+    assert parse_time_window(' 07:30 - 24:00 ') == (450, 1440)
+    for bad in ('22-06', '25:00-01:00', '10:00', '10:60-11:00'):
+        with pytest.raises(ValueError):
+            parse_time_window(bad)
+
+    night = (1320, 360)
+    assert in_window(datetime.datetime(2026, 10, 14, 23, 0), night)
+    assert in_window(datetime.datetime(2026, 10, 15, 5, 59), night)
+    assert not in_window(datetime.datetime(2026, 10, 15, 6, 0), night)
+    # Saturday 02:00 belongs to Friday night
+    fridays = frozenset({4})
+    assert in_window(datetime.datetime(2026, 10, 17, 2, 0), night, fridays)
+    assert not in_window(datetime.datetime(2026, 10, 16, 2, 0), night, fridays)
+    assert in_window(NOON, (0, 0))
+
+
+def test_invalid_rules_are_left_out(capsys):
+    rules = compile_rules([{'name': 'No config', 'when': {}},
+                           {'config': 'Gaming', 'when': {'weather': 'rain'}},
+                           {'config': 'Night', 'when': {'days': ['someday']}},
+                           {'config': 'Gaming', 'when': {'process': 'Game.EXE'}}])
+    assert [rule['name'] for rule in rules] == ['Gaming']
+    assert rules[0]['processes'] == frozenset({'game'})
+    out = capsys.readouterr().out
+    assert "Ignoring rule No config" in out and "weather" in out and "#3" in out
+
+
+def test_first_matching_rule_wins():
+    rules = compile_rules(RULES)
+    facts = empty_facts()
+    assert choose(rules, facts, NOON) is None
+
+    facts['ssids'] = ['HomeNet']
+    assert choose(rules, facts, NOON)['config'] == 'Family'
+    assert choose(rules, facts, NOON.replace(day=17)) is None          # Saturday
+    facts['processes'] = {'valorant': 1}
+    assert choose(rules, facts, NOON)['config'] == 'Gaming'
+    facts['adapters'] = ['Wi-Fi', 'ProtonVPN']
+    assert choose(rules, facts, NOON)['config'] == 'Corp'
+    facts['adapters'] = ['Wi-Fi', 'Laptop Ethernet']
+    assert choose(rules, facts, NOON)['config'] == 'Gaming'
+
+
+def test_timer_wakes_at_the_next_window_edge():
+    rules = compile_rules(RULES)
+    assert seconds_until_change(rules, NOON) == 9 * 3600                  # 21:00
+    assert seconds_until_change(rules, datetime.datetime(2026, 10, 14, 23, 30)) == 30 * 60  # midnight, for days
+    assert seconds_until_change(compile_rules(RULES[:2]), NOON) is None
+
+
+class Harness:
+    def __init__(self, rules, network=None, processes=None, apply_ok=True, now=NOON):
+        self.network = network or {'adapters': ['Wi-Fi'], 'ssids': []}
+        self.processes = processes or {}
+        self.applied = []
+        self.decisions = []
+        self.reads = 0
+        self.apply_ok = apply_ok
+        self.now = now
+        self.engine = RulesEngine({'rules': rules}, configs=lambda: CONFIGS, apply=self.apply,
+                                  on_decision=self.decisions.append, read_network=self.read_network,
+                                  read_processes=lambda: dict(self.processes), clock=lambda: self.now,
+                                  watch_events=False)
+
+    def read_network(self):
+        self.reads += 1
+        return dict(self.network)
+
+    def apply(self, name, config):
+        self.applied.append(name)
+        return self.apply_ok
+
+    def fire(self, trigger, detail=None):
+        return self.engine.handle([(trigger, detail, time.perf_counter())])
+
+
+def test_engine_switches_only_when_the_decision_changes():
+    harness = Harness(RULES, processes={'explorer.exe': 1, 'cs2.exe': 2})
+    assert harness.fire('start')['config'] == 'Gaming'
+
+    # One of two cs2 processes exits: still gaming, nothing re-applied
+    assert harness.fire('process', ('stop', 'cs2.exe')) is None
+    reads = harness.reads
+    assert harness.fire('process', ('start', 'notepad.exe')) is None
+    assert harness.reads == reads          # unrelated programs don't even re-read facts
+
+    harness.fire('process', ('stop', 'cs2.exe'))
+    assert harness.applied == ['Gaming']   # no rule matches now; the current DNS stays
+
+    harness.network = {'adapters': ['Wi-Fi', 'WireGuard Tunnel'], 'ssids': ['HomeNet']}
+    decision = harness.fire('network')
+    assert (decision['rule'], decision['trigger'], decision['applied']) == ('On VPN', 'network', True)
+    assert decision['decision_ms'] < 50
+    assert harness.applied == ['Gaming', 'Corp']
+
+    harness.network = {'adapters': ['Wi-Fi'], 'ssids': ['HomeNet']}
+    harness.fire('network')
+    harness.now = NOON.replace(hour=22, minute=30)
+    harness.fire('time')
+    assert harness.applied == ['Gaming', 'Corp', 'Family', 'Night']
+
+
+def test_failed_switch_is_retried_on_the_next_trigger():
+    harness = Harness(RULES[3:], apply_ok=False, now=NOON.replace(hour=23))
+    assert harness.fire('start')['applied'] is False
+    harness.apply_ok = True
+    assert harness.fire('time')['applied'] is True
+    assert harness.applied == ['Night', 'Night']
+
+    missing = Harness([{'config': 'Nowhere'}])
+    assert missing.fire('start')['applied'] is False and missing.applied == []
+
+
+def test_engine_thread_decides_within_milliseconds():
+    harness = Harness(RULES[1:2])
+    decided = threading.Event()
+    harness.engine.on_decision = lambda decision: decided.set()
+    harness.engine.start()
+    try:
+        time.sleep(0.05)
+        start = time.perf_counter()
+        harness.engine.notify('process', ('start', 'VALORANT.exe'))
+        assert decided.wait(1.0)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        assert harness.applied == ['Gaming']
+        assert elapsed_ms < 100
+    finally:
+        harness.engine.stop()
+
+
+def test_restarting_the_engine_reuses_one_address_watcher(monkeypatch):
+    changes = queue.Queue()
+    waiters = []
+
+    def waiter():
+        waiters.append(1)
+        return changes.get
+
+    monkeypatch.setattr(rules_engine, '_address_change_waiter', waiter)
+    monkeypatch.setattr(rules_engine, '_address_listeners', [])
+    monkeypatch.setattr(rules_engine, '_address_thread', None)
+    harness = Harness([{'name': 'Office', 'config': 'Corp', 'when': {'adapter': 'Ethernet'}}])
+    harness.engine.watch_events = True
+    for _ in range(3):
+        harness.engine.start()
+        harness.engine.stop()
+        harness.engine._thread.join(1.0)
+    harness.engine.start()
+    try:
+        assert len(waiters) == 1 and len(rules_engine._address_listeners) == 1
+        seen = queue.Queue()
+        harness.engine.notify = lambda trigger, detail=None: seen.put(trigger)
+        changes.put(0)
+        assert seen.get(timeout=1.0) == 'network'
+    finally:
+        harness.engine.stop()
+        changes.put(1)    # ends the watcher thread
+    assert rules_engine._address_listeners == []
+
+
+def test_process_watcher_streams_trace_events():
+    events = []
+    script = "print('ready'); print('start game.exe'); print('bogus'); print('stop game.exe')"
+    watcher = ProcessWatcher(lambda kind, name: events.append((kind, name)),
+                             argv=[sys.executable, '-c', script], poll_interval=60)
+    watcher._stop.set()   # don't fall back to polling once the script ends
+    watcher._run()
+    assert events == [('start', 'game.exe'), ('stop', 'game.exe')] and watcher.mode == 'trace'
+
+
+def test_process_watcher_falls_back_to_tasklist():
+    snapshots = iter(['"a.exe","1","Console","1","1 K"\n',
+                      '"a.exe","1","Console","1","1 K"\n"b.exe","2","Console","1","1 K"\n'])
+    runner = FakeRunner({'tasklist': lambda args: next(snapshots, '"b.exe","2","Console","1","1 K"\n')})
+    events = []
+    watcher = ProcessWatcher(lambda kind, name: events.append((kind, name)), runner=runner,
+                             argv=['no-such-powershell-here'], poll_interval=0.01)
+    watcher.start()
+    deadline = time.time() + 2
+    while len(events) < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    watcher.stop()
+    assert events[:2] == [('start', 'b.exe'), ('stop', 'a.exe')] and watcher.mode == 'poll'
+
+
+def test_windows_fact_parsers():
+    interfaces = """
+Admin State    State          Type             Interface Name
+-------------------------------------------------------------------------
+Enabled        Connected      Dedicated        Ethernet 2
+Enabled        Disconnected   Dedicated        Wi-Fi
+Enabled        Connected      Dedicated        Corp VPN
+"""
+    assert netsh_backend.parse_connected_interfaces(interfaces) == ['Ethernet 2', 'Corp VPN']
+
+    wlan = """
+There is 2 interfaces on the system:
+
+    Name                   : Wi-Fi
+    State                  : connected
+    SSID                   : HomeNet
+    BSSID                  : aa:bb:cc:dd:ee:ff
+
+    Name                   : Wi-Fi 2
+    State                  : disconnected
+"""
+    assert netsh_backend.parse_wlan_ssids(wlan) == ['HomeNet']
+    assert netsh_backend.parse_tasklist('"svchost.exe","4","Services","0","10,000 K"\n'
+                                        '"svchost.exe","8","Services","0","12,000 K"\n'
+                                        'INFO: No tasks are running\n') == {'svchost.exe': 2}
+
+
+def test_toggling_keeps_a_broken_rules_file(tmp_path, capsys):
+    path = tmp_path / "dns_rules.json"
+    assert rules_engine.load_rules(str(path)) == {'enabled': False, 'rules': []}
+    assert rules_engine.set_enabled(True, str(path))
+    assert json.loads(path.read_text())['enabled'] is True
+
+    path.write_text('{"enabled": true, "rules": [')
+    assert rules_engine.set_enabled(False, str(path)) is False
+    assert path.read_text() == '{"enabled": true, "rules": ['
+    assert rules_engine.load_rules(str(path))['rules'] == []
+    assert "not valid JSON" in capsys.readouterr().out
@@ -0,0 +1,75 @@
+"""
+Tests for dual-stack service probing
+"""
+
+import socket
+import time
+
+import service_probe
+from service_probe import probe_service, format_summary
+
+
+def test_resolve_addresses_localhost():
+    addresses = service_probe.resolve_addresses("localhost")
+    assert (socket.AF_INET, "127.0.0.1") in addresses
+    assert len(addresses) == len(set(addresses))
+
+
+def test_probe_service_reports_best_and_worst_per_family(monkeypatch):
+    monkeypatch.setattr(service_probe, "resolve_addresses", lambda host: [
+        (socket.AF_INET, "192.0.2.1"),
+        (socket.AF_INET, "192.0.2.2"),
+        (socket.AF_INET, "192.0.2.3"),
+        (socket.AF_INET6, "2001:db8::1"),
+    ])
+    latencies = {"192.0.2.1": 80.0, "192.0.2.2": 12.0, "192.0.2.3": None, "2001:db8::1": 30.0}
+
+    result = probe_service("example.test", probe=lambda address, family: latencies[address])
+
+    ipv4 = result["families"]["IPv4"]
+    assert ipv4["count"] == 3
+    assert ipv4["reachable"] == 2
+    assert ipv4["best"]["address"] == "192.0.2.2"
+    assert ipv4["worst"]["address"] == "192.0.2.1"
+    assert result["families"]["IPv6"]["best"]["address"] == "2001:db8::1"
+    assert result["best"]["address"] == "192.0.2.2"
+    assert format_summary(result) == "v4 12/80ms  v6 30ms"
+
+
+def test_probe_service_probes_addresses_concurrently(monkeypatch):
+    monkeypatch.setattr(service_probe, "resolve_addresses", lambda host: [
+        (socket.AF_INET, f"192.0.2.{i}") for i in range(1, 5)
+    ])
+
+    def slow_probe(address, family):
+        time.sleep(0.2)
+        return 10.0
+
+    start = time.perf_counter()
+    result = probe_service("example.test", probe=slow_probe)
+    assert time.perf_counter() - start < 0.6
+    assert result["families"]["IPv4"]["reachable"] == 4
+
+
+def test_probe_service_unresolvable_host():
+    result = probe_service("does-not-exist.invalid")
+    assert result["addresses"] == []
+    assert result["best"] is None
+
+
+def test_probe_services_batches_all_hosts(monkeypatch):
+    monkeypatch.setattr(service_probe, "resolve_addresses", lambda host: {
+        "a.test": [(socket.AF_INET, "192.0.2.1")],
+        "b.test": [(socket.AF_INET, "192.0.2.2"), (socket.AF_INET6, "2001:db8::2")],
+    }[host])
+    calls = []
+
+    def fake_ping_many(addresses, count, timeout):
+        calls.append(list(addresses))
+        return {address: {"avg": 5.0} for address in addresses}
+
+    monkeypatch.setattr(service_probe, "ping_many", fake_ping_many)
+    results = service_probe.probe_services(["a.test", "b.test"])
+
+    assert calls == [["192.0.2.1", "192.0.2.2", "2001:db8::2"]]
+    assert results["b.test"]["families"]["IPv6"]["best"]["latency"] == 5.0
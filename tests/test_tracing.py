@@ -0,0 +1,78 @@
+"""
+Tests for the opt-in Chrome trace recorder
+"""
+
+import json
+import threading
+import time
+
+import pytest
+
+import tracing
+
+
+@pytest.fixture
+def no_tracer(monkeypatch):
+    monkeypatch.setattr(tracing, "_tracer", None)
+    monkeypatch.delenv(tracing.ENV_VAR, raising=False)
+
+
+def test_disabled_tracing_is_a_no_op(no_tracer, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    @tracing.traced()
+    def work():
+        return 42
+
+    assert tracing.enable_from_environment() is None
+    assert not tracing.is_enabled()
+    with tracing.span("anything") as span:
+        assert span is None
+    assert work() == 42
+    tracing.instant("marker")
+    tracing.save()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_enabled_tracing_writes_chrome_trace(no_tracer, tmp_path, monkeypatch):
+    path = tmp_path / "trace.json"
+    monkeypatch.setenv(tracing.ENV_VAR, str(path))
+    tracing.enable_from_environment()
+
+    @tracing.traced(category="ui")
+    def rebuild():
+        time.sleep(0.01)
+
+    start = time.perf_counter()
+    rebuild()
+    with tracing.span("ipconfig /all", "subprocess", adapter="Wi-Fi"):
+        pass
+    worker = threading.Thread(target=rebuild, name="worker")
+    worker.start()
+    worker.join()
+    with pytest.raises(ValueError):
+        with tracing.span("failing"):
+            raise ValueError("boom")
+    tracing.complete("imports", "startup", start - 0.5, start)
+    tracing.instant("first paint", "startup")
+    tracing.save()
+
+    events = json.loads(path.read_text())["traceEvents"]
+    spans = [e for e in events if e["ph"] == "X"]
+    names = [e["name"] for e in spans]
+    assert names.count(rebuild.__qualname__) == 2
+    assert "ipconfig /all" in names
+
+    rebuilds = [e for e in spans if e["name"] == rebuild.__qualname__]
+    assert rebuilds[0]["cat"] == "ui"
+    assert rebuilds[0]["dur"] >= 10_000
+    assert rebuilds[0]["tid"] != rebuilds[1]["tid"]
+
+    subprocess_span = next(e for e in spans if e["name"] == "ipconfig /all")
+    assert subprocess_span["args"] == {"adapter": "Wi-Fi"}
+    assert next(e for e in spans if e["name"] == "failing")["args"] == {"error": "ValueError"}
+    assert next(e for e in spans if e["name"] == "imports")["dur"] == pytest.approx(500_000)
+
+    thread_names = {e["args"]["name"] for e in events if e["ph"] == "M"}
+    assert {"MainThread", "worker"} <= thread_names
+    assert any(e["ph"] == "i" and e["name"] == "first paint" for e in events)
@@ -0,0 +1,107 @@
+"""
+Tests for the TTL cache behind the per-adapter DNS settings
+"""
+
+import pytest
+
+import netsh_backend
+from command_runner import CommandError, FakeRunner
+from ttl_cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = TTLCache(ttl=5, clock=clock)
+    cache.put('Wi-Fi', {'primary': '1.1.1.1'})
+    clock.now += 4.9
+    assert cache.get('Wi-Fi') == {'primary': '1.1.1.1'} and 'Wi-Fi' in cache
+    clock.now += 0.1
+    assert cache.get('Wi-Fi', 'gone') == 'gone' and 'Wi-Fi' not in cache
+    assert cache.stats()['expirations'] == 1 and len(cache) == 0
+
+
+def test_size_bound_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert 'a' in cache and 'b' not in cache and 'c' in cache
+    assert cache.stats()['evictions'] == 1
+    with pytest.raises(ValueError):
+        TTLCache(maxsize=0)
+
+
+def test_none_is_a_cached_value():
+    loads = []
+    cache = TTLCache()
+    for _ in range(3):
+        assert cache.get_or_load('Ethernet', lambda: loads.append(1)) is None
+    assert len(loads) == 1
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['hit_rate']) == (2, 1, pytest.approx(2 / 3))
+
+
+def test_failures_are_cached_only_for_negative_ttl():
+    clock = FakeClock()
+    calls = []
+
+    def failing():
+        calls.append(1)
+        raise OSError("netsh failed")
+
+    uncached = TTLCache(clock=clock)
+    for _ in range(2):
+        with pytest.raises(OSError):
+            uncached.get_or_load('Wi-Fi', failing)
+    assert len(calls) == 2 and len(uncached) == 0
+
+    calls.clear()
+    cache = TTLCache(ttl=60, negative_ttl=2, clock=clock)
+    for _ in range(3):
+        with pytest.raises(OSError, match="netsh failed"):
+            cache.get_or_load('Wi-Fi', failing)
+    assert len(calls) == 1
+    assert cache.peek('Wi-Fi', 'unknown') == 'unknown'
+
+    clock.now += 2
+    assert cache.get_or_load('Wi-Fi', lambda: {'primary': '9.9.9.9'}) == {'primary': '9.9.9.9'}
+
+
+def test_invalidation_hooks():
+    lookups = []
+    cache = TTLCache(on_lookup=lookups.append)
+    for adapter in ('Wi-Fi', 'Ethernet', 'VPN'):
+        cache.put(adapter, adapter.lower())
+    assert cache.invalidate('Wi-Fi') is True and cache.invalidate('Wi-Fi') is False
+    assert cache.retain(['Ethernet', 'Bluetooth']) == 1
+    assert cache.get('Ethernet') == 'ethernet' and cache.get('VPN') is None
+    assert lookups == ['hit', 'miss']
+    cache.clear()
+    assert len(cache) == 0 and cache.stats()['invalidations'] == 3
+
+
+def test_netsh_failure_is_not_read_as_dhcp():
+    runner = FakeRunner({
+        ('netsh', 'interface', 'ip', 'show', 'dns', 'Ethernet'):
+            "Configuration for interface \"Ethernet\"\n    DNS servers configured through DHCP:  None\n",
+    })
+    cache = TTLCache(negative_ttl=2)
+
+    def load(adapter):
+        return cache.get_or_load(adapter, lambda: netsh_backend.get_dns_servers(runner, adapter, check=True))
+
+    assert load('Ethernet') is None and 'Ethernet' in cache
+    with pytest.raises(CommandError):
+        load('Missing')
+    assert cache.peek('Missing', 'unknown') == 'unknown'
+    # Without check, failure and DHCP still look the same
+    assert netsh_backend.get_dns_servers(runner, 'Missing') is None
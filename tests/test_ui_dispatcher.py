@@ -0,0 +1,138 @@
+"""
+Tests for the UI update dispatcher, driven by a fake Tk root
+"""
+
+import threading
+
+from ui_dispatcher import UIDispatcher
+
+
+class FakeRoot:
+    """Records after() callbacks instead of running a Tk event loop"""
+
+    def __init__(self):
+        self.scheduled = []
+        self.cancelled = []
+
+    def after(self, ms, func):
+        self.scheduled.append((ms, func))
+        return f"after#{len(self.scheduled)}"
+
+    def after_cancel(self, after_id):
+        self.cancelled.append(after_id)
+
+    def tick(self):
+        """Run the most recent callback, like the event loop would"""
+        _, func = self.scheduled[-1]
+        func()
+
+
+class Label:
+    def __init__(self):
+        self.options = {}
+        self.calls = 0
+
+    def configure(self, **options):
+        self.calls += 1
+        self.options.update(options)
+
+
+def test_configure_updates_are_merged_per_widget():
+    ui = UIDispatcher(FakeRoot())
+    label, other = Label(), Label()
+    ui.configure(label, text="Testing...", text_color="gray")
+    ui.configure(other, text="Testing...")
+    ui.configure(label, text="12 ms")
+
+    assert ui.drain() == 2
+    assert label.calls == 1
+    assert label.options == {"text": "12 ms", "text_color": "gray"}
+    assert ui.stats["coalesced"] == 1
+
+
+def test_calls_run_in_order_and_keys_replace():
+    ui = UIDispatcher(FakeRoot())
+    seen = []
+    ui.call(seen.append, "clear")
+    for percent in range(0, 101, 10):
+        ui.call(seen.append, f"{percent}%", key="progress")
+    ui.call(seen.append, "done")
+
+    ui.drain()
+    assert seen == ["clear", "100%", "done"]
+
+
+def test_nothing_runs_until_the_tk_thread_ticks():
+    root = FakeRoot()
+    ui = UIDispatcher(root, frame_ms=16, idle_ms=50)
+    ui.start()
+    ui.start()
+    assert len(root.scheduled) == 1
+
+    label = Label()
+    worker = threading.Thread(target=lambda: [ui.configure(label, text=str(i)) for i in range(1000)])
+    worker.start()
+    worker.join()
+    # The worker only queued; it never scheduled anything on the root
+    assert len(root.scheduled) == 1 and label.calls == 0
+
+    root.tick()
+    assert label.calls == 1 and label.options["text"] == "999"
+    assert root.scheduled[-1][0] == 16      # stay at frame rate right after work
+    root.tick()
+    assert root.scheduled[-1][0] == 50      # back to idle polling
+
+    ui.stop()
+    assert root.cancelled == ["after#3"]
+
+
+def test_many_workers_cost_one_change_per_label_per_frame():
+    root = FakeRoot()
+    ui = UIDispatcher(root)
+    ui.start()
+    labels = [Label() for _ in range(500)]
+
+    def probe(label):
+        ui.configure(label, text="Testing...")
+        ui.configure(label, text="42 ms", text_color="#2ecc71")
+
+    threads = [threading.Thread(target=probe, args=(label,)) for label in labels]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    root.tick()
+    assert sum(label.calls for label in labels) == 500
+    assert all(label.options["text"] == "42 ms" for label in labels)
+    assert ui.stats["ticks"] == 1
+
+
+def test_large_batches_are_spread_over_frames():
+    root = FakeRoot()
+    ui = UIDispatcher(root, max_per_tick=100)
+    ui.start()
+    seen = []
+    for i in range(250):
+        ui.call(seen.append, i)
+
+    root.tick()
+    assert len(seen) == 100 and ui.pending == 150
+    root.tick()
+    root.tick()
+    assert seen == list(range(250))
+
+
+def test_failing_update_does_not_stop_the_rest(capsys):
+    ui = UIDispatcher(FakeRoot())
+    seen = []
+
+    def closed_window():
+        raise RuntimeError('invalid command name ".!ctktoplevel"')
+
+    ui.call(closed_window)
+    ui.call(seen.append, "next")
+    ui.drain()
+    assert seen == ["next"]
+    assert ui.stats["errors"] == 1
+    assert "failed" in capsys.readouterr().out
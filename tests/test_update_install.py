@@ -0,0 +1,267 @@
+"""
+Tests for manifest-based delta updates, ZIP installs and the staged file swap
+"""
+
+import functools
+import json
+import os
+import threading
+import zipfile
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import update_install
+from update_install import StagedSwap, build_manifest, plan_delta, recover
+from updater import UpdateManager
+
+
+def write_tree(root, files):
+    root.mkdir(parents=True, exist_ok=True)
+    for name, content in files.items():
+        (root / name).write_text(content)
+
+
+@pytest.fixture
+def install(tmp_path):
+    app = tmp_path / "app"
+    write_tree(app, {"dns_manager.py": "old main", "updater.py": "same", "legacy.py": "gone soon",
+                     "dns_configs.json": "{\"user\": 1}", "monitor_settings.json": "{}",
+                     "split_dns.json": "{}", "blocklist.json": "{}"})
+    update_install.save_manifest(app, build_manifest(app, "1.0.0"))
+    return app
+
+
+@pytest.fixture
+def release(tmp_path):
+    root = tmp_path / "release"
+    write_tree(root, {"dns_manager.py": "new main!", "updater.py": "same", "catalog.py": "added"})
+    return root
+
+
+def test_manifest_skips_user_data(install):
+    manifest = build_manifest(install, "1.0.0")
+    assert sorted(manifest["files"]) == ["dns_manager.py", "legacy.py", "updater.py"]
+    assert manifest["base_url"].endswith("/v1.0.0/")
+
+
+def test_plan_lists_only_differences(install, release):
+    manifest = build_manifest(release, "2.0.0")
+    plan = plan_delta(manifest, install, update_install.load_manifest(install))
+    assert sorted(plan["changed"]) == ["catalog.py", "dns_manager.py"]
+    assert plan["removed"] == ["legacy.py"]
+    # Without a record of the installed files nothing is removed
+    assert plan_delta(manifest, install)["removed"] == []
+
+
+def test_plan_rejects_paths_outside_app(install):
+    with pytest.raises(ValueError):
+        plan_delta({"files": {"../evil.py": {"sha256": "0", "size": 1}}}, install)
+
+
+def stage(swap, files):
+    for name, content in files.items():
+        swap.stage_path(name).write_text(content)
+
+
+def test_swap_commits_and_cleans_up(install):
+    swap = StagedSwap(install)
+    stage(swap, {"dns_manager.py": "new", "catalog.py": "added"})
+    swap.commit(["dns_manager.py", "catalog.py"], ["legacy.py"])
+    swap.cleanup()
+
+    assert (install / "dns_manager.py").read_text() == "new"
+    assert (install / "catalog.py").read_text() == "added"
+    assert not (install / "legacy.py").exists()
+    assert not (install / update_install.STAGING_DIR).exists()
+    assert not (install / update_install.ROLLBACK_DIR).exists()
+
+
+def test_failed_swap_restores_previous_files(install, monkeypatch):
+    swap = StagedSwap(install)
+    stage(swap, {"dns_manager.py": "new", "catalog.py": "added", "updater.py": "new too"})
+    real_replace = os.replace
+    calls = []
+
+    def flaky_replace(src, dst):
+        calls.append(src)
+        if len(calls) == 3:
+            raise PermissionError("file in use")
+        real_replace(src, dst)
+
+    monkeypatch.setattr(update_install.os, "replace", flaky_replace)
+    with pytest.raises(PermissionError):
+        swap.commit(["dns_manager.py", "catalog.py", "updater.py"], ["legacy.py"])
+
+    assert (install / "dns_manager.py").read_text() == "old main"
+    assert (install / "updater.py").read_text() == "same"
+    assert (install / "legacy.py").read_text() == "gone soon"
+    assert not (install / "catalog.py").exists()
+
+
+def test_recover_undoes_interrupted_swap(install, monkeypatch):
+    swap = StagedSwap(install)
+    stage(swap, {"dns_manager.py": "new", "catalog.py": "added", "updater.py": "new too"})
+    real_replace = os.replace
+    calls = []
+
+    def crash(src, dst):
+        calls.append(src)
+        if len(calls) == 3:
+            raise SystemExit("power cut")
+        real_replace(src, dst)
+
+    monkeypatch.setattr(update_install.os, "replace", crash)
+    with pytest.raises(SystemExit):
+        swap.commit(["dns_manager.py", "catalog.py", "updater.py"])
+    monkeypatch.setattr(update_install.os, "replace", real_replace)
+
+    assert recover(install)
+    assert (install / "dns_manager.py").read_text() == "old main"
+    assert (install / "updater.py").read_text() == "same"
+    assert not (install / "catalog.py").exists()
+    assert not recover(install)
+
+
+def test_recover_keeps_files_the_crash_never_reached(install, monkeypatch):
+    swap = StagedSwap(install)
+    stage(swap, {"dns_manager.py": "new", "catalog.py": "added"})
+    real_replace = os.replace
+    calls = []
+
+    def crash(src, dst):
+        calls.append(src)
+        if len(calls) == 2:
+            raise SystemExit("power cut")
+        real_replace(src, dst)
+
+    monkeypatch.setattr(update_install.os, "replace", crash)
+    with pytest.raises(SystemExit):
+        swap.commit(["dns_manager.py", "catalog.py"], removed=["legacy.py"])
+    monkeypatch.setattr(update_install.os, "replace", real_replace)
+
+    assert recover(install)
+    assert (install / "dns_manager.py").read_text() == "old main"
+    assert (install / "legacy.py").read_text() == "gone soon"     # never moved aside
+    assert not (install / "catalog.py").exists()
+
+
+def test_recover_leaves_a_committed_update_alone(install):
+    swap = StagedSwap(install)
+    stage(swap, {"dns_manager.py": "new", "catalog.py": "added"})
+    swap.commit(["dns_manager.py", "catalog.py"], removed=["legacy.py"])
+    # Crash before save_manifest()/cleanup()
+    assert not recover(install)
+    assert (install / "dns_manager.py").read_text() == "new"
+    assert (install / "catalog.py").read_text() == "added"
+    assert not (install / "legacy.py").exists()
+
+
+def test_install_delta_downloads_only_changed_files(install, release, tmp_path):
+    requested = []
+
+    class Handler(SimpleHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            requested.append(self.path)
+            super().do_GET()
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(Handler, directory=str(release)))
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{httpd.server_port}/"
+    manifest = build_manifest(release, "2.0.0", base_url=base)
+    (release / "manifest.json").write_text(json.dumps(manifest))
+    (release / "checksums.txt").write_text(
+        f"{update_install.file_sha256(release / 'manifest.json')}  manifest.json\n")
+
+    manager = UpdateManager(state_path=tmp_path / "state.json")
+    manager.app_dir = install
+    reports = []
+    try:
+        info = {"manifest_url": base + "manifest.json", "checksums_url": base + "checksums.txt"}
+        assert manager.install_delta(info, progress_callback=lambda *a: reports.append(a))
+
+        # Tampered file on the server: hash check fails, install is untouched
+        (release / "dns_manager.py").write_text("tampered")
+        (install / "dns_manager.py").write_text("local edit")
+        assert not manager.install_delta(info)
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+    assert requested[:2] == ["/checksums.txt", "/manifest.json"]
+    assert sorted(requested[2:4]) == ["/catalog.py", "/dns_manager.py"]
+    assert reports[-1] == (100.0, 2, 2)
+    assert (install / "catalog.py").read_text() == "added"
+    assert (install / "dns_manager.py").read_text() == "local edit"
+    assert (install / "dns_configs.json").read_text() == "{\"user\": 1}"
+    assert update_install.load_manifest(install)["version"] == "2.0.0"
+    assert not (install / update_install.STAGING_DIR).exists()
+
+
+def test_install_delta_refuses_an_unverified_manifest(install, release, tmp_path):
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0),
+                                functools.partial(SimpleHTTPRequestHandler, directory=str(release)))
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{httpd.server_port}/"
+    (release / "manifest.json").write_text(json.dumps(build_manifest(release, "2.0.0", base_url=base)))
+    manager = UpdateManager(state_path=tmp_path / "state.json")
+    manager.app_dir = install
+    info = {"manifest_url": base + "manifest.json", "checksums_url": base + "checksums.txt"}
+    try:
+        (release / "checksums.txt").write_text(f"{'ab' * 32}  DNSManagerPro-Setup.exe\n")
+        assert not manager.install_delta(info)             # manifest not listed
+        (release / "checksums.txt").write_text(f"{'ab' * 32}  manifest.json\n")
+        assert not manager.install_delta(info)             # manifest does not match
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+    assert (install / "dns_manager.py").read_text() == "old main"
+    assert not manager.can_delta_update({"manifest_url": base + "manifest.json"})
+
+
+def make_zip(path, files, prefix="DNSManager-2.0.0/"):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, content in files.items():
+            archive.writestr(prefix + name, content)
+    return path
+
+
+def test_install_zip_replaces_only_changed_files(install, tmp_path):
+    untouched = install / "updater.py"
+    inode = untouched.stat().st_ino
+    archive = make_zip(tmp_path / "update.zip", {
+        "dns_manager.py": "new main", "updater.py": "same", "catalog.py": "added",
+        "dns_configs.json": "{}", "__pycache__/x.pyc": "junk", "blocklist.json": "{\"lists\": []}",
+        "blocklist_index/hosts-1.idx": "junk"})
+
+    stats = update_install.install_zip(archive, install, max_workers=4)
+
+    assert stats == {"changed": 2, "unchanged": 1}
+    assert (install / "dns_manager.py").read_text() == "new main"
+    assert (install / "catalog.py").read_text() == "added"
+    assert untouched.stat().st_ino == inode
+    assert (install / "dns_configs.json").read_text() == "{\"user\": 1}"
+    assert (install / "blocklist.json").read_text() == "{}"
+    assert not (install / "__pycache__").exists() and not (install / "blocklist_index").exists()
+    assert not (install / update_install.ROLLBACK_DIR).exists()
+
+
+def test_install_zip_rolls_back_on_failure(install, tmp_path, monkeypatch):
+    archive = make_zip(tmp_path / "update.zip", {"dns_manager.py": "new main", "updater.py": "changed"})
+    real_replace = os.replace
+
+    def failing_replace(src, dst):
+        if str(dst).endswith("updater.py"):
+            raise PermissionError("file in use")
+        real_replace(src, dst)
+
+    monkeypatch.setattr(update_install.os, "replace", failing_replace)
+    with pytest.raises(PermissionError):
+        update_install.install_zip(archive, install)
+
+    assert (install / "dns_manager.py").read_text() == "old main"
+    assert (install / "updater.py").read_text() == "same"
+    assert not (install / update_install.STAGING_DIR).exists()
@@ -0,0 +1,324 @@
+"""
+Tests for update checks and downloads, run against a local HTTP server
+"""
+
+import hashlib
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import updater
+from updater import UpdateManager, backoff_delay
+
+RELEASE = {"tag_name": "v99.0.0", "body": "Notes", "html_url": "https://example.invalid/r",
+           "assets": [{"name": "DNSManager-Setup.exe",
+                       "browser_download_url": "https://example.invalid/setup.exe"}]}
+
+
+class ReleaseServer:
+    """Serves a release JSON with an ETag; `status` forces an error response"""
+
+    def __init__(self):
+        self.requests = []
+        self.status = 200
+        self.retry_after = None
+        self.etag = '"v1"'
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server.requests.append(dict(self.headers))
+                if server.status != 200:
+                    self.send_response(server.status)
+                    if server.retry_after:
+                        self.send_header("Retry-After", str(server.retry_after))
+                    self.end_headers()
+                    return
+                if self.headers.get("If-None-Match") == server.etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                body = json.dumps(RELEASE).encode()
+                self.send_response(200)
+                self.send_header("ETag", server.etag)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/releases/latest"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def release_server():
+    server = ReleaseServer()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def manager(release_server, tmp_path):
+    manager = UpdateManager(api_url=release_server.url, state_path=tmp_path / "state.json",
+                            min_interval=3600)
+    manager.clock = lambda: manager.now
+    manager.now = 1_000_000.0
+    return manager
+
+
+def test_check_is_cached_for_the_minimum_interval(manager, release_server):
+    info = manager.check_for_updates()
+    assert info["version"] == "99.0.0"
+    assert info["download_url"].endswith("setup.exe")
+
+    manager.now += 60
+    assert manager.check_for_updates()["version"] == "99.0.0"
+    assert len(release_server.requests) == 1
+
+
+def test_conditional_request_after_interval(manager, release_server):
+    manager.check_for_updates()
+    manager.now += 3601
+    assert manager.check_for_updates()["version"] == "99.0.0"
+    assert len(release_server.requests) == 2
+    assert release_server.requests[1]["If-None-Match"] == '"v1"'
+
+    # A forced check always asks, but still conditionally
+    manager.check_for_updates(force=True)
+    assert len(release_server.requests) == 3
+
+
+def test_cache_survives_restart(manager, release_server, tmp_path):
+    manager.check_for_updates()
+    restarted = UpdateManager(api_url=release_server.url, state_path=tmp_path / "state.json")
+    restarted.clock = lambda: manager.now + 10
+    assert restarted.check_for_updates()["version"] == "99.0.0"
+    assert len(release_server.requests) == 1
+
+
+def test_failures_back_off_with_jitter(manager, release_server):
+    release_server.status = 500
+    assert manager.check_for_updates() is None
+    state = json.loads(manager.state_path.read_text())
+    assert state["failures"] == 1
+    first_delay = state["retry_after"] - manager.now
+    assert updater.BACKOFF_BASE / 2 <= first_delay <= updater.BACKOFF_BASE
+
+    # No request while backing off
+    manager.now += first_delay / 2
+    manager.check_for_updates()
+    assert len(release_server.requests) == 1
+
+    release_server.status = 200
+    manager.now += first_delay
+    assert manager.check_for_updates()["version"] == "99.0.0"
+    assert json.loads(manager.state_path.read_text())["failures"] == 0
+
+
+def test_rate_limit_retry_after_is_honoured(manager, release_server):
+    release_server.status = 403
+    release_server.retry_after = 50_000
+    manager.check_for_updates()
+    state = json.loads(manager.state_path.read_text())
+    assert state["retry_after"] - manager.now == 50_000
+
+
+def test_backoff_grows_and_is_capped():
+    for failures in range(1, 20):
+        delay = backoff_delay(failures, base=10, cap=1000)
+        expected = min(1000, 10 * 2 ** (failures - 1))
+        assert expected / 2 <= delay <= expected
+
+
+class FileServer:
+    """Serves one file with Range support; the first `drops` responses stop early"""
+
+    def __init__(self, payload, drops=0, drop_after=256 * 1024, ranges=True):
+        self.payload = payload
+        self.drops = drops
+        self.drop_after = drop_after
+        self.ranges = ranges
+        self.ranges_seen = []
+        self.checksums = ""
+        self.checksum_source = None
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.endswith("checksums.txt"):
+                    checksums = server.checksum_source() if server.checksum_source else server.checksums
+                    if checksums is None:
+                        self.send_error(503)
+                        return
+                    body = checksums.encode()
+                    self.send_response(200)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+
+                start = 0
+                byte_range = self.headers.get("Range")
+                server.ranges_seen.append(byte_range)
+                if byte_range and server.ranges:
+                    start = int(byte_range.split("=")[1].rstrip("-"))
+                    self.send_response(206)
+                    self.send_header("Content-Range",
+                                     f"bytes {start}-{len(server.payload) - 1}/{len(server.payload)}")
+                else:
+                    self.send_response(200)
+                self.send_header("ETag", '"payload"')
+                self.send_header("Content-Length", str(len(server.payload) - start))
+                self.end_headers()
+
+                body = server.payload[start:]
+                if server.drops:
+                    server.drops -= 1
+                    body = body[:server.drop_after]
+                    self.close_connection = True
+                self.wfile.write(body)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base = f"http://127.0.0.1:{self.httpd.server_port}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def download_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(updater.tempfile, "tempdir", str(tmp_path))
+    return tmp_path / "dns_manager_update"
+
+
+def start_file_server(**kwargs):
+    payload = os.urandom(3 * 1024 * 1024 + 123)
+    server = FileServer(payload, **kwargs)
+    server.checksums = (f"SHA256 hash of DNSManagerPro-Setup.exe:\r\n"
+                        f"{hashlib.sha256(payload).hexdigest()}\r\n"
+                        f"CertUtil: -hashfile command completed successfully.\r\n")
+    return server
+
+
+def test_download_resumes_after_dropped_connections(download_dir):
+    server = start_file_server(drops=3)
+    manager = UpdateManager()
+    manager.retry_delay = 0
+    reports = []
+    try:
+        path = manager.download_update(f"{server.base}/DNSManagerPro-Setup.exe",
+                                       progress_callback=lambda *a: reports.append(a),
+                                       checksum_url=f"{server.base}/checksums.txt")
+    finally:
+        server.close()
+
+    assert path is not None and path.read_bytes() == server.payload
+    assert server.ranges_seen[0] is None
+    assert server.ranges_seen[1:] == [f"bytes={n * 256 * 1024}-" for n in (1, 2, 3)]
+    assert reports[-1] == (100.0, len(server.payload), len(server.payload))
+    assert len(reports) < 50
+    assert sorted(p.name for p in download_dir.iterdir()) == ["dns_manager_setup.exe"]
+
+
+def test_download_restarts_when_server_ignores_ranges(download_dir):
+    server = start_file_server(drops=1, ranges=False)
+    manager = UpdateManager()
+    manager.retry_delay = 0
+    try:
+        path = manager.download_update(f"{server.base}/DNSManagerPro-Setup.exe",
+                                       checksum_url=f"{server.base}/checksums.txt")
+    finally:
+        server.close()
+    assert path.read_bytes() == server.payload
+
+
+def test_download_rejects_checksum_mismatch(download_dir):
+    server = start_file_server()
+    server.checksums = f"{'0' * 64}  DNSManagerPro-Setup.exe\n"
+    try:
+        path = UpdateManager().download_update(f"{server.base}/DNSManagerPro-Setup.exe",
+                                               checksum_url=f"{server.base}/checksums.txt")
+    finally:
+        server.close()
+    assert path is None
+    assert list(download_dir.iterdir()) == []
+
+
+def test_download_gives_up_without_progress(download_dir):
+    server = start_file_server(drops=100, drop_after=0)
+    manager = UpdateManager()
+    manager.retry_delay = 0
+    try:
+        assert manager.download_update(f"{server.base}/DNSManagerPro-Setup.exe", retries=2,
+                                       checksum_url=f"{server.base}/checksums.txt") is None
+    finally:
+        server.close()
+    assert len(server.ranges_seen) == 3
+
+
+def test_download_refuses_assets_without_a_checksum(download_dir):
+    server = start_file_server()
+    manager = UpdateManager()
+    try:
+        assert manager.download_update(f"{server.base}/DNSManagerPro-Setup.exe") is None
+        server.checksums = f"{'ab' * 32}  Other.zip\n"
+        assert manager.download_update(f"{server.base}/DNSManagerPro-Setup.exe",
+                                       checksum_url=f"{server.base}/checksums.txt") is None
+    finally:
+        server.close()
+    assert server.ranges_seen == []             # nothing was downloaded
+
+
+def test_checksum_fetch_is_retried(download_dir):
+    server = start_file_server()
+    listed = server.checksums
+    failures = []                               # the checksum file fails twice, then appears
+
+    def checksums():
+        if len(failures) < 2:
+            failures.append(1)
+            return None
+        return listed
+    server.checksum_source = checksums
+    manager = UpdateManager()
+    manager.retry_delay = 0
+    try:
+        path = manager.download_update(f"{server.base}/DNSManagerPro-Setup.exe",
+                                       checksum_url=f"{server.base}/checksums.txt")
+    finally:
+        server.close()
+    assert path.read_bytes() == server.payload and len(failures) == 2
+
+
+def test_parse_checksum_formats():
+    digest = "ab" * 32
+    spaced = " ".join(["ab"] * 32)
+    assert updater.parse_checksums(f"{digest}  dist/App.zip\n{'cd' * 32} *Other.exe", "app.zip") == digest
+    assert updater.parse_checksums(f"SHA256 hash of App.exe:\n{spaced}\nCertUtil: done", "App.exe") == digest
+    assert updater.parse_checksums(f"{digest}\n", "anything.zip") == digest
+    assert updater.parse_checksums(f"{digest}  Other.exe", "App.exe") is None
+
+
+def test_checksum_asset_is_found_for_download():
+    release = {"assets": [
+        {"name": "DNSManagerPro-Setup-v3.exe", "browser_download_url": "https://x/DNSManagerPro-Setup-v3.exe"},
+        {"name": "checksums.txt", "browser_download_url": "https://x/checksums.txt"}]}
+    assert UpdateManager()._get_checksum_url(release) == "https://x/checksums.txt"
+    release["assets"].append({"name": "DNSManagerPro-Setup-v3.exe.sha256",
+                              "browser_download_url": "https://x/setup.sha256"})
+    assert UpdateManager()._get_checksum_url(release) == "https://x/setup.sha256"
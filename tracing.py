@@ -0,0 +1,150 @@
+"""
+Startup and runtime tracing for DNS Manager Pro
+Records timed spans in Chrome trace format (open in chrome://tracing or Perfetto)
+
+Tracing is off unless the DNSMANAGER_TRACE environment variable or the
+--trace command line flag names an output file. When off, span() returns a
+shared no-op context manager and traced functions call straight through.
+"""
+
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+from typing import Dict, Optional
+
+ENV_VAR = 'DNSMANAGER_TRACE'
+DEFAULT_TRACE_FILE = 'dns_manager_trace.json'
+
+_NULL_SPAN = nullcontext()
+
+_tracer = None
+
+
+class Tracer:
+    """Collects trace events in memory and writes them as Chrome trace JSON"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.pid = os.getpid()
+        self.events = []
+        self._named_threads = set()
+        self._lock = threading.Lock()
+
+    def _thread_id(self) -> int:
+        thread = threading.current_thread()
+        tid = thread.ident or 0
+        if tid not in self._named_threads:
+            self._named_threads.add(tid)
+            self.events.append({'name': 'thread_name', 'ph': 'M', 'pid': self.pid, 'tid': tid,
+                                'args': {'name': thread.name}})
+        return tid
+
+    def complete(self, name: str, category: str, start: float, end: float,
+                 args: Optional[Dict] = None):
+        """Record a finished span from perf_counter() timestamps"""
+        event = {'name': name, 'cat': category, 'ph': 'X', 'pid': self.pid,
+                 'tid': self._thread_id(), 'ts': start * 1e6, 'dur': (end - start) * 1e6}
+        if args:
+            event['args'] = args
+        self.events.append(event)
+
+    def instant(self, name: str, category: str, args: Optional[Dict] = None):
+        event = {'name': name, 'cat': category, 'ph': 'i', 's': 't', 'pid': self.pid,
+                 'tid': self._thread_id(), 'ts': time.perf_counter() * 1e6}
+        if args:
+            event['args'] = args
+        self.events.append(event)
+
+    def save(self):
+        """Write all events recorded so far"""
+        with self._lock:
+            try:
+                with open(self.path, 'w') as f:
+                    json.dump({'traceEvents': list(self.events), 'displayTimeUnit': 'ms'}, f)
+            except OSError as e:
+                print(f"Could not write trace file: {e}")
+
+
+class _Span:
+    __slots__ = ('tracer', 'name', 'category', 'args', 'start')
+
+    def __init__(self, tracer: Tracer, name: str, category: str, args: Optional[Dict]):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        args = self.args
+        if exc_type is not None:
+            args = dict(args or {}, error=exc_type.__name__)
+        self.tracer.complete(self.name, self.category, self.start, time.perf_counter(), args)
+        return False
+
+
+def enable(path: Optional[str] = None) -> Tracer:
+    """Start recording; the trace is written at exit and whenever save() is called"""
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer(path or DEFAULT_TRACE_FILE)
+        atexit.register(_tracer.save)
+    return _tracer
+
+
+def enable_from_environment() -> Optional[Tracer]:
+    """Enable tracing if DNSMANAGER_TRACE is set"""
+    path = os.environ.get(ENV_VAR)
+    if path:
+        return enable(path)
+    return None
+
+
+def is_enabled() -> bool:
+    return _tracer is not None
+
+
+def span(name: str, category: str = 'app', **args):
+    """Context manager timing a block; a shared no-op when tracing is off"""
+    if _tracer is None:
+        return _NULL_SPAN
+    return _Span(_tracer, name, category, args or None)
+
+
+def complete(name: str, category: str, start: float, end: float, **args):
+    """Record a span measured elsewhere with time.perf_counter()"""
+    if _tracer is not None:
+        _tracer.complete(name, category, start, end, args or None)
+
+
+def instant(name: str, category: str = 'app', **args):
+    """Record a point-in-time marker"""
+    if _tracer is not None:
+        _tracer.instant(name, category, args or None)
+
+
+def save():
+    if _tracer is not None:
+        _tracer.save()
+
+
+def traced(name: Optional[str] = None, category: str = 'app'):
+    """Decorator timing every call of a function"""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return func(*args, **kwargs)
+            with _Span(_tracer, span_name, category, None):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,167 @@
+"""
+Small thread-safe TTL cache for DNS Manager Pro
+Least recently used entries are evicted beyond `maxsize`; failed loads can
+be remembered briefly (negative caching) so a broken command is not re-run
+on every refresh
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional
+
+_MISSING = object()
+
+
+class _Entry:
+    __slots__ = ('value', 'error', 'expires')
+
+    def __init__(self, value, error: Optional[BaseException], expires: float):
+        self.value = value
+        self.error = error
+        self.expires = expires
+
+
+class TTLCache:
+    """
+    Maps keys to values that expire `ttl` seconds after they were stored
+
+    get_or_load() runs the loader on a miss. A loader exception is re-raised
+    and, when negative_ttl > 0, remembered for that long: hits within the
+    window raise the same exception again without calling the loader.
+    on_lookup('hit' | 'miss') is called for every get/get_or_load.
+    """
+
+    def __init__(self, maxsize: int = 128, ttl: float = 60.0, negative_ttl: float = 0.0,
+                 clock: Callable[[], float] = time.monotonic,
+                 on_lookup: Optional[Callable[[str], None]] = None):
+        if maxsize < 1:
+            raise ValueError("Cache size must be at least 1")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.clock = clock
+        self.on_lookup = on_lookup
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _find(self, key: Hashable) -> Optional[_Entry]:
+        """The live entry for key (moved to most recently used); lock held"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires <= self.clock():
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _count(self, hit: bool):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        if self.on_lookup:
+            self.on_lookup('hit' if hit else 'miss')
+
+    def _store(self, key: Hashable, entry: _Entry):
+        """Lock held"""
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Cached value, or default when missing or expired; re-raises a cached failure"""
+        with self._lock:
+            entry = self._find(key)
+            self._count(entry is not None)
+        if entry is None:
+            return default
+        if entry.error is not None:
+            raise entry.error
+        return entry.value
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Like get, without touching stats or recency; cached failures read as default"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.error is not None or entry.expires <= self.clock():
+                return default
+            return entry.value
+
+    def put(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        with self._lock:
+            self._store(key, _Entry(value, None, self.clock() + (self.ttl if ttl is None else ttl)))
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        Cached value, or loader() stored under key
+        Concurrent misses for one key may each run the loader; the last result wins.
+        """
+        with self._lock:
+            entry = self._find(key)
+            self._count(entry is not None)
+        if entry is not None:
+            if entry.error is not None:
+                raise entry.error
+            return entry.value
+
+        try:
+            value = loader()
+        except Exception as e:
+            if self.negative_ttl > 0:
+                with self._lock:
+                    self._store(key, _Entry(None, e, self.clock() + self.negative_ttl))
+            raise
+        self.put(key, value)
+        return value
+
+    def invalidate(self, key: Hashable) -> bool:
+        """Forget one key; returns whether it was cached"""
+        with self._lock:
+            found = self._entries.pop(key, _MISSING) is not _MISSING
+            if found:
+                self.invalidations += 1
+            return found
+
+    def retain(self, keys: Iterable[Hashable]) -> int:
+        """Forget every key not in keys (e.g. adapters that disappeared); returns how many"""
+        keep = set(keys)
+        with self._lock:
+            stale = [key for key in self._entries if key not in keep]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry.expires > self.clock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self) -> Dict:
+        """Returns: {'size', 'maxsize', 'hits', 'misses', 'hit_rate', 'evictions', 'expirations', 'invalidations'}"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'size': len(self._entries), 'maxsize': self.maxsize,
+                    'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': self.hits / lookups if lookups else None,
+                    'evictions': self.evictions, 'expirations': self.expirations,
+                    'invalidations': self.invalidations}
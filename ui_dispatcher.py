@@ -0,0 +1,108 @@
+"""
+UI update dispatcher for DNS Manager Pro
+Background threads queue widget changes here; the Tk thread applies them
+in one after() tick per frame, merging repeated updates to the same widget.
+"""
+
+import itertools
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional
+
+# Tick interval while updates are arriving (about one frame), and while idle
+FRAME_MS = 16
+IDLE_MS = 50
+
+# Upper bound on queued calls run in one tick; the rest wait for the next frame
+MAX_PER_TICK = 500
+
+
+class UIDispatcher:
+    """
+    Queue of UI calls that is drained on the Tk thread
+
+    Workers never touch Tk, not even to schedule: the Tk thread polls the
+    queue with after(), every FRAME_MS while there is work and every IDLE_MS
+    otherwise. Calls queued with the same key replace each other, and
+    configure() merges options per widget, so a burst of progress updates
+    costs one widget change per frame.
+    """
+
+    def __init__(self, root, frame_ms: int = FRAME_MS, idle_ms: int = IDLE_MS,
+                 max_per_tick: int = MAX_PER_TICK):
+        self.root = root
+        self.frame_ms = frame_ms
+        self.idle_ms = idle_ms
+        self.max_per_tick = max_per_tick
+        self.stats = {'submitted': 0, 'coalesced': 0, 'executed': 0, 'errors': 0, 'ticks': 0}
+        self._pending = OrderedDict()     # key -> (func, args, kwargs)
+        self._lock = threading.Lock()
+        self._sequence = itertools.count()
+        self._after_id = None
+
+    def start(self):
+        """Start polling (call on the Tk thread)"""
+        if self._after_id is None:
+            self._after_id = self.root.after(self.idle_ms, self._tick)
+
+    def stop(self):
+        if self._after_id is not None:
+            try:
+                self.root.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+
+    def call(self, func: Callable, *args, key: Optional[Hashable] = None, **kwargs):
+        """
+        Run func(*args, **kwargs) on the Tk thread (safe from any thread)
+        A pending call with the same key is dropped in favour of this one.
+        """
+        with self._lock:
+            self.stats['submitted'] += 1
+            if key is None:
+                key = ('call', next(self._sequence))
+            elif self._pending.pop(key, None) is not None:
+                self.stats['coalesced'] += 1
+            self._pending[key] = (func, args, kwargs)
+
+    def configure(self, widget, **options):
+        """widget.configure(**options) on the Tk thread, merged with pending changes"""
+        key = ('configure', id(widget))
+        with self._lock:
+            self.stats['submitted'] += 1
+            previous = self._pending.pop(key, None)
+            if previous is not None:
+                self.stats['coalesced'] += 1
+                options = {**previous[2], **options}
+            self._pending[key] = (widget.configure, (), options)
+
+    @property
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def drain(self, limit: Optional[int] = None) -> int:
+        """
+        Run queued calls in order (Tk thread only)
+        Returns: number of calls run
+        """
+        with self._lock:
+            count = len(self._pending) if limit is None else min(limit, len(self._pending))
+            batch = [self._pending.popitem(last=False)[1] for _ in range(count)]
+
+        for func, args, kwargs in batch:
+            try:
+                func(*args, **kwargs)
+            except Exception as e:
+                # Usually the widget's window was closed while a worker was running
+                self.stats['errors'] += 1
+                print(f"UI update {getattr(func, '__qualname__', func)} failed: {e}")
+        self.stats['executed'] += len(batch)
+        return len(batch)
+
+    def _tick(self):
+        self.stats['ticks'] += 1
+        ran = self.drain(self.max_per_tick)
+        delay = self.frame_ms if ran or self.pending else self.idle_ms
+        self._after_id = self.root.after(delay, self._tick)
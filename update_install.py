@@ -0,0 +1,341 @@
+"""
+Delta update installation for DNS Manager Pro
+Releases ship a manifest of file hashes; only files whose hash differs are
+downloaded into a staging directory and swapped into place by rename.
+Full ZIP updates go through the same staging, extracting only the members
+whose CRC differs from the installed file.
+
+Usage (release side):
+    python update_install.py manifest <app dir> <version> [output file]
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from version import GITHUB_REPO
+
+MANIFEST_NAME = 'manifest.json'
+STAGING_DIR = '.update_staging'
+ROLLBACK_DIR = '.update_rollback'
+JOURNAL_NAME = 'journal.json'
+
+# Files that make up an install (top level only, like the app itself)
+APP_PATTERNS = ('*.py', '*.json', '*.ico', '*.svg', '*.txt', '*.md', '*.bat', '*.iss', '*.spec')
+
+# User data and update bookkeeping: never listed, replaced or removed
+PRESERVED = {'dns_configs.json', 'service_catalog.json', 'dns_rules.json', 'monitor_settings.json',
+             'split_dns.json', 'blocklist.json', 'blocklist_index', MANIFEST_NAME, STAGING_DIR,
+             ROLLBACK_DIR, 'backup', 'temp_update', '__pycache__'}
+
+COPY_WORKERS = 8
+
+
+def file_sha256(path: Path) -> str:
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def file_crc32(path: Path) -> int:
+    crc = 0
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            crc = zlib.crc32(block, crc)
+    return crc
+
+
+def raw_base_url(version: str) -> str:
+    """Where a tagged release's files can be fetched one by one"""
+    return f"https://raw.githubusercontent.com/{GITHUB_REPO}/v{version}/"
+
+
+def build_manifest(root: Path, version: str, patterns: Iterable[str] = APP_PATTERNS,
+                   base_url: Optional[str] = None) -> Dict:
+    """
+    Hash every app file under root
+    Returns: {'version', 'base_url', 'files': {name: {'sha256', 'size'}}}
+    """
+    root = Path(root)
+    files = {}
+    for pattern in patterns:
+        for path in sorted(root.glob(pattern)):
+            if path.is_file() and path.name not in PRESERVED:
+                files[path.relative_to(root).as_posix()] = {
+                    'sha256': file_sha256(path),
+                    'size': path.stat().st_size,
+                }
+    return {'version': version, 'base_url': base_url or raw_base_url(version),
+            'files': dict(sorted(files.items()))}
+
+
+def load_manifest(app_dir: Path) -> Optional[Dict]:
+    """The manifest of the currently installed files, if a delta update wrote one"""
+    try:
+        with open(Path(app_dir) / MANIFEST_NAME, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_manifest(app_dir: Path, manifest: Dict):
+    path = Path(app_dir) / MANIFEST_NAME
+    temp_path = path.with_suffix('.tmp')
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temp_path, path)
+
+
+def _check_name(name: str) -> str:
+    """Reject manifest entries that would write outside the app directory"""
+    path = Path(name)
+    if path.is_absolute() or '..' in path.parts or not path.parts or path.parts[0] in PRESERVED:
+        raise ValueError(f"Refusing manifest entry {name!r}")
+    return name
+
+
+def plan_delta(manifest: Dict, app_dir: Path, installed: Optional[Dict] = None) -> Dict[str, List[str]]:
+    """
+    Compare a release manifest with the files on disk
+    A size mismatch marks a file changed without hashing it.
+    Files are only removed if the installed manifest lists them and the new one doesn't.
+    Returns: {'changed': [...], 'removed': [...]}
+    """
+    app_dir = Path(app_dir)
+    changed = []
+    for name, entry in manifest['files'].items():
+        path = app_dir / _check_name(name)
+        if not path.is_file() or path.stat().st_size != entry['size']:
+            changed.append(name)
+        elif file_sha256(path) != entry['sha256']:
+            changed.append(name)
+
+    removed = []
+    if installed:
+        for name in installed.get('files', {}):
+            if name not in manifest['files'] and (app_dir / _check_name(name)).is_file():
+                removed.append(name)
+    return {'changed': changed, 'removed': removed}
+
+
+def _hard_link(source: Path, link_path: Path) -> bool:
+    try:
+        os.link(source, link_path)
+        return True
+    except (OSError, NotImplementedError):
+        return False
+
+
+class StagedSwap:
+    """
+    Replace a set of files so that a failure leaves the previous install
+
+    New files are written under .update_staging (same volume, so os.replace is
+    a rename). commit() keeps each current file in .update_rollback - as a hard
+    link where the filesystem allows, so the file never disappears, otherwise
+    by moving it - and renames the staged file into place; on error this is
+    undone. No file is copied. A journal in the rollback directory lets
+    recover() undo a swap that was interrupted by a crash.
+    """
+
+    def __init__(self, app_dir: Path):
+        self.app_dir = Path(app_dir)
+        self.staging_dir = self.app_dir / STAGING_DIR
+        self.rollback_dir = self.app_dir / ROLLBACK_DIR
+        self._done = []     # (name, had_previous) in commit order
+
+    def stage_path(self, name: str) -> Path:
+        """Where the new version of `name` must be written before commit()"""
+        path = self.staging_dir / _check_name(name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return path
+
+    def _write_journal(self, changed: List[str], removed: List[str]):
+        self.rollback_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.rollback_dir / JOURNAL_NAME, 'w', encoding='utf-8') as f:
+            json.dump({'changed': changed, 'removed': removed}, f)
+
+    def commit(self, changed: List[str], removed: Iterable[str] = ()):
+        removed = list(removed)
+        for name in changed:
+            if not (self.staging_dir / name).is_file():
+                raise FileNotFoundError(f"{name} was not staged")
+        self._write_journal(changed, removed)
+
+        try:
+            for name in changed:
+                self._swap_in(name)
+            for name in removed:
+                self._move_aside(name)
+        except OSError:
+            self.rollback()
+            raise
+        # Done: from here on a crash must not make recover() undo the update
+        (self.rollback_dir / JOURNAL_NAME).unlink()
+
+    def _move_aside(self, name: str, link: bool = False) -> bool:
+        target = self.app_dir / name
+        if not target.exists():
+            self._done.append((name, False))
+            return False
+        backup = self.rollback_dir / name
+        backup.parent.mkdir(parents=True, exist_ok=True)
+        if not (link and _hard_link(target, backup)):
+            # Without hard links (e.g. FAT32) moving is still a rename, not a copy
+            os.replace(target, backup)
+        self._done.append((name, True))
+        return True
+
+    def _swap_in(self, name: str):
+        self._move_aside(name, link=True)
+        target = self.app_dir / name
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(self.staging_dir / name, target)
+
+    def rollback(self):
+        """Undo the moves made by commit(), newest first"""
+        for name, had_previous in reversed(self._done):
+            target = self.app_dir / name
+            backup = self.rollback_dir / name
+            try:
+                if had_previous:
+                    os.replace(backup, target)
+                elif target.exists():
+                    target.unlink()
+            except OSError as e:
+                print(f"Could not restore {name}: {e}")
+        self._done.clear()
+        self.cleanup()
+
+    def cleanup(self):
+        """Drop staging and rollback directories (after a successful or undone swap)"""
+        for directory in (self.staging_dir, self.rollback_dir):
+            if directory.exists():
+                shutil.rmtree(directory, ignore_errors=True)
+
+
+def _zip_content_prefix(names: List[str]) -> str:
+    """Archives often wrap everything in one folder (e.g. GitHub zipballs); strip it"""
+    tops = {name.split('/', 1)[0] for name in names}
+    if len(tops) == 1 and all('/' in name for name in names):
+        return tops.pop() + '/'
+    return ''
+
+
+def install_zip(zip_path: Path, app_dir: Path, max_workers: int = COPY_WORKERS) -> Dict[str, int]:
+    """
+    Install a full ZIP update, touching only files that differ
+    Members are compared with the installed files by size, then by CRC-32
+    (stored in the archive, so unchanged members are never decompressed).
+    Changed members are streamed into staging in parallel and swapped in.
+    Returns: {'changed', 'unchanged'} counts; raises on failure after rolling back
+    """
+    app_dir = Path(app_dir)
+    with zipfile.ZipFile(zip_path) as archive:
+        members = [info for info in archive.infolist() if not info.is_dir()]
+    prefix = _zip_content_prefix([info.filename for info in members])
+
+    entries = []
+    for info in members:
+        name = info.filename[len(prefix):]
+        parts = Path(name).parts
+        if not name or parts[0] in PRESERVED or '__pycache__' in parts:
+            continue
+        entries.append((_check_name(name), info))
+
+    def differs(entry) -> bool:
+        name, info = entry
+        path = app_dir / name
+        if not path.is_file() or path.stat().st_size != info.file_size:
+            return True
+        return file_crc32(path) != info.CRC
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        changed = [entry for entry, different in zip(entries, executor.map(differs, entries))
+                   if different]
+
+    swap = StagedSwap(app_dir)
+    local = threading.local()
+    handles = []
+    handles_lock = threading.Lock()
+
+    def extract(entry):
+        # ZipFile objects are not shared between threads; each worker opens its own
+        if not hasattr(local, 'archive'):
+            local.archive = zipfile.ZipFile(zip_path)
+            with handles_lock:
+                handles.append(local.archive)
+        name, info = entry
+        with local.archive.open(info) as source, open(swap.stage_path(name), 'wb') as target:
+            shutil.copyfileobj(source, target, 1024 * 1024)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(extract, changed))
+        swap.commit([name for name, _ in changed])
+    except BaseException:
+        swap.cleanup()
+        raise
+    finally:
+        for handle in handles:
+            handle.close()
+
+    swap.cleanup()
+    return {'changed': len(changed), 'unchanged': len(entries) - len(changed)}
+
+
+def recover(app_dir: Path) -> bool:
+    """
+    Undo a swap left half-done by a crash (the journal is removed once commit() finishes)
+    Returns: True if something was restored
+    """
+    app_dir = Path(app_dir)
+    journal = app_dir / ROLLBACK_DIR / JOURNAL_NAME
+    if not journal.exists():
+        return False
+    try:
+        with open(journal, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+    except (OSError, ValueError):
+        entries = {'changed': [], 'removed': []}
+
+    swap = StagedSwap(app_dir)
+    for name in entries.get('changed', []):
+        if (swap.rollback_dir / name).exists():
+            # An original that was moved aside
+            swap._done.append((name, True))
+        elif not (swap.staging_dir / name).exists() and (app_dir / name).exists():
+            # New in the update and already swapped in (its staged copy is gone)
+            swap._done.append((name, False))
+    for name in entries.get('removed', []):
+        # Only files that were moved aside; the others were never touched
+        if (swap.rollback_dir / name).exists():
+            swap._done.append((name, True))
+    swap.rollback()
+    return True
+
+
+def main(argv: List[str]) -> int:
+    if len(argv) < 3 or argv[0] != 'manifest':
+        print(__doc__)
+        return 2
+    manifest = build_manifest(Path(argv[1]), argv[2])
+    output = Path(argv[3]) if len(argv) > 3 else Path(argv[1]) / MANIFEST_NAME
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    print(f"Wrote {output} ({len(manifest['files'])} files)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
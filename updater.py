@@ -4,28 +4,123 @@ Handles checking for updates and installing them automatically
 """
 
 import os
+import re
 import sys
 import json
+import random
+import time
+import hashlib
+import http.client
+import urllib.parse
 import urllib.request
 import urllib.error
 import zipfile
-import shutil
 import subprocess
 import tempfile
 from typing import Optional, Dict, Tuple
 from pathlib import Path
 import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from version import __version__, RELEASES_API_URL, GITHUB_REPO
+from command_runner import CommandRunner, default_runner
+import tracing
+import update_install
+
+GIT_TIMEOUT = 120
+
+# Update check caching: at most one request per interval; failed checks back
+# off exponentially (with jitter so a fleet of machines doesn't retry in step)
+UPDATE_STATE_FILE = 'update_check.json'
+MIN_CHECK_INTERVAL = 6 * 3600
+BACKOFF_BASE = 300
+BACKOFF_MAX = 24 * 3600
+
+
+# Downloads: resumed with HTTP Range after a dropped connection, read with a
+# buffer that grows on fast links, verified against the release checksums
+DOWNLOAD_TIMEOUT = 30
+DOWNLOAD_RETRIES = 5
+MIN_BUFFER = 64 * 1024
+MAX_BUFFER = 4 * 1024 * 1024
+PROGRESS_INTERVAL = 0.1  # seconds between progress callbacks
+CHECKSUM_FILES = ('checksums.txt', 'sha256sums', 'sha256sums.txt')
+
+_SHA256_LINE_RE = re.compile(r'^([0-9a-fA-F]{64})\s+\*?(.+?)\s*$')
+_CERTUTIL_HEADER_RE = re.compile(r'^SHA256 hash of (.+?):?\s*$', re.IGNORECASE)
+_HEX_RE = re.compile(r'^[0-9a-fA-F ]+$')
+
+
+def parse_checksums(text: str, filename: Optional[str] = None) -> Optional[str]:
+    """
+    SHA-256 for `filename` from a checksum file
+    Understands `sha256sum` output ("<hex>  <name>"), `certutil -hashfile`
+    output (as written by release.bat) and a file holding a single bare hash.
+    Returns: lowercase hex digest or None if the file is not listed
+    """
+    hashes = {}
+    bare = []
+    pending_name = None
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        match = _SHA256_LINE_RE.match(line)
+        if match:
+            hashes[Path(match.group(2)).name.lower()] = match.group(1).lower()
+            continue
+        match = _CERTUTIL_HEADER_RE.match(line)
+        if match:
+            pending_name = Path(match.group(1).strip('"')).name.lower()
+            continue
+        if _HEX_RE.match(line):
+            digest = line.replace(' ', '').lower()
+            if len(digest) == 64:
+                if pending_name:
+                    hashes[pending_name] = digest
+                else:
+                    bare.append(digest)
+            pending_name = None
+
+    if filename and filename.lower() in hashes:
+        return hashes[filename.lower()]
+    if not hashes and len(bare) == 1:
+        return bare[0]
+    if filename is None and len(hashes) == 1:
+        return next(iter(hashes.values()))
+    return None
+
+
+def state_directory() -> Path:
+    """Per-user directory for update state (the install directory may be read-only)"""
+    base = os.environ.get('LOCALAPPDATA') or Path.home()
+    return Path(base) / 'DNSManagerPro'
+
+
+def backoff_delay(failures: int, base: float = BACKOFF_BASE, cap: float = BACKOFF_MAX) -> float:
+    """Seconds to wait after `failures` consecutive failed checks: half fixed, half random"""
+    delay = min(cap, base * 2 ** max(0, failures - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
 
 
 class UpdateManager:
     """Manages application updates from GitHub releases"""
 
-    def __init__(self):
+    def __init__(self, runner: Optional[CommandRunner] = None, api_url: str = RELEASES_API_URL,
+                 state_path: Optional[Path] = None, min_interval: float = MIN_CHECK_INTERVAL):
+        self.runner = runner or default_runner()
         self.current_version = __version__
         self.is_frozen = getattr(sys, 'frozen', False)
         self.app_dir = self._get_app_directory()
+        self.api_url = api_url
+        self.state_path = Path(state_path) if state_path else state_directory() / UPDATE_STATE_FILE
+        self.min_interval = min_interval
+        self.clock = time.time
+        self.retry_delay = 1.0
+        self._state_lock = threading.Lock()
+
+        if not self.is_frozen and update_install.recover(self.app_dir):
+            print("Rolled back an interrupted update")
 
     def _get_app_directory(self) -> Path:
         """Get the application directory"""
@@ -33,37 +128,107 @@ class UpdateManager:
             return Path(sys.executable).parent
         return Path(__file__).parent
 
-    def check_for_updates(self, timeout=10) -> Optional[Dict]:
+    @tracing.traced('update check', 'update')
+    def check_for_updates(self, timeout=10, force=False) -> Optional[Dict]:
         """
         Check GitHub for latest release
+        Uses the cached release if the last check was recent (unless force=True)
         Returns: dict with update info or None
         """
+        data = self.fetch_release(timeout=timeout, force=force)
+        if not data:
+            return None
+
+        latest_version = data.get('tag_name', '').lstrip('v')
+
+        if self._is_newer_version(latest_version):
+            return {
+                'version': latest_version,
+                'current_version': self.current_version,
+                'release_notes': data.get('body', 'No release notes available'),
+                'download_url': self._get_download_url(data),
+                'checksum_url': self._get_checksum_url(data),
+                'manifest_url': self._get_asset_url(data, update_install.MANIFEST_NAME),
+                'checksums_url': self._get_checksums_file_url(data),
+                'published_at': data.get('published_at', ''),
+                'html_url': data.get('html_url', '')
+            }
+        return None
+
+    def _load_state(self) -> Dict:
         try:
-            headers = {'User-Agent': 'DNS-Manager-Pro'}
-            req = urllib.request.Request(RELEASES_API_URL, headers=headers)
-
-            with urllib.request.urlopen(req, timeout=timeout) as response:
-                data = json.loads(response.read().decode())
-
-                latest_version = data.get('tag_name', '').lstrip('v')
-
-                if self._is_newer_version(latest_version):
-                    return {
-                        'version': latest_version,
-                        'current_version': self.current_version,
-                        'release_notes': data.get('body', 'No release notes available'),
-                        'download_url': self._get_download_url(data),
-                        'published_at': data.get('published_at', ''),
-                        'html_url': data.get('html_url', '')
-                    }
-                return None
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
 
-        except urllib.error.URLError as e:
-            print(f"Network error checking for updates: {e}")
-            return None
-        except Exception as e:
-            print(f"Error checking for updates: {e}")
-            return None
+    def _save_state(self, state: Dict):
+        try:
+            self.state_path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.state_path.with_suffix('.tmp')
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+            os.replace(temp_path, self.state_path)
+        except OSError as e:
+            print(f"Could not save update check state: {e}")
+
+    def fetch_release(self, timeout=10, force=False) -> Optional[Dict]:
+        """
+        Latest release JSON, fetched with a conditional request
+        The last response is kept on disk with its ETag/Last-Modified; a 304
+        reuses it. Within min_interval of the last check, or while backing off
+        after failures, no request is made unless force=True.
+        Returns: release data (possibly cached) or None
+        """
+        with self._state_lock:
+            state = self._load_state()
+            now = self.clock()
+            cached = state.get('release')
+
+            if not force:
+                if now < state.get('retry_after', 0):
+                    return cached
+                if cached and now - state.get('checked_at', 0) < self.min_interval:
+                    return cached
+
+            headers = {'User-Agent': 'DNS-Manager-Pro', 'Accept': 'application/vnd.github+json'}
+            if cached:
+                if state.get('etag'):
+                    headers['If-None-Match'] = state['etag']
+                if state.get('last_modified'):
+                    headers['If-Modified-Since'] = state['last_modified']
+
+            try:
+                req = urllib.request.Request(self.api_url, headers=headers)
+                with urllib.request.urlopen(req, timeout=timeout) as response:
+                    data = json.loads(response.read().decode())
+                    state.update(release=data,
+                                 etag=response.headers.get('ETag'),
+                                 last_modified=response.headers.get('Last-Modified'))
+            except urllib.error.HTTPError as e:
+                if e.code == 304 and cached:
+                    data = cached
+                else:
+                    print(f"Update check failed: HTTP {e.code}")
+                    self._record_failure(state, now, e.headers.get('Retry-After'))
+                    return cached
+            except (urllib.error.URLError, OSError, ValueError) as e:
+                print(f"Network error checking for updates: {e}")
+                self._record_failure(state, now)
+                return cached
+
+            state.update(checked_at=now, failures=0, retry_after=0)
+            self._save_state(state)
+            return data
+
+    def _record_failure(self, state: Dict, now: float, retry_after: Optional[str] = None):
+        state['failures'] = state.get('failures', 0) + 1
+        delay = backoff_delay(state['failures'])
+        if retry_after and retry_after.isdigit():
+            # Rate limited: never retry earlier than the server asked
+            delay = max(delay, int(retry_after))
+        state['retry_after'] = now + delay
+        self._save_state(state)
 
     def _is_newer_version(self, latest: str) -> bool:
         """Compare version strings"""
@@ -102,9 +267,45 @@ class UpdateManager:
 
         return release_data.get('zipball_url')
 
-    def download_update(self, download_url: str, progress_callback=None) -> Optional[Path]:
+    @staticmethod
+    def _get_asset_url(release_data: Dict, asset_name: str) -> Optional[str]:
+        for asset in release_data.get('assets', []):
+            if asset.get('name', '').lower() == asset_name:
+                return asset.get('browser_download_url')
+        return None
+
+    def _get_checksum_url(self, release_data: Dict) -> Optional[str]:
+        """URL of the checksum asset for the chosen download, if the release publishes one"""
+        download_url = self._get_download_url(release_data) or ''
+        download_name = download_url.rsplit('/', 1)[-1].lower()
+        assets = release_data.get('assets', [])
+
+        for asset in assets:
+            name = asset.get('name', '').lower()
+            if download_name and name == download_name + '.sha256':
+                return asset.get('browser_download_url')
+
+        return self._get_checksums_file_url(release_data)
+
+    @staticmethod
+    def _get_checksums_file_url(release_data: Dict) -> Optional[str]:
+        """URL of the release-wide checksum file (one hash per published asset)"""
+        for asset in release_data.get('assets', []):
+            if asset.get('name', '').lower() in CHECKSUM_FILES:
+                return asset.get('browser_download_url')
+        return None
+
+    @tracing.traced('update download', 'update')
+    def download_update(self, download_url: str, progress_callback=None,
+                        checksum_url: Optional[str] = None,
+                        retries: int = DOWNLOAD_RETRIES) -> Optional[Path]:
         """
-        Download update file
+        Download update file, resuming a previous partial download if there is one
+        progress_callback(percent, downloaded, total) is called at most
+        1 / PROGRESS_INTERVAL times per second, from the downloading thread.
+        The file must match its SHA-256 in the release checksums (checksum_url);
+        a release without one, or a checksum file that does not list the
+        asset, is not downloaded at all.
         Returns: Path to downloaded file or None
         """
         try:
@@ -119,33 +320,238 @@ class UpdateManager:
                 filename = 'dns_manager_update.zip'
 
             file_path = temp_dir / filename
+            part_path = temp_dir / (filename + '.part')
 
-            # Download with progress
-            headers = {'User-Agent': 'DNS-Manager-Pro'}
-            req = urllib.request.Request(download_url, headers=headers)
-
-            with urllib.request.urlopen(req) as response:
-                total_size = int(response.headers.get('content-length', 0))
-                downloaded = 0
+            asset_name = urllib.parse.unquote(download_url.rsplit('/', 1)[-1])
+            if not checksum_url:
+                print(f"The release publishes no checksums; refusing to install {asset_name} unverified")
+                return None
+            expected = self._fetch_checksum(checksum_url, asset_name, retries)
+            if not expected:
+                print(f"Checksum file does not list {asset_name}; refusing to install it unverified")
+                return None
 
-                with open(file_path, 'wb') as f:
-                    while True:
-                        chunk = response.read(8192)
-                        if not chunk:
-                            break
-                        f.write(chunk)
-                        downloaded += len(chunk)
+            digest = self._stream_download(download_url, part_path, progress_callback, retries)
 
-                        if progress_callback and total_size > 0:
-                            progress = (downloaded / total_size) * 100
-                            progress_callback(progress, downloaded, total_size)
+            if digest != expected:
+                print(f"Checksum mismatch for update: expected {expected}, got {digest}")
+                self._discard_partial(part_path)
+                return None
 
+            os.replace(part_path, file_path)
+            self._discard_partial(part_path)
             return file_path
 
-        except Exception as e:
+        except (urllib.error.URLError, http.client.HTTPException, OSError, ValueError) as e:
             print(f"Error downloading update: {e}")
             return None
 
+    def _fetch_checksum(self, checksum_url: str, asset_name: str,
+                        retries: int = DOWNLOAD_RETRIES) -> Optional[str]:
+        """Published SHA-256 of an asset; transient failures are retried with a growing delay"""
+        headers = {'User-Agent': 'DNS-Manager-Pro'}
+        req = urllib.request.Request(checksum_url, headers=headers)
+        for attempt in range(retries + 1):
+            try:
+                with urllib.request.urlopen(req, timeout=DOWNLOAD_TIMEOUT) as response:
+                    text = response.read().decode('utf-8', errors='replace')
+                return parse_checksums(text, asset_name)
+            except urllib.error.HTTPError as e:
+                if e.code < 500 or attempt == retries:
+                    raise
+                error = e
+            except (urllib.error.URLError, http.client.HTTPException, OSError) as e:
+                if attempt == retries:
+                    raise
+                error = e
+            print(f"Could not fetch the release checksums ({error}), retrying")
+            time.sleep(self.retry_delay * 2 ** attempt)
+
+    @staticmethod
+    def _discard_partial(part_path: Path):
+        for path in (part_path, part_path.with_name(part_path.name + '.json')):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _stream_download(self, url: str, part_path: Path, progress_callback, retries: int) -> str:
+        """
+        Download url into part_path, resuming with Range requests
+        Returns: SHA-256 hex digest of the complete file
+        """
+        meta_path = part_path.with_name(part_path.name + '.json')
+        sha = hashlib.sha256()
+        offset = 0
+        validator = None
+
+        # Resume a partial file left by an earlier run of the same download
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('url') == url and part_path.exists():
+                validator = meta.get('validator')
+                with open(part_path, 'rb') as f:
+                    for block in iter(lambda: f.read(MAX_BUFFER), b''):
+                        sha.update(block)
+                        offset += len(block)
+        except (OSError, ValueError):
+            pass
+
+        total = None
+        buffer_size = MIN_BUFFER
+        failures = 0
+        last_report = 0.0
+
+        while True:
+            headers = {'User-Agent': 'DNS-Manager-Pro'}
+            if offset:
+                headers['Range'] = f'bytes={offset}-'
+                if validator:
+                    # Server sends the whole file instead if it changed since
+                    headers['If-Range'] = validator
+            req = urllib.request.Request(url, headers=headers)
+            received = 0
+
+            try:
+                with urllib.request.urlopen(req, timeout=DOWNLOAD_TIMEOUT) as response:
+                    content_range = response.headers.get('Content-Range', '')
+                    if offset and response.status == 206 and content_range.startswith(f'bytes {offset}-'):
+                        size = content_range.rsplit('/', 1)[-1]
+                        total = int(size) if size.isdigit() else None
+                    else:
+                        # Full body: start over
+                        offset = 0
+                        sha = hashlib.sha256()
+                        length = response.headers.get('Content-Length')
+                        total = int(length) if length and length.isdigit() else None
+
+                    validator = response.headers.get('ETag') or response.headers.get('Last-Modified')
+                    with open(meta_path, 'w', encoding='utf-8') as f:
+                        json.dump({'url': url, 'validator': validator}, f)
+
+                    with open(part_path, 'ab' if offset else 'wb') as f:
+                        while True:
+                            started = time.perf_counter()
+                            chunk = response.read(buffer_size)
+                            elapsed = time.perf_counter() - started
+                            if not chunk:
+                                break
+                            f.write(chunk)
+                            sha.update(chunk)
+                            offset += len(chunk)
+                            received += len(chunk)
+
+                            # Grow the buffer while reads fill it quickly, shrink on slow links
+                            if len(chunk) == buffer_size and elapsed < 0.05:
+                                buffer_size = min(MAX_BUFFER, buffer_size * 2)
+                            elif elapsed > 0.5:
+                                buffer_size = max(MIN_BUFFER, buffer_size // 2)
+
+                            now = time.monotonic()
+                            if progress_callback and total and now - last_report >= PROGRESS_INTERVAL:
+                                last_report = now
+                                progress_callback(offset / total * 100, offset, total)
+
+                if total is not None and offset < total:
+                    raise http.client.IncompleteRead(b'', total - offset)
+
+            except urllib.error.HTTPError as e:
+                if e.code == 416 and offset:
+                    # Partial file is not a prefix of the current file
+                    offset, validator, sha = 0, None, hashlib.sha256()
+                    continue
+                if e.code < 500:
+                    raise
+                error = e
+            except (urllib.error.URLError, http.client.HTTPException, OSError) as e:
+                error = e
+            else:
+                break
+
+            # Only consecutive attempts that made no progress count against the limit
+            failures = 0 if received else failures + 1
+            if failures > retries:
+                raise error
+            print(f"Download interrupted at {offset} bytes ({error}), resuming")
+            time.sleep(self.retry_delay * max(1, failures))
+
+        if progress_callback and total:
+            progress_callback(100.0, offset, total)
+        return sha.hexdigest()
+
+    def can_delta_update(self, update_info: Dict) -> bool:
+        """
+        Delta updates replace individual files, so they only apply to source installs,
+        and need the checksums that vouch for the manifest
+        """
+        return (not self.is_frozen and bool(update_info.get('manifest_url'))
+                and bool(update_info.get('checksums_url')))
+
+    @tracing.traced('delta update', 'update')
+    def install_delta(self, update_info: Dict, progress_callback=None, max_workers: int = 4) -> bool:
+        """
+        Update by downloading only the files whose hash differs from the release manifest
+        progress_callback(percent, files_done, files_total) is called per file.
+        Returns: True if successful (also when nothing changed)
+        """
+        swap = update_install.StagedSwap(self.app_dir)
+        try:
+            # The manifest carries every file's hash, so it is checked against the release checksums
+            expected = self._fetch_checksum(update_info['checksums_url'], update_install.MANIFEST_NAME)
+            if not expected:
+                raise ValueError(f"Checksum file does not list {update_install.MANIFEST_NAME}")
+            req = urllib.request.Request(update_info['manifest_url'],
+                                         headers={'User-Agent': 'DNS-Manager-Pro'})
+            with urllib.request.urlopen(req, timeout=DOWNLOAD_TIMEOUT) as response:
+                body = response.read()
+            if hashlib.sha256(body).hexdigest() != expected:
+                raise ValueError(f"Checksum mismatch for {update_install.MANIFEST_NAME}")
+            manifest = json.loads(body.decode())
+
+            plan = update_install.plan_delta(manifest, self.app_dir,
+                                             update_install.load_manifest(self.app_dir))
+            changed = plan['changed']
+            base_url = manifest.get('base_url') or update_install.raw_base_url(manifest['version'])
+            print(f"Delta update: {len(changed)} changed, {len(plan['removed'])} removed "
+                  f"of {len(manifest['files'])} files")
+
+            done = 0
+            if progress_callback and changed:
+                progress_callback(0.0, 0, len(changed))
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [executor.submit(self._download_file, base_url + urllib.parse.quote(name),
+                                           swap.stage_path(name), manifest['files'][name]['sha256'])
+                           for name in changed]
+                for future in futures:
+                    future.result()
+                    done += 1
+                    if progress_callback:
+                        progress_callback(done / len(changed) * 100, done, len(changed))
+
+            swap.commit(changed, plan['removed'])
+            update_install.save_manifest(self.app_dir, manifest)
+            swap.cleanup()
+            return True
+
+        except (urllib.error.URLError, http.client.HTTPException, OSError, ValueError, KeyError) as e:
+            print(f"Error installing delta update: {e}")
+            swap.cleanup()
+            return False
+
+    @staticmethod
+    def _download_file(url: str, destination: Path, expected_sha256: str):
+        """Download one file and check it against its manifest hash"""
+        sha = hashlib.sha256()
+        req = urllib.request.Request(url, headers={'User-Agent': 'DNS-Manager-Pro'})
+        with urllib.request.urlopen(req, timeout=DOWNLOAD_TIMEOUT) as response:
+            with open(destination, 'wb') as f:
+                for chunk in iter(lambda: response.read(MIN_BUFFER), b''):
+                    f.write(chunk)
+                    sha.update(chunk)
+        if sha.hexdigest() != expected_sha256:
+            raise ValueError(f"Checksum mismatch for {url}")
+
     def install_update(self, update_file: Path, silent=False) -> bool:
         """
         Install the downloaded update
@@ -171,62 +577,13 @@ class UpdateManager:
             return False
 
     def _install_from_zip(self, zip_path: Path) -> bool:
-        """Extract ZIP and replace application files"""
+        """Extract ZIP and replace the application files that changed"""
         try:
-            # Create backup
-            backup_dir = self.app_dir / 'backup'
-            if backup_dir.exists():
-                shutil.rmtree(backup_dir)
-            backup_dir.mkdir(exist_ok=True)
-
-            # Backup critical files
-            for item in self.app_dir.iterdir():
-                if item.name not in ['backup', 'dns_configs.json', 'logo.ico']:
-                    if item.is_file():
-                        shutil.copy2(item, backup_dir / item.name)
-                    elif item.is_dir() and item.name != '__pycache__':
-                        shutil.copytree(item, backup_dir / item.name, dirs_exist_ok=True)
-
-            # Extract new files
-            temp_extract = self.app_dir / 'temp_update'
-            temp_extract.mkdir(exist_ok=True)
-
-            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                zip_ref.extractall(temp_extract)
-
-            # Find the actual content directory (might be nested)
-            content_dir = temp_extract
-            subdirs = list(temp_extract.iterdir())
-            if len(subdirs) == 1 and subdirs[0].is_dir():
-                content_dir = subdirs[0]
-
-            # Copy new files
-            for item in content_dir.iterdir():
-                dest = self.app_dir / item.name
-                if item.is_file():
-                    shutil.copy2(item, dest)
-                elif item.is_dir():
-                    if dest.exists():
-                        shutil.rmtree(dest)
-                    shutil.copytree(item, dest)
-
-            # Cleanup
-            shutil.rmtree(temp_extract)
-
+            stats = update_install.install_zip(zip_path, self.app_dir)
+            print(f"Installed update: {stats['changed']} files changed, {stats['unchanged']} unchanged")
             return True
-
-        except Exception as e:
+        except (zipfile.BadZipFile, OSError, ValueError) as e:
             print(f"Error installing from ZIP: {e}")
-            # Try to restore backup
-            if backup_dir.exists():
-                for item in backup_dir.iterdir():
-                    dest = self.app_dir / item.name
-                    if item.is_file():
-                        shutil.copy2(item, dest)
-                    elif item.is_dir():
-                        if dest.exists():
-                            shutil.rmtree(dest)
-                        shutil.copytree(item, dest)
             return False
 
     def check_git_repo(self) -> bool:
@@ -241,24 +598,22 @@ class UpdateManager:
                 return False, "Not a git repository"
 
             # Stash local changes
-            result = subprocess.run(['git', 'stash'],
-                                  capture_output=True,
-                                  text=True,
-                                  cwd=str(self.app_dir))
+            result = self.runner.run(['git', 'stash'], timeout=GIT_TIMEOUT,
+                                     cwd=str(self.app_dir), label='git stash')
+            if result.error:
+                return False, "Git not installed"
 
             # Pull latest changes
-            result = subprocess.run(['git', 'pull', 'origin', 'main'],
-                                  capture_output=True,
-                                  text=True,
-                                  cwd=str(self.app_dir))
+            result = self.runner.run(['git', 'pull', 'origin', 'main'], timeout=GIT_TIMEOUT,
+                                     cwd=str(self.app_dir), label='git pull')
 
-            if result.returncode == 0:
+            if result.ok:
                 return True, "Updated successfully via git"
+            elif result.timed_out:
+                return False, f"git pull timed out after {GIT_TIMEOUT}s"
             else:
                 return False, result.stderr
 
-        except FileNotFoundError:
-            return False, "Git not installed"
         except Exception as e:
             return False, str(e)
 